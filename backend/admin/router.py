@@ -142,6 +142,15 @@ async def status_sincronizacao(
     return await service.status_sincronizacao()
 
 
+@router.get("/sync/execucoes")
+async def historico_sincronizacao(
+    limite: int = Query(30, ge=1, le=200),
+    current_user: CurrentUser = Depends(require_perfil("superadmin"))
+):
+    """Histórico de execuções da sincronização com tendências de latência"""
+    return await service.historico_sincronizacao(limite)
+
+
 @router.post("/sync/forcar/{uc_id}")
 async def forcar_sincronizacao(
     uc_id: int,
@@ -8,6 +8,7 @@ from decimal import Decimal
 import re
 from ..core.database import db_admin
 from ..core.exceptions import NotFoundError, ValidationError, ForbiddenError
+from ..faturas.blob_store import FILTRO_COM_PDF
 
 
 def parse_datetime_safe(dt_string: str) -> datetime:
@@ -613,7 +614,7 @@ class AdminService:
         # Faturas com PDF
         faturas_pdf_result = self.supabase.table("faturas").select(
             "id", count="exact"
-        ).not_.is_("pdf_base64", "null").execute()
+        ).or_(FILTRO_COM_PDF).execute()
         faturas_com_pdf = faturas_pdf_result.count or 0
 
         return {
@@ -632,6 +633,93 @@ class AdminService:
             "sessoes": sessoes
         }
 
+    async def historico_sincronizacao(self, limite: int = 30) -> Dict[str, Any]:
+        """
+        Retorna as últimas execuções da sincronização e tendências de latência.
+
+        Args:
+            limite: Quantidade de execuções analisadas
+
+        Returns:
+            Execuções (mais recente primeiro), tendência por etapa e CPFs mais lentos
+        """
+        result = self.supabase.table("sync_execucoes").select(
+            "id, origem, inicio, fim, duracao_segundos, ucs_processadas, ucs_atualizadas, "
+            "faturas_sincronizadas, gd_sincronizados, erros, cpfs_processados, cpfs_ignorados, "
+            "latencias, cpfs"
+        ).order("inicio", desc=True).limit(limite).execute()
+
+        execucoes = result.data or []
+        cronologicas = list(reversed(execucoes))
+
+        # Série por etapa (mais antiga primeiro) e comparação entre metades
+        series: Dict[str, List[dict]] = {}
+        for execucao in cronologicas:
+            for etapa, lat in (execucao.get("latencias") or {}).items():
+                series.setdefault(etapa, []).append({
+                    "execucao_id": execucao["id"],
+                    "inicio": execucao["inicio"],
+                    "p50": lat.get("p50"),
+                    "p95": lat.get("p95"),
+                    "max": lat.get("max"),
+                    "n": lat.get("n")
+                })
+
+        tendencias = {}
+        for etapa, serie in series.items():
+            p95s = [ponto["p95"] for ponto in serie if ponto["p95"] is not None]
+            meio = len(p95s) // 2
+            anterior = sum(p95s[:meio]) / meio if meio else None
+            recente = sum(p95s[meio:]) / (len(p95s) - meio) if len(p95s) > meio else None
+            variacao = None
+            if anterior and recente is not None:
+                variacao = round((recente - anterior) / anterior * 100, 1)
+
+            tendencias[etapa] = {
+                "p95_anterior": round(anterior, 3) if anterior is not None else None,
+                "p95_recente": round(recente, 3) if recente is not None else None,
+                "variacao_p95_percentual": variacao,
+                "serie": serie
+            }
+
+        # CPFs mais lentos (média entre as execuções em que apareceram)
+        duracoes_cpf: Dict[str, List[float]] = {}
+        for execucao in execucoes:
+            for cpf, info in (execucao.get("cpfs") or {}).items():
+                if info.get("processado"):
+                    duracoes_cpf.setdefault(cpf, []).append(info.get("duracao_segundos") or 0)
+
+        cpfs_mais_lentos = sorted(
+            (
+                {
+                    "cpf": cpf,
+                    "execucoes": len(duracoes),
+                    "duracao_media_segundos": round(sum(duracoes) / len(duracoes), 2),
+                    "duracao_max_segundos": max(duracoes)
+                }
+                for cpf, duracoes in duracoes_cpf.items()
+            ),
+            key=lambda x: x["duracao_media_segundos"],
+            reverse=True
+        )[:10]
+
+        duracoes = [float(e["duracao_segundos"]) for e in execucoes if e.get("duracao_segundos") is not None]
+
+        return {
+            "resumo": {
+                "execucoes": len(execucoes),
+                "duracao_media_segundos": round(sum(duracoes) / len(duracoes), 2) if duracoes else None,
+                "duracao_max_segundos": max(duracoes) if duracoes else None,
+                "erros_total": sum(e.get("erros") or 0 for e in execucoes)
+            },
+            "execucoes": [
+                {k: v for k, v in e.items() if k not in ("latencias", "cpfs")}
+                for e in execucoes
+            ],
+            "tendencias": tendencias,
+            "cpfs_mais_lentos": cpfs_mais_lentos
+        }
+
     async def forcar_sincronizacao(self, uc_id: int, user_id: str) -> Dict[str, Any]:
         """Força sincronização de uma UC específica"""
         from backend.sync.service import SyncService
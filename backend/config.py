@@ -54,6 +54,60 @@ class Settings(BaseSettings):
     # ========================
     ENERGISA_SESSION_TIMEOUT: int = 300  # 5 minutos
     ENERGISA_TOKEN_EXPIRATION_HOURS: int = 24
+    ENERGISA_HTTP_POOL_MAXSIZE: int = 32  # conexões keep-alive reaproveitadas por host
+    ENERGISA_HTTP_POOL_HOSTS: int = 4
+    ENERGISA_TOKEN_MARGEM_SEGUNDOS: int = 300  # renova o token só se expira antes disso
+    ENERGISA_TOKEN_TTL_SEM_EXP_SEGUNDOS: int = 600  # token sem exp legível: vale após refresh
+    ENERGISA_BUILD_ID_TTL_SEGUNDOS: int = 900  # buildId do Next.js atualizado em background após isso
+    ENERGISA_CACHE_MAX_ITENS: int = 2000  # respostas de leitura em memória (LRU)
+    ENERGISA_CACHE_TTL_UCS: int = 300  # validade por endpoint, em segundos (0 = sem cache)
+    ENERGISA_CACHE_TTL_UC_INFO: int = 600
+    ENERGISA_CACHE_TTL_FATURAS: int = 300
+    ENERGISA_CACHE_TTL_GD: int = 900
+    ENERGISA_CAMINHOS_MEIA_VIDA_SEGUNDOS: int = 1800  # peso das observações de cada rota cai pela metade
+    ENERGISA_CAMINHOS_EXPLORAR_A_CADA: int = 50  # chamadas entre tentativas de uma rota fora do topo (0 = nunca)
+    ENERGISA_SESSAO_CACHE_TTL_SEGUNDOS: int = 300  # sessão em memória antes de reler o banco (0 = sem cache)
+    ENERGISA_RENOVACAO_ANTECEDENCIA_HORAS: int = 2  # renova sessões a menos disso das 24h
+    ENERGISA_RENOVACAO_INTERVALO_SEGUNDOS: int = 600
+    ENERGISA_RENOVACAO_LOTE: int = 10  # sessões renovadas por verificação
+    ENERGISA_RENOVACAO_MAX_FALHAS: int = 3  # tentativas seguidas antes de deixar a sessão expirar
+    PLAYWRIGHT_POOL_NAVEGADORES: int = 2  # Chromium pré-aquecidos para login (0 = um por login)
+    PLAYWRIGHT_POOL_MAX_LOGINS: int = 4  # logins simultâneos; os demais esperam na fila
+    PLAYWRIGHT_POOL_MAX_USOS: int = 20  # contextos por navegador antes de reciclar
+    PLAYWRIGHT_POOL_ESPERA_SEGUNDOS: int = 20  # espera máxima na fila de login (rotas esperam 60s no total)
+    ENERGISA_LOGIN_BLOQUEAR_RECURSOS: bool = True  # login sem imagens, fontes, mídia e rastreadores
+    ENERGISA_LOGIN_URL: str = "https://servicos.energisa.com.br/login"  # página aberta pelo Playwright (simulador no benchmark)
+    ENERGISA_LIMITE_GLOBAL_RPS: float = 20.0  # requisições/s do processo à Energisa (WAF por IP)
+    ENERGISA_LIMITE_GLOBAL_RAJADA: float = 40.0
+    ENERGISA_LIMITE_CPF_RPS: float = 3.0  # requisições/s por sessão
+    ENERGISA_LIMITE_CPF_RAJADA: float = 6.0
+    ENERGISA_LIMITE_RPS_MINIMO: float = 0.2  # piso após bloqueios seguidos
+    ENERGISA_LIMITE_FATOR_REDUCAO: float = 0.5  # taxa multiplicada por isso a cada 403/429/WAF
+    ENERGISA_LIMITE_AUMENTO_RPS: float = 0.1  # taxa devolvida a cada resposta normal
+    ENERGISA_LIMITE_ESPERA_MAX_SEGUNDOS: float = 30.0  # acima disso a chamada falha em vez de esperar
+    LOGIN_SESSOES_MAX: int = 50  # logins por SMS em andamento por processo
+    LOGIN_SESSAO_TTL_SEGUNDOS: int = 600  # sessão no fluxo do SMS; depois o navegador é fechado
+    LOGIN_SESSAO_TTL_AUTENTICADA_SEGUNDOS: int = 3600  # simulação pública após o SMS validado
+
+    # ========================
+    # Sincronização Energisa
+    # ========================
+    SYNC_MAX_CONCORRENCIA: int = 4  # CPFs sincronizando em paralelo
+    SYNC_MAX_CONCORRENCIA_POR_CPF: int = 1  # jobs simultâneos do mesmo CPF (scheduler + manual/renovação/PDFs)
+    SYNC_AGENDA_INTERVALO_SEGUNDOS: int = 60  # verificação da agenda de UCs
+    SYNC_AGENDA_LOTE: int = 50  # UCs vencidas sincronizadas por verificação
+    SYNC_LEASE_TTL_SEGUNDOS: int = 90  # lease de líder do scheduler
+    SYNC_SCHEDULER_NA_API: bool = True  # False = scheduler só no worker dedicado
+    PDF_FILA_CONCORRENCIA: int = 2  # CPFs baixando PDFs em paralelo
+    PDF_FILA_MAX_TENTATIVAS: int = 6  # backoff exponencial entre tentativas
+
+    # ========================
+    # Armazenamento de PDFs
+    # ========================
+    PDF_BLOB_BACKEND: str = "local"  # "local" ou "supabase" (Storage)
+    PDF_BLOB_DIRETORIO: str = "data/pdfs"  # raiz dos blobs no backend local
+    PDF_BLOB_COMPARTILHADO: bool = False  # True = diretório local é um volume visto pela API e pelo worker
+    PDF_BLOB_BUCKET: str = "faturas-pdf"  # bucket privado no backend supabase
 
     # ========================
     # LLM / AI Extraction
@@ -62,6 +116,15 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4o-mini"
     ANTHROPIC_API_KEY: Optional[str] = None
+    EXTRACAO_FILA_WORKERS: int = 4  # faturas extraídas em paralelo pelo worker
+    EXTRACAO_FILA_MAX_TENTATIVAS: int = 3  # backoff exponencial entre tentativas
+    EXTRACAO_LIMITE_LLMWHISPERER: int = 2  # chamadas simultâneas por provedor
+    EXTRACAO_LIMITE_OPENAI: int = 4
+    EXTRACAO_LIMITE_ANTHROPIC: int = 4
+    EXTRACAO_CACHE: bool = True  # reaproveita extrações do mesmo PDF (extracao_cache)
+    EXTRACAO_CUSTO_LLMWHISPERER_PAGINA_USD: float = 0.01  # high_quality, para estimar a economia
+    EXTRACAO_CUSTO_OPENAI_ENTRADA_USD: float = 0.15  # por 1M tokens (gpt-4o-mini)
+    EXTRACAO_CUSTO_OPENAI_SAIDA_USD: float = 0.60  # por 1M tokens (gpt-4o-mini)
 
     # ========================
     # Database (PostgreSQL via Supabase)
@@ -4,7 +4,7 @@ Database - Conexão com Supabase
 
 from supabase import create_client, Client
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Optional
 
 from backend.config import settings
 
@@ -149,6 +149,57 @@ class SupabaseClient:
     # Métodos utilitários
     # ========================
 
+    def upsert_em_lote(
+        self,
+        name: str,
+        registros: List[dict],
+        on_conflict: str,
+        tamanho_lote: int = 500
+    ) -> int:
+        """
+        Faz upsert de vários registros com o menor número de requisições.
+
+        Registros são agrupados pelo conjunto de colunas: num upsert em lote o
+        PostgREST grava NULL nas colunas ausentes de uma linha, então só vão
+        juntos registros com as mesmas chaves (preserva o comportamento de
+        remover campos None antes do upsert individual).
+
+        Registros repetidos na chave de conflito ficam só com o último: o
+        Postgres recusa o lote inteiro se o ON CONFLICT atingir a mesma linha
+        duas vezes ("cannot affect row a second time").
+
+        Args:
+            name: Nome da tabela
+            registros: Lista de registros
+            on_conflict: Colunas da constraint de conflito
+            tamanho_lote: Máximo de registros por requisição
+
+        Returns:
+            Número de requisições enviadas
+        """
+        chave = [coluna.strip() for coluna in on_conflict.split(",")]
+        unicos: Dict[tuple, dict] = {}
+        for registro in registros:
+            identificador = tuple(registro.get(coluna) for coluna in chave)
+            # pop + reinserção: o registro vai para a posição do último
+            unicos.pop(identificador, None)
+            unicos[identificador] = registro
+
+        grupos: Dict[tuple, List[dict]] = {}
+        for registro in unicos.values():
+            grupos.setdefault(tuple(sorted(registro.keys())), []).append(registro)
+
+        requisicoes = 0
+        for grupo in grupos.values():
+            for i in range(0, len(grupo), tamanho_lote):
+                self.table(name).upsert(
+                    grupo[i:i + tamanho_lote],
+                    on_conflict=on_conflict
+                ).execute()
+                requisicoes += 1
+
+        return requisicoes
+
     async def get_config(self, chave: str) -> Optional[str]:
         """
         Busca uma configuração da plataforma.
@@ -0,0 +1,130 @@
+"""
+Lease - Eleição de líder entre processos via tabela worker_leases
+Garante que só um processo (worker uvicorn ou container) rode uma tarefa de background
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from backend.core.database import SupabaseClient
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """
+    Lease nomeado renovado em background.
+
+    O processo que consegue adquirir o lease vira líder e o renova a cada
+    ttl/3 segundos. Se o processo morrer ou travar, o lease expira e outro
+    processo assume na próxima tentativa.
+    """
+
+    def __init__(self, nome: str, ttl_segundos: int = 90):
+        """
+        Args:
+            nome: Nome do lease (uma tarefa de background)
+            ttl_segundos: Validade do lease sem renovação
+        """
+        self.nome = nome
+        self.ttl_segundos = max(10, ttl_segundos)
+        self.dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.db = SupabaseClient(admin=True)
+        self._lider = False
+        self._lider_desde: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_lider(self) -> bool:
+        """True se este processo segura o lease"""
+        return self._lider
+
+    def tentar_adquirir(self) -> bool:
+        """
+        Adquire ou renova o lease.
+
+        Returns:
+            True se este processo é o líder
+        """
+        try:
+            result = self.db.rpc("adquirir_lease", {
+                "p_nome": self.nome,
+                "p_dono": self.dono,
+                "p_ttl_segundos": self.ttl_segundos
+            }).execute()
+            lider = bool(result.data)
+        except Exception as e:
+            # Sem conseguir renovar, não dá para garantir exclusividade
+            logger.warning(f"⚠️ Erro ao renovar lease '{self.nome}': {e}")
+            lider = False
+
+        if lider and not self._lider:
+            self._lider_desde = datetime.now()
+            logger.info(f"👑 Lease '{self.nome}' adquirido por {self.dono}")
+        elif not lider and self._lider:
+            self._lider_desde = None
+            logger.warning(f"⚠️ Lease '{self.nome}' perdido por {self.dono}")
+
+        self._lider = lider
+        return lider
+
+    def liberar(self):
+        """Libera o lease para outro processo assumir imediatamente"""
+        if not self._lider:
+            return
+        try:
+            self.db.rpc("liberar_lease", {"p_nome": self.nome, "p_dono": self.dono}).execute()
+            logger.info(f"🔓 Lease '{self.nome}' liberado por {self.dono}")
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao liberar lease '{self.nome}': {e}")
+        self._lider = False
+        self._lider_desde = None
+
+    async def _manter(self):
+        """Loop de aquisição/renovação"""
+        while True:
+            await asyncio.to_thread(self.tentar_adquirir)
+            await asyncio.sleep(self.ttl_segundos / 3)
+
+    def start(self):
+        """Inicia a renovação em background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._manter())
+
+    def parar_renovacao(self):
+        """Para a renovação sem liberar (o lease expira sozinho)"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def stop(self):
+        """Para a renovação e libera o lease"""
+        self.parar_renovacao()
+        await asyncio.to_thread(self.liberar)
+
+    def lider_atual(self) -> Optional[dict]:
+        """
+        Consulta quem segura o lease (pode ser outro processo).
+
+        Returns:
+            Dict com dono e expira_em, ou None se ninguém segura
+        """
+        result = self.db.table("worker_leases").select(
+            "dono, expira_em, adquirido_em"
+        ).eq("nome", self.nome).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    def get_status(self) -> dict:
+        """Retorna o estado do lease neste processo"""
+        return {
+            "nome": self.nome,
+            "dono": self.dono,
+            "lider": self._lider,
+            "lider_desde": self._lider_desde.isoformat() if self._lider_desde else None,
+            "ttl_segundos": self.ttl_segundos,
+        }
@@ -0,0 +1,388 @@
+"""
+Energisa Benchmark de Login - Mede o login por SMS (Playwright) contra o simulador local
+N logins simultâneos pelo _login_worker_thread, com tempo até o SMS e memória por navegador
+
+Uso:
+    python -m backend.energisa.benchmark_login --logins 8 --pool 2 --max-logins 4 --headless
+    python -m backend.energisa.benchmark_login --logins 4 --sem-bloqueio --akamai-ms 3000 --json
+
+No container do sync-worker (Chromium e Xvfb já instalados), com navegador headed:
+    docker compose run --rm sync-worker sh -c "xvfb-run --auto-servernum \\
+        python -m backend.energisa.benchmark_login --logins 8 --pool 2 --max-logins 4 --json"
+
+Ferramenta ainda sem medição: nenhum número de antes/depois do login foi
+coletado (o ambiente em que foi escrita não tinha Chromium). Para comparar,
+rode o comando do container antes e depois da mudança e registre p50/p95
+até o SMS e a memória de pico por navegador.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from backend.config import settings
+from backend.energisa.replay import cpf_sintetico
+from backend.energisa.simulador_login import SimuladorLogin, usar_simulador
+from backend.sync.benchmark import BancoMemoria, _banco_substituido
+from backend.sync.metricas import percentil
+
+
+# Espera máxima por cada resposta do worker (fila de admissão + etapa)
+TIMEOUT_ETAPA_SEGUNDOS = 120
+
+# Intervalo de amostragem da memória dos navegadores
+INTERVALO_MEMORIA_SEGUNDOS = 0.2
+
+
+# ========================
+# Memória dos navegadores (/proc, sem dependências)
+# ========================
+
+def _processos_chromium() -> Dict[int, dict]:
+    """
+    Processos Chromium descendentes deste processo.
+
+    Returns:
+        Dict pid -> {ppid, rss_kb, principal} (principal = processo do navegador,
+        não renderer/gpu/utility)
+    """
+    processos = {}
+    for nome in os.listdir("/proc"):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat") as f:
+                stat = f.read()
+            with open(f"/proc/{nome}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ").decode(errors="ignore")
+            with open(f"/proc/{nome}/status") as f:
+                rss_kb = next((int(l.split()[1]) for l in f if l.startswith("VmRSS:")), 0)
+        except (OSError, ValueError):
+            continue
+
+        # comm fica entre parênteses e pode ter espaços: campos depois do último ")"
+        comando = stat[stat.index("(") + 1:stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        processos[int(nome)] = {
+            "ppid": ppid,
+            "rss_kb": rss_kb,
+            "chromium": "chrom" in comando.lower() or "headless_shell" in comando,
+            "principal": "--type=" not in cmdline,
+        }
+
+    # Só a árvore deste processo (pool via Popen, launch via driver do Playwright)
+    meu_pid = os.getpid()
+
+    def _descendente(pid: int) -> bool:
+        vistos = set()
+        while pid in processos and pid not in vistos:
+            vistos.add(pid)
+            pid = processos[pid]["ppid"]
+            if pid == meu_pid:
+                return True
+        return False
+
+    return {pid: p for pid, p in processos.items() if p["chromium"] and _descendente(pid)}
+
+
+class MedidorMemoria:
+    """Amostra o RSS de cada navegador (processo principal + filhos) e guarda o pico"""
+
+    def __init__(self, intervalo_segundos: float = INTERVALO_MEMORIA_SEGUNDOS):
+        self.intervalo_segundos = intervalo_segundos
+        self.disponivel = os.path.isdir("/proc")
+        self.picos_kb: Dict[int, int] = {}
+        self.pico_total_kb = 0
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def amostrar(self):
+        processos = _processos_chromium()
+        por_navegador: Dict[int, int] = {}
+        for pid, processo in processos.items():
+            # Sobe até o processo principal do navegador
+            raiz = pid
+            while not processos[raiz]["principal"] and processos[raiz]["ppid"] in processos:
+                raiz = processos[raiz]["ppid"]
+            por_navegador[raiz] = por_navegador.get(raiz, 0) + processo["rss_kb"]
+
+        for raiz, rss_kb in por_navegador.items():
+            self.picos_kb[raiz] = max(self.picos_kb.get(raiz, 0), rss_kb)
+        self.pico_total_kb = max(self.pico_total_kb, sum(por_navegador.values()))
+
+    def iniciar(self):
+        if not self.disponivel:
+            return
+
+        def _loop():
+            while not self._parar.wait(self.intervalo_segundos):
+                self.amostrar()
+
+        self._thread = threading.Thread(target=_loop, name="benchmark-memoria", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> Optional[dict]:
+        """
+        Returns:
+            Picos em MB (total e por navegador) ou None sem /proc
+        """
+        if not self.disponivel:
+            return None
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+
+        picos = sorted(self.picos_kb.values())
+        return {
+            "navegadores": len(picos),
+            "pico_total_mb": round(self.pico_total_kb / 1024, 1),
+            "pico_por_navegador_mb": round(picos[-1] / 1024, 1) if picos else None,
+            "pico_medio_por_navegador_mb": round(sum(picos) / len(picos) / 1024, 1) if picos else None,
+        }
+
+
+# ========================
+# Execução
+# ========================
+
+@contextlib.contextmanager
+def _pool_substituido(pool):
+    """Aponta o worker de login para um pool criado só para o benchmark"""
+    import backend.energisa.navegadores as navegadores
+
+    anterior = navegadores.navegador_pool
+    navegadores.navegador_pool = pool
+    try:
+        yield pool
+    finally:
+        pool.encerrar()
+        navegadores.navegador_pool = anterior
+
+
+def _um_login(cpf: str, espera_codigo_segundos: float) -> dict:
+    """
+    Faz um login completo pelo worker, como as rotas /login/start, /select-option e /finish.
+
+    Returns:
+        Tempos (s) até os telefones, até o SMS e da autenticação, ou o erro
+    """
+    from backend.energisa.router import _login_worker_thread
+
+    cmd_queue: queue.Queue = queue.Queue()
+    result_queue: queue.Queue = queue.Queue()
+    inicio = time.monotonic()
+    worker = threading.Thread(target=_login_worker_thread, args=(cpf, cmd_queue, result_queue), daemon=True)
+    worker.start()
+
+    try:
+        resposta = result_queue.get(timeout=TIMEOUT_ETAPA_SEGUNDOS)
+        if not resposta.get("success"):
+            return {"erro": resposta.get("error")}
+        telefones = time.monotonic() - inicio
+
+        cmd_queue.put({"action": "select_phone", "telefone": resposta["listaTelefone"][0]["celular"]})
+        resposta = result_queue.get(timeout=TIMEOUT_ETAPA_SEGUNDOS)
+        if not resposta.get("success"):
+            return {"erro": resposta.get("error")}
+        sms = time.monotonic() - inicio
+
+        # Tempo do usuário receber e digitar o código
+        time.sleep(espera_codigo_segundos)
+
+        inicio_autenticacao = time.monotonic()
+        cmd_queue.put({"action": "finish_sms", "sms_code": "123456"})
+        resposta = result_queue.get(timeout=TIMEOUT_ETAPA_SEGUNDOS)
+        if not resposta.get("success"):
+            return {"erro": resposta.get("error")}
+
+        return {
+            "ate_telefones": telefones,
+            "ate_sms": sms,
+            "autenticacao": time.monotonic() - inicio_autenticacao,
+        }
+    except queue.Empty:
+        cmd_queue.put({"action": "cancelar"})
+        return {"erro": "timeout"}
+    finally:
+        worker.join(timeout=30)
+
+
+def _resumo(valores: list) -> Optional[dict]:
+    if not valores:
+        return None
+    return {
+        "p50": round(percentil(valores, 50), 3),
+        "p95": round(percentil(valores, 95), 3),
+        "max": round(max(valores), 3),
+    }
+
+
+def executar_benchmark_login(
+    logins: int = 4,
+    pool_tamanho: int = 2,
+    max_logins: int = 4,
+    headless: bool = False,
+    bloquear_recursos: bool = True,
+    espera_codigo_segundos: float = 1.0,
+    simulador: Optional[SimuladorLogin] = None
+) -> dict:
+    """
+    Roda N logins simultâneos contra o simulador local.
+
+    Args:
+        logins: Logins disparados ao mesmo tempo
+        pool_tamanho: Navegadores do pool (0 = um Chromium por login)
+        max_logins: Logins simultâneos admitidos pelo pool
+        headless: True = sem Xvfb (o simulador não tem Akamai real)
+        bloquear_recursos: Liga o bloqueio de imagens/fontes do login_perfil
+        espera_codigo_segundos: Pausa entre o SMS enviado e o código digitado
+        simulador: Simulador configurado (None = atrasos padrão)
+
+    Returns:
+        Percentis dos tempos por etapa, erros, memória e requisições ao simulador
+    """
+    from backend.energisa.navegadores import NavegadorPool
+
+    simulador = simulador or SimuladorLogin()
+    pool = NavegadorPool(tamanho=pool_tamanho, max_logins=max_logins, headless=headless)
+    bloqueio_anterior = settings.ENERGISA_LOGIN_BLOQUEAR_RECURSOS
+    settings.ENERGISA_LOGIN_BLOQUEAR_RECURSOS = bloquear_recursos
+    medidor = MedidorMemoria()
+
+    try:
+        with usar_simulador(simulador), _banco_substituido(BancoMemoria()), _pool_substituido(pool):
+            inicio = time.perf_counter()
+            pool.aquecer()
+            aquecimento = time.perf_counter() - inicio
+
+            medidor.iniciar()
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=logins) as executor:
+                resultados = list(executor.map(
+                    lambda i: _um_login(cpf_sintetico(i), espera_codigo_segundos), range(logins)
+                ))
+            duracao = time.perf_counter() - inicio
+            memoria = medidor.parar()
+            status_pool = pool.get_status()
+    finally:
+        settings.ENERGISA_LOGIN_BLOQUEAR_RECURSOS = bloqueio_anterior
+
+    ok = [r for r in resultados if "erro" not in r]
+    return {
+        "parametros": {
+            "logins": logins,
+            "pool_tamanho": pool_tamanho,
+            "max_logins": max_logins,
+            "headless": headless,
+            "bloquear_recursos": bloquear_recursos,
+            "espera_codigo_segundos": espera_codigo_segundos,
+            "atrasos_ms": {
+                "pagina": simulador.atraso_pagina_ms,
+                "akamai": simulador.atraso_akamai_ms,
+                "telefones": simulador.atraso_telefones_ms,
+                "sms": simulador.atraso_sms_ms,
+                "validacao": simulador.atraso_validacao_ms,
+                "recursos": simulador.atraso_recursos_ms,
+            },
+        },
+        "aquecimento_segundos": round(aquecimento, 3),
+        "duracao_segundos": round(duracao, 3),
+        "sucesso": len(ok),
+        "erros": [r["erro"] for r in resultados if "erro" in r],
+        "ate_telefones": _resumo([r["ate_telefones"] for r in ok]),
+        "ate_sms": _resumo([r["ate_sms"] for r in ok]),
+        "autenticacao": _resumo([r["autenticacao"] for r in ok]),
+        "memoria": memoria,
+        "requisicoes_simulador": dict(simulador.requisicoes),
+        "pool": status_pool,
+    }
+
+
+def _imprimir(resultado: dict):
+    p = resultado["parametros"]
+    print(
+        f"\n📊 Benchmark de login: {p['logins']} logins, pool {p['pool_tamanho']} navegadores / "
+        f"{p['max_logins']} logins, bloqueio de recursos {'ligado' if p['bloquear_recursos'] else 'desligado'}"
+    )
+    print(f"Sucesso: {resultado['sucesso']}/{p['logins']} em {resultado['duracao_segundos']}s "
+          f"(aquecimento do pool {resultado['aquecimento_segundos']}s)")
+    print(f"{'etapa':>14} {'p50(s)':>8} {'p95(s)':>8} {'max(s)':>8}")
+    for etapa in ("ate_telefones", "ate_sms", "autenticacao"):
+        r = resultado[etapa]
+        if r:
+            print(f"{etapa:>14} {r['p50']:>8} {r['p95']:>8} {r['max']:>8}")
+
+    memoria = resultado["memoria"]
+    if memoria:
+        print(
+            f"Memória: pico {memoria['pico_total_mb']} MB em {memoria['navegadores']} navegadores, "
+            f"pico por navegador {memoria['pico_por_navegador_mb']} MB"
+        )
+    print(f"Requisições ao simulador: {resultado['requisicoes_simulador']}")
+    if resultado["erros"]:
+        print(f"Erros: {resultado['erros']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do login Energisa por SMS")
+    parser.add_argument("--logins", type=int, default=4, help="Logins simultâneos")
+    parser.add_argument("--pool", type=int, default=2, help="Navegadores do pool (0 = um por login)")
+    parser.add_argument("--max-logins", type=int, default=4)
+    parser.add_argument("--headless", action="store_true", help="Sem Xvfb")
+    parser.add_argument("--sem-bloqueio", action="store_true", help="Não bloqueia imagens/fontes")
+    parser.add_argument("--espera-codigo", type=float, default=1.0, help="Segundos até digitar o código")
+    parser.add_argument("--pagina-ms", type=int, default=300)
+    parser.add_argument("--akamai-ms", type=int, default=1500)
+    parser.add_argument("--telefones-ms", type=int, default=800)
+    parser.add_argument("--sms-ms", type=int, default=600)
+    parser.add_argument("--validacao-ms", type=int, default=500)
+    parser.add_argument("--recursos-ms", type=int, default=400)
+    parser.add_argument("--json", action="store_true", help="Saída completa em JSON")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs do worker de login")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    simulador = SimuladorLogin(
+        atraso_pagina_ms=args.pagina_ms,
+        atraso_akamai_ms=args.akamai_ms,
+        atraso_telefones_ms=args.telefones_ms,
+        atraso_sms_ms=args.sms_ms,
+        atraso_validacao_ms=args.validacao_ms,
+        atraso_recursos_ms=args.recursos_ms
+    )
+
+    def _rodar():
+        return executar_benchmark_login(
+            logins=args.logins,
+            pool_tamanho=args.pool,
+            max_logins=args.max_logins,
+            headless=args.headless,
+            bloquear_recursos=not args.sem_bloqueio,
+            espera_codigo_segundos=args.espera_codigo,
+            simulador=simulador
+        )
+
+    if args.verbose:
+        resultado = _rodar()
+    else:
+        # O worker imprime cada etapa; silencia durante a medição
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = _rodar()
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False, default=str))
+    else:
+        _imprimir(resultado)
+
+
+if __name__ == "__main__":
+    main()
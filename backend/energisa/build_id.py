@@ -0,0 +1,115 @@
+"""
+Energisa BuildId - Cache do buildId do Next.js compartilhado pelo processo
+As rotas /_next/data/{buildId}/... dependem da versão publicada do site;
+o buildId só muda em deploy da Energisa, então não precisa ser buscado a cada instância
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from backend.config import settings
+
+
+class BuildIdCache:
+    """
+    Cache do buildId com TTL e atualização em background.
+
+    - Dentro do TTL: devolve o valor em memória, sem requisição
+    - Vencido: devolve o valor atual e atualiza em uma thread de background
+    - Sem valor (início ou invalidado por 404): busca na hora, uma busca por vez
+    """
+
+    def __init__(self, ttl_segundos: int = 900):
+        """
+        Args:
+            ttl_segundos: Idade a partir da qual o buildId é atualizado em background
+        """
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+        self._build_id: Optional[str] = None
+        self._obtido_em = 0.0
+        self._atualizando = False
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        self.atualizacoes_background = 0
+
+    def obter(self, buscar: Callable[[], Optional[str]]) -> Optional[str]:
+        """
+        Retorna o buildId atual.
+
+        Args:
+            buscar: Função que baixa a página e extrai o buildId (None se falhar)
+
+        Returns:
+            buildId ou None se não foi possível obter
+        """
+        build_id = self._build_id
+        if build_id:
+            self.hits += 1
+            if time.monotonic() - self._obtido_em > self.ttl_segundos:
+                self._atualizar_em_background(buscar)
+            return build_id
+
+        with self._lock:
+            # Outra thread pode ter buscado enquanto esperávamos o lock
+            if self._build_id:
+                self.hits += 1
+                return self._build_id
+
+            self.misses += 1
+            build_id = buscar()
+            if build_id:
+                self._guardar(build_id)
+            return build_id
+
+    def _guardar(self, build_id: str):
+        self._build_id = build_id
+        self._obtido_em = time.monotonic()
+
+    def _atualizar_em_background(self, buscar: Callable[[], Optional[str]]):
+        """Dispara uma única atualização em background"""
+        with self._lock:
+            if self._atualizando:
+                return
+            self._atualizando = True
+
+        def _atualizar():
+            try:
+                build_id = buscar()
+                if build_id:
+                    self._guardar(build_id)
+                    self.atualizacoes_background += 1
+            finally:
+                self._atualizando = False
+
+        threading.Thread(target=_atualizar, name="energisa-build-id", daemon=True).start()
+
+    def invalidar(self, build_id: str):
+        """
+        Descarta o buildId (ex: rota _next/data respondeu 404 após deploy).
+
+        Args:
+            build_id: buildId usado na requisição que falhou; se o cache já
+                tiver outro valor (atualizado por outra thread), nada muda
+        """
+        with self._lock:
+            if self._build_id == build_id:
+                self._build_id = None
+                self.invalidacoes += 1
+
+    def get_status(self) -> dict:
+        """BuildId atual, idade e contadores"""
+        return {
+            "build_id": self._build_id,
+            "idade_segundos": round(time.monotonic() - self._obtido_em) if self._build_id else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidacoes": self.invalidacoes,
+            "atualizacoes_background": self.atualizacoes_background,
+        }
+
+
+# Instância global do cache
+build_id_cache = BuildIdCache(ttl_segundos=settings.ENERGISA_BUILD_ID_TTL_SEGUNDOS)
@@ -0,0 +1,159 @@
+"""
+Energisa Cache - Cache em memória das respostas de leitura da Energisa
+Evita repetir a mesma consulta (UCs, info da UC, faturas, GD) em poucos segundos
+"""
+
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from backend.config import settings
+
+
+def resposta_cacheavel(valor: Any) -> bool:
+    """Só guarda respostas com conteúdo e sem erro (vazio pode ser falha da API)"""
+    if not valor:
+        return False
+    if isinstance(valor, dict) and valor.get("errored"):
+        return False
+    return True
+
+
+class RespostaCache:
+    """
+    LRU com TTL por item, compartilhado pelo processo.
+
+    Chave: (cpf, endpoint, cdc). Cada endpoint tem seu TTL; ao passar de
+    max_itens, os itens usados há mais tempo saem primeiro. Os valores são
+    copiados na entrada e na saída para que quem chama possa alterá-los.
+    """
+
+    def __init__(self, max_itens: int = 2000):
+        """
+        Args:
+            max_itens: Quantidade máxima de respostas em memória
+        """
+        self.max_itens = max(1, max_itens)
+        self._lock = threading.Lock()
+        self._itens: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.remocoes = 0
+
+    def obter(self, chave: Tuple[str, str, Hashable]) -> Tuple[bool, Any]:
+        """
+        Busca uma resposta.
+
+        Args:
+            chave: (cpf, endpoint, cdc)
+
+        Returns:
+            (encontrado, valor)
+        """
+        endpoint = chave[1]
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._itens[chave]
+                self.misses[endpoint] += 1
+                return False, None
+
+            self._itens.move_to_end(chave)
+            self.hits[endpoint] += 1
+            valor = item[1]
+
+        return True, copy.deepcopy(valor)
+
+    def guardar(self, chave: Tuple[str, str, Hashable], valor: Any, ttl_segundos: int):
+        """
+        Guarda uma resposta por ttl_segundos.
+
+        Args:
+            chave: (cpf, endpoint, cdc)
+            valor: Resposta da Energisa
+            ttl_segundos: Validade (0 desliga o cache do endpoint)
+        """
+        if ttl_segundos <= 0:
+            return
+
+        valor = copy.deepcopy(valor)
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + ttl_segundos, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.remocoes += 1
+
+    def buscar(
+        self,
+        chave: Tuple[str, str, Hashable],
+        ttl_segundos: int,
+        buscar: Callable[[], Any],
+        usar_cache: bool = True
+    ) -> Any:
+        """
+        Retorna do cache ou busca na Energisa e guarda.
+
+        Args:
+            chave: (cpf, endpoint, cdc)
+            ttl_segundos: Validade da resposta
+            buscar: Consulta à Energisa
+            usar_cache: False = sempre consulta (e atualiza o cache)
+
+        Returns:
+            Resposta da Energisa
+        """
+        if usar_cache:
+            encontrado, valor = self.obter(chave)
+            if encontrado:
+                return valor
+
+        valor = buscar()
+        if resposta_cacheavel(valor):
+            self.guardar(chave, valor, ttl_segundos)
+        return valor
+
+    def invalidar(self, cpf: str, endpoint: Optional[str] = None):
+        """
+        Remove as respostas de um CPF (ex: após alteração de beneficiária).
+
+        Args:
+            cpf: CPF da sessão
+            endpoint: Só este endpoint (None = todos)
+        """
+        with self._lock:
+            for chave in [c for c in self._itens if c[0] == cpf and (endpoint is None or c[1] == endpoint)]:
+                del self._itens[chave]
+
+    def get_status(self) -> dict:
+        """Tamanho e taxa de acerto por endpoint"""
+        endpoints = {}
+        for endpoint in sorted(set(self.hits) | set(self.misses)):
+            total = self.hits[endpoint] + self.misses[endpoint]
+            endpoints[endpoint] = {
+                "hits": self.hits[endpoint],
+                "misses": self.misses[endpoint],
+                "taxa_acerto": round(self.hits[endpoint] / total, 3) if total else None,
+            }
+
+        return {
+            "itens": len(self._itens),
+            "max_itens": self.max_itens,
+            "remocoes": self.remocoes,
+            "endpoints": endpoints,
+        }
+
+
+# Validade das respostas por endpoint
+TTL_ENDPOINTS = {
+    "listar_ucs": settings.ENERGISA_CACHE_TTL_UCS,
+    "get_uc_info": settings.ENERGISA_CACHE_TTL_UC_INFO,
+    "listar_faturas": settings.ENERGISA_CACHE_TTL_FATURAS,
+    "get_gd_details": settings.ENERGISA_CACHE_TTL_GD,
+}
+
+# Instância global do cache
+resposta_cache = RespostaCache(max_itens=settings.ENERGISA_CACHE_MAX_ITENS)
@@ -0,0 +1,194 @@
+"""
+Energisa Caminhos - Escolha adaptativa entre rotas alternativas para o mesmo dado
+Ex: faturas via _next/data, API legacy ou SSR; tenta primeiro a mais rápida saudável
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Peso mínimo das observações para julgar um caminho (abaixo disso é "desconhecido")
+PESO_MINIMO = 1.0
+
+# Taxa de sucesso abaixo da qual o caminho vai para o fim da fila
+TAXA_SUCESSO_MINIMA = 0.5
+
+# Falhas seguidas que degradam o caminho mesmo com histórico bom (Energisa mudou a rota)
+FALHAS_SEGUIDAS_MAX = 2
+
+
+class _EstatisticaCaminho:
+    """Sucesso e latência com decaimento exponencial no tempo"""
+
+    def __init__(self):
+        self.peso = 0.0
+        self.sucessos = 0.0
+        self.peso_latencia = 0.0
+        self.soma_latencia = 0.0
+        self.atualizado = time.monotonic()
+        self.tentativas = 0
+        self.falhas_seguidas = 0
+
+    def decair(self, agora: float, meia_vida: float):
+        fator = 0.5 ** ((agora - self.atualizado) / meia_vida)
+        self.peso *= fator
+        self.sucessos *= fator
+        self.peso_latencia *= fator
+        self.soma_latencia *= fator
+        self.atualizado = agora
+
+    def registrar(self, sucesso: bool, latencia: float):
+        self.tentativas += 1
+        self.peso += 1
+        if sucesso:
+            self.sucessos += 1
+            self.peso_latencia += 1
+            self.soma_latencia += latencia
+            self.falhas_seguidas = 0
+        else:
+            self.falhas_seguidas += 1
+
+    @property
+    def taxa_sucesso(self) -> Optional[float]:
+        return self.sucessos / self.peso if self.peso > 0 else None
+
+    @property
+    def latencia(self) -> Optional[float]:
+        return self.soma_latencia / self.peso_latencia if self.peso_latencia > 0 else None
+
+    def estado(self) -> str:
+        if self.peso < PESO_MINIMO:
+            return "desconhecido"
+        if self.falhas_seguidas >= FALHAS_SEGUIDAS_MAX:
+            return "degradado"
+        if self.taxa_sucesso < TAXA_SUCESSO_MINIMA or self.latencia is None:
+            return "degradado"
+        return "saudavel"
+
+    def custo(self) -> float:
+        """Tempo esperado até um sucesso (latência / taxa de sucesso)"""
+        return (self.latencia or 0.0) / max(self.taxa_sucesso or 0.0, 0.05)
+
+
+class SeletorCaminhos:
+    """
+    Ordem de tentativa dos caminhos de cada operação.
+
+    - Saudáveis primeiro, do menor custo (latência / taxa de sucesso)
+    - Depois os sem dados recentes, na ordem padrão; por último os degradados
+    - As observações perdem metade do peso a cada meia_vida_segundos, então
+      um caminho que falhou volta a ser "desconhecido" com o tempo
+    - A cada explorar_a_cada chamadas, um caminho fora do topo é tentado
+      primeiro, para notar quando ele volta ou fica mais rápido
+    """
+
+    def __init__(self, meia_vida_segundos: float = 1800, explorar_a_cada: int = 50):
+        """
+        Args:
+            meia_vida_segundos: Meia-vida das observações
+            explorar_a_cada: Chamadas entre explorações (0 desliga)
+        """
+        self.meia_vida_segundos = meia_vida_segundos
+        self.explorar_a_cada = explorar_a_cada
+        self._lock = threading.Lock()
+        self._estatisticas: Dict[str, Dict[str, _EstatisticaCaminho]] = {}
+        self._chamadas: Dict[str, int] = {}
+        self._preferido: Dict[str, str] = {}
+
+    def _estatistica(self, operacao: str, caminho: str) -> _EstatisticaCaminho:
+        return self._estatisticas.setdefault(operacao, {}).setdefault(caminho, _EstatisticaCaminho())
+
+    def ordem(self, operacao: str, caminhos: List[str]) -> List[str]:
+        """
+        Ordem em que os caminhos devem ser tentados.
+
+        Args:
+            operacao: Nome da operação (ex: "listar_faturas")
+            caminhos: Caminhos disponíveis na ordem padrão
+
+        Returns:
+            Os mesmos caminhos, reordenados
+        """
+        agora = time.monotonic()
+        with self._lock:
+            estatisticas = {}
+            for caminho in caminhos:
+                estatistica = self._estatistica(operacao, caminho)
+                estatistica.decair(agora, self.meia_vida_segundos)
+                estatisticas[caminho] = estatistica
+
+            saudaveis = sorted(
+                (c for c in caminhos if estatisticas[c].estado() == "saudavel"),
+                key=lambda c: estatisticas[c].custo()
+            )
+            desconhecidos = [c for c in caminhos if estatisticas[c].estado() == "desconhecido"]
+            degradados = sorted(
+                (c for c in caminhos if estatisticas[c].estado() == "degradado"),
+                key=lambda c: estatisticas[c].custo()
+            )
+            ordem = saudaveis + desconhecidos + degradados
+
+            self._chamadas[operacao] = self._chamadas.get(operacao, 0) + 1
+            if saudaveis and self.explorar_a_cada and self._chamadas[operacao] % self.explorar_a_cada == 0:
+                fora_do_topo = desconhecidos + degradados + saudaveis[1:]
+                if fora_do_topo:
+                    ordem.remove(fora_do_topo[0])
+                    ordem.insert(0, fora_do_topo[0])
+
+            if saudaveis and self._preferido.get(operacao) != saudaveis[0]:
+                anterior = self._preferido.get(operacao)
+                self._preferido[operacao] = saudaveis[0]
+                if anterior:
+                    logger.warning(f"🔀 {operacao}: caminho preferido mudou de {anterior} para {saudaveis[0]}")
+
+        return ordem
+
+    def registrar(self, operacao: str, caminho: str, sucesso: bool, latencia: float):
+        """
+        Registra o resultado de uma tentativa.
+
+        Args:
+            operacao: Nome da operação
+            caminho: Caminho tentado
+            sucesso: Se o caminho devolveu o dado
+            latencia: Duração da tentativa em segundos
+        """
+        agora = time.monotonic()
+        with self._lock:
+            estatistica = self._estatistica(operacao, caminho)
+            estatistica.decair(agora, self.meia_vida_segundos)
+            estatistica.registrar(sucesso, latencia)
+
+    def get_status(self) -> dict:
+        """Taxa de sucesso, latência e estado de cada caminho"""
+        agora = time.monotonic()
+        status = {}
+        with self._lock:
+            for operacao, caminhos in self._estatisticas.items():
+                detalhes = {}
+                for caminho, estatistica in caminhos.items():
+                    estatistica.decair(agora, self.meia_vida_segundos)
+                    taxa = estatistica.taxa_sucesso
+                    latencia = estatistica.latencia
+                    detalhes[caminho] = {
+                        "estado": estatistica.estado(),
+                        "taxa_sucesso": round(taxa, 3) if taxa is not None else None,
+                        "latencia_segundos": round(latencia, 3) if latencia is not None else None,
+                        "tentativas": estatistica.tentativas,
+                        "falhas_seguidas": estatistica.falhas_seguidas,
+                    }
+                status[operacao] = {"preferido": self._preferido.get(operacao), "caminhos": detalhes}
+        return status
+
+
+# Instância global do seletor
+seletor_caminhos = SeletorCaminhos(
+    meia_vida_segundos=settings.ENERGISA_CAMINHOS_MEIA_VIDA_SEGUNDOS,
+    explorar_a_cada=settings.ENERGISA_CAMINHOS_EXPLORAR_A_CADA
+)
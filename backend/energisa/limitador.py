@@ -0,0 +1,280 @@
+"""
+Energisa Limitador - Controle de taxa das chamadas HTTP à Energisa (WAF Akamai)
+Token bucket global e por CPF, com redução multiplicativa em 403/429/página
+de bloqueio e recuperação aditiva a cada resposta normal (AIMD)
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Optional
+
+import requests
+
+from backend.config import settings
+from backend.sync.metricas import resumir_latencias
+
+logger = logging.getLogger(__name__)
+
+
+# Status tratados como "devagar" pelo WAF/API
+STATUS_BLOQUEIO = {403, 429}
+
+# Textos da página de bloqueio do Akamai
+MARCADORES_WAF = ("Access Denied", "Reference #", "Request Rejected")
+
+# Uma redução por janela: várias respostas 429 da mesma rajada contam como um evento
+JANELA_REDUCAO_SEGUNDOS = 2.0
+
+# CPFs com balde próprio mantidos em memória
+MAX_BALDES_CPF = 5000
+
+# Amostras de espera guardadas para as métricas
+AMOSTRAS_MAX = 500
+
+
+class LimiteEnergisaExcedido(Exception):
+    """A espera por vaga passou de espera_max_segundos"""
+
+
+class BaldeTokens:
+    """
+    Token bucket com taxa ajustável.
+
+    Reserva por "dívida": quem chama consome o token na hora e recebe quanto
+    precisa esperar, o que mantém a ordem de chegada sem laço de espera.
+    """
+
+    def __init__(self, taxa: float, rajada: float, taxa_minima: float):
+        self.taxa_base = taxa
+        self.taxa = taxa
+        self.taxa_minima = min(taxa_minima, taxa)
+        self.rajada = max(1.0, rajada)
+        self.tokens = self.rajada
+        self.atualizado = time.monotonic()
+        self.ultima_reducao = 0.0
+
+    def _repor(self, agora: float):
+        self.tokens = min(self.rajada, self.tokens + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def espera(self, agora: float) -> float:
+        """Segundos até haver um token (sem consumir)"""
+        self._repor(agora)
+        return max(0.0, (1 - self.tokens) / self.taxa)
+
+    def consumir(self):
+        self.tokens -= 1
+
+    def reduzir(self, agora: float, fator: float, pausa_segundos: float = 0.0) -> bool:
+        """
+        Redução multiplicativa (uma por janela).
+
+        Returns:
+            True se reduziu (False = já reduzido nesta janela)
+        """
+        self._repor(agora)
+        reduziu = agora - self.ultima_reducao >= JANELA_REDUCAO_SEGUNDOS
+        if reduziu:
+            self.ultima_reducao = agora
+            self.taxa = max(self.taxa_minima, self.taxa * fator)
+
+        # Retry-After: segura o balde pelo tempo pedido, na taxa já reduzida.
+        # min, não soma: uma rajada de bloqueios não acumula pausas
+        self.tokens = min(self.tokens, -pausa_segundos * self.taxa)
+        return reduziu
+
+    def aumentar(self, passo: float):
+        """Recuperação aditiva até a taxa configurada"""
+        self.taxa = min(self.taxa_base, self.taxa + passo)
+
+
+class LimitadorEnergisa:
+    """
+    Limite de requisições à Energisa para o processo.
+
+    - Um balde global (o WAF enxerga o IP) e um por CPF (uma sessão não
+      monopoliza a vazão)
+    - 403, 429 ou página de bloqueio: as duas taxas caem por fator_reducao
+    - Cada resposta normal devolve aumento_rps às taxas, até a configurada
+    - Quem precisaria esperar mais que espera_max_segundos recebe
+      LimiteEnergisaExcedido em vez de segurar a thread
+    """
+
+    def __init__(
+        self,
+        taxa_global: float = 20.0,
+        rajada_global: float = 40.0,
+        taxa_cpf: float = 3.0,
+        rajada_cpf: float = 6.0,
+        taxa_minima: float = 0.2,
+        fator_reducao: float = 0.5,
+        aumento_rps: float = 0.1,
+        espera_max_segundos: float = 30.0
+    ):
+        """
+        Args:
+            taxa_global: Requisições por segundo do processo
+            rajada_global: Requisições seguidas permitidas sem espera
+            taxa_cpf: Requisições por segundo de cada CPF
+            rajada_cpf: Rajada de cada CPF
+            taxa_minima: Piso das taxas após reduções
+            fator_reducao: Multiplicador da taxa a cada bloqueio
+            aumento_rps: Taxa devolvida a cada resposta normal
+            espera_max_segundos: Espera máxima por vaga
+        """
+        self.taxa_cpf = taxa_cpf
+        self.rajada_cpf = rajada_cpf
+        self.taxa_minima = taxa_minima
+        self.fator_reducao = fator_reducao
+        self.aumento_rps = aumento_rps
+        self.espera_max_segundos = espera_max_segundos
+
+        self._lock = threading.Lock()
+        self._global = BaldeTokens(taxa_global, rajada_global, taxa_minima)
+        self._por_cpf: "OrderedDict[str, BaldeTokens]" = OrderedDict()
+
+        self._esperas = deque(maxlen=AMOSTRAS_MAX)
+        self.eventos: Counter = Counter()
+        self.ultimos_eventos = deque(maxlen=20)
+        self.recusadas = 0
+
+    def _balde_cpf(self, cpf: str) -> BaldeTokens:
+        balde = self._por_cpf.get(cpf)
+        if balde is None:
+            balde = BaldeTokens(self.taxa_cpf, self.rajada_cpf, self.taxa_minima)
+            self._por_cpf[cpf] = balde
+            while len(self._por_cpf) > MAX_BALDES_CPF:
+                self._por_cpf.popitem(last=False)
+        else:
+            self._por_cpf.move_to_end(cpf)
+        return balde
+
+    def aguardar(self, cpf: Optional[str] = None):
+        """
+        Reserva uma vaga e dorme o necessário.
+
+        Args:
+            cpf: CPF da sessão (None = só o limite global)
+
+        Raises:
+            LimiteEnergisaExcedido: Espera maior que espera_max_segundos
+        """
+        with self._lock:
+            agora = time.monotonic()
+            baldes = [self._global] + ([self._balde_cpf(cpf)] if cpf else [])
+            espera = max(b.espera(agora) for b in baldes)
+            if espera > self.espera_max_segundos:
+                self.recusadas += 1
+                raise LimiteEnergisaExcedido(
+                    "Muitas requisições à Energisa no momento. Tente novamente em instantes."
+                )
+            for balde in baldes:
+                balde.consumir()
+
+        self._esperas.append(espera)
+        if espera > 0:
+            time.sleep(espera)
+
+    @staticmethod
+    def motivo_bloqueio(resp: requests.Response) -> Optional[str]:
+        """
+        Identifica resposta de bloqueio/limitação.
+
+        Returns:
+            "403", "429", "waf" ou None
+        """
+        if resp.status_code in STATUS_BLOQUEIO:
+            return str(resp.status_code)
+        if "text/html" in resp.headers.get("Content-Type", "") and "/api/" in resp.url:
+            # API devolvendo HTML: página do WAF no lugar do JSON
+            if any(m in resp.text[:2000] for m in MARCADORES_WAF):
+                return "waf"
+        return None
+
+    def registrar(self, cpf: Optional[str], resp: requests.Response):
+        """
+        Ajusta as taxas pela resposta.
+
+        Args:
+            cpf: CPF da sessão
+            resp: Resposta da Energisa
+        """
+        motivo = self.motivo_bloqueio(resp)
+        with self._lock:
+            baldes = [self._global] + ([self._balde_cpf(cpf)] if cpf else [])
+            if motivo is None:
+                for balde in baldes:
+                    balde.aumentar(self.aumento_rps)
+                return
+
+            try:
+                pausa = float(resp.headers.get("Retry-After") or 0)
+            except ValueError:
+                pausa = 0.0
+
+            agora = time.monotonic()
+            reduziu = [balde.reduzir(agora, self.fator_reducao, pausa) for balde in baldes]
+            self.eventos[motivo] += 1
+            self.ultimos_eventos.append({
+                "motivo": motivo,
+                "cpf": f"{cpf[:3]}***" if cpf else None,
+                "em": time.time(),
+                "taxa_global": round(self._global.taxa, 2),
+            })
+
+        if reduziu[0]:
+            logger.warning(
+                f"🐢 Energisa respondeu {motivo}: taxa global reduzida para {self._global.taxa:.2f} req/s"
+            )
+
+    def get_status(self) -> dict:
+        """Taxas atuais, CPFs limitados e eventos de bloqueio"""
+        with self._lock:
+            limitados = sum(1 for b in self._por_cpf.values() if b.taxa < b.taxa_base)
+            taxa_global = self._global.taxa
+
+        return {
+            "taxa_global": round(taxa_global, 2),
+            "taxa_global_base": self._global.taxa_base,
+            "taxa_cpf_base": self.taxa_cpf,
+            "cpfs": len(self._por_cpf),
+            "cpfs_limitados": limitados,
+            "eventos": dict(self.eventos),
+            "ultimos_eventos": list(self.ultimos_eventos),
+            "recusadas": self.recusadas,
+            "espera": resumir_latencias({"espera": list(self._esperas)}).get("espera"),
+        }
+
+
+class SessaoLimitada(requests.Session):
+    """
+    Session do requests que passa cada chamada pelo limitador do processo.
+
+    Args:
+        cpf: CPF da sessão Energisa (None = só o limite global)
+    """
+
+    def __init__(self, cpf: Optional[str] = None):
+        super().__init__()
+        self.cpf = cpf
+
+    def request(self, method, url, *args, **kwargs):
+        limitador_energisa.aguardar(self.cpf)
+        resp = super().request(method, url, *args, **kwargs)
+        limitador_energisa.registrar(self.cpf, resp)
+        return resp
+
+
+# Instância global do limitador
+limitador_energisa = LimitadorEnergisa(
+    taxa_global=settings.ENERGISA_LIMITE_GLOBAL_RPS,
+    rajada_global=settings.ENERGISA_LIMITE_GLOBAL_RAJADA,
+    taxa_cpf=settings.ENERGISA_LIMITE_CPF_RPS,
+    rajada_cpf=settings.ENERGISA_LIMITE_CPF_RAJADA,
+    taxa_minima=settings.ENERGISA_LIMITE_RPS_MINIMO,
+    fator_reducao=settings.ENERGISA_LIMITE_FATOR_REDUCAO,
+    aumento_rps=settings.ENERGISA_LIMITE_AUMENTO_RPS,
+    espera_max_segundos=settings.ENERGISA_LIMITE_ESPERA_MAX_SEGUNDOS
+)
@@ -0,0 +1,162 @@
+"""
+Energisa Login Perfil - Esperas por evento, bloqueio de recursos e tempo por etapa
+Usado pelos fluxos de login por SMS (worker do router e EnergisaService.start_login)
+"""
+
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Tipos de recurso que não influenciam o fluxo de login (CSS fica: is_visible depende do layout)
+TIPOS_BLOQUEADOS = {"image", "media", "font"}
+
+# Rastreamento/analytics de terceiros (o sensor do Akamai é servido pelo próprio domínio)
+DOMINIOS_BLOQUEADOS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com/tr",
+    "hotjar.com",
+    "clarity.ms",
+    "tiktok.com",
+)
+
+# Intervalo entre verificações do cookie do Akamai (ms)
+INTERVALO_AKAMAI_MS = 250
+
+# Atraso por tecla ao digitar (ms): ainda humano, sem os 150ms fixos
+ATRASO_TECLA_MS = (30, 70)
+
+
+def bloquear_recursos(context):
+    """
+    Aborta imagens, mídia, fontes e scripts de rastreamento no contexto.
+
+    Desligado com ENERGISA_LOGIN_BLOQUEAR_RECURSOS=false.
+    """
+    if not settings.ENERGISA_LOGIN_BLOQUEAR_RECURSOS:
+        return
+
+    def _filtrar(route):
+        request = route.request
+        if request.resource_type in TIPOS_BLOQUEADOS or any(d in request.url for d in DOMINIOS_BLOQUEADOS):
+            return route.abort()
+        return route.continue_()
+
+    context.route("**/*", _filtrar)
+
+
+def aguardar_akamai(context, page, timeout_s: float = 20) -> bool:
+    """
+    Espera o cookie _abck ser validado (~0~), movendo o mouse enquanto isso.
+
+    Verifica a cada INTERVALO_AKAMAI_MS em vez de dormir 1s por volta;
+    page.wait_for_timeout mantém o loop de eventos do Playwright rodando.
+
+    Returns:
+        True se o cookie foi validado dentro do timeout
+    """
+    limite = time.monotonic() + timeout_s
+    while time.monotonic() < limite:
+        abck = next((c["value"] for c in context.cookies() if c["name"] == "_abck"), None)
+        if abck and "~0~" in abck:
+            return True
+
+        page.mouse.move(random.randint(100, 800), random.randint(100, 600), steps=5)
+        page.wait_for_timeout(INTERVALO_AKAMAI_MS)
+    return False
+
+
+def localizar_primeiro(page, seletores: List[str], timeout_ms: int = 15000):
+    """
+    Espera o primeiro dos seletores ficar visível (todos ao mesmo tempo).
+
+    Uma única espera pela lista de seletores CSS, em vez de testar um a um
+    com timeout cada.
+
+    Args:
+        page: Página do Playwright
+        seletores: Seletores CSS alternativos
+        timeout_ms: Espera máxima
+
+    Returns:
+        Locator do elemento visível ou None se nenhum apareceu
+    """
+    # :visible é extensão CSS do Playwright: .first pega só entre os visíveis
+    locator = page.locator(", ".join(f"{s}:visible" for s in seletores)).first
+    try:
+        locator.wait_for(state="visible", timeout=timeout_ms)
+        return locator
+    except Exception:
+        return None
+
+
+def clicar_quando_visivel(page, seletor: str, timeout_ms: int = 5000) -> bool:
+    """Espera o elemento ficar visível e clica (False se não apareceu)"""
+    locator = page.locator(seletor).first
+    try:
+        locator.wait_for(state="visible", timeout=timeout_ms)
+        locator.click()
+        return True
+    except Exception:
+        return False
+
+
+def estado_navegador(context) -> Optional[dict]:
+    """
+    Storage state do contexto (cookies + localStorage), guardado com a sessão.
+
+    Returns:
+        Dict no formato do Playwright ou None se não deu para ler
+    """
+    try:
+        return context.storage_state()
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao capturar estado do navegador: {e}")
+        return None
+
+
+def digitar(page, texto: str):
+    """Digita com atraso curto e variável entre as teclas"""
+    for char in texto:
+        page.keyboard.type(char, delay=random.randint(*ATRASO_TECLA_MS))
+
+
+class CronometroLogin:
+    """
+    Tempo por etapa do login, registrado no log ao final.
+
+    Exemplo de saída:
+        ⏱️ Login 123***: pagina=1.84s akamai=2.10s cpf=0.95s telefones=1.32s (total 6.21s)
+    """
+
+    def __init__(self, cpf: str):
+        self.cpf = cpf
+        self.inicio = time.monotonic()
+        self.etapas: List[tuple] = []
+
+    @contextmanager
+    def etapa(self, nome: str):
+        """Mede a duração do bloco"""
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.etapas.append((nome, time.monotonic() - inicio))
+
+    def total(self) -> float:
+        return time.monotonic() - self.inicio
+
+    def registrar(self, fase: Optional[str] = None):
+        """Escreve no log as etapas medidas até aqui"""
+        partes = " ".join(f"{nome}={duracao:.2f}s" for nome, duracao in self.etapas)
+        prefixo = f"⏱️ Login {self.cpf[:3]}***" + (f" [{fase}]" if fase else "")
+        logger.info(f"{prefixo}: {partes} (total {self.total():.2f}s)")
@@ -0,0 +1,317 @@
+"""
+Energisa Login Sessões - Registro das sessões de login por SMS em andamento
+Substitui os dicts globais sem limite: teto de sessões, TTL por sessão e
+encerramento do navegador das sessões abandonadas
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from backend.config import settings
+from backend.core.database import SupabaseClient
+
+logger = logging.getLogger(__name__)
+
+
+# Cada processo renova atualizado_em das suas sessões a cada BATIMENTO_SEGUNDOS;
+# sem batimento por DONO_INATIVO_SEGUNDOS, o dono morreu (e o navegador junto)
+BATIMENTO_SEGUNDOS = 60
+DONO_INATIVO_SEGUNDOS = 3 * BATIMENTO_SEGUNDOS
+
+
+class RegistroLoginsCheio(Exception):
+    """Teto de sessões de login simultâneas atingido"""
+
+
+class RegistroLogins:
+    """
+    Sessões de login (transaction_id -> navegador/worker do login).
+
+    Os recursos vivos (thread, filas, página do Playwright) só existem no
+    processo que iniciou o login; os metadados (CPF, fase, autenticada, dono)
+    ficam também na tabela login_sessoes, para que rotas que só precisam do
+    CPF funcionem em qualquer worker da API.
+
+    - max_sessoes: logins simultâneos neste processo
+    - ttl_segundos: validade de uma sessão ainda no fluxo do SMS
+    - ttl_autenticada_segundos: validade após o SMS validado (consulta de UCs/faturas)
+    - Linhas de um dono sem batimento deixam de valer como dono (o navegador
+      morreu com o processo) e são apagadas na limpeza de qualquer processo
+    """
+
+    def __init__(self, max_sessoes: int = 50, ttl_segundos: int = 600, ttl_autenticada_segundos: int = 3600):
+        self.max_sessoes = max(1, max_sessoes)
+        self.ttl_segundos = ttl_segundos
+        self.ttl_autenticada_segundos = ttl_autenticada_segundos
+        self.dono = f"{socket.gethostname()}:{os.getpid()}"
+        self.db = SupabaseClient(admin=True)
+        self._lock = threading.Lock()
+        self._sessoes: Dict[str, dict] = {}
+        self._limpeza: Optional[threading.Thread] = None
+        self.expiradas = 0
+        self.recusadas = 0
+
+    # ========================
+    # Persistência (metadados compartilhados)
+    # ========================
+
+    def _gravar(self, sessao_id: str, sessao: dict):
+        expira_em = datetime.now(timezone.utc) + timedelta(seconds=sessao["expira_em"] - time.monotonic())
+        try:
+            self.db.table("login_sessoes").upsert({
+                "id": sessao_id,
+                "cpf": sessao["cpf"],
+                "ip": sessao.get("ip"),
+                "fase": sessao["fase"],
+                "autenticada": sessao["autenticada"],
+                "dono": self.dono,
+                "expira_em": expira_em.isoformat(),
+                "atualizado_em": datetime.now(timezone.utc).isoformat()
+            }).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao gravar sessão de login: {e}")
+
+    def _bater(self):
+        """Batimento: marca as sessões deste processo como vivas"""
+        with self._lock:
+            tem_sessoes = bool(self._sessoes)
+        if not tem_sessoes:
+            return
+        try:
+            self.db.table("login_sessoes").update({
+                "atualizado_em": datetime.now(timezone.utc).isoformat()
+            }).eq("dono", self.dono).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao renovar sessões de login: {e}")
+
+    def _apagar_orfas(self) -> int:
+        """
+        Apaga linhas vencidas e logins em andamento de donos sem batimento.
+
+        Sessão já autenticada de um dono morto continua até expirar: ela só
+        guarda o CPF, não depende do navegador.
+
+        Returns:
+            Linhas apagadas
+        """
+        agora = datetime.now(timezone.utc)
+        inativo = (agora - timedelta(seconds=DONO_INATIVO_SEGUNDOS)).isoformat()
+        try:
+            vencidas = self.db.table("login_sessoes").delete().lt("expira_em", agora.isoformat()).execute()
+            orfas = self.db.table("login_sessoes").delete().eq("autenticada", False).lt(
+                "atualizado_em", inativo
+            ).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao limpar sessões de login órfãs: {e}")
+            return 0
+        return len(vencidas.data or []) + len(orfas.data or [])
+
+    def _apagar(self, sessao_id: str):
+        try:
+            self.db.table("login_sessoes").delete().eq("id", sessao_id).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao apagar sessão de login: {e}")
+
+    # ========================
+    # Sessões
+    # ========================
+
+    def tem_vaga(self) -> bool:
+        """True se cabe mais um login neste processo (checar antes de abrir o navegador)"""
+        self.limpar_expiradas()
+        return len(self._sessoes) < self.max_sessoes
+
+    def registrar(
+        self,
+        sessao_id: str,
+        cpf: str,
+        recursos: dict,
+        encerrar: Callable[[dict], None],
+        ip: Optional[str] = None
+    ):
+        """
+        Registra um login que já enviou a lista de telefones.
+
+        Args:
+            sessao_id: transaction_id / session_id devolvido ao cliente
+            cpf: CPF do login
+            recursos: Objetos vivos do login (filas, thread, página)
+            encerrar: Libera os recursos (chamado na expiração ou remoção)
+            ip: IP do cliente (simulação pública)
+
+        Raises:
+            RegistroLoginsCheio: Teto de sessões atingido (recursos ficam com quem chamou)
+        """
+        self.limpar_expiradas()
+        with self._lock:
+            if len(self._sessoes) >= self.max_sessoes:
+                self.recusadas += 1
+                raise RegistroLoginsCheio("Muitos logins em andamento. Tente novamente em instantes.")
+
+            sessao = {
+                "cpf": cpf,
+                "ip": ip,
+                "fase": "telefones",
+                "autenticada": False,
+                "criado_em": time.time(),
+                "expira_em": time.monotonic() + self.ttl_segundos,
+                "recursos": recursos,
+                "encerrar": encerrar,
+            }
+            self._sessoes[sessao_id] = sessao
+
+        self._gravar(sessao_id, sessao)
+
+    def obter(self, sessao_id: str) -> Optional[dict]:
+        """
+        Sessão viva deste processo.
+
+        Returns:
+            Dict com cpf, fase, autenticada e recursos, ou None
+        """
+        with self._lock:
+            sessao = self._sessoes.get(sessao_id)
+            if sessao and sessao["expira_em"] >= time.monotonic():
+                return sessao
+        return None
+
+    def metadados(self, sessao_id: str) -> Optional[dict]:
+        """
+        Metadados da sessão, deste processo ou de outro worker.
+
+        Returns:
+            Dict com cpf, fase, autenticada, dono e dono_ativo (False se o
+            dono parou de bater), ou None se não existe/expirou
+        """
+        sessao = self.obter(sessao_id)
+        if sessao:
+            return {
+                "cpf": sessao["cpf"],
+                "fase": sessao["fase"],
+                "autenticada": sessao["autenticada"],
+                "dono": self.dono,
+                "dono_ativo": True
+            }
+
+        agora = datetime.now(timezone.utc)
+        try:
+            result = self.db.table("login_sessoes").select("cpf, fase, autenticada, dono, atualizado_em").eq(
+                "id", sessao_id
+            ).gt("expira_em", agora.isoformat()).limit(1).execute()
+            if not result.data:
+                return None
+            metadados = result.data[0]
+            batimento = metadados.pop("atualizado_em", None)
+            metadados["dono_ativo"] = bool(batimento) and (
+                agora - datetime.fromisoformat(str(batimento).replace("Z", "+00:00"))
+            ).total_seconds() < DONO_INATIVO_SEGUNDOS
+            return metadados
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar sessão de login: {e}")
+            return None
+
+    def atualizar_fase(self, sessao_id: str, fase: str):
+        """
+        Avança a fase da sessão.
+
+        Na fase "autenticada" o navegador já terminou: os recursos são
+        liberados e a sessão passa a valer ttl_autenticada_segundos.
+        """
+        with self._lock:
+            sessao = self._sessoes.get(sessao_id)
+            if not sessao:
+                return
+            sessao["fase"] = fase
+            if fase == "autenticada":
+                sessao["autenticada"] = True
+                sessao["expira_em"] = time.monotonic() + self.ttl_autenticada_segundos
+                sessao["recursos"] = {}
+
+        self._gravar(sessao_id, sessao)
+
+    def remover(self, sessao_id: str):
+        """Remove a sessão e libera o navegador"""
+        with self._lock:
+            sessao = self._sessoes.pop(sessao_id, None)
+        if sessao:
+            self._encerrar(sessao)
+        self._apagar(sessao_id)
+
+    def _encerrar(self, sessao: dict):
+        if not sessao["recursos"]:
+            return
+        try:
+            sessao["encerrar"](sessao["recursos"])
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao encerrar navegador do login: {e}")
+
+    def limpar_expiradas(self) -> int:
+        """
+        Encerra as sessões vencidas deste processo.
+
+        Returns:
+            Quantidade de sessões encerradas
+        """
+        agora = time.monotonic()
+        with self._lock:
+            vencidas = [(sid, s) for sid, s in self._sessoes.items() if s["expira_em"] < agora]
+            for sid, _ in vencidas:
+                del self._sessoes[sid]
+
+        for sid, sessao in vencidas:
+            logger.info(f"⌛ Sessão de login expirada (CPF {sessao['cpf'][:3]}***), encerrando navegador")
+            self._encerrar(sessao)
+            self._apagar(sid)
+        self.expiradas += len(vencidas)
+        return len(vencidas)
+
+    def iniciar_limpeza(self, intervalo_segundos: int = BATIMENTO_SEGUNDOS):
+        """
+        Em uma thread de background: limpa as sessões expiradas, renova o
+        batimento das sessões deste processo e apaga as órfãs de processos mortos.
+        """
+        if self._limpeza is not None:
+            return
+
+        def _loop():
+            while True:
+                time.sleep(intervalo_segundos)
+                try:
+                    self.limpar_expiradas()
+                    self._bater()
+                    orfas = self._apagar_orfas()
+                    if orfas:
+                        logger.info(f"🧹 {orfas} sessões de login órfãs/vencidas removidas")
+                except Exception as e:
+                    logger.error(f"❌ Erro na limpeza de sessões de login: {e}")
+
+        self._limpeza = threading.Thread(target=_loop, name="energisa-login-sessoes", daemon=True)
+        self._limpeza.start()
+
+    def get_status(self) -> dict:
+        """Sessões abertas por fase e contadores"""
+        with self._lock:
+            fases: Dict[str, int] = {}
+            for sessao in self._sessoes.values():
+                fases[sessao["fase"]] = fases.get(sessao["fase"], 0) + 1
+
+        return {
+            "sessoes": sum(fases.values()),
+            "max_sessoes": self.max_sessoes,
+            "por_fase": fases,
+            "expiradas": self.expiradas,
+            "recusadas": self.recusadas,
+        }
+
+
+# Instância global do registro
+registro_logins = RegistroLogins(
+    max_sessoes=settings.LOGIN_SESSOES_MAX,
+    ttl_segundos=settings.LOGIN_SESSAO_TTL_SEGUNDOS,
+    ttl_autenticada_segundos=settings.LOGIN_SESSAO_TTL_AUTENTICADA_SEGUNDOS
+)
@@ -0,0 +1,439 @@
+"""
+Energisa Navegadores - Pool de Chromium pré-aquecidos para os logins por SMS
+Cada login recebe um contexto novo e isolado em um navegador já aberto,
+em vez de subir um processo Chromium por login
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Optional
+
+from backend.config import settings
+from backend.sync.metricas import resumir_latencias
+
+logger = logging.getLogger(__name__)
+
+
+# Mesmos argumentos do launch original (modo headed no Xvfb, sem sinais de automação)
+ARGS_CHROMIUM = [
+    "--no-sandbox",
+    "--disable-infobars",
+    "--start-maximized",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--no-first-run",
+    "--no-default-browser-check",
+]
+
+# Tempo máximo para o Chromium publicar a porta do DevTools
+TIMEOUT_INICIO_SEGUNDOS = 20
+
+# Amostras de latência guardadas para as métricas
+AMOSTRAS_MAX = 200
+
+
+class PoolNavegadoresEsgotado(Exception):
+    """Nenhuma vaga de login liberou dentro do tempo de espera"""
+
+
+class _Navegador:
+    """Processo Chromium do pool, acessado via CDP"""
+
+    def __init__(self, processo: subprocess.Popen, perfil_dir: str, endpoint: str):
+        self.processo = processo
+        self.perfil_dir = perfil_dir
+        self.endpoint = endpoint
+        self.criado_em = time.monotonic()
+        self.ativos = 0
+        self.usos = 0
+        self.quebrado = False
+
+    def vivo(self) -> bool:
+        """Processo rodando e DevTools respondendo"""
+        if self.processo.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(f"{self.endpoint}/json/version", timeout=2) as resp:
+                return resp.status == 200
+        except Exception:
+            return False
+
+    def encerrar(self):
+        """Mata o processo e apaga o perfil temporário"""
+        try:
+            self.processo.terminate()
+            self.processo.wait(timeout=10)
+        except Exception:
+            self.processo.kill()
+        shutil.rmtree(self.perfil_dir, ignore_errors=True)
+
+
+class ReservaNavegador:
+    """
+    Contexto de login emprestado do pool.
+
+    Deve ser usado e fechado na mesma thread que o abriu (API síncrona do
+    Playwright); fechar() devolve a vaga ao pool.
+    """
+
+    def __init__(self, pool: "NavegadorPool", navegador: Optional[_Navegador], browser, context):
+        self._pool = pool
+        self._navegador = navegador
+        self.browser = browser
+        self.context = context
+        self._fechada = False
+
+    def fechar(self):
+        if self._fechada:
+            return
+        self._fechada = True
+        try:
+            self.context.close()
+        except Exception:
+            pass
+        try:
+            # Em navegador do pool só desconecta; o processo continua aberto
+            self.browser.close()
+        except Exception:
+            pass
+        self._pool._devolver(self._navegador)
+
+
+class NavegadorPool:
+    """
+    Pool de processos Chromium de longa duração.
+
+    - Admissão: no máximo max_logins contextos abertos; os demais esperam
+      na fila até espera_segundos
+    - Cada login ganha um contexto novo (cookies/storage isolados) no
+      navegador com menos contextos ativos
+    - Health check ao emprestar; navegador morto ou com max_usos contextos
+      servidos é reciclado quando fica ocioso
+    - tamanho=0 desliga o pool: cada login lança o próprio Chromium, como antes
+    """
+
+    def __init__(
+        self,
+        tamanho: int = 2,
+        max_logins: int = 4,
+        max_usos: int = 20,
+        espera_segundos: int = 20,
+        headless: bool = False
+    ):
+        """
+        Args:
+            tamanho: Processos Chromium mantidos abertos
+            max_logins: Logins (contextos) simultâneos
+            max_usos: Contextos servidos por navegador antes de reciclar
+            espera_segundos: Espera máxima na fila de admissão
+            headless: False = janela real no Xvfb (necessário para o Akamai)
+        """
+        self.tamanho = max(0, tamanho)
+        self.max_logins = max(1, max_logins)
+        self.max_usos = max(1, max_usos)
+        self.espera_segundos = espera_segundos
+        self.headless = headless
+
+        self._admissao = threading.BoundedSemaphore(self.max_logins)
+        self._lock = threading.Lock()
+        self._navegadores: List[_Navegador] = []
+        self._executavel: Optional[str] = None
+        self._na_fila = 0
+        self._lancando = 0
+        self._lancou = threading.Condition(self._lock)
+        self._lancamentos = 0
+
+        self._esperas = deque(maxlen=AMOSTRAS_MAX)
+        self._aberturas = deque(maxlen=AMOSTRAS_MAX)
+        self._inicios = deque(maxlen=AMOSTRAS_MAX)
+        self.logins = 0
+        self.recusados = 0
+        self.reciclados = 0
+
+    # ========================
+    # Processos
+    # ========================
+
+    def _lancar(self) -> _Navegador:
+        """Sobe um Chromium com DevTools em porta livre"""
+        perfil_dir = tempfile.mkdtemp(prefix="energisa-chromium-")
+        args = [self._executavel, *ARGS_CHROMIUM, f"--user-data-dir={perfil_dir}", "--remote-debugging-port=0"]
+        if self.headless:
+            args.append("--headless=new")
+        args.append("about:blank")
+
+        processo = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # O Chromium grava a porta escolhida em DevToolsActivePort
+        porta_arquivo = os.path.join(perfil_dir, "DevToolsActivePort")
+        limite = time.monotonic() + TIMEOUT_INICIO_SEGUNDOS
+        while time.monotonic() < limite:
+            if processo.poll() is not None:
+                break
+            try:
+                with open(porta_arquivo) as f:
+                    porta = int(f.readline().strip())
+                navegador = _Navegador(processo, perfil_dir, f"http://127.0.0.1:{porta}")
+                logger.info(f"🌐 Chromium do pool iniciado (pid {processo.pid}, porta {porta})")
+                return navegador
+            except (FileNotFoundError, ValueError):
+                time.sleep(0.1)
+
+        _Navegador(processo, perfil_dir, "").encerrar()
+        raise Exception("Chromium do pool não iniciou")
+
+    def _escolher(self) -> _Navegador:
+        """
+        Navegador saudável com menos contextos ativos (lança um se couber).
+
+        O lock só protege a lista: a vaga é reservada com ele, mas o launch
+        do Chromium, o health check e o encerramento acontecem fora, para
+        não travar os outros abrir/liberar/get_status.
+        """
+        while True:
+            descartar = []
+            esperar = False
+            with self._lock:
+                for navegador in list(self._navegadores):
+                    if navegador.ativos == 0 and (navegador.quebrado or navegador.usos >= self.max_usos):
+                        self._navegadores.remove(navegador)
+                        descartar.append(navegador)
+                        self.reciclados += 1
+
+                # Navegador que já serviu max_usos só termina os logins em andamento
+                candidatos = sorted(
+                    (n for n in self._navegadores if not n.quebrado and n.usos < self.max_usos),
+                    key=lambda n: n.ativos
+                )
+                lancar = not candidatos or (
+                    candidatos[0].ativos > 0 and len(self._navegadores) + self._lancando < self.tamanho
+                )
+                if not candidatos and self._lancando and len(self._navegadores) + self._lancando >= self.tamanho:
+                    # Pool cheio só de navegadores subindo: espera um deles
+                    esperar, lancar = True, False
+                    lancamentos = self._lancamentos
+                elif lancar:
+                    self._lancando += 1
+                else:
+                    navegador = candidatos[0]
+                    ocioso = navegador.ativos == 0
+                    navegador.ativos += 1
+
+            for navegador_velho in descartar:
+                navegador_velho.encerrar()
+
+            if esperar:
+                with self._lock:
+                    self._lancou.wait_for(lambda: self._lancamentos != lancamentos, timeout=TIMEOUT_INICIO_SEGUNDOS)
+                continue
+
+            if lancar:
+                try:
+                    navegador = self._lancar()
+                except Exception:
+                    with self._lock:
+                        self._lancando -= 1
+                        self._lancamentos += 1
+                        self._lancou.notify_all()
+                    raise
+                with self._lock:
+                    self._lancando -= 1
+                    navegador.ativos += 1
+                    self._navegadores.append(navegador)
+                    self._lancamentos += 1
+                    self._lancou.notify_all()
+                return navegador
+
+            # Health check só de navegador ocioso (em uso, a conexão CDP acusa a falha)
+            if not ocioso or navegador.vivo():
+                return navegador
+
+            with self._lock:
+                navegador.quebrado = True
+                navegador.ativos -= 1
+
+    def _devolver(self, navegador: Optional[_Navegador]):
+        if navegador is not None:
+            with self._lock:
+                navegador.ativos -= 1
+                navegador.usos += 1
+        self._admissao.release()
+
+    # ========================
+    # Empréstimo
+    # ========================
+
+    def abrir(self, playwright, **opcoes_contexto) -> ReservaNavegador:
+        """
+        Espera uma vaga e abre um contexto novo.
+
+        Args:
+            playwright: Instância sync_playwright() da thread que fará o login
+            **opcoes_contexto: Repassadas ao browser.new_context
+
+        Returns:
+            ReservaNavegador (chamar fechar() ao final do login)
+
+        Raises:
+            PoolNavegadoresEsgotado: Fila de admissão não andou a tempo
+        """
+        inicio = time.monotonic()
+        with self._lock:
+            self._na_fila += 1
+        try:
+            admitido = self._admissao.acquire(timeout=self.espera_segundos)
+        finally:
+            with self._lock:
+                self._na_fila -= 1
+
+        if not admitido:
+            self.recusados += 1
+            raise PoolNavegadoresEsgotado("Muitos logins em andamento. Tente novamente em instantes.")
+
+        self._esperas.append(time.monotonic() - inicio)
+        inicio_abertura = time.monotonic()
+
+        navegador = None
+        try:
+            if self._executavel is None:
+                self._executavel = playwright.chromium.executable_path
+
+            if self.tamanho > 0:
+                navegador = self._escolher()
+                try:
+                    browser = playwright.chromium.connect_over_cdp(navegador.endpoint)
+                except Exception:
+                    # Navegador travado: sai da escolha e é reciclado quando ficar ocioso
+                    with self._lock:
+                        navegador.quebrado = True
+                        navegador.ativos -= 1
+                    navegador = self._escolher()
+                    browser = playwright.chromium.connect_over_cdp(navegador.endpoint)
+            else:
+                browser = playwright.chromium.launch(
+                    headless=self.headless,
+                    args=ARGS_CHROMIUM,
+                    ignore_default_args=["--enable-automation"]
+                )
+
+            context = browser.new_context(**opcoes_contexto)
+        except Exception:
+            if navegador is not None:
+                self._devolver(navegador)
+            else:
+                self._admissao.release()
+            raise
+
+        self._aberturas.append(time.monotonic() - inicio_abertura)
+        self.logins += 1
+        return ReservaNavegador(self, navegador if self.tamanho > 0 else None, browser, context)
+
+    def registrar_inicio_login(self, segundos: float):
+        """Tempo do início do login até a lista de telefones (métrica)"""
+        self._inicios.append(segundos)
+
+    @contextmanager
+    def contexto(self, playwright, **opcoes_contexto):
+        """Context manager de abrir()/fechar()"""
+        reserva = self.abrir(playwright, **opcoes_contexto)
+        try:
+            yield reserva.context
+        finally:
+            reserva.fechar()
+
+    # ========================
+    # Ciclo de vida
+    # ========================
+
+    def aquecer(self):
+        """Sobe os navegadores do pool antes do primeiro login"""
+        if self.tamanho == 0:
+            return
+        if not self.headless and not os.environ.get("DISPLAY"):
+            logger.warning("⚠️ Pool de navegadores não aquecido: sem DISPLAY (Xvfb)")
+            return
+
+        try:
+            if self._executavel is None:
+                from playwright.sync_api import sync_playwright
+                with sync_playwright() as playwright:
+                    self._executavel = playwright.chromium.executable_path
+
+            while True:
+                with self._lock:
+                    if len(self._navegadores) + self._lancando >= self.tamanho:
+                        break
+                    self._lancando += 1
+                try:
+                    navegador = self._lancar()
+                except Exception:
+                    with self._lock:
+                        self._lancando -= 1
+                        self._lancamentos += 1
+                        self._lancou.notify_all()
+                    raise
+                with self._lock:
+                    self._lancando -= 1
+                    self._navegadores.append(navegador)
+                    self._lancamentos += 1
+                    self._lancou.notify_all()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao aquecer pool de navegadores: {e}")
+
+    def aquecer_em_background(self):
+        """aquecer() sem segurar o startup da API"""
+        threading.Thread(target=self.aquecer, name="energisa-navegadores", daemon=True).start()
+
+    def encerrar(self):
+        """Fecha todos os navegadores do pool"""
+        with self._lock:
+            for navegador in self._navegadores:
+                navegador.encerrar()
+            self._navegadores = []
+
+    def get_status(self) -> dict:
+        """Navegadores, fila de admissão e latências (espera na fila e abertura do contexto)"""
+        with self._lock:
+            navegadores = [
+                {
+                    "pid": n.processo.pid,
+                    "ativos": n.ativos,
+                    "usos": n.usos,
+                    "idade_segundos": round(time.monotonic() - n.criado_em),
+                }
+                for n in self._navegadores
+            ]
+            na_fila = self._na_fila
+
+        return {
+            "tamanho": self.tamanho,
+            "max_logins": self.max_logins,
+            "navegadores": navegadores,
+            "na_fila": na_fila,
+            "logins": self.logins,
+            "recusados": self.recusados,
+            "reciclados": self.reciclados,
+            "latencias": resumir_latencias({
+                "espera_fila": list(self._esperas),
+                "abertura_contexto": list(self._aberturas),
+                "inicio_login": list(self._inicios),
+            }),
+        }
+
+
+# Instância global do pool
+navegador_pool = NavegadorPool(
+    tamanho=settings.PLAYWRIGHT_POOL_NAVEGADORES,
+    max_logins=settings.PLAYWRIGHT_POOL_MAX_LOGINS,
+    max_usos=settings.PLAYWRIGHT_POOL_MAX_USOS,
+    espera_segundos=settings.PLAYWRIGHT_POOL_ESPERA_SEGUNDOS
+)
@@ -0,0 +1,265 @@
+"""
+Energisa Replay - Transporte offline que responde com os payloads gravados em responses/
+Usado em benchmark e testes de carga da sincronização sem acessar a Energisa
+"""
+
+import base64
+import json
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from backend.energisa.service import EnergisaService
+
+
+# Pasta padrão dos payloads gravados (raiz do repositório)
+FIXTURES_DIR = Path(__file__).resolve().parents[2] / "responses"
+
+# CPFs e UCs sintéticos: CPF i -> 900000000ii, UC j do CPF i -> CDC_BASE + i*100 + j
+CPF_BASE = 90_000_000_000
+CDC_BASE = 5_000_000
+
+BUILD_ID = "replay-build"
+
+
+def cpf_sintetico(indice: int) -> str:
+    """CPF sintético (11 dígitos) do índice"""
+    return str(CPF_BASE + indice)
+
+
+def cdc_sintetico(indice_cpf: int, indice_uc: int) -> int:
+    """CDC sintético da UC indice_uc do CPF indice_cpf"""
+    return CDC_BASE + indice_cpf * 100 + indice_uc
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    Adapter do requests que serve os payloads de responses/*.json.
+
+    Montado na Session do EnergisaService, substitui a rede sem mudar a
+    lógica do serviço. Cada UC recebe uma cópia do payload com o próprio CDC.
+
+    - latencia_ms: (mínimo, máximo) de latência simulada por requisição
+    - taxa_erro: fração das chamadas /api que retornam status_erro
+    - taxa_mudanca: fração das respostas de dados com um valor alterado
+      (simula faturas/UCs que mudaram entre execuções)
+    """
+
+    def __init__(
+        self,
+        fixtures_dir: Optional[Path] = None,
+        latencia_ms: Tuple[float, float] = (0, 0),
+        taxa_erro: float = 0.0,
+        status_erro: int = 500,
+        taxa_mudanca: float = 0.0,
+        ucs_por_cpf: int = 1,
+        semente: Optional[int] = None
+    ):
+        super().__init__()
+        self.fixtures_dir = Path(fixtures_dir or FIXTURES_DIR)
+        self.latencia_ms = latencia_ms
+        self.taxa_erro = taxa_erro
+        self.status_erro = status_erro
+        self.taxa_mudanca = taxa_mudanca
+        self.ucs_por_cpf = ucs_por_cpf
+        self._random = random.Random(semente)
+        self._lock = threading.Lock()
+        self._pdf: Optional[bytes] = None
+
+        self.requisicoes: Counter = Counter()
+        self.erros_injetados: Counter = Counter()
+
+        self._ucs = self._carregar("ucs.json")
+        self._uc_info = self._carregar("ucs_info.json")
+        self._faturas = self._carregar("fatura_listar.json")
+        self._gd_info = self._carregar("gd_info.json")
+        self._gd_details = [
+            self._carregar(f"gd_details_{tipo}.json")
+            for tipo in ("geradora", "beneficiaria", "compensadora")
+        ]
+
+    def _carregar(self, nome: str):
+        with open(self.fixtures_dir / nome, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _pdf_bytes(self) -> bytes:
+        """PDF gravado (carregado sob demanda, o arquivo tem ~2.6MB)"""
+        if self._pdf is None:
+            self._pdf = base64.b64decode(self._carregar("fatura_download.json")["file_base64"])
+        return self._pdf
+
+    def _sortear(self, taxa: float) -> bool:
+        if taxa <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < taxa
+
+    # ========================
+    # Rotas
+    # ========================
+
+    @staticmethod
+    def _cdc_da_requisicao(request, query: dict) -> Optional[int]:
+        """CDC da query (uc, numeroCdc, numeroUc), do corpo JSON ou do cookie NumeroUc"""
+        for chave in ("uc", "numeroCdc", "numeroUc"):
+            if chave in query:
+                return int(query[chave][0])
+
+        if request.body:
+            try:
+                corpo = json.loads(request.body)
+                if isinstance(corpo, dict) and corpo.get("cdc"):
+                    return int(corpo["cdc"])
+            except (ValueError, TypeError):
+                pass
+
+        for parte in (request.headers.get("Cookie") or "").split(";"):
+            nome, _, valor = parte.strip().partition("=")
+            if nome == "NumeroUc" and valor:
+                return int(valor)
+        return None
+
+    def _listar_ucs(self, doc: str) -> list:
+        indice = int(doc) - CPF_BASE
+        modelo = self._ucs[0]
+        return [
+            {**modelo, "numeroUc": cdc_sintetico(indice, j), "digitoVerificador": 0}
+            for j in range(self.ucs_por_cpf)
+        ]
+
+    def _listar_faturas(self, cdc: int) -> list:
+        faturas = []
+        for fatura in self._faturas:
+            copia = {
+                **fatura,
+                "cdcVinculado": cdc,
+                "cdcCadastrado": cdc,
+                "numeroFatura": cdc * 1000 + fatura["numeroFatura"] % 1000,
+            }
+            faturas.append(copia)
+        if faturas and self._sortear(self.taxa_mudanca):
+            faturas[0]["valorFatura"] = round((faturas[0].get("valorFatura") or 0) + 0.01, 2)
+        return faturas
+
+    def _uc_info_de(self, cdc: int) -> dict:
+        infos = json.loads(json.dumps(self._uc_info["infos"]))
+        infos["dadosUc"]["numeroCdc"] = cdc
+        if self._sortear(self.taxa_mudanca):
+            infos["dadosUc"]["nomeTitular"] = f"{infos['dadosUc'].get('nomeTitular')} *"
+        return {**self._uc_info, "infos": infos}
+
+    def _gd_details_de(self, cdc: int) -> dict:
+        modelo = self._gd_details[cdc % len(self._gd_details)]
+        return {**modelo, "infos": [{**item, "cdc": cdc} for item in modelo["infos"]]}
+
+    def _rotear(self, request) -> Tuple[str, int, object, str]:
+        """Retorna (rota, status, corpo, content-type) da requisição"""
+        url = urlparse(request.url)
+        caminho = url.path
+        query = parse_qs(url.query)
+
+        if caminho in ("/login", "/home", "/faturas"):
+            html = f'<html><script id="__NEXT_DATA__">{{"buildId":"{BUILD_ID}"}}</script></html>'
+            return caminho, 200, html, "text/html"
+
+        if caminho == "/api/autenticacao/RefreshToken":
+            sufixo = int(time.time() * 1000)
+            return "refresh_token", 200, {
+                "errored": False,
+                "infos": {"utk": f"utk-{sufixo}", "refreshToken": f"rtk-{sufixo}"}
+            }, "application/json"
+
+        if caminho == "/api/usuarios/UnidadeConsumidora":
+            return "listar_ucs", 200, {"infos": self._listar_ucs(query["doc"][0])}, "application/json"
+
+        cdc = self._cdc_da_requisicao(request, query)
+
+        if caminho == "/api/clientes/UnidadeConsumidora/Informacao":
+            return "get_uc_info", 200, self._uc_info_de(cdc), "application/json"
+
+        if caminho == f"/_next/data/{BUILD_ID}/faturas.json":
+            return "listar_faturas", 200, {
+                "pageProps": {"data": {"faturas": self._listar_faturas(cdc)}}
+            }, "application/json"
+
+        if caminho == "/api/clientes/Fatura/ListarFaturasCliente":
+            return "listar_faturas_api", 200, {"infos": self._listar_faturas(cdc)}, "application/json"
+
+        if caminho == "/api/clientes/SegundaVia/Download":
+            return "download_pdf", 200, self._pdf_bytes(), "application/pdf"
+
+        if caminho == "/api/clientes/Gd/GetHistoricoDemonstrativoGd":
+            return "get_gd_details", 200, self._gd_details_de(cdc), "application/json"
+
+        if caminho == "/api/clientes/Gd/VerificaContextoGDByUC":
+            return "get_gd_info", 200, self._gd_info, "application/json"
+
+        return caminho, 404, {"errored": True, "message": "Rota não gravada"}, "application/json"
+
+    # ========================
+    # HTTPAdapter
+    # ========================
+
+    def send(self, request, **kwargs):
+        rota, status, corpo, content_type = self._rotear(request)
+
+        minimo, maximo = self.latencia_ms
+        if maximo > 0:
+            with self._lock:
+                espera = self._random.uniform(minimo, maximo)
+            time.sleep(espera / 1000)
+
+        if status == 200 and urlparse(request.url).path.startswith("/api/") and self._sortear(self.taxa_erro):
+            status = self.status_erro
+            corpo = {"errored": True, "message": "Erro injetado pelo replay"}
+            content_type = "application/json"
+            with self._lock:
+                self.erros_injetados[rota] += 1
+
+        with self._lock:
+            self.requisicoes[rota] += 1
+
+        if isinstance(corpo, bytes):
+            conteudo = corpo
+        elif isinstance(corpo, str):
+            conteudo = corpo.encode("utf-8")
+        else:
+            conteudo = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+
+        resp = Response()
+        resp.status_code = status
+        resp._content = conteudo
+        resp.headers = CaseInsensitiveDict({"Content-Type": content_type})
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        resp.reason = "OK" if status == 200 else "Replay"
+        return resp
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def usar_replay(adapter: ReplayAdapter):
+    """
+    Faz todo EnergisaService criado dentro do bloco usar o adapter.
+
+    Args:
+        adapter: ReplayAdapter configurado
+    """
+    anterior = EnergisaService.adapter_padrao
+    EnergisaService.adapter_padrao = adapter
+    try:
+        yield adapter
+    finally:
+        EnergisaService.adapter_padrao = anterior
@@ -13,13 +13,11 @@ import time
 
 from backend.core.security import get_current_active_user, CurrentUser, optional_auth
 from backend.energisa.service import EnergisaService
+from backend.energisa.login_sessoes import registro_logins, RegistroLoginsCheio
 from backend.energisa import constants, calculadora, aneel_api
 
 router = APIRouter()
 
-# Gerenciador de sessões de login em threads separadas
-_login_sessions = {}
-
 
 # ========================
 # Pydantic Models
@@ -112,30 +110,30 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
     """Worker para processo de login com Playwright"""
     from playwright.sync_api import sync_playwright
     from backend.energisa.session_manager import SessionManager
-    import random
+    from backend.energisa.navegadores import navegador_pool, PoolNavegadoresEsgotado
+    from backend.energisa import login_perfil
+    from backend.config import settings
     import time
 
     playwright_instance = None
-    browser = None
+    reserva = None
     page = None
+    inicio_login = time.monotonic()
+    cronometro = login_perfil.CronometroLogin(cpf)
 
     try:
         print(f"[Worker] Iniciando navegador para CPF {cpf}...")
 
         playwright_instance = sync_playwright().start()
 
-        args = [
-            "--no-sandbox", "--disable-infobars", "--start-maximized",
-            "--disable-blink-features=AutomationControlled", "--disable-dev-shm-usage", "--disable-gpu"
-        ]
-
-        browser = playwright_instance.chromium.launch(
-            headless=False,  # IMPORTANTE: False para bypass do Akamai (usa xvfb)
-            args=args,
-            ignore_default_args=["--enable-automation"]
-        )
-
-        context = browser.new_context(viewport={'width': 1280, 'height': 1024}, locale='pt-BR')
+        # Contexto novo em um Chromium já aberto do pool (headed no Xvfb,
+        # necessário para o bypass do Akamai); espera na fila se estiver cheio
+        with cronometro.etapa("navegador"):
+            reserva = navegador_pool.abrir(
+                playwright_instance, viewport={'width': 1280, 'height': 1024}, locale='pt-BR'
+            )
+        context = reserva.context
+        login_perfil.bloquear_recursos(context)
 
         context.add_init_script("""
         () => {
@@ -148,44 +146,17 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
         page = context.new_page()
 
         print("   [Web] Acessando pagina de login...")
-        page.goto("https://servicos.energisa.com.br/login", wait_until="domcontentloaded", timeout=60000)
+        with cronometro.etapa("pagina"):
+            page.goto(settings.ENERGISA_LOGIN_URL, wait_until="domcontentloaded", timeout=60000)
 
         # Validação Akamai
         print("   [Security] Aguardando validacao de seguranca...")
-        start_time = time.time()
-
-        while time.time() - start_time < 20:
-            cookies = context.cookies()
-            abck = next((c['value'] for c in cookies if c['name'] == '_abck'), None)
-
-            if abck and "~0~" in abck:
+        with cronometro.etapa("akamai"):
+            if login_perfil.aguardar_akamai(context, page):
                 print(f"   [OK] Cookie de seguranca validado!")
-                break
-
-            x, y = random.randint(100, 800), random.randint(100, 600)
-            page.mouse.move(x, y, steps=10)
-            if random.random() > 0.8:
-                page.mouse.click(x, y)
-            time.sleep(1.0)
-
-        # Aguarda a página carregar completamente
-        print("   [Page] Aguardando carregamento completo da pagina...")
-        time.sleep(3)
 
-        # Tenta aguardar por um input na página
-        try:
-            page.wait_for_selector('input', timeout=15000)
-            print("   [Page] Input encontrado na pagina")
-        except Exception as e:
-            print(f"   [WARN] Timeout esperando input: {e}")
-            # Tira screenshot para debug
-            try:
-                page.screenshot(path="/app/backend/sessions/page_state.png")
-                print("   [Debug] Screenshot salvo em sessions/page_state.png")
-            except:
-                pass
-
-        # Preenchimento CPF - múltiplos seletores para compatibilidade
+        # Preenchimento CPF - múltiplos seletores para compatibilidade,
+        # esperados ao mesmo tempo (o primeiro que aparecer)
         cpf_selectors = [
             'input[name="cpf"]',
             'input#cpf',
@@ -199,39 +170,14 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
             'input[aria-label*="cpf"]',
         ]
 
-        cpf_input_found = False
-        for selector in cpf_selectors:
-            try:
-                if page.is_visible(selector, timeout=2000):
-                    page.click(selector)
-                    cpf_input_found = True
-                    print(f"   [CPF] Campo encontrado com seletor: {selector}")
-                    break
-            except:
-                continue
+        with cronometro.etapa("campo_cpf"):
+            campo_cpf = login_perfil.localizar_primeiro(page, cpf_selectors, timeout_ms=15000)
+            if campo_cpf is None:
+                # Tenta encontrar qualquer input visível na página
+                print("   [CPF] Tentando busca generica de inputs...")
+                campo_cpf = login_perfil.localizar_primeiro(page, ['input'], timeout_ms=5000)
 
-        if not cpf_input_found:
-            # Tenta encontrar qualquer input visível na página
-            print("   [CPF] Tentando busca generica de inputs...")
-            try:
-                time.sleep(2)
-                inputs = page.locator('input').all()
-                print(f"   [CPF] Encontrados {len(inputs)} inputs na pagina")
-                for idx, inp in enumerate(inputs):
-                    try:
-                        if inp.is_visible():
-                            print(f"   [CPF] Input {idx} visivel, clicando...")
-                            inp.click()
-                            cpf_input_found = True
-                            print("   [CPF] Campo encontrado via busca generica")
-                            break
-                    except Exception as inp_err:
-                        print(f"   [CPF] Input {idx} erro: {inp_err}")
-                        continue
-            except Exception as e:
-                print(f"   [CPF] Erro na busca generica: {e}")
-
-        if not cpf_input_found:
+        if campo_cpf is None:
             try:
                 page.screenshot(path="/app/backend/sessions/cpf_not_found.png")
                 print("   [Debug] Screenshot salvo em sessions/cpf_not_found.png")
@@ -243,15 +189,16 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
                 print(f"   [Debug] Erro ao salvar debug: {e}")
             raise Exception("Campo CPF não encontrado. O layout da Energisa pode ter mudado.")
 
-        for char in cpf:
-            page.keyboard.type(char, delay=random.randint(50, 150))
+        with cronometro.etapa("digitar_cpf"):
+            campo_cpf.click()
+            login_perfil.digitar(page, cpf)
 
         # Interceptação
         print("   [Worker] Aguardando JSON de telefones...")
 
-        with page.expect_response(lambda response: "selecionar-numero.json" in response.url and response.status == 200, timeout=30000) as response_info:
-            time.sleep(1)
-            page.click('button:has-text("ENTRAR"), button:has-text("Entrar")')
+        with cronometro.etapa("telefones"):
+            with page.expect_response(lambda response: "selecionar-numero.json" in response.url and response.status == 200, timeout=30000) as response_info:
+                page.click('button:has-text("ENTRAR"), button:has-text("Entrar")')
 
         response = response_info.value
         json_data = response.json()
@@ -271,6 +218,8 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
             print(f"   [ERROR] Erro extracao telefones: {e}")
 
         transaction_id = f"{cpf}_{int(time.time())}"
+        navegador_pool.registrar_inicio_login(time.monotonic() - inicio_login)
+        cronometro.registrar("telefones")
 
         result_queue.put({
             "success": True,
@@ -283,6 +232,8 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
         # Fase 2: Seleção
         print("   [Worker] Aguardando escolha do telefone...")
         cmd = cmd_queue.get(timeout=300)
+        if cmd.get("action") == "cancelar":
+            raise Exception("Login cancelado (sessão expirada)")
         if cmd.get("action") != "select_phone":
             raise Exception("Comando inválido")
 
@@ -291,7 +242,9 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
 
         print(f"   [Worker] Buscando opcao... {tel_clean}")
 
-        page.wait_for_selector('text=/contato|telefone|sms/i', timeout=30000)
+        cronometro = login_perfil.CronometroLogin(cpf)
+        with cronometro.etapa("tela_contato"):
+            page.wait_for_selector('text=/contato|telefone|sms/i', timeout=30000)
 
         clicked = False
         try:
@@ -310,33 +263,36 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
             elif page.is_visible('input[type="radio"]'):
                 page.click('input[type="radio"]')
 
-        time.sleep(1)
-        if page.is_visible('button:has-text("AVANÇAR")'):
-            page.click('button:has-text("AVANÇAR")')
-        else:
-            page.evaluate("() => { const b = Array.from(document.querySelectorAll('button')).find(x => x.innerText.includes('AVANÇAR')); if(b) b.click() }")
+        with cronometro.etapa("enviar_sms"):
+            if not login_perfil.clicar_quando_visivel(page, 'button:has-text("AVANÇAR")'):
+                page.evaluate("() => { const b = Array.from(document.querySelectorAll('button')).find(x => x.innerText.includes('AVANÇAR')); if(b) b.click() }")
+        cronometro.registrar("sms_enviado")
 
         result_queue.put({"success": True, "phase": "sms_sent", "message": "SMS Enviado"})
 
         # Fase 3: Finish SMS
         cmd = cmd_queue.get(timeout=300)
+        if cmd.get("action") == "cancelar":
+            raise Exception("Login cancelado (sessão expirada)")
         if cmd.get("action") != "finish_sms":
             raise Exception("Comando inválido")
 
         sms = cmd.get("sms_code")
         print(f"   [Worker] Digitando SMS: {sms}")
 
-        if page.is_visible('input'):
-            page.click('input')
-        page.keyboard.type(sms, delay=100)
-        time.sleep(0.5)
-        page.click('button:has-text("AVANÇAR")')
+        cronometro = login_perfil.CronometroLogin(cpf)
+        with cronometro.etapa("digitar_sms"):
+            if page.is_visible('input'):
+                page.click('input')
+            login_perfil.digitar(page, sms)
+            page.click('button:has-text("AVANÇAR")')
 
         print("   [Wait] Aguardando autenticacao...")
-        try:
-            page.wait_for_url(lambda u: "listagem-ucs" in u or "home" in u, timeout=25000)
-        except:
-            pass
+        with cronometro.etapa("autenticacao"):
+            try:
+                page.wait_for_url(lambda u: "listagem-ucs" in u or "home" in u, timeout=25000)
+            except:
+                pass
 
         # Captura tokens
         final_cookies = {c['name']: c['value'] for c in page.context.cookies()}
@@ -360,21 +316,67 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
         except Exception as e:
             print(f"   [WARN] Erro ao ler LocalStorage: {e}")
 
-        SessionManager.save_session(cpf, final_cookies)
+        SessionManager.save_session(
+            cpf, final_cookies, storage_state=login_perfil.estado_navegador(page.context)
+        )
         print("   [Save] Sessao salva com sucesso!")
+        cronometro.registrar("autenticado")
 
         result_queue.put({"success": True, "tokens": list(final_cookies.keys()), "message": "Login OK"})
 
+    except PoolNavegadoresEsgotado as e:
+        print(f"[Worker] {e}")
+        result_queue.put({"success": False, "error": str(e), "status_code": 503})
     except Exception as e:
         print(f"[Worker Error] {e}")
         result_queue.put({"success": False, "error": str(e)})
     finally:
-        if browser:
-            browser.close()
+        if reserva:
+            reserva.fechar()
         if playwright_instance:
             playwright_instance.stop()
 
 
+def _encerrar_worker_login(recursos: dict):
+    """Pede ao worker que encerre o login (o navegador é fechado na thread dele)"""
+    recursos["cmd_queue"].put({"action": "cancelar"})
+
+
+def _sessao_login(sessao_id: str, status_code: int, detail: str) -> dict:
+    """
+    Sessão de login com o navegador vivo neste processo.
+
+    Raises:
+        HTTPException 409: O navegador está em outro worker da API (vivo)
+        HTTPException status_code: Sessão não existe, expirou ou o processo
+            dono morreu
+    """
+    sessao = registro_logins.obter(sessao_id)
+    if sessao and sessao["recursos"]:
+        return sessao
+
+    metadados = registro_logins.metadados(sessao_id)
+    if metadados and metadados["dono"] != registro_logins.dono and metadados["dono_ativo"]:
+        raise HTTPException(409, "Sessão de login aberta em outro processo da API. Tente novamente.")
+
+    raise HTTPException(status_code, detail)
+
+
+def _registrar_login(sessao_id: str, cpf: str, thread, cmd_q, result_q, ip: Optional[str] = None):
+    """Registra o login iniciado (encerra o worker se o teto foi atingido)"""
+    try:
+        registro_logins.registrar(
+            sessao_id,
+            cpf,
+            {"thread": thread, "cmd_queue": cmd_q, "result_queue": result_q},
+            _encerrar_worker_login,
+            ip=ip
+        )
+    except RegistroLoginsCheio as e:
+        _encerrar_worker_login({"cmd_queue": cmd_q})
+        raise HTTPException(503, str(e))
+
+
 # ========================
 # Rotas de Login (Protegidas)
 # ========================
@@ -382,6 +384,9 @@ def _login_worker_thread(cpf: str, cmd_queue: queue.Queue, result_queue: queue.Q
 @router.post("/login/start", summary="Iniciar login na Energisa")
 async def login_start(req: LoginStartRequest, current_user: CurrentUser = Depends(get_current_active_user)):
     """Inicia o navegador e retorna a lista de telefones interceptada."""
+    if not registro_logins.tem_vaga():
+        raise HTTPException(503, "Muitos logins em andamento. Tente novamente em instantes.")
+
     cmd_q = queue.Queue()
     result_q = queue.Queue()
 
@@ -400,15 +405,10 @@ async def login_start(req: LoginStartRequest, current_user: CurrentUser = Depend
         raise HTTPException(500, "Timeout ao carregar opções de login")
 
     if not result.get("success"):
-        raise HTTPException(500, result.get("error", "Erro desconhecido"))
+        raise HTTPException(result.get("status_code", 500), result.get("error", "Erro desconhecido"))
 
     transaction_id = result["transaction_id"]
-
-    _login_sessions[transaction_id] = {
-        "thread": thread,
-        "cmd_queue": cmd_q,
-        "result_queue": result_q
-    }
+    _registrar_login(transaction_id, cpf_clean, thread, cmd_q, result_q)
 
     return {
         "transaction_id": transaction_id,
@@ -419,9 +419,7 @@ async def login_start(req: LoginStartRequest, current_user: CurrentUser = Depend
 @router.post("/login/select-option", summary="Selecionar telefone para SMS")
 async def login_select_option(req: LoginSelectRequest, current_user: CurrentUser = Depends(get_current_active_user)):
     """Recebe o transaction_id e o telefone escolhido."""
-    session = _login_sessions.get(req.transaction_id)
-    if not session:
-        raise HTTPException(400, "Sessão não encontrada")
+    session = _sessao_login(req.transaction_id, 400, "Sessão não encontrada")["recursos"]
 
     session["cmd_queue"].put({
         "action": "select_phone",
@@ -436,15 +434,14 @@ async def login_select_option(req: LoginSelectRequest, current_user: CurrentUser
     if not result.get("success"):
         raise HTTPException(500, result.get("error"))
 
+    registro_logins.atualizar_fase(req.transaction_id, "sms_enviado")
     return {"message": "SMS enviado com sucesso"}
 
 
 @router.post("/login/finish", summary="Finalizar login com código SMS")
 async def login_finish(req: LoginFinishRequest, current_user: CurrentUser = Depends(get_current_active_user)):
     """Recebe o código SMS e finaliza."""
-    session = _login_sessions.pop(req.transaction_id, None)
-    if not session:
-        raise HTTPException(400, "Sessão expirada")
+    session = _sessao_login(req.transaction_id, 400, "Sessão expirada")["recursos"]
 
     session["cmd_queue"].put({
         "action": "finish_sms",
@@ -455,6 +452,8 @@ async def login_finish(req: LoginFinishRequest, current_user: CurrentUser = Depe
         result = session["result_queue"].get(timeout=60)
     except queue.Empty:
         raise HTTPException(500, "Timeout na validação do SMS")
+    finally:
+        registro_logins.remover(req.transaction_id)
 
     if not result.get("success"):
         raise HTTPException(400, result.get("error"))
@@ -589,6 +588,9 @@ async def public_simulation_start(req: PublicSimulationStart, request: Request):
 
         cpf_clean = req.cpf.replace(".", "").replace("-", "")
 
+        if not registro_logins.tem_vaga():
+            raise HTTPException(status_code=503, detail="Muitos logins em andamento. Tente novamente em instantes.")
+
         cmd_queue = queue.Queue()
         result_queue = queue.Queue()
 
@@ -605,20 +607,12 @@ async def public_simulation_start(req: PublicSimulationStart, request: Request):
             raise HTTPException(status_code=500, detail="Timeout aguardando lista de telefones")
 
         if not result.get("success"):
-            raise HTTPException(status_code=500, detail=result.get("error", "Erro desconhecido"))
+            raise HTTPException(status_code=result.get("status_code", 500), detail=result.get("error", "Erro desconhecido"))
 
         transaction_id = result["transaction_id"]
         session_id = f"pub_{transaction_id}"
 
-        _login_sessions[session_id] = {
-            "thread": worker_thread,
-            "cmd_queue": cmd_queue,
-            "result_queue": result_queue,
-            "cpf": cpf_clean,
-            "ip": ip,
-            "transaction_id": transaction_id,
-            "created_at": time.time()
-        }
+        _registrar_login(session_id, cpf_clean, worker_thread, cmd_queue, result_queue, ip=ip)
 
         return {
             "transaction_id": session_id,
@@ -635,9 +629,7 @@ async def public_simulation_start(req: PublicSimulationStart, request: Request):
 async def public_simulation_send_sms(req: PublicSimulationSelectPhone, request: Request):
     """Endpoint público para enviar SMS ao telefone selecionado."""
     try:
-        session = _login_sessions.get(req.transactionId)
-        if not session:
-            raise HTTPException(400, "Sessão não encontrada ou expirada")
+        session = _sessao_login(req.transactionId, 400, "Sessão não encontrada ou expirada")["recursos"]
 
         session["cmd_queue"].put({
             "action": "select_phone",
@@ -652,6 +644,7 @@ async def public_simulation_send_sms(req: PublicSimulationSelectPhone, request:
         if not result.get("success"):
             raise HTTPException(500, result.get("error", "Erro ao enviar SMS"))
 
+        registro_logins.atualizar_fase(req.transactionId, "sms_enviado")
         return {"success": True, "message": "SMS enviado com sucesso"}
 
     except HTTPException:
@@ -666,10 +659,7 @@ async def public_simulation_validate_sms(req: PublicSimulationSms, request: Requ
     try:
         session_id = req.sessionId
 
-        if session_id not in _login_sessions:
-            raise HTTPException(status_code=404, detail="Sessão não encontrada ou expirada")
-
-        session_data = _login_sessions[session_id]
+        session_data = _sessao_login(session_id, 404, "Sessão não encontrada ou expirada")["recursos"]
 
         cmd_queue = session_data["cmd_queue"]
         result_queue = session_data["result_queue"]
@@ -684,7 +674,7 @@ async def public_simulation_validate_sms(req: PublicSimulationSms, request: Requ
         if not result.get("success"):
             raise HTTPException(status_code=400, detail=result.get("error", "Erro na validação do SMS"))
 
-        _login_sessions[session_id]["authenticated"] = True
+        registro_logins.atualizar_fase(session_id, "autenticada")
 
         return {
             "success": True,
@@ -702,12 +692,11 @@ async def public_simulation_validate_sms(req: PublicSimulationSms, request: Requ
 async def public_simulation_get_ucs(session_id: str, request: Request):
     """Endpoint público para buscar UCs após autenticação."""
     try:
-        if session_id not in _login_sessions:
+        session_data = registro_logins.metadados(session_id)
+        if not session_data:
             raise HTTPException(status_code=404, detail="Sessão não encontrada")
 
-        session_data = _login_sessions[session_id]
-
-        if not session_data.get("authenticated"):
+        if not session_data.get("autenticada"):
             raise HTTPException(status_code=401, detail="Sessão não autenticada")
 
         cpf = session_data["cpf"]
@@ -733,12 +722,11 @@ async def public_simulation_get_ucs(session_id: str, request: Request):
 async def public_simulation_get_faturas(session_id: str, codigo_uc: int, request: Request):
     """Endpoint público para buscar faturas de uma UC com cálculo de economia."""
     try:
-        if session_id not in _login_sessions:
+        session_data = registro_logins.metadados(session_id)
+        if not session_data:
             raise HTTPException(status_code=404, detail="Sessão não encontrada")
 
-        session_data = _login_sessions[session_id]
-
-        if not session_data.get("authenticated"):
+        if not session_data.get("autenticada"):
             raise HTTPException(status_code=401, detail="Sessão não autenticada")
 
         cpf = session_data["cpf"]
@@ -5,21 +5,45 @@ PRESERVADO DO GATEWAY ORIGINAL - Não modificar lógica de scraping
 
 import playwright
 from playwright.sync_api import sync_playwright
-import requests
 import time
 import re
 from backend.energisa.session_manager import SessionManager
+from backend.energisa.transporte import adapter_compartilhado
+from backend.energisa.limitador import LimiteEnergisaExcedido, SessaoLimitada
+from backend.energisa.tokens import expiracao_jwt, refresh_coordenador
+from backend.energisa.build_id import build_id_cache
+from backend.energisa.cache import TTL_ENDPOINTS, resposta_cache
+from backend.energisa.caminhos import seletor_caminhos
+from backend.energisa.navegadores import navegador_pool
+from backend.energisa.login_sessoes import registro_logins
+from backend.energisa import login_perfil
+from backend.config import settings
 
-# Armazena navegadores abertos temporariamente aguardando o SMS
-# Chave: transaction_id | Valor: contexto do playwright
-PENDING_LOGINS = {}
+
+def _encerrar_login_pendente(recursos: dict):
+    """Fecha o navegador de um login que não chegou ao finish_login"""
+    recursos["br"].fechar()
+    recursos["pw"].stop()
 
 
 class EnergisaService:
-    def __init__(self, cpf: str):
+    # Transporte alternativo montado na Session (ex: ReplayAdapter offline).
+    # None = pool de conexões compartilhado do processo.
+    adapter_padrao = None
+
+    def __init__(self, cpf: str, usar_cache: bool = True):
+        """
+        Args:
+            cpf: CPF da sessão Energisa
+            usar_cache: False = consultas de leitura sempre vão à Energisa
+                (a resposta ainda atualiza o cache; usado pela sincronização)
+        """
         self.cpf = cpf.replace(".", "").replace("-", "")
+        self.usar_cache = usar_cache
         self.base_url = "https://servicos.energisa.com.br"
-        self.session = requests.Session()
+        # Session própria (cookies isolados por CPF) sobre conexões compartilhadas
+        self.session = SessaoLimitada(self.cpf)
+        self.session.mount(self.base_url, EnergisaService.adapter_padrao or adapter_compartilhado())
 
         # Carrega cookies existentes se houver
         self.cookies = SessionManager.load_session(self.cpf)
@@ -30,27 +54,34 @@ class EnergisaService:
         for name, value in cookies.items():
             self.session.cookies.set(name, value)
 
+    def _em_cache(self, endpoint: str, uc_data: dict, buscar):
+        """Consulta de leitura passando pelo cache de respostas (chave: CPF, endpoint, CDC)"""
+        chave = (self.cpf, endpoint, str(uc_data.get('cdc')) if uc_data else None)
+        return resposta_cache.buscar(chave, TTL_ENDPOINTS[endpoint], buscar, self.usar_cache)
+
     def _get_build_id(self):
-        """Busca o identificador da versão atual do site (necessário para rotas _next)"""
-        if hasattr(self, '_cached_build_id'):
-            return self._cached_build_id
+        """Identificador da versão atual do site (necessário para rotas _next), em cache no processo"""
+        return build_id_cache.obter(self._buscar_build_id)
 
+    def _buscar_build_id(self):
+        """Busca o buildId nas páginas públicas (pode rodar em background, usa Session própria)"""
         print("   🔍 Buscando buildId do Next.js...")
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
         }
+        session = SessaoLimitada()
+        session.mount(self.base_url, EnergisaService.adapter_padrao or adapter_compartilhado())
 
         # Tenta buscar em rotas públicas primeiro (Login ou Home)
         urls_to_try = [f"{self.base_url}/login", f"{self.base_url}/home"]
 
         for url in urls_to_try:
             try:
-                resp = self.session.get(url, headers=headers, timeout=10)
+                resp = session.get(url, headers=headers, timeout=10)
                 if resp.status_code == 200:
                     match = re.search(r'"buildId"\s*:\s*"([^"]+)"', resp.text)
                     if match:
                         bid = match.group(1)
-                        self._cached_build_id = bid
                         print(f"   ✅ BuildId encontrado em {url}: {bid}")
                         return bid
             except Exception as e:
@@ -58,6 +89,34 @@ class EnergisaService:
 
         return None
 
+    def _get_next_data(self, rota: str, **kwargs):
+        """
+        GET em /_next/data/{buildId}/{rota}.
+
+        Um 404 indica deploy novo da Energisa: invalida o buildId em cache,
+        busca o atual e tenta mais uma vez.
+
+        Args:
+            rota: Caminho após o buildId (ex: "faturas.json")
+            **kwargs: Repassados ao session.get (headers, params)
+
+        Returns:
+            Response ou None se o buildId não pôde ser obtido
+        """
+        build_id = self._get_build_id()
+        if not build_id:
+            return None
+
+        resp = self.session.get(f"{self.base_url}/_next/data/{build_id}/{rota}", **kwargs)
+        if resp.status_code == 404:
+            print(f"   ♻️ BuildId {build_id} desatualizado, buscando o atual...")
+            build_id_cache.invalidar(build_id)
+            novo = self._get_build_id()
+            if novo and novo != build_id:
+                resp = self.session.get(f"{self.base_url}/_next/data/{novo}/{rota}", **kwargs)
+
+        return resp
+
     def is_authenticated(self):
         if not self.cookies:
             return False
@@ -74,34 +133,24 @@ class EnergisaService:
     # --- LOGIN (Versão HEADED / VISUAL rodando no Xvfb) ---
     def start_login(self, final_telefone: str):
         print(f"🚀 Login: CPF {self.cpf} | Tel Final: {final_telefone}")
+        cronometro = login_perfil.CronometroLogin(self.cpf)
 
         playwright = sync_playwright().start()
 
-        # 1. Argumentos para simular um PC real
-        args = [
-            "--no-sandbox",
-            "--disable-infobars",
-            "--start-maximized",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-dev-shm-usage",
-            "--disable-gpu"
-        ]
-
-        browser = playwright.chromium.launch(
-            headless=False,
-            args=args,
-            ignore_default_args=["--enable-automation"]
-        )
-
-        # 2. Contexto com a mesma resolução do Xvfb (1280x1024)
-        context = browser.new_context(
-            viewport={'width': 1280, 'height': 1024},
-            locale='pt-BR',
-            timezone_id='America/Sao_Paulo',
-            user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        )
-
-        # 3. Scripts de Camuflagem (Evasão de Bot)
+        # 1. Contexto novo em um Chromium já aberto do pool (headed no Xvfb),
+        #    com a mesma resolução do Xvfb (1280x1024)
+        with cronometro.etapa("navegador"):
+            reserva = navegador_pool.abrir(
+                playwright,
+                viewport={'width': 1280, 'height': 1024},
+                locale='pt-BR',
+                timezone_id='America/Sao_Paulo',
+                user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+            )
+        context = reserva.context
+        login_perfil.bloquear_recursos(context)
+
+        # 2. Scripts de Camuflagem (Evasão de Bot)
         init_script = """
         () => {
             Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
@@ -122,17 +171,13 @@ class EnergisaService:
         try:
             print("   🌐 Acessando página de login (Modo Visual/Xvfb)...")
 
-            # Acessa Google antes para 'aquecer' o navegador
-            try:
-                page.goto("https://www.google.com.br", timeout=10000)
-            except:
-                pass
-
-            # Acessa a Energisa
-            page.goto(f"{self.base_url}/login", wait_until="domcontentloaded", timeout=60000)
+            # Acessa a Energisa (o navegador do pool já está aquecido)
+            with cronometro.etapa("pagina"):
+                page.goto(settings.ENERGISA_LOGIN_URL, wait_until="domcontentloaded", timeout=60000)
 
-            # Pausa humanizada para scripts de segurança rodarem
-            time.sleep(5)
+            # Espera os scripts de segurança validarem o cookie do Akamai
+            with cronometro.etapa("akamai"):
+                login_perfil.aguardar_akamai(context, page)
 
             # Verifica se fomos bloqueados
             title = page.title()
@@ -155,17 +200,11 @@ class EnergisaService:
                 'input[inputmode="numeric"]',
             ]
 
-            cpf_found = False
-            for selector in cpf_selectors:
-                try:
-                    page.wait_for_selector(selector, state="visible", timeout=5000)
-                    cpf_found = True
-                    print(f"   ✅ Campo CPF encontrado: {selector}")
-                    break
-                except:
-                    continue
+            # Todos os seletores esperados ao mesmo tempo (o primeiro que aparecer)
+            with cronometro.etapa("campo_cpf"):
+                campo_cpf = login_perfil.localizar_primeiro(page, cpf_selectors, timeout_ms=15000)
 
-            if not cpf_found:
+            if campo_cpf is None:
                 if page.locator("iframe").count() > 0:
                     raise Exception("Captcha detectado na tela.")
 
@@ -177,24 +216,18 @@ class EnergisaService:
                 raise Exception(f"Campo CPF não carregou. Título: {title}")
 
             print("   ✍️ Preenchendo CPF...")
-            # Tenta clicar no campo CPF
-            for selector in cpf_selectors:
-                try:
-                    if page.is_visible(selector):
-                        page.click(selector)
-                        break
-                except:
-                    continue
-
-            for char in self.cpf:
-                page.keyboard.type(char, delay=150)
-
-            time.sleep(1)
-            page.click('button:has-text("ENTRAR"), button:has-text("Entrar")')
+            with cronometro.etapa("digitar_cpf"):
+                campo_cpf.click()
+                login_perfil.digitar(page, self.cpf)
+                page.click('button:has-text("ENTRAR"), button:has-text("Entrar")')
 
             print("   📞 Selecionando telefone...")
-            page.wait_for_selector('text=/contato|telefone|sms/i', timeout=30000)
-            time.sleep(2)
+            with cronometro.etapa("tela_contato"):
+                page.wait_for_selector('text=/contato|telefone|sms/i', timeout=30000)
+                # Espera a opção do telefone renderizar em vez de uma pausa fixa
+                login_perfil.localizar_primeiro(
+                    page, [f'label:has-text("{final_telefone}")', 'label'], timeout_ms=5000
+                )
 
             found = False
             for sel in [f'label:has-text("{final_telefone}")', f'div:has-text("{final_telefone}")', f'text={final_telefone}']:
@@ -210,17 +243,23 @@ class EnergisaService:
                 else:
                     raise Exception("Opção de telefone não encontrada")
 
-            time.sleep(1)
-            page.click('button:has-text("AVANÇAR")')
+            with cronometro.etapa("enviar_sms"):
+                login_perfil.clicar_quando_visivel(page, 'button:has-text("AVANÇAR")')
+            cronometro.registrar("sms_enviado")
 
             # Salva estado para o passo 2 (finish_login)
             transaction_id = f"{self.cpf}_{int(time.time())}"
-            PENDING_LOGINS[transaction_id] = {"pw": playwright, "br": browser, "pg": page}
+            registro_logins.registrar(
+                transaction_id,
+                self.cpf,
+                {"pw": playwright, "br": reserva, "pg": page},
+                _encerrar_login_pendente
+            )
 
             return {"transaction_id": transaction_id, "message": "SMS enviado (Modo Visual)"}
 
         except Exception as e:
-            browser.close()
+            reserva.fechar()
             playwright.stop()
             raise Exception(f"Erro no login: {str(e)}")
 
@@ -256,13 +295,11 @@ class EnergisaService:
         return tokens
 
     def finish_login(self, transaction_id: str, sms_code: str):
-        if transaction_id not in PENDING_LOGINS:
+        sessao = registro_logins.obter(transaction_id)
+        if not sessao or not sessao["recursos"]:
             raise Exception("Transação expirada")
 
-        ctx = PENDING_LOGINS.pop(transaction_id)
-        page = ctx["pg"]
-        browser = ctx["br"]
-        playwright = ctx["pw"]
+        page = sessao["recursos"]["pg"]
 
         try:
             try:
@@ -275,13 +312,9 @@ class EnergisaService:
             except:
                 pass
 
-            for d in sms_code:
-                page.keyboard.type(d, delay=150)
-            time.sleep(1)
+            login_perfil.digitar(page, sms_code)
 
-            if page.is_visible('button:has-text("AVANÇAR")'):
-                page.click('button:has-text("AVANÇAR")')
-            else:
+            if not login_perfil.clicar_quando_visivel(page, 'button:has-text("AVANÇAR")', timeout_ms=3000):
                 page.evaluate("() => { const b = Array.from(document.querySelectorAll('button')).find(x => x.innerText.includes('AVANÇAR')); if(b) b.click() }")
 
             print("   ⏳ Aguardando tokens...")
@@ -291,22 +324,85 @@ class EnergisaService:
                 pass
 
             final_cookies = {}
-            for _ in range(10):
+            for _ in range(20):
                 final_cookies = self._extract_tokens_from_browser(page)
                 if 'rtk' in final_cookies or 'accessTokenEnergisa' in final_cookies:
                     break
-                time.sleep(1)
+                page.wait_for_timeout(500)
 
             if 'rtk' not in final_cookies and 'accessTokenEnergisa' not in final_cookies:
                 raise Exception("Falha ao capturar tokens")
 
-            SessionManager.save_session(self.cpf, final_cookies)
+            SessionManager.save_session(
+                self.cpf, final_cookies, storage_state=login_perfil.estado_navegador(page.context)
+            )
             self._apply_cookies(final_cookies)
             return {"status": "success", "message": "Login OK", "tokens": list(final_cookies.keys())}
         except Exception as e:
             raise e
         finally:
-            browser.close()
+            # Fecha o navegador e libera a vaga no registro
+            registro_logins.remover(transaction_id)
+
+    def renovar_com_navegador(self, storage_state: dict) -> bool:
+        """
+        Renova os tokens reabrindo o portal com o estado do navegador do login.
+
+        O próprio portal usa o refresh token do localStorage, sem pedir SMS.
+        Roda em um contexto do pool de navegadores, como o login.
+
+        Args:
+            storage_state: Cookies + localStorage gravados com a sessão
+
+        Returns:
+            True se tokens novos foram capturados e salvos
+        """
+        token_anterior = (self.cookies or {}).get("accessTokenEnergisa")
+        playwright = sync_playwright().start()
+        reserva = None
+
+        try:
+            reserva = navegador_pool.abrir(
+                playwright,
+                storage_state=storage_state,
+                viewport={'width': 1280, 'height': 1024},
+                locale='pt-BR',
+                timezone_id='America/Sao_Paulo'
+            )
+            context = reserva.context
+            login_perfil.bloquear_recursos(context)
+
+            page = context.new_page()
+            page.goto(f"{self.base_url}/listagem-ucs", wait_until="domcontentloaded", timeout=60000)
+            login_perfil.aguardar_akamai(context, page)
+            try:
+                page.wait_for_load_state("networkidle", timeout=20000)
+            except Exception:
+                pass
+
+            if "/login" in page.url:
+                print(f"   ❌ Portal pediu novo login para CPF {self.cpf[:3]}***")
+                return False
+
+            tokens = self._extract_tokens_from_browser(page)
+            token = tokens.get("accessTokenEnergisa")
+            expira_em = expiracao_jwt(token)
+            renovado = expira_em > time.time() if expira_em is not None else bool(token and token != token_anterior)
+            if not renovado:
+                print(f"   ❌ Portal não renovou o token do CPF {self.cpf[:3]}***")
+                return False
+
+            self.cookies = {**(self.cookies or {}), **tokens}
+            SessionManager.save_session(
+                self.cpf, self.cookies, storage_state=login_perfil.estado_navegador(context)
+            )
+            self._apply_cookies(self.cookies)
+            print(f"   ✅ Token renovado pelo navegador para CPF {self.cpf[:3]}***")
+            return True
+
+        finally:
+            if reserva is not None:
+                reserva.fechar()
             playwright.stop()
 
     def _get_headers(self, json_content=True):
@@ -328,7 +424,51 @@ class EnergisaService:
             "retk": ""
         }
 
+    def token_expira_em(self):
+        """Expiração (epoch) do access token lida do JWT, ou None se não der para ler"""
+        if not self.cookies:
+            return None
+        return expiracao_jwt(self.cookies.get("utk") or self.cookies.get("accessTokenEnergisa"))
+
+    def token_valido(self, margem_segundos: int = None):
+        """
+        True se o access token ainda vale por mais que a margem.
+
+        Sem exp legível no token, considera válido só se este processo
+        renovou o token do CPF há pouco tempo.
+        """
+        if margem_segundos is None:
+            margem_segundos = settings.ENERGISA_TOKEN_MARGEM_SEGUNDOS
+
+        expira_em = self.token_expira_em()
+        if expira_em is not None:
+            return expira_em - time.time() > margem_segundos
+
+        ultimo = refresh_coordenador.ultimo_refresh(self.cpf)
+        return ultimo is not None and time.monotonic() - ultimo < settings.ENERGISA_TOKEN_TTL_SEM_EXP_SEGUNDOS
+
+    def garantir_token(self):
+        """Renova o token apenas se estiver perto de expirar"""
+        if self.token_valido():
+            return True
+        return self._refresh_token()
+
     def _refresh_token(self):
+        """
+        Renova o access token.
+
+        Coalescido por CPF: quem chama durante um refresh em andamento (ou
+        logo após) reaproveita os tokens novos em vez de renovar de novo.
+        """
+        sucesso, cookies = refresh_coordenador.executar(
+            self.cpf, lambda: (self._executar_refresh_token(), self.cookies)
+        )
+        if sucesso and cookies is not None and cookies is not self.cookies:
+            self.cookies = dict(cookies)
+            self._apply_cookies(self.cookies)
+        return sucesso
+
+    def _executar_refresh_token(self):
         print("   🔄 Tentando renovar Access Token com RTK...")
         url = f"{self.base_url}/api/autenticacao/RefreshToken"
 
@@ -388,6 +528,9 @@ class EnergisaService:
 
             print(f"   ❌ Falha ao renovar token: {resp.status_code} - {resp.text[:200]}")
             return False
+        except LimiteEnergisaExcedido:
+            # Recusa do limitador local não é falha do token: quem chama decide
+            raise
         except Exception as e:
             print(f"   ❌ Erro na renovação: {e}")
             return False
@@ -396,6 +539,9 @@ class EnergisaService:
         """
         Consulta informações detalhadas da Unidade Consumidora.
         """
+        return self._em_cache("get_uc_info", uc_data, lambda: self._get_uc_info(uc_data))
+
+    def _get_uc_info(self, uc_data: dict):
         try:
             empresa = int(uc_data.get('codigoEmpresaWeb', 6))
             uc_numero = int(uc_data.get('cdc'))
@@ -433,6 +579,9 @@ class EnergisaService:
             return {"errored": True, "message": str(e)}
 
     def listar_ucs(self):
+        return self._em_cache("listar_ucs", None, self._listar_ucs)
+
+    def _listar_ucs(self):
         url = f"{self.base_url}/api/usuarios/UnidadeConsumidora?doc={self.cpf}"
 
         payload = self._get_tokens_payload()
@@ -452,6 +601,9 @@ class EnergisaService:
         raise Exception(f"Erro API Energisa: {resp.status_code} - {resp.text}")
 
     def listar_faturas(self, uc_data: dict):
+        return self._em_cache("listar_faturas", uc_data, lambda: self._listar_faturas(uc_data))
+
+    def _listar_faturas(self, uc_data: dict):
         try:
             cdc = int(uc_data.get('cdc', 0))
             digito = int(uc_data.get('digitoVerificadorCdc', 0))
@@ -473,40 +625,56 @@ class EnergisaService:
         self.cookies["Digito"] = str(digito)
         self.cookies["CodigoEmpresaWeb"] = str(empresa)
 
-        # Tenta a rota via Next.js
-        build_id = self._get_build_id()
+        # Caminhos alternativos para as faturas, do mais rápido saudável ao
+        # mais lento; cada um devolve a lista ou None se falhou
+        caminhos = {
+            "next_data": lambda: self._faturas_next_data(cdc),
+            "api": lambda: self._faturas_api(cdc, digito, empresa),
+            "ssr": lambda: self._faturas_ssr(uc_data),
+        }
 
-        if build_id:
-            url_next = f"{self.base_url}/_next/data/{build_id}/faturas.json"
-            headers_next = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": f"{self.base_url}/faturas",
-                "Accept": "*/*"
-            }
+        for caminho in seletor_caminhos.ordem("listar_faturas", list(caminhos)):
+            inicio = time.monotonic()
+            try:
+                faturas = caminhos[caminho]()
+            except LimiteEnergisaExcedido:
+                # Recusa do limitador local não diz nada sobre a saúde da rota
+                raise
+            except Exception as e:
+                print(f"   ⚠️ Faturas via {caminho} falhou: {e}")
+                faturas = None
+            seletor_caminhos.registrar("listar_faturas", caminho, faturas is not None, time.monotonic() - inicio)
 
-            print(f"   📤 Consultando faturas via Next.js (UC {cdc})...")
-            resp = self.session.get(url_next, headers=headers_next)
+            if faturas is not None:
+                print(f"   ✅ Sucesso via {caminho}! {len(faturas)} faturas encontradas.")
+                return faturas
 
-            if resp.status_code == 200:
-                try:
-                    data = resp.json()
-                    if "pageProps" in data and "data" in data["pageProps"]:
-                        faturas = data["pageProps"]["data"].get("faturas", [])
-                        print(f"   ✅ Sucesso via Next.js! {len(faturas)} faturas encontradas.")
-                        return faturas
-                except:
-                    print("   ⚠️ Erro ao processar JSON do Next.js")
+        print(f"   ❌ Todas as tentativas falharam (UC {cdc}).")
+        return []
+
+    def _faturas_next_data(self, cdc: int):
+        """Faturas pela rota _next/data (cookies de contexto da UC já definidos)"""
+        headers_next = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Referer": f"{self.base_url}/faturas",
+            "Accept": "*/*"
+        }
 
-        # Fallback para API antiga
-        print("   ⚠️ Next.js falhou ou buildId não encontrado. Tentando API Legacy...")
+        print(f"   📤 Consultando faturas via Next.js (UC {cdc})...")
+        resp = self._get_next_data("faturas.json", headers=headers_next)
 
+        if resp is not None and resp.status_code == 200:
+            try:
+                data = resp.json()
+                if "pageProps" in data and "data" in data["pageProps"]:
+                    return data["pageProps"]["data"].get("faturas", [])
+            except ValueError:
+                print("   ⚠️ Erro ao processar JSON do Next.js")
+        return None
+
+    def _faturas_api(self, cdc: int, digito: int, empresa: int):
+        """Faturas pela API legacy ListarFaturasCliente"""
         url_api = f"{self.base_url}/api/clientes/Fatura/ListarFaturasCliente"
-        payload = self._get_tokens_payload()
-        payload.update({
-            "codigoEmpresaWeb": empresa,
-            "cdc": cdc,
-            "digitoVerificadorCdc": digito
-        })
 
         headers_api = {
             "Content-Type": "application/json",
@@ -514,11 +682,18 @@ class EnergisaService:
             "Origin": self.base_url
         }
 
-        resp = self.session.post(url_api, json=payload, headers=headers_api)
+        def _post():
+            payload = self._get_tokens_payload()
+            payload.update({
+                "codigoEmpresaWeb": empresa,
+                "cdc": cdc,
+                "digitoVerificadorCdc": digito
+            })
+            return self.session.post(url_api, json=payload, headers=headers_api)
 
-        if resp.status_code == 401:
-            if self._refresh_token():
-                return self.listar_faturas(uc_data)
+        resp = _post()
+        if resp.status_code == 401 and self._refresh_token():
+            resp = _post()
 
         if resp.status_code == 200:
             data = resp.json()
@@ -527,8 +702,24 @@ class EnergisaService:
             if isinstance(data, list):
                 return data
 
-        print(f"   ❌ Todas as tentativas falharam. Status API: {resp.status_code}")
-        return []
+        print(f"   ⚠️ API Legacy de faturas: status {resp.status_code}")
+        return None
+
+    def _faturas_ssr(self, uc_data: dict):
+        """
+        Faturas pela rota SSR; só vale se os itens tiverem o formato das
+        outras rotas (numeroFatura), senão conta como falha do caminho.
+        """
+        data = self.listar_faturas_ssr(uc_data)
+        if not isinstance(data, dict) or data.get("errored"):
+            return None
+
+        faturas = data.get("pageProps", {}).get("dadosServerSide", {}).get("dadosUsuario")
+        if isinstance(faturas, list) and faturas and all(
+            isinstance(f, dict) and "numeroFatura" in f for f in faturas
+        ):
+            return faturas
+        return None
 
     def _sincronizar_sessao_via_navegacao(self, uc_data: dict):
         """Simula o navegador entrando na página de faturas da UC específica."""
@@ -681,6 +872,9 @@ class EnergisaService:
 
     def get_gd_details(self, uc_data: dict):
         """Consulta histórico detalhado de créditos e geração."""
+        return self._em_cache("get_gd_details", uc_data, lambda: self._get_gd_details(uc_data))
+
+    def _get_gd_details(self, uc_data: dict):
         try:
             cdc = int(uc_data.get('cdc', 0))
             digito = int(uc_data.get('digitoVerificadorCdc', 0))
@@ -814,6 +1008,8 @@ class EnergisaService:
                     resp = self.session.post(url, json=payload, headers=headers)
 
             if resp.status_code == 200:
+                # GD e dados das UCs mudam com a alteração
+                resposta_cache.invalidar(self.cpf)
                 return resp.json()
             else:
                 print(f"   ❌ Erro Alteração Beneficiária: {resp.status_code} - {resp.text[:200]}")
@@ -923,12 +1119,9 @@ class EnergisaService:
 
     def get_login_options(self):
         """Busca as opções de contato (Telefone/Email) para o CPF informado."""
-        build_id = self._get_build_id()
-        if not build_id:
+        if not self._get_build_id():
             raise Exception("Não foi possível obter o BuildId da aplicação Energisa.")
 
-        url = f"{self.base_url}/_next/data/{build_id}/login/selecionar-numero.json"
-
         self.session.cookies.set("cpf", self.cpf)
 
         headers = self._get_headers(json_content=False)
@@ -940,7 +1133,7 @@ class EnergisaService:
         print(f"   📋 Buscando opções de login para CPF {self.cpf}...")
 
         try:
-            resp = self.session.get(url, headers=headers)
+            resp = self._get_next_data("login/selecionar-numero.json", headers=headers)
 
             if resp.status_code == 200:
                 data = resp.json()
@@ -966,12 +1159,9 @@ class EnergisaService:
             empresa = uc_data.get('codigoEmpresaWeb', 6)
             grupoleitura = uc_data.get('grupoLeitura', 'B')
 
-            build_id = self._get_build_id()
-            if not build_id:
+            if not self._get_build_id():
                 return {"errored": True, "message": "Não foi possível obter o Build ID"}
 
-            url = f"{self.base_url}/_next/data/{build_id}/login/login-faturas-ssr.json"
-
             self.session.cookies.set("NumeroUc", str(cdc))
             self.session.cookies.set("Digito", str(digito))
             self.session.cookies.set("CodigoEmpresaWeb", str(empresa))
@@ -992,7 +1182,7 @@ class EnergisaService:
 
             print(f"   🚀 [SSR] Buscando faturas (Novo GET): UC {cdc}")
 
-            resp = self.session.get(url, params=params, headers=headers)
+            resp = self._get_next_data("login/login-faturas-ssr.json", params=params, headers=headers)
 
             if resp.status_code == 200:
                 data = resp.json()
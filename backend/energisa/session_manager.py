@@ -2,10 +2,13 @@
 Session Manager - Gerenciamento de sessões da Energisa no banco de dados
 """
 
+import threading
 import time
 import logging
 from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, Optional, Tuple
 
+from backend.config import settings
 from backend.core.database import db_admin
 
 logger = logging.getLogger(__name__)
@@ -14,6 +17,109 @@ logger = logging.getLogger(__name__)
 MAX_SESSION_AGE_HOURS = 24
 
 
+class SessaoCache:
+    """
+    Cache em memória das sessões por CPF (write-through).
+
+    Cada entrada vale até a sessão completar MAX_SESSION_AGE_HOURS, limitada
+    a ttl_segundos para reler o banco (outro processo pode ter renovado ou
+    removido a sessão). CPFs sem sessão também ficam em cache (None);
+    save_session e delete_session atualizam a entrada na hora.
+
+    Os cookies entram e saem como cópia: cada EnergisaService muda os seus
+    (NumeroUc, tokens renovados) e não pode vazar isso para outra instância
+    do mesmo CPF nem para o cache.
+    """
+
+    def __init__(self, ttl_segundos: int = 300):
+        """
+        Args:
+            ttl_segundos: Tempo máximo sem reler o banco (0 desliga o cache)
+        """
+        self.ttl_segundos = ttl_segundos
+        self._lock = threading.Lock()
+        self._itens: Dict[str, Tuple[float, Optional[dict]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, cpf: str) -> Tuple[bool, Optional[dict]]:
+        """
+        Returns:
+            (encontrado, cookies) - cookies None = CPF sem sessão válida
+        """
+        with self._lock:
+            item = self._itens.get(cpf)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._itens[cpf]
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, dict(item[1]) if item[1] is not None else None
+
+    def guardar(self, cpf: str, cookies: Optional[dict], atualizado_em: Optional[datetime] = None):
+        """
+        Guarda a sessão (ou a ausência dela) do CPF.
+
+        Args:
+            cpf: CPF limpo
+            cookies: Cookies da sessão ou None
+            atualizado_em: Última gravação da sessão (define a expiração)
+        """
+        if self.ttl_segundos <= 0:
+            return
+
+        validade = self.ttl_segundos
+        if cookies is not None and atualizado_em is not None:
+            restante = (atualizado_em + timedelta(hours=MAX_SESSION_AGE_HOURS) - datetime.now(timezone.utc)).total_seconds()
+            validade = min(validade, restante)
+            if validade <= 0:
+                cookies = None
+                validade = self.ttl_segundos
+
+        with self._lock:
+            self._itens[cpf] = (time.monotonic() + validade, dict(cookies) if cookies is not None else None)
+
+    def invalidar(self, cpf: str):
+        with self._lock:
+            self._itens.pop(cpf, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def get_status(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "itens": len(self._itens),
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / total, 3) if total else None,
+        }
+
+
+# Instância global do cache de sessões
+sessao_cache = SessaoCache(ttl_segundos=settings.ENERGISA_SESSAO_CACHE_TTL_SEGUNDOS)
+
+
+def _ler_sessao(row: dict) -> Tuple[Optional[dict], Optional[datetime]]:
+    """
+    Cookies e data de atualização de uma linha de sessoes_energisa.
+
+    Returns:
+        (cookies, atualizado_em) - cookies None se a sessão expirou
+    """
+    atualizado_em = row.get("atualizado_em")
+    if not atualizado_em:
+        return row.get("cookies"), None
+
+    session_time = datetime.fromisoformat(atualizado_em.replace("Z", "+00:00"))
+    age = datetime.now(timezone.utc) - session_time
+    if age > timedelta(hours=MAX_SESSION_AGE_HOURS):
+        return None, session_time
+    return row.get("cookies"), session_time
+
+
 class SessionManager:
     @staticmethod
     def _clean_cpf(cpf: str) -> str:
@@ -21,41 +127,47 @@ class SessionManager:
         return cpf.replace(".", "").replace("-", "")
 
     @staticmethod
-    def save_session(cpf: str, cookies: dict):
+    def save_session(cpf: str, cookies: dict, storage_state: Optional[dict] = None):
         """
-        Salva sessão no banco de dados.
+        Salva sessão no banco de dados (e no cache do processo).
 
         Args:
             cpf: CPF do titular
             cookies: Dict com cookies da sessão
+            storage_state: Cookies + localStorage do navegador (login por SMS);
+                None mantém o estado já gravado
         """
         cpf_clean = SessionManager._clean_cpf(cpf)
 
         try:
             # Upsert - insere ou atualiza se já existir
+            agora = datetime.now(timezone.utc)
             data = {
                 "cpf": cpf_clean,
                 "cookies": cookies,
-                "atualizado_em": datetime.now(timezone.utc).isoformat()
+                "atualizado_em": agora.isoformat(),
+                "renovacao_falhas": 0
             }
+            if storage_state is not None:
+                data["storage_state"] = storage_state
 
             db_admin.table("sessoes_energisa").upsert(
                 data,
                 on_conflict="cpf"
             ).execute()
 
+            sessao_cache.guardar(cpf_clean, cookies, agora)
             logger.info(f"💾 Sessão salva no banco para CPF: {cpf_clean[:3]}***")
-            print(f"💾 Sessão salva no banco para CPF: {cpf_clean[:3]}***")
 
         except Exception as e:
+            sessao_cache.invalidar(cpf_clean)
             logger.error(f"❌ Erro ao salvar sessão no banco: {e}")
-            print(f"❌ Erro ao salvar sessão no banco: {e}")
             raise
 
     @staticmethod
     def load_session(cpf: str):
         """
-        Carrega sessão do banco de dados.
+        Carrega sessão do cache do processo ou do banco de dados.
 
         Args:
             cpf: CPF do titular
@@ -65,47 +177,95 @@ class SessionManager:
         """
         cpf_clean = SessionManager._clean_cpf(cpf)
 
+        encontrado, cookies = sessao_cache.obter(cpf_clean)
+        if encontrado:
+            return cookies
+
         try:
             result = db_admin.table("sessoes_energisa").select(
                 "cookies, atualizado_em"
             ).eq("cpf", cpf_clean).execute()
 
             if not result.data:
-                logger.warning(f"⚠️ Sessão não encontrada no banco para CPF: {cpf_clean[:3]}***")
-                print(f"⚠️ Sessão não encontrada no banco para CPF: {cpf_clean[:3]}***")
+                logger.debug(f"⚠️ Sessão não encontrada no banco para CPF: {cpf_clean[:3]}***")
+                sessao_cache.guardar(cpf_clean, None)
                 return None
 
-            session_data = result.data[0]
-            atualizado_em = session_data.get("atualizado_em")
+            cookies, atualizado_em = _ler_sessao(result.data[0])
+            if cookies is None:
+                logger.debug(f"❌ Sessão expirada para CPF {cpf_clean[:3]}***")
+
+            sessao_cache.guardar(cpf_clean, cookies, atualizado_em)
+            return cookies
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar sessão do banco: {e}")
+            return None
+
+    @staticmethod
+    def load_storage_state(cpf: str) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        Cookies e storage state gravados, mesmo de sessão expirada (renovação).
+
+        Args:
+            cpf: CPF do titular
+
+        Returns:
+            (cookies, storage_state) ou (None, None) se não houver sessão
+        """
+        cpf_clean = SessionManager._clean_cpf(cpf)
+
+        try:
+            result = db_admin.table("sessoes_energisa").select(
+                "cookies, storage_state"
+            ).eq("cpf", cpf_clean).execute()
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar estado do navegador: {e}")
+            return None, None
 
-            # Verifica idade da sessão
-            if atualizado_em:
-                session_time = datetime.fromisoformat(atualizado_em.replace("Z", "+00:00"))
-                now = datetime.now(timezone.utc)
-                age = now - session_time
-                max_age = timedelta(hours=MAX_SESSION_AGE_HOURS)
+        if not result.data:
+            return None, None
+        return result.data[0].get("cookies"), result.data[0].get("storage_state")
 
-                logger.info(f"🔍 Verificando sessão para CPF {cpf_clean[:3]}***:")
-                logger.info(f"   📅 Atualizada em: {session_time.isoformat()}")
-                logger.info(f"   ⏱️ Idade: {age.total_seconds():.0f}s (Máx: {max_age.total_seconds():.0f}s)")
+    @staticmethod
+    def load_sessions(cpfs: Iterable[str]) -> Dict[str, dict]:
+        """
+        Carrega as sessões de vários CPFs em uma única consulta.
 
-                print(f"🔍 Verificando sessão para CPF {cpf_clean[:3]}***:")
-                print(f"   📅 Atualizada em: {session_time.isoformat()}")
-                print(f"   ⏱️ Idade: {age.total_seconds():.0f}s (Máx: {max_age.total_seconds():.0f}s)")
+        Usado no início da sincronização: os load_session seguintes desses
+        CPFs (inclusive os sem sessão) saem do cache.
 
-                if age > max_age:
-                    logger.warning("   ❌ Sessão expirada!")
-                    print("   ❌ Sessão expirada!")
-                    return None
+        Args:
+            cpfs: CPFs dos titulares
 
-            logger.info("   ✅ Sessão válida.")
-            print("   ✅ Sessão válida.")
-            return session_data.get("cookies")
+        Returns:
+            Dict CPF limpo -> cookies, só com as sessões válidas
+        """
+        cpfs_clean = list({SessionManager._clean_cpf(cpf) for cpf in cpfs})
+        if not cpfs_clean:
+            return {}
 
+        try:
+            result = db_admin.table("sessoes_energisa").select(
+                "cpf, cookies, atualizado_em"
+            ).in_("cpf", cpfs_clean).execute()
         except Exception as e:
-            logger.error(f"❌ Erro ao carregar sessão do banco: {e}")
-            print(f"❌ Erro ao carregar sessão do banco: {e}")
-            return None
+            logger.error(f"❌ Erro ao carregar sessões do banco: {e}")
+            return {}
+
+        sessoes = {}
+        for row in result.data or []:
+            cookies, atualizado_em = _ler_sessao(row)
+            sessao_cache.guardar(row["cpf"], cookies, atualizado_em)
+            if cookies is not None:
+                sessoes[row["cpf"]] = cookies
+
+        for cpf_clean in cpfs_clean:
+            if cpf_clean not in sessoes:
+                sessao_cache.guardar(cpf_clean, None)
+
+        logger.info(f"🔑 {len(sessoes)}/{len(cpfs_clean)} CPFs com sessão ativa")
+        return sessoes
 
     @staticmethod
     def delete_session(cpf: str):
@@ -122,12 +282,12 @@ class SessionManager:
                 "cpf", cpf_clean
             ).execute()
 
+            sessao_cache.guardar(cpf_clean, None)
             logger.info(f"🗑️ Sessão removida do banco para CPF: {cpf_clean[:3]}***")
-            print(f"🗑️ Sessão removida do banco para CPF: {cpf_clean[:3]}***")
 
         except Exception as e:
+            sessao_cache.invalidar(cpf_clean)
             logger.error(f"❌ Erro ao remover sessão do banco: {e}")
-            print(f"❌ Erro ao remover sessão do banco: {e}")
 
     @staticmethod
     def session_exists(cpf: str) -> bool:
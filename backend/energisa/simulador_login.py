@@ -0,0 +1,301 @@
+"""
+Energisa Simulador de Login - Portal local que imita login -> telefone -> código SMS
+Usado no benchmark do login por Playwright sem acessar a Energisa
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Sequence, Tuple
+from urllib.parse import urlparse
+
+from backend.config import settings
+
+
+BUILD_ID = "simulador-build"
+
+# Imagem/fonte servidas pelo simulador: só existem para medir o bloqueio de recursos
+TAMANHO_RECURSO_BYTES = 200_000
+
+
+# Mesmos textos e seletores que _login_worker_thread e EnergisaService.start_login procuram:
+# input[name="cpf"], button "ENTRAR", texto "telefone/contato", label com o final do
+# número, button "AVANÇAR", input[type="tel"] do código e redirecionamento para /listagem-ucs
+PAGINA_LOGIN = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Energisa - Login (simulador)</title>
+<link rel="stylesheet" href="/static/estilo.css">
+</head>
+<body>
+<img src="/static/banner.jpg" alt="">
+<div id="app">
+  <h1>Acesse sua conta</h1>
+  <input name="cpf" id="cpf" placeholder="CPF" inputmode="numeric" maxlength="14">
+  <button id="entrar">ENTRAR</button>
+</div>
+<script>
+const CONFIG = __CONFIG__;
+const dormir = (ms) => new Promise((r) => setTimeout(r, ms));
+const app = document.getElementById("app");
+
+// Sensor do Akamai: cookie inválido até o "desafio" terminar
+document.cookie = "_abck=simulador~-1~0; path=/";
+setTimeout(() => { document.cookie = "_abck=simulador~0~1; path=/"; }, CONFIG.atraso_akamai_ms);
+
+async function postar(caminho, corpo) {
+  const resp = await fetch(caminho, {
+    method: "POST",
+    headers: {"Content-Type": "application/json"},
+    body: JSON.stringify(corpo || {})
+  });
+  return resp.json();
+}
+
+function telaCodigo() {
+  app.innerHTML = `
+    <h1>Verificação</h1>
+    <p>Digite o código enviado por SMS</p>
+    <input type="tel" id="codigo" maxlength="6">
+    <button id="validar">AVANÇAR</button>`;
+  document.getElementById("validar").onclick = async () => {
+    const codigo = document.getElementById("codigo").value;
+    const tokens = await postar("/api/simulador/validar-sms", {codigo});
+    localStorage.setItem("accessTokenEnergisa", tokens.accessTokenEnergisa);
+    localStorage.setItem("rtk", tokens.rtk);
+    localStorage.setItem("udk", tokens.udk);
+    location.href = "/listagem-ucs";
+  };
+}
+
+function telaTelefones(telefones) {
+  history.pushState({}, "", "/login/selecionar-numero");
+  const opcoes = telefones.map((t, i) => `
+    <label><input type="radio" name="telefone" value="${i}"> ${t.celular}</label>`).join("");
+  app.innerHTML = `
+    <h1>Selecione um telefone para contato</h1>
+    <p>Enviaremos um código por SMS</p>
+    ${opcoes}
+    <button id="avancar">AVANÇAR</button>`;
+  document.getElementById("avancar").onclick = async () => {
+    await postar("/api/simulador/enviar-sms");
+    telaCodigo();
+  };
+}
+
+document.getElementById("entrar").onclick = async () => {
+  const cpf = document.getElementById("cpf").value;
+  const resp = await fetch(`/_next/data/${CONFIG.build_id}/login/selecionar-numero.json?doc=${cpf}`);
+  const dados = await resp.json();
+  telaTelefones(dados.pageProps.data.listaTelefone);
+};
+</script>
+</body>
+</html>
+"""
+
+PAGINA_UCS = """<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Energisa - Unidades</title></head>
+<body><h1>Minhas unidades</h1></body></html>
+"""
+
+ESTILO = "body { font-family: Simulador, sans-serif; } " \
+         "@font-face { font-family: Simulador; src: url(/static/fonte.woff2); }"
+
+
+class SimuladorLogin:
+    """
+    Servidor HTTP local com o fluxo de login por SMS da Energisa.
+
+    Cada etapa tem um atraso configurável (ms), para aproximar os tempos do
+    portal real:
+
+    - atraso_pagina_ms: HTML da página de login
+    - atraso_akamai_ms: até o cookie _abck ficar válido (~0~)
+    - atraso_telefones_ms: JSON selecionar-numero.json
+    - atraso_sms_ms: envio do SMS (AVANÇAR na tela de telefones)
+    - atraso_validacao_ms: validação do código
+    - atraso_recursos_ms: cada imagem/fonte (bloqueadas pelo login_perfil)
+    """
+
+    def __init__(
+        self,
+        atraso_pagina_ms: int = 300,
+        atraso_akamai_ms: int = 1500,
+        atraso_telefones_ms: int = 800,
+        atraso_sms_ms: int = 600,
+        atraso_validacao_ms: int = 500,
+        atraso_recursos_ms: int = 400,
+        telefones: Sequence[str] = ("1234", "5678")
+    ):
+        """
+        Args:
+            telefones: Finais (4 dígitos) dos celulares listados para o CPF
+        """
+        self.atraso_pagina_ms = atraso_pagina_ms
+        self.atraso_akamai_ms = atraso_akamai_ms
+        self.atraso_telefones_ms = atraso_telefones_ms
+        self.atraso_sms_ms = atraso_sms_ms
+        self.atraso_validacao_ms = atraso_validacao_ms
+        self.atraso_recursos_ms = atraso_recursos_ms
+        self.telefones = list(telefones)
+
+        self._lock = threading.Lock()
+        self._servidor = None
+        self._thread = None
+        self.requisicoes: Counter = Counter()
+
+    # ========================
+    # Respostas
+    # ========================
+
+    def _contar(self, tipo: str):
+        with self._lock:
+            self.requisicoes[tipo] += 1
+
+    def _pagina_login(self) -> str:
+        config = {"atraso_akamai_ms": self.atraso_akamai_ms, "build_id": BUILD_ID}
+        return PAGINA_LOGIN.replace("__CONFIG__", json.dumps(config))
+
+    def _telefones(self) -> dict:
+        """Mesmo formato do pageProps da Energisa"""
+        lista = [
+            {"celular": f"(**) *****-{final}", "cdc": 0, "posicao": posicao}
+            for posicao, final in enumerate(self.telefones, start=1)
+        ]
+        return {"pageProps": {"data": {"listaTelefone": lista, "dadosUsuario": {}}}, "__N_SSP": True}
+
+    def _tokens(self) -> dict:
+        sufixo = f"{time.time_ns()}"
+        return {
+            "accessTokenEnergisa": f"simulador-access-{sufixo}",
+            "rtk": f"simulador-rtk-{sufixo}",
+            "udk": f"simulador-udk-{sufixo}",
+        }
+
+    def responder(self, metodo: str, caminho: str) -> Tuple[int, str, bytes, float]:
+        """
+        Resposta de uma requisição.
+
+        Args:
+            metodo: GET ou POST
+            caminho: Path da URL (sem query string)
+
+        Returns:
+            (status, content-type, corpo, atraso em segundos)
+        """
+        if metodo == "GET" and caminho == "/login":
+            self._contar("pagina")
+            return 200, "text/html; charset=utf-8", self._pagina_login().encode(), self.atraso_pagina_ms / 1000
+
+        if metodo == "GET" and caminho == f"/_next/data/{BUILD_ID}/login/selecionar-numero.json":
+            self._contar("telefones")
+            corpo = json.dumps(self._telefones()).encode()
+            return 200, "application/json", corpo, self.atraso_telefones_ms / 1000
+
+        if metodo == "POST" and caminho == "/api/simulador/enviar-sms":
+            self._contar("enviar_sms")
+            return 200, "application/json", b'{"sucesso": true}', self.atraso_sms_ms / 1000
+
+        if metodo == "POST" and caminho == "/api/simulador/validar-sms":
+            self._contar("validar_sms")
+            corpo = json.dumps(self._tokens()).encode()
+            return 200, "application/json", corpo, self.atraso_validacao_ms / 1000
+
+        if metodo == "GET" and caminho == "/listagem-ucs":
+            self._contar("listagem_ucs")
+            return 200, "text/html; charset=utf-8", PAGINA_UCS.encode(), 0
+
+        if metodo == "GET" and caminho == "/static/estilo.css":
+            self._contar("estilo")
+            return 200, "text/css", ESTILO.encode(), 0
+
+        if metodo == "GET" and caminho in ("/static/banner.jpg", "/static/fonte.woff2"):
+            self._contar("recurso")
+            tipo = "image/jpeg" if caminho.endswith(".jpg") else "font/woff2"
+            return 200, tipo, b"\0" * TAMANHO_RECURSO_BYTES, self.atraso_recursos_ms / 1000
+
+        self._contar("nao_encontrado")
+        return 404, "text/plain", b"not found", 0
+
+    # ========================
+    # Servidor
+    # ========================
+
+    def _handler(self):
+        simulador = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _atender(self, metodo: str):
+                if metodo == "POST":
+                    self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+                status, tipo, corpo, atraso = simulador.responder(metodo, urlparse(self.path).path)
+                if atraso:
+                    time.sleep(atraso)
+
+                self.send_response(status)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                self._atender("GET")
+
+            def do_POST(self):
+                self._atender("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self, porta: int = 0) -> "SimuladorLogin":
+        """
+        Sobe o servidor em uma thread de background.
+
+        Args:
+            porta: Porta local (0 = livre)
+        """
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", porta), self._handler())
+        self._servidor.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._servidor.serve_forever, name="energisa-simulador-login", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def parar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+
+@contextmanager
+def usar_simulador(simulador: SimuladorLogin):
+    """
+    Sobe o simulador e aponta ENERGISA_LOGIN_URL para ele dentro do bloco.
+
+    Args:
+        simulador: SimuladorLogin configurado (ainda não iniciado)
+    """
+    anterior = settings.ENERGISA_LOGIN_URL
+    simulador.iniciar()
+    settings.ENERGISA_LOGIN_URL = f"{simulador.url}/login"
+    try:
+        yield simulador
+    finally:
+        settings.ENERGISA_LOGIN_URL = anterior
+        simulador.parar()
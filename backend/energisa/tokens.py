@@ -0,0 +1,101 @@
+"""
+Energisa Tokens - Expiração do access token e refresh coalescido por CPF
+Evita refresh desnecessário (token ainda válido) e refreshes concorrentes do mesmo CPF
+"""
+
+import base64
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# Refresh concluído há menos que isso é reaproveitado por quem chega depois
+# (ex: várias requisições que receberam 401 com o token antigo)
+JANELA_COALESCER_SEGUNDOS = 2.0
+
+
+def expiracao_jwt(token: Optional[str]) -> Optional[float]:
+    """
+    Lê o claim exp de um JWT (sem validar assinatura).
+
+    Args:
+        token: Access token (utk / accessTokenEnergisa)
+
+    Returns:
+        Expiração em epoch (segundos) ou None se o token não for um JWT com exp
+    """
+    if not token or token.count(".") != 2:
+        return None
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except (ValueError, TypeError, json.JSONDecodeError):
+        return None
+
+
+class RefreshCoordenador:
+    """
+    Single-flight de refresh por CPF (compartilhado pelo processo).
+
+    Chamadores concorrentes do mesmo CPF esperam o refresh em andamento e
+    reaproveitam o resultado (cookies novos) em vez de disparar outro
+    refresh, que invalidaria o token recém-emitido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks_cpf: Dict[str, threading.Lock] = {}
+        # cpf -> (monotonic de conclusão, sucesso, cookies após o refresh)
+        self._ultimo: Dict[str, Tuple[float, bool, Optional[dict]]] = {}
+        self.refreshes = 0
+        self.coalescidos = 0
+
+    def _lock_do_cpf(self, cpf: str) -> threading.Lock:
+        with self._lock:
+            lock = self._locks_cpf.get(cpf)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks_cpf[cpf] = lock
+            return lock
+
+    def ultimo_refresh(self, cpf: str) -> Optional[float]:
+        """Momento (monotonic) do último refresh bem-sucedido do CPF neste processo"""
+        ultimo = self._ultimo.get(cpf)
+        return ultimo[0] if ultimo and ultimo[1] else None
+
+    def executar(self, cpf: str, refresh: Callable[[], Tuple[bool, Optional[dict]]]) -> Tuple[bool, Optional[dict]]:
+        """
+        Executa o refresh ou reaproveita um concluído durante a espera.
+
+        Args:
+            cpf: CPF da sessão
+            refresh: Função que faz o refresh e retorna (sucesso, cookies)
+
+        Returns:
+            (sucesso, cookies atualizados)
+        """
+        chegada = time.monotonic()
+        with self._lock_do_cpf(cpf):
+            ultimo = self._ultimo.get(cpf)
+            if ultimo and ultimo[0] >= chegada - JANELA_COALESCER_SEGUNDOS:
+                self.coalescidos += 1
+                return ultimo[1], ultimo[2]
+
+            sucesso, cookies = refresh()
+            self.refreshes += 1
+            self._ultimo[cpf] = (time.monotonic(), sucesso, dict(cookies) if cookies else None)
+            return sucesso, cookies
+
+    def get_status(self) -> dict:
+        """Contadores de refresh executados e coalescidos"""
+        return {
+            "refreshes": self.refreshes,
+            "coalescidos": self.coalescidos,
+            "cpfs": len(self._locks_cpf),
+        }
+
+
+# Instância global do coordenador
+refresh_coordenador = RefreshCoordenador()
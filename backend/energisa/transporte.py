@@ -0,0 +1,60 @@
+"""
+Energisa Transporte - Pool de conexões HTTP compartilhado pelo processo
+Cada EnergisaService mantém sua própria Session (cookies isolados por CPF),
+mas todas usam o mesmo adapter, reaproveitando conexões TCP/TLS keep-alive
+"""
+
+import threading
+from typing import Optional
+
+from requests.adapters import HTTPAdapter
+
+from backend.config import settings
+
+_adapter: Optional[HTTPAdapter] = None
+_lock = threading.Lock()
+
+
+def adapter_compartilhado() -> HTTPAdapter:
+    """
+    Retorna (criando na primeira chamada) o adapter compartilhado.
+
+    O PoolManager do urllib3 é thread-safe: instâncias em threads
+    diferentes (asyncio.to_thread, endpoints síncronos do FastAPI) pegam e
+    devolvem conexões do mesmo pool.
+
+    Returns:
+        HTTPAdapter com pool de conexões para servicos.energisa.com.br
+    """
+    global _adapter
+    if _adapter is None:
+        with _lock:
+            if _adapter is None:
+                _adapter = HTTPAdapter(
+                    pool_connections=settings.ENERGISA_HTTP_POOL_HOSTS,
+                    pool_maxsize=settings.ENERGISA_HTTP_POOL_MAXSIZE,
+                    pool_block=False
+                )
+    return _adapter
+
+
+def get_status() -> dict:
+    """Conexões ociosas disponíveis por host no pool compartilhado"""
+    if _adapter is None:
+        return {"iniciado": False}
+
+    hosts = {}
+    for chave in list(_adapter.poolmanager.pools.keys()):
+        pool = _adapter.poolmanager.pools.get(chave)
+        if pool is not None:
+            hosts[f"{chave.key_scheme}://{chave.key_host}"] = {
+                "conexoes_ociosas": pool.pool.qsize() if pool.pool else 0,
+                "conexoes_abertas": pool.num_connections,
+                "requisicoes": pool.num_requests,
+            }
+
+    return {
+        "iniciado": True,
+        "pool_maxsize": settings.ENERGISA_HTTP_POOL_MAXSIZE,
+        "hosts": hosts,
+    }
@@ -0,0 +1,336 @@
+"""
+Faturas Blob Store - PDFs das faturas endereçados pelo conteúdo (SHA-256)
+A linha de faturas guarda só hash, tamanho e mime; PDFs iguais ocupam um blob
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+import requests
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+PDF_MIME = "application/pdf"
+
+# Bytes por parte na leitura em streaming
+TAMANHO_PARTE = 64 * 1024
+
+# Filtro or_ das faturas com PDF: no blob store ou ainda em pdf_base64 (antes do migrar_pdfs)
+FILTRO_COM_PDF = "pdf_sha256.not.is.null,pdf_base64.not.is.null"
+
+
+class BlobNaoEncontrado(Exception):
+    """Nenhum blob com o hash pedido"""
+
+
+class BlobStore:
+    """
+    Armazenamento imutável de blobs pelo SHA-256 do conteúdo.
+
+    - A chave é o próprio hash, então gravar o mesmo PDF de novo não ocupa
+      espaço nem faz upload (deduplicação)
+    - Blobs nunca são sobrescritos: um hash sempre devolve o mesmo conteúdo
+    - Subclasses implementam _existe, _gravar, _ler e _ler_partes
+    - compartilhado indica se todos os serviços (API e sync-worker) enxergam
+      os mesmos blobs; sem isso, um PDF gravado pelo worker some para a API
+    """
+
+    nome = "base"
+    compartilhado = False
+
+    def __init__(self):
+        self.gravados = 0
+        self.deduplicados = 0
+
+    @staticmethod
+    def calcular_hash(dados: bytes) -> str:
+        """SHA-256 hexadecimal do conteúdo"""
+        return hashlib.sha256(dados).hexdigest()
+
+    @staticmethod
+    def chave(sha256: str) -> str:
+        """Caminho do blob, com dois níveis de prefixo para não lotar um diretório"""
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def _existe(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    def _gravar(self, sha256: str, dados: bytes, mime: str) -> bool:
+        """Grava o blob; False se ele já existia"""
+        raise NotImplementedError
+
+    def _ler(self, sha256: str) -> bytes:
+        raise NotImplementedError
+
+    def _ler_partes(self, sha256: str, inicio: int, fim: Optional[int], tamanho_parte: int) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    def guardar(self, dados: bytes, mime: str = PDF_MIME) -> str:
+        """
+        Grava o conteúdo (se ainda não existir).
+
+        Args:
+            dados: Conteúdo do blob
+            mime: Tipo do conteúdo
+
+        Returns:
+            SHA-256 do conteúdo
+        """
+        sha256 = self.calcular_hash(dados)
+        if self._existe(sha256) or not self._gravar(sha256, dados, mime):
+            self.deduplicados += 1
+        else:
+            self.gravados += 1
+        return sha256
+
+    def guardar_pdf(self, pdf_bytes: bytes) -> dict:
+        """
+        Grava um PDF e monta as colunas que a fatura guarda.
+
+        Args:
+            pdf_bytes: Conteúdo do PDF
+
+        Returns:
+            Dict com pdf_sha256, pdf_tamanho e pdf_mime
+        """
+        return {
+            "pdf_sha256": self.guardar(pdf_bytes, PDF_MIME),
+            "pdf_tamanho": len(pdf_bytes),
+            "pdf_mime": PDF_MIME
+        }
+
+    def ler(self, sha256: str) -> bytes:
+        """
+        Lê o conteúdo de um blob.
+
+        Args:
+            sha256: Hash do conteúdo
+
+        Returns:
+            Bytes do blob
+
+        Raises:
+            BlobNaoEncontrado: Hash sem blob gravado
+        """
+        return self._ler(sha256)
+
+    def conferir(self, sha256: str) -> bool:
+        """
+        Relê o blob e confere o hash do conteúdo.
+
+        Args:
+            sha256: Hash esperado
+
+        Returns:
+            True se o blob existe e o conteúdo bate com o hash
+        """
+        try:
+            return self.calcular_hash(self._ler(sha256)) == sha256
+        except BlobNaoEncontrado:
+            return False
+
+    def ler_partes(
+        self,
+        sha256: str,
+        inicio: int = 0,
+        fim: Optional[int] = None,
+        tamanho_parte: int = TAMANHO_PARTE
+    ) -> Iterator[bytes]:
+        """
+        Lê um blob (ou um intervalo dele) em partes, sem carregá-lo inteiro.
+
+        Args:
+            sha256: Hash do conteúdo
+            inicio: Primeiro byte
+            fim: Último byte, inclusivo (None = até o fim)
+            tamanho_parte: Bytes por parte
+
+        Returns:
+            Iterador de partes
+
+        Raises:
+            BlobNaoEncontrado: Hash sem blob gravado (na primeira parte)
+        """
+        return self._ler_partes(sha256, inicio, fim, tamanho_parte)
+
+    def get_status(self) -> dict:
+        """Backend e contadores deste processo"""
+        return {
+            "backend": self.nome,
+            "compartilhado": self.compartilhado,
+            "gravados": self.gravados,
+            "deduplicados": self.deduplicados
+        }
+
+
+class BlobStoreLocal(BlobStore):
+    """
+    Blobs em um diretório local (desenvolvimento ou volume persistente).
+
+    Em produção o diretório precisa ser um volume montado no mesmo caminho
+    em todos os serviços (PDF_BLOB_COMPARTILHADO=true); senão use o backend
+    supabase.
+
+    Args:
+        diretorio: Raiz dos blobs
+        compartilhado: True se o diretório é visto por todos os serviços
+    """
+
+    nome = "local"
+
+    def __init__(self, diretorio: str, compartilhado: bool = False):
+        super().__init__()
+        self.diretorio = Path(diretorio)
+        self.compartilhado = compartilhado
+
+    def _caminho(self, sha256: str) -> Path:
+        return self.diretorio / self.chave(sha256)
+
+    def _existe(self, sha256: str) -> bool:
+        return self._caminho(sha256).exists()
+
+    def _gravar(self, sha256: str, dados: bytes, mime: str) -> bool:
+        caminho = self._caminho(sha256)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+
+        # Arquivo temporário + rename: quem lê nunca vê um PDF pela metade
+        fd, temporario = tempfile.mkstemp(dir=caminho.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as arquivo:
+                arquivo.write(dados)
+            os.replace(temporario, caminho)
+        except Exception:
+            if os.path.exists(temporario):
+                os.unlink(temporario)
+            raise
+        return True
+
+    def _ler(self, sha256: str) -> bytes:
+        try:
+            return self._caminho(sha256).read_bytes()
+        except FileNotFoundError:
+            raise BlobNaoEncontrado(sha256)
+
+    def _ler_partes(self, sha256: str, inicio: int, fim: Optional[int], tamanho_parte: int) -> Iterator[bytes]:
+        try:
+            arquivo = open(self._caminho(sha256), "rb")
+        except FileNotFoundError:
+            raise BlobNaoEncontrado(sha256)
+
+        with arquivo:
+            arquivo.seek(inicio)
+            restante = None if fim is None else fim - inicio + 1
+            while restante is None or restante > 0:
+                parte = arquivo.read(tamanho_parte if restante is None else min(tamanho_parte, restante))
+                if not parte:
+                    break
+                if restante is not None:
+                    restante -= len(parte)
+                yield parte
+
+
+class BlobStoreSupabase(BlobStore):
+    """
+    Blobs em um bucket privado do Supabase Storage.
+
+    Args:
+        bucket: Nome do bucket
+    """
+
+    nome = "supabase"
+    compartilhado = True
+
+    def __init__(self, bucket: str):
+        super().__init__()
+        from backend.core.database import SupabaseClient
+
+        self.bucket = bucket
+        self.db = SupabaseClient(admin=True)
+
+    def _arquivos(self):
+        return self.db.storage.from_(self.bucket)
+
+    def _existe(self, sha256: str) -> bool:
+        # Sem consulta prévia: o upload recusa chave repetida
+        return False
+
+    def _gravar(self, sha256: str, dados: bytes, mime: str) -> bool:
+        try:
+            self._arquivos().upload(self.chave(sha256), dados, {"content-type": mime})
+        except Exception as e:
+            if "Duplicate" in str(e) or "already exists" in str(e) or "409" in str(e):
+                return False
+            raise
+        return True
+
+    def _ler(self, sha256: str) -> bytes:
+        try:
+            return self._arquivos().download(self.chave(sha256))
+        except Exception as e:
+            if "not found" in str(e).lower() or "404" in str(e):
+                raise BlobNaoEncontrado(sha256)
+            raise
+
+    def _ler_partes(self, sha256: str, inicio: int, fim: Optional[int], tamanho_parte: int) -> Iterator[bytes]:
+        # URL assinada curta + Range: o Storage devolve só o intervalo, em stream
+        try:
+            assinada = self._arquivos().create_signed_url(self.chave(sha256), 60)
+        except Exception as e:
+            if "not found" in str(e).lower() or "404" in str(e):
+                raise BlobNaoEncontrado(sha256)
+            raise
+
+        url = assinada.get("signedURL") or assinada.get("signedUrl")
+        cabecalhos = {"Range": f"bytes={inicio}-{'' if fim is None else fim}"}
+        with requests.get(url, headers=cabecalhos, stream=True, timeout=30) as resp:
+            if resp.status_code == 404:
+                raise BlobNaoEncontrado(sha256)
+            resp.raise_for_status()
+
+            partes = resp.iter_content(tamanho_parte)
+            parcial = inicio > 0 or fim is not None
+            if resp.status_code != 206 and parcial:
+                # Storage ignorou o Range e mandou o arquivo inteiro: corta aqui
+                logger.warning(f"⚠️ Storage respondeu {resp.status_code} a um Range ({sha256[:12]}), recortando o intervalo")
+                partes = self._recortar(partes, inicio, fim)
+            yield from partes
+
+    @staticmethod
+    def _recortar(partes: Iterator[bytes], inicio: int, fim: Optional[int]) -> Iterator[bytes]:
+        """Recorta [inicio, fim] de um stream que começa no byte 0"""
+        posicao = 0
+        for parte in partes:
+            comeco, final = posicao, posicao + len(parte)
+            posicao = final
+            if final <= inicio:
+                continue
+            corte_inicio = max(inicio - comeco, 0)
+            corte_fim = len(parte) if fim is None else min(fim + 1 - comeco, len(parte))
+            if corte_fim > corte_inicio:
+                yield parte[corte_inicio:corte_fim]
+            if fim is not None and final > fim:
+                break
+
+
+def criar_blob_store() -> BlobStore:
+    """Blob store configurado em PDF_BLOB_BACKEND ("local" ou "supabase")"""
+    if settings.PDF_BLOB_BACKEND == "supabase":
+        return BlobStoreSupabase(settings.PDF_BLOB_BUCKET)
+    if settings.ENVIRONMENT == "production" and not settings.PDF_BLOB_COMPARTILHADO:
+        logger.warning(
+            f"⚠️ PDFs em diretório local não compartilhado ({settings.PDF_BLOB_DIRETORIO}): "
+            f"PDFs baixados pelo sync-worker não ficam visíveis para a API. "
+            f"Monte um volume comum e defina PDF_BLOB_COMPARTILHADO=true, ou use PDF_BLOB_BACKEND=supabase"
+        )
+    return BlobStoreLocal(settings.PDF_BLOB_DIRETORIO, compartilhado=settings.PDF_BLOB_COMPARTILHADO)
+
+
+# Instância global do blob store
+blob_store = criar_blob_store()
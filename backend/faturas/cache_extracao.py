@@ -0,0 +1,169 @@
+"""
+Faturas Cache de Extração - Resultado da extração endereçado pelo PDF
+O mesmo PDF (SHA-256), com as mesmas versões de extrator e prompt, nunca
+volta ao LLMWhisperer nem ao OpenAI: o resultado sai da tabela extracao_cache
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from backend.config import settings
+from backend.core.database import SupabaseClient
+
+logger = logging.getLogger(__name__)
+
+
+# Caracteres por token (aproximação para texto em português)
+CARACTERES_POR_TOKEN = 4
+
+
+def estimar_custo_usd(texto: str, dados: dict) -> float:
+    """
+    Estima quanto custou extrair uma fatura (LLMWhisperer + OpenAI).
+
+    Args:
+        texto: Texto devolvido pelo LLMWhisperer
+        dados: JSON devolvido pelo OpenAI
+
+    Returns:
+        Custo estimado em dólares
+    """
+    from backend.faturas.llm_extractor import SEPARADOR_PAGINA, OpenAIParser
+
+    paginas = texto.count(SEPARADOR_PAGINA) + 1
+    tokens_entrada = len(OpenAIParser._criar_prompt(texto)) / CARACTERES_POR_TOKEN
+    tokens_saida = len(json.dumps(dados, ensure_ascii=False)) / CARACTERES_POR_TOKEN
+
+    return round(
+        paginas * settings.EXTRACAO_CUSTO_LLMWHISPERER_PAGINA_USD
+        + tokens_entrada * settings.EXTRACAO_CUSTO_OPENAI_ENTRADA_USD / 1_000_000
+        + tokens_saida * settings.EXTRACAO_CUSTO_OPENAI_SAIDA_USD / 1_000_000,
+        6
+    )
+
+
+class CacheExtracao:
+    """
+    Cache persistente dos resultados de extração.
+
+    - Chave: (pdf_sha256, versao_extrator, versao_prompt); trocar o modo do
+      LLMWhisperer ou editar um prompt gera chaves novas, sem limpar nada
+    - Só entram resultados com os dados críticos preenchidos
+    - Resultados do parser IA (fallback) não entram: dependem de provedor e
+      modelo, que não fazem parte da chave
+    - Cada acerto soma o custo evitado (estimado na gravação)
+    """
+
+    def __init__(self, ativo: bool = True):
+        """
+        Args:
+            ativo: False desliga leitura e gravação
+        """
+        self.db = SupabaseClient(admin=True)
+        self.ativo = ativo
+        self.acertos = 0
+        self.faltas = 0
+        self.economizado_usd = 0.0
+
+    @staticmethod
+    def versoes() -> Tuple[str, str]:
+        """Versões atuais (extrator, prompt)"""
+        from backend.faturas.llm_extractor import VERSAO_EXTRATOR, versao_prompt
+
+        return VERSAO_EXTRATOR, versao_prompt()
+
+    def obter(self, pdf_sha256: str) -> Optional[dict]:
+        """
+        Busca o resultado já extraído deste PDF.
+
+        Args:
+            pdf_sha256: Hash do PDF
+
+        Returns:
+            Registro com texto, dados e custo_usd, ou None
+        """
+        if not self.ativo:
+            return None
+
+        versao_extrator, versao_prompt = self.versoes()
+        result = self.db.table("extracao_cache").select("*").eq(
+            "pdf_sha256", pdf_sha256
+        ).eq("versao_extrator", versao_extrator).eq("versao_prompt", versao_prompt).limit(1).execute()
+
+        if not result.data:
+            self.faltas += 1
+            return None
+
+        entrada = result.data[0]
+        self.acertos += 1
+        self.economizado_usd += float(entrada.get("custo_usd") or 0)
+
+        try:
+            self.db.table("extracao_cache").update({
+                "hits": (entrada.get("hits") or 0) + 1,
+                "ultimo_hit_em": datetime.now(timezone.utc).isoformat()
+            }).eq("pdf_sha256", pdf_sha256).eq("versao_extrator", versao_extrator).eq(
+                "versao_prompt", versao_prompt
+            ).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível contar o acerto do cache de extração: {e}")
+
+        return entrada
+
+    def guardar(self, pdf_sha256: str, texto: str, dados: dict):
+        """
+        Grava o resultado de uma extração bem-sucedida.
+
+        Falha ao gravar não derruba a extração: só perde o cache.
+
+        Args:
+            pdf_sha256: Hash do PDF
+            texto: Texto do LLMWhisperer
+            dados: Dados estruturados extraídos
+        """
+        if not self.ativo:
+            return
+
+        versao_extrator, versao_prompt = self.versoes()
+        try:
+            self.db.table("extracao_cache").upsert({
+                "pdf_sha256": pdf_sha256,
+                "versao_extrator": versao_extrator,
+                "versao_prompt": versao_prompt,
+                "texto": texto,
+                "dados": dados,
+                "custo_usd": estimar_custo_usd(texto, dados)
+            }, on_conflict="pdf_sha256,versao_extrator,versao_prompt").execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível gravar o cache de extração ({pdf_sha256[:12]}): {e}")
+
+    def get_status(self) -> dict:
+        """
+        Taxa de acerto e economia.
+
+        Returns:
+            Contadores deste processo e totais acumulados (view extracao_cache_resumo)
+        """
+        consultas = self.acertos + self.faltas
+        status = {
+            "ativo": self.ativo,
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "taxa_acerto": round(self.acertos / consultas, 3) if consultas else None,
+            "economizado_usd": round(self.economizado_usd, 4),
+        }
+
+        try:
+            result = self.db.table("extracao_cache_resumo").select("*").execute()
+            if result.data:
+                status["total"] = result.data[0]
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível ler o resumo do cache de extração: {e}")
+
+        return status
+
+
+# Instância global do cache
+cache_extracao = CacheExtracao(ativo=settings.EXTRACAO_CACHE)
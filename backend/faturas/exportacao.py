@@ -0,0 +1,110 @@
+"""
+Faturas Exportação - ZIP com os PDFs de várias faturas, gerado em streaming
+O arquivo sai em partes enquanto os PDFs são lidos do blob store; a memória
+fica em torno de uma parte de PDF, qualquer que seja o tamanho do ZIP
+"""
+
+import logging
+import time
+import zipfile
+from typing import Iterator, List
+
+from backend.faturas.blob_store import BlobNaoEncontrado, BlobStore
+
+logger = logging.getLogger(__name__)
+
+
+class _SaidaZip:
+    """
+    Destino do ZipFile sem seek: acumula o que foi escrito até ser esvaziado.
+
+    Sem tell/seek o zipfile grava cada entrada com data descriptor, o que
+    permite escrever o ZIP do início ao fim sem voltar no arquivo.
+    """
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def nome_arquivo_pdf(fatura: dict) -> str:
+    """
+    Nome do PDF dentro do ZIP: UC + mês de referência.
+
+    Args:
+        fatura: Registro com mes_referencia, ano_referencia e a UC em
+            unidades_consumidoras (cod_empresa, cdc, digito_verificador)
+
+    Returns:
+        Ex: "6-1234567-8_2025-01.pdf"
+    """
+    uc = fatura.get("unidades_consumidoras") or {}
+    if uc.get("cdc"):
+        nome_uc = f"{uc.get('cod_empresa') or 6}-{uc['cdc']}-{uc.get('digito_verificador')}"
+    else:
+        nome_uc = f"uc{fatura['uc_id']}"
+    return f"{nome_uc}_{fatura['ano_referencia']}-{fatura['mes_referencia']:02d}.pdf"
+
+
+def gerar_zip_pdfs(faturas: List[dict], store: BlobStore) -> Iterator[bytes]:
+    """
+    Gera o ZIP dos PDFs em partes.
+
+    PDFs ausentes no blob store não interrompem o arquivo: são listados em
+    AUSENTES.txt no fim do ZIP.
+
+    Args:
+        faturas: Registros com pdf_sha256 (ver nome_arquivo_pdf)
+        store: Blob store dos PDFs
+
+    Returns:
+        Iterador com as partes do ZIP
+    """
+    return (parte for parte in _partes_zip(faturas, store) if parte)
+
+
+def _partes_zip(faturas: List[dict], store: BlobStore) -> Iterator[bytes]:
+    saida = _SaidaZip()
+    ausentes = []
+    data_hora = time.localtime()[:6]
+
+    # PDF já é comprimido; nível 1 só evita pagar CPU à toa
+    with zipfile.ZipFile(saida, mode="w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as arquivo_zip:
+        for fatura in faturas:
+            nome = nome_arquivo_pdf(fatura)
+            partes = store.ler_partes(fatura["pdf_sha256"])
+            try:
+                primeira = next(partes, b"")
+            except BlobNaoEncontrado:
+                logger.warning(f"⚠️ PDF da fatura {fatura['id']} não está no blob store")
+                ausentes.append(nome)
+                continue
+
+            info = zipfile.ZipInfo(nome, date_time=data_hora)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # force_zip64: sem seek o tamanho não pode ser corrigido depois
+            with arquivo_zip.open(info, mode="w", force_zip64=(fatura.get("pdf_tamanho") or 0) > 2 ** 31) as entrada:
+                entrada.write(primeira)
+                for parte in partes:
+                    entrada.write(parte)
+                    yield saida.esvaziar()
+            yield saida.esvaziar()
+
+        if ausentes:
+            arquivo_zip.writestr(
+                zipfile.ZipInfo("AUSENTES.txt", date_time=data_hora),
+                "PDFs não encontrados no armazenamento:\n" + "\n".join(ausentes) + "\n"
+            )
+
+    yield saida.esvaziar()
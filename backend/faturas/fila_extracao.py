@@ -0,0 +1,343 @@
+"""
+Fila Extração - Extração de dados das faturas em background
+O endpoint de lote só cria o job; um pool de workers extrai com retry e backoff
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from backend.config import settings
+from backend.core.database import SupabaseClient
+from backend.core.exceptions import NotFoundError
+from backend.faturas.cache_extracao import cache_extracao
+from backend.faturas.provedores import limites_provedores
+
+logger = logging.getLogger(__name__)
+
+
+# Backoff exponencial: 2min, 4min, 8min... limitado a 1h
+BACKOFF_BASE_SEGUNDOS = 120
+BACKOFF_MAX_SEGUNDOS = 3600
+
+# Tempo que um item fica reservado por um worker antes de voltar à fila
+# (LLMWhisperer em high_quality pode levar minutos)
+RESERVA_SEGUNDOS = 900
+
+
+class FilaExtracao:
+    """
+    Fila persistente (tabelas extracao_jobs e fila_extracao) de extrações.
+
+    - Cada POST /extrair-lote vira um job com um item por fatura
+    - O pool tem `workers` corrotinas, cada uma extraindo um item por vez;
+      as chamadas aos provedores passam por limites_provedores
+      (concorrência por provedor)
+    - Só processa no processo que segura o lease do scheduler
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_tentativas: int = 3,
+        intervalo_segundos: int = 10
+    ):
+        """
+        Args:
+            workers: Faturas extraídas ao mesmo tempo
+            max_tentativas: Tentativas antes de marcar o item como erro
+            intervalo_segundos: Espera entre verificações da fila vazia
+        """
+        self.db = SupabaseClient(admin=True)
+        self.workers = max(1, workers)
+        self.max_tentativas = max(1, max_tentativas)
+        self.intervalo_segundos = intervalo_segundos
+        self._tasks: List[asyncio.Task] = []
+        self._acordar: Optional[asyncio.Event] = None
+        self.extraidas = 0
+        self.falhas = 0
+
+    # ========================
+    # Jobs
+    # ========================
+
+    def criar_job(
+        self,
+        filtros: Optional[dict] = None,
+        limite: int = 10,
+        forcar_reprocessamento: bool = False,
+        usuario_id: Optional[str] = None
+    ) -> dict:
+        """
+        Cria um job com as faturas a extrair e acorda os workers.
+
+        Args:
+            filtros: uc_id, mes_referencia, ano_referencia
+            limite: Máximo de faturas no job
+            forcar_reprocessamento: Inclui faturas já extraídas
+            usuario_id: Quem pediu
+
+        Returns:
+            Progresso inicial do job (ver progresso)
+        """
+        from backend.faturas.service import faturas_service
+
+        faturas = faturas_service.faturas_para_extracao(filtros, limite, forcar_reprocessamento)
+        agora = datetime.now(timezone.utc).isoformat()
+
+        job = self.db.table("extracao_jobs").insert({
+            "filtros": filtros or {},
+            "forcar_reprocessamento": forcar_reprocessamento,
+            "total": len(faturas),
+            "criado_por": usuario_id,
+            "concluido_em": None if faturas else agora
+        }).execute().data[0]
+
+        if faturas:
+            self.db.table("fila_extracao").insert([
+                {"job_id": job["id"], "fatura_id": f["id"]} for f in faturas
+            ]).execute()
+            logger.info(f"🧾 Job de extração {job['id']} criado com {len(faturas)} faturas")
+
+        if self._acordar:
+            self._acordar.set()
+
+        return self.progresso(job["id"])
+
+    def progresso(self, job_id: int) -> dict:
+        """
+        Andamento de um job.
+
+        Args:
+            job_id: ID do job
+
+        Returns:
+            Contagens (total, processadas, sucesso, erro, pendentes), status
+            e o resultado de cada fatura
+
+        Raises:
+            NotFoundError: Job não encontrado
+        """
+        result = self.db.table("extracao_jobs").select("*").eq("id", job_id).execute()
+        if not result.data:
+            raise NotFoundError("Job de extração")
+        job = result.data[0]
+
+        itens = self.db.table("fila_extracao").select(
+            "fatura_id, status, tentativas, ultimo_erro"
+        ).eq("job_id", job_id).order("id").execute().data or []
+
+        sucesso = sum(1 for i in itens if i["status"] == "concluido")
+        erro = sum(1 for i in itens if i["status"] == "erro")
+        pendentes = len(itens) - sucesso - erro
+        concluido = pendentes == 0
+
+        return {
+            "job_id": job_id,
+            "status": "concluido" if concluido else "processando",
+            "total": job["total"],
+            "processadas": sucesso + erro,
+            "sucesso": sucesso,
+            "erro": erro,
+            "pendentes": pendentes,
+            "filtros": job.get("filtros"),
+            "criado_em": job.get("criado_em"),
+            "concluido_em": job.get("concluido_em"),
+            "resultados": [
+                {
+                    "fatura_id": i["fatura_id"],
+                    "status": {"concluido": "sucesso", "erro": "erro"}.get(i["status"], i["status"]),
+                    "tentativas": i["tentativas"],
+                    "erro": i["ultimo_erro"] if i["status"] != "concluido" else None
+                }
+                for i in itens
+            ]
+        }
+
+    # ========================
+    # Persistência
+    # ========================
+
+    def reservar(self, limite: int) -> List[dict]:
+        """
+        Reserva itens prontos para extração.
+
+        A reserva é condicional (status ainda pendente), então dois workers
+        nunca pegam o mesmo item.
+
+        Args:
+            limite: Máximo de itens
+
+        Returns:
+            Itens reservados
+        """
+        agora = datetime.now(timezone.utc)
+
+        # Itens de um worker que morreu no meio da extração voltam para a fila
+        self.db.table("fila_extracao").update({"status": "pendente"}).eq(
+            "status", "processando"
+        ).lt("reservado_ate", agora.isoformat()).execute()
+
+        candidatos = self.db.table("fila_extracao").select(
+            "*, extracao_jobs(forcar_reprocessamento)"
+        ).eq(
+            "status", "pendente"
+        ).lte("proxima_tentativa_em", agora.isoformat()).order(
+            "proxima_tentativa_em"
+        ).limit(limite).execute()
+
+        reservados = []
+        for item in candidatos.data or []:
+            result = self.db.table("fila_extracao").update({
+                "status": "processando",
+                "reservado_ate": (agora + timedelta(seconds=RESERVA_SEGUNDOS)).isoformat(),
+                "atualizado_em": agora.isoformat()
+            }).eq("id", item["id"]).eq("status", "pendente").execute()
+            if result.data:
+                reservados.append(item)
+
+        return reservados
+
+    def concluir(self, item: dict):
+        """Encerra o item com sucesso"""
+        agora = datetime.now(timezone.utc).isoformat()
+        self.db.table("fila_extracao").update({
+            "status": "concluido",
+            "tentativas": item["tentativas"] + 1,
+            "ultimo_erro": None,
+            "concluido_em": agora,
+            "atualizado_em": agora
+        }).eq("id", item["id"]).execute()
+
+    def finalizar_job(self, job_id: int):
+        """Marca concluido_em do job quando nenhum item dele resta na fila"""
+        restantes = self.db.table("fila_extracao").select("id", count="exact").eq(
+            "job_id", job_id
+        ).in_("status", ["pendente", "processando"]).limit(1).execute()
+        if restantes.count:
+            return
+
+        self.db.table("extracao_jobs").update({
+            "concluido_em": datetime.now(timezone.utc).isoformat()
+        }).eq("id", job_id).is_("concluido_em", "null").execute()
+        logger.info(f"🧾 Job de extração {job_id} concluído")
+
+    def falhar(self, item: dict, erro: str, definitivo: bool = False):
+        """Registra a falha e reagenda com backoff (ou encerra como erro)"""
+        agora = datetime.now(timezone.utc)
+        tentativas = item["tentativas"] + 1
+        esgotado = definitivo or tentativas >= self.max_tentativas
+        espera = min(BACKOFF_BASE_SEGUNDOS * 2 ** (tentativas - 1), BACKOFF_MAX_SEGUNDOS)
+
+        self.db.table("fila_extracao").update({
+            "status": "erro" if esgotado else "pendente",
+            "tentativas": tentativas,
+            "ultimo_erro": erro[:500],
+            "proxima_tentativa_em": (agora + timedelta(seconds=espera)).isoformat(),
+            "concluido_em": agora.isoformat() if esgotado else None,
+            "atualizado_em": agora.isoformat()
+        }).eq("id", item["id"]).execute()
+
+    def resumo(self) -> dict:
+        """
+        Profundidade da fila.
+
+        Returns:
+            Contagem por status, contadores deste processo, uso dos provedores
+            e acertos do cache de extração
+        """
+        contagens = {}
+        for status in ("pendente", "processando", "erro"):
+            result = self.db.table("fila_extracao").select("id", count="exact").eq(
+                "status", status
+            ).limit(1).execute()
+            contagens[status] = result.count or 0
+
+        return {
+            **contagens,
+            "extraidas": self.extraidas,
+            "falhas": self.falhas,
+            "workers": self.workers,
+            "provedores": limites_provedores.get_status(),
+            "cache": cache_extracao.get_status()
+        }
+
+    # ========================
+    # Processamento
+    # ========================
+
+    async def extrair(self, item: dict):
+        """Extrai uma fatura e atualiza a fila"""
+        from backend.faturas.service import faturas_service
+
+        # Job com forcar_reprocessamento extrai de novo em vez de ler o cache
+        job = item.get("extracao_jobs") or {}
+
+        try:
+            await faturas_service.processar_extracao_fatura(
+                item["fatura_id"], ignorar_cache=bool(job.get("forcar_reprocessamento"))
+            )
+            await asyncio.to_thread(self.concluir, item)
+            self.extraidas += 1
+
+        except NotFoundError as e:
+            # Fatura apagada depois de enfileirada: não adianta tentar de novo
+            self.falhas += 1
+            await asyncio.to_thread(self.falhar, item, str(e.detail), True)
+
+        except Exception as e:
+            self.falhas += 1
+            erro = getattr(e, "detail", None) or str(e)
+            logger.warning(f"⚠️ Erro ao extrair fatura {item['fatura_id']} (job {item['job_id']}): {erro}")
+            await asyncio.to_thread(self.falhar, item, str(erro))
+
+        # Quem encerra o último item carimba o fim do job (o GET de progresso só lê)
+        try:
+            await asyncio.to_thread(self.finalizar_job, item["job_id"])
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao finalizar job de extração {item['job_id']}: {e}")
+
+    async def _worker(self, numero: int, lease):
+        """Um worker do pool: um item por vez enquanto houver itens prontos"""
+        while True:
+            try:
+                if lease.is_lider:
+                    itens = await asyncio.to_thread(self.reservar, 1)
+                    if itens:
+                        await self.extrair(itens[0])
+                        continue
+            except Exception as e:
+                logger.error(f"❌ Erro no worker {numero} de extração: {e}")
+
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=self.intervalo_segundos)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+
+    def start(self, lease):
+        """
+        Inicia o pool de workers.
+
+        Args:
+            lease: LeaderLease do scheduler (só o líder processa)
+        """
+        if not self._tasks:
+            self._acordar = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._worker(n, lease)) for n in range(self.workers)]
+            logger.info(f"🧾 Fila de extração iniciada ({self.workers} workers)")
+
+    def stop(self):
+        """Para o pool de workers"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._acordar = None
+
+
+# Instância global da fila
+fila_extracao = FilaExtracao(
+    workers=settings.EXTRACAO_FILA_WORKERS,
+    max_tentativas=settings.EXTRACAO_FILA_MAX_TENTATIVAS
+)
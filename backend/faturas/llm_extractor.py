@@ -3,6 +3,7 @@ Extrator de Faturas usando LLMWhisperer + OpenAI
 """
 
 import base64
+import hashlib
 import json
 import logging
 from typing import Optional
@@ -13,6 +14,22 @@ from openai import OpenAI
 logger = logging.getLogger(__name__)
 
 
+# Parâmetros do LLMWhisperer; mudar qualquer um muda o texto extraído
+LLMWHISPERER_MODO = "high_quality"
+LLMWHISPERER_SAIDA = "line-printer"
+SEPARADOR_PAGINA = "<<<NOVA_PAGINA>>>"
+
+# Versão do extrator de texto (chave do cache de extração)
+VERSAO_EXTRATOR = f"llmwhisperer:{LLMWHISPERER_MODO}:{LLMWHISPERER_SAIDA}:v1"
+
+OPENAI_MODELO = "gpt-4o-mini"
+
+OPENAI_MENSAGEM_SISTEMA = (
+    "Você é um assistente especializado em extrair dados estruturados de faturas de energia "
+    "elétrica da Energisa. Retorne APENAS um JSON válido, sem comentários ou texto adicional."
+)
+
+
 class LLMWhispererExtractor:
     """Extrai texto de PDF usando LLMWhisperer"""
 
@@ -29,18 +46,27 @@ class LLMWhispererExtractor:
         Returns:
             Texto extraído otimizado para LLMs
         """
-        try:
-            # Decodificar base64
-            pdf_bytes = base64.b64decode(pdf_base64)
+        return self.extract_from_bytes(base64.b64decode(pdf_base64))
+
+    def extract_from_bytes(self, pdf_bytes: bytes) -> str:
+        """
+        Extrai texto do PDF usando LLMWhisperer.
+
+        Args:
+            pdf_bytes: Conteúdo do PDF
 
+        Returns:
+            Texto extraído otimizado para LLMs
+        """
+        try:
             logger.info("Chamando LLMWhisperer API...")
 
             # Usar cliente oficial
             result = self.client.whisper(
                 file_data=pdf_bytes,
-                processing_mode="high_quality",
-                output_mode="line-printer",
-                page_seperator="<<<NOVA_PAGINA>>>",
+                processing_mode=LLMWHISPERER_MODO,
+                output_mode=LLMWHISPERER_SAIDA,
+                page_seperator=SEPARADOR_PAGINA,
                 force_text_processing=False
             )
 
@@ -62,7 +88,7 @@ class OpenAIParser:
 
     def __init__(self, api_key: str):
         self.client = OpenAI(api_key=api_key)
-        self.model = "gpt-4o-mini"
+        self.model = OPENAI_MODELO
 
     def parse_fatura(self, texto: str) -> dict:
         """
@@ -85,7 +111,7 @@ class OpenAIParser:
                 messages=[
                     {
                         "role": "system",
-                        "content": "Você é um assistente especializado em extrair dados estruturados de faturas de energia elétrica da Energisa. Retorne APENAS um JSON válido, sem comentários ou texto adicional."
+                        "content": OPENAI_MENSAGEM_SISTEMA
                     },
                     {
                         "role": "user",
@@ -107,7 +133,8 @@ class OpenAIParser:
             logger.error(f"Erro no OpenAI: {e}")
             raise
 
-    def _criar_prompt(self, texto: str) -> str:
+    @staticmethod
+    def _criar_prompt(texto: str) -> str:
         """Cria o prompt para o OpenAI"""
         return f"""Extraia os seguintes dados desta fatura de energia elétrica e retorne um JSON:
 
@@ -193,6 +220,22 @@ INSTRUÇÕES IMPORTANTES:
 Retorne APENAS o JSON, sem texto adicional."""
 
 
+def versao_prompt() -> str:
+    """
+    Versão dos prompts de extração (chave do cache de extração).
+
+    Hash do modelo e dos prompts do OpenAIParser e do fallback com IA
+    (ai_parser): qualquer mudança neles invalida os resultados em cache.
+
+    Returns:
+        Ex: "gpt-4o-mini:3f2a9c1b7d4e"
+    """
+    from backend.faturas.ai_parser import SYSTEM_PROMPT
+
+    conteudo = "\n".join([OPENAI_MENSAGEM_SISTEMA, OpenAIParser._criar_prompt(""), SYSTEM_PROMPT])
+    return f"{OPENAI_MODELO}:{hashlib.sha256(conteudo.encode()).hexdigest()[:12]}"
+
+
 def criar_extrator_llm():
     """
     Cria instância do extrator LLM.
@@ -0,0 +1,137 @@
+"""
+Migração dos PDFs - Move faturas.pdf_base64 para o blob store em lotes
+
+Uso:
+    python -m backend.faturas.migrar_pdfs [--lote 20] [--limite N] [--simular]
+
+Só um lote de PDFs fica em memória por vez. Cada fatura movida recebe
+pdf_sha256/pdf_tamanho/pdf_mime e tem pdf_base64 zerado na mesma atualização,
+então o script pode ser interrompido e rodado de novo.
+
+pdf_base64 só é zerado se o blob store for compartilhado entre os serviços
+(supabase, ou diretório local com PDF_BLOB_COMPARTILHADO=true) e se o blob
+relido bater com o hash. --simular grava e relê os blobs sem tocar no banco.
+"""
+
+import argparse
+import base64
+import binascii
+import logging
+from typing import Optional
+
+from backend.core.database import SupabaseClient
+from backend.faturas.blob_store import BlobStore, blob_store
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStoreNaoCompartilhado(Exception):
+    """O blob store não é visto por todos os serviços: zerar pdf_base64 perderia PDFs"""
+
+
+def migrar_pdfs(
+    db: SupabaseClient,
+    store: BlobStore,
+    lote: int = 20,
+    limite: Optional[int] = None,
+    simular: bool = False
+) -> dict:
+    """
+    Move os PDFs em base64 para o blob store.
+
+    Args:
+        db: Cliente do banco
+        store: Blob store de destino
+        lote: Faturas lidas por consulta
+        limite: Máximo de faturas nesta execução (None = todas)
+        simular: True grava e relê os blobs, sem atualizar as faturas
+
+    Returns:
+        Contadores da migração
+
+    Raises:
+        BlobStoreNaoCompartilhado: Store local fora de um volume comum (sem simular)
+    """
+    if not simular and not store.compartilhado:
+        raise BlobStoreNaoCompartilhado(
+            f"Blob store '{store.nome}' não é compartilhado entre API e sync-worker; "
+            f"use PDF_BLOB_BACKEND=supabase ou um volume comum com PDF_BLOB_COMPARTILHADO=true"
+        )
+
+    resultado = {"movidas": 0, "deduplicadas": 0, "invalidas": 0, "nao_conferidas": 0, "bytes": 0}
+    ultimo_id = 0
+
+    def processadas() -> int:
+        return resultado["movidas"] + resultado["invalidas"] + resultado["nao_conferidas"]
+
+    while limite is None or processadas() < limite:
+        tamanho = lote if limite is None else min(lote, limite - processadas())
+        # Paginação por id (keyset): inválidas que ficam para trás não voltam
+        result = db.table("faturas").select("id, pdf_base64").not_.is_(
+            "pdf_base64", "null"
+        ).gt("id", ultimo_id).order("id").limit(tamanho).execute()
+
+        faturas = result.data or []
+        if not faturas:
+            break
+
+        for fatura in faturas:
+            ultimo_id = fatura["id"]
+            try:
+                pdf_bytes = base64.b64decode(fatura["pdf_base64"], validate=True)
+            except (binascii.Error, ValueError):
+                resultado["invalidas"] += 1
+                logger.warning(f"⚠️ Fatura {fatura['id']}: pdf_base64 inválido, mantido na linha")
+                continue
+
+            deduplicados_antes = store.deduplicados
+            colunas = store.guardar_pdf(pdf_bytes)
+
+            # Releitura antes de zerar: pdf_base64 é a única cópia até aqui
+            if not store.conferir(colunas["pdf_sha256"]):
+                resultado["nao_conferidas"] += 1
+                logger.warning(f"⚠️ Fatura {fatura['id']}: blob não confere na releitura, pdf_base64 mantido")
+                continue
+
+            if not simular:
+                db.table("faturas").update({**colunas, "pdf_base64": None}).eq("id", fatura["id"]).execute()
+
+            resultado["movidas"] += 1
+            resultado["bytes"] += len(pdf_bytes)
+            if store.deduplicados > deduplicados_antes:
+                resultado["deduplicadas"] += 1
+
+        logger.info(
+            f"📦 {resultado['movidas']} PDFs {'conferidos' if simular else 'movidos'} (até a fatura {ultimo_id})"
+        )
+
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move faturas.pdf_base64 para o blob store")
+    parser.add_argument("--lote", type=int, default=20, help="Faturas por consulta")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de faturas nesta execução")
+    parser.add_argument("--simular", action="store_true", help="Grava e relê os blobs sem atualizar as faturas")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    try:
+        resultado = migrar_pdfs(
+            SupabaseClient(admin=True), blob_store, lote=args.lote, limite=args.limite, simular=args.simular
+        )
+    except BlobStoreNaoCompartilhado as e:
+        print(f"Migração recusada: {e}")
+        raise SystemExit(1)
+
+    print(
+        f"PDFs {'conferidos (simulação)' if args.simular else 'movidos'}: {resultado['movidas']} "
+        f"({resultado['bytes'] / 1024 / 1024:.1f} MB), "
+        f"deduplicados: {resultado['deduplicadas']}, inválidos: {resultado['invalidas']}, "
+        f"não conferidos: {resultado['nao_conferidas']} (backend: {blob_store.nome})"
+    )
+
+
+if __name__ == "__main__":
+    main()
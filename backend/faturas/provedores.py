@@ -0,0 +1,87 @@
+"""
+Faturas Provedores - Concorrência limitada por provedor externo de extração
+Chamadas bloqueantes (LLMWhisperer, OpenAI, Anthropic) vão para uma thread,
+sem travar o event loop, e cada provedor tem seu próprio limite
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from typing import Callable, Dict
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LimitesProvedores:
+    """
+    Semáforo por provedor de extração.
+
+    - Provedor sem limite configurado usa limite_padrao
+    - Os semáforos são criados no primeiro uso (dentro do event loop)
+    """
+
+    def __init__(self, limites: Dict[str, int], limite_padrao: int = 2):
+        """
+        Args:
+            limites: Chamadas simultâneas por provedor
+            limite_padrao: Limite de provedores não listados
+        """
+        self.limites = {nome: max(1, limite) for nome, limite in limites.items()}
+        self.limite_padrao = max(1, limite_padrao)
+        self._semaforos: Dict[str, asyncio.Semaphore] = {}
+        self.em_uso: Counter = Counter()
+        self.chamadas: Counter = Counter()
+        self.falhas: Counter = Counter()
+
+    def _semaforo(self, provedor: str) -> asyncio.Semaphore:
+        semaforo = self._semaforos.get(provedor)
+        if semaforo is None:
+            semaforo = asyncio.Semaphore(self.limites.get(provedor, self.limite_padrao))
+            self._semaforos[provedor] = semaforo
+        return semaforo
+
+    async def executar(self, provedor: str, fn: Callable, *args):
+        """
+        Executa uma chamada bloqueante ao provedor, respeitando o limite.
+
+        Args:
+            provedor: Nome do provedor (ex: "openai")
+            fn: Função bloqueante
+            *args: Argumentos da função
+
+        Returns:
+            Retorno da função
+        """
+        async with self._semaforo(provedor):
+            self.em_uso[provedor] += 1
+            self.chamadas[provedor] += 1
+            try:
+                return await asyncio.to_thread(fn, *args)
+            except Exception:
+                self.falhas[provedor] += 1
+                raise
+            finally:
+                self.em_uso[provedor] -= 1
+
+    def get_status(self) -> dict:
+        """Limite, chamadas em andamento e totais por provedor"""
+        nomes = sorted(set(self.limites) | set(self.chamadas))
+        return {
+            nome: {
+                "limite": self.limites.get(nome, self.limite_padrao),
+                "em_uso": self.em_uso[nome],
+                "chamadas": self.chamadas[nome],
+                "falhas": self.falhas[nome],
+            }
+            for nome in nomes
+        }
+
+
+# Instância global dos limites
+limites_provedores = LimitesProvedores({
+    "llmwhisperer": settings.EXTRACAO_LIMITE_LLMWHISPERER,
+    "openai": settings.EXTRACAO_LIMITE_OPENAI,
+    "anthropic": settings.EXTRACAO_LIMITE_ANTHROPIC,
+})
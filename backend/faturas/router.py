@@ -2,10 +2,15 @@
 Faturas Router - Endpoints de Faturas
 """
 
-from fastapi import APIRouter, Depends, Query, status
-from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Optional, Tuple
 from datetime import date
+import asyncio
+import itertools
+import logging
 import math
+import re
 
 from backend.faturas.schemas import (
     FaturaManualRequest,
@@ -18,6 +23,10 @@ from backend.faturas.schemas import (
     MessageResponse,
 )
 from backend.faturas.service import faturas_service
+from backend.faturas.blob_store import BlobNaoEncontrado, blob_store
+from backend.faturas.exportacao import gerar_zip_pdfs
+from backend.faturas.fila_extracao import fila_extracao
+from backend.core.exceptions import NotFoundError
 from backend.core.security import (
     CurrentUser,
     get_current_active_user,
@@ -26,6 +35,41 @@ from backend.core.security import (
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+
+def _intervalo_range(cabecalho: str, tamanho: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta um cabeçalho Range de intervalo único.
+
+    Args:
+        cabecalho: Valor do Range (ex: "bytes=0-1023", "bytes=500-", "bytes=-500")
+        tamanho: Tamanho do arquivo
+
+    Returns:
+        (início, fim inclusivo), ou None para ignorar o Range (malformado
+        ou com vários intervalos) e servir o arquivo inteiro
+
+    Raises:
+        ValueError: Intervalo fora do arquivo (416)
+    """
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", cabecalho)
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    if match.group(1) == "":
+        # Sufixo: os últimos N bytes
+        sufixo = int(match.group(2))
+        if sufixo == 0:
+            raise ValueError("Intervalo vazio")
+        return max(0, tamanho - sufixo), tamanho - 1
+
+    inicio = int(match.group(1))
+    fim = int(match.group(2)) if match.group(2) else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        raise ValueError("Intervalo fora do arquivo")
+    return inicio, min(fim, tamanho - 1)
+
 
 @router.get(
     "",
@@ -233,7 +277,7 @@ async def buscar_fatura(
 @router.get(
     "/{fatura_id}/pdf",
     summary="Buscar PDF da fatura",
-    description="Retorna o PDF em base64 da fatura"
+    description="Retorna o PDF em base64 da fatura (compatibilidade; prefira /pdf/arquivo)"
 )
 async def buscar_pdf_fatura(
     fatura_id: int,
@@ -245,6 +289,128 @@ async def buscar_pdf_fatura(
     return await faturas_service.buscar_pdf(fatura_id)
 
 
+@router.get(
+    "/exportar/pdfs",
+    summary="Exportar PDFs em ZIP",
+    description="ZIP em streaming com os PDFs das faturas de uma usina, UC e/ou mês",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/zip": {}}}},
+    dependencies=[Depends(require_perfil("superadmin", "gestor"))]
+)
+async def exportar_pdfs_faturas(
+    current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
+    usina_id: Optional[int] = Query(None, description="UC geradora e beneficiárias da usina"),
+    uc_id: Optional[int] = Query(None, description="Filtrar por UC"),
+    mes_referencia: Optional[int] = Query(None, ge=1, le=12, description="Mês de referência"),
+    ano_referencia: Optional[int] = Query(None, ge=2000, description="Ano de referência"),
+):
+    """
+    Exporta os PDFs das faturas filtradas em um único ZIP.
+
+    O ZIP é montado enquanto é enviado: cada PDF vai do blob store para a
+    resposta em partes, sem carregar o arquivo inteiro em memória.
+    Arquivos nomeados por UC e referência (ex: 6-1234567-8_2025-01.pdf).
+    """
+    faturas = await faturas_service.listar_pdfs_exportacao(
+        usina_id=usina_id,
+        uc_id=uc_id,
+        mes_referencia=mes_referencia,
+        ano_referencia=ano_referencia
+    )
+    if not faturas:
+        raise NotFoundError("PDF de fatura")
+
+    partes_nome = ["faturas"]
+    if usina_id:
+        partes_nome.append(f"usina{usina_id}")
+    if uc_id:
+        partes_nome.append(f"uc{uc_id}")
+    if ano_referencia:
+        partes_nome.append(f"{ano_referencia}-{mes_referencia:02d}" if mes_referencia else str(ano_referencia))
+    elif mes_referencia:
+        partes_nome.append(f"mes{mes_referencia:02d}")
+
+    return StreamingResponse(
+        gerar_zip_pdfs(faturas, blob_store),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{"_".join(partes_nome)}.zip"'}
+    )
+
+
+@router.get(
+    "/{fatura_id}/pdf/arquivo",
+    summary="Baixar PDF da fatura",
+    description="PDF binário em streaming, com ETag (hash do conteúdo) e suporte a Range",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"application/pdf": {}}},
+        206: {"description": "Intervalo do PDF"},
+        304: {"description": "PDF não mudou (If-None-Match)"},
+        416: {"description": "Intervalo fora do arquivo"}
+    }
+)
+async def baixar_pdf_fatura(
+    fatura_id: int,
+    request: Request,
+    current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
+    download: bool = Query(False, description="true = anexo; false = abrir no navegador"),
+):
+    """
+    Baixa o PDF da fatura direto do blob store, em partes.
+    """
+    pdf = await faturas_service.buscar_pdf_arquivo(fatura_id)
+    tamanho = pdf["tamanho"]
+    etag = f'"{pdf["sha256"]}"'
+    cabecalhos = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # Mesmo id pode ganhar outro PDF: o navegador revalida, mas só recebe 304
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'{"attachment" if download else "inline"}; filename="{pdf["nome_arquivo"]}"'
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if "*" in etags or etag in etags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+
+    inicio, fim = 0, tamanho - 1
+    status_code = status.HTTP_200_OK
+    cabecalho_range = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range com outra versão: o cliente recebe o arquivo inteiro
+    if cabecalho_range and (not if_range or if_range.strip() == etag):
+        try:
+            intervalo = _intervalo_range(cabecalho_range, tamanho)
+        except ValueError:
+            return Response(
+                status_code=416,  # Range Not Satisfiable
+                headers={**cabecalhos, "Content-Range": f"bytes */{tamanho}"}
+            )
+        if intervalo:
+            inicio, fim = intervalo
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            cabecalhos["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+
+    partes = blob_store.ler_partes(pdf["sha256"], inicio, fim)
+    try:
+        # Primeira parte antes da resposta: blob ausente vira 404, não um stream quebrado.
+        # Fora do event loop: no backend supabase ela abre a conexão HTTP com o Storage
+        primeira = await asyncio.to_thread(next, partes, b"")
+    except BlobNaoEncontrado:
+        logger.error(f"PDF {pdf['sha256']} da fatura {fatura_id} não está no blob store")
+        raise NotFoundError("PDF da fatura")
+
+    cabecalhos["Content-Length"] = str(fim - inicio + 1)
+    return StreamingResponse(
+        itertools.chain([primeira], partes),
+        status_code=status_code,
+        media_type=pdf["mime"],
+        headers=cabecalhos
+    )
+
+
 @router.get(
     "/{fatura_id}/pix",
     summary="Buscar dados PIX da fatura",
@@ -312,8 +478,9 @@ async def extrair_dados_fatura(
 
 @router.post(
     "/extrair-lote",
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Extrair dados de múltiplas faturas",
-    description="Processa extração em lote de faturas pendentes",
+    description="Enfileira a extração em lote e retorna o id do job",
     dependencies=[Depends(require_perfil("superadmin", "gestor"))]
 )
 async def extrair_dados_lote(
@@ -325,7 +492,10 @@ async def extrair_dados_lote(
     current_user: Annotated[CurrentUser, Depends(get_current_active_user)] = None,
 ):
     """
-    Processa extração de múltiplas faturas em lote.
+    Enfileira a extração de múltiplas faturas.
+
+    A extração roda nos workers em background; acompanhe em
+    GET /faturas/extrair-lote/{job_id}.
 
     Args:
         uc_id: Filtrar por UC (opcional)
@@ -335,7 +505,7 @@ async def extrair_dados_lote(
         forcar_reprocessamento: Se true, reprocessa mesmo faturas já extraídas
 
     Returns:
-        Resultado do processamento com contadores e detalhes
+        job_id e progresso inicial do job
     """
     filtros = {}
     if uc_id:
@@ -345,8 +515,28 @@ async def extrair_dados_lote(
     if ano_referencia:
         filtros["ano_referencia"] = ano_referencia
 
-    resultado = await faturas_service.processar_lote_faturas(filtros, limite, forcar_reprocessamento)
-    return resultado
+    return await asyncio.to_thread(
+        fila_extracao.criar_job,
+        filtros, limite, forcar_reprocessamento, current_user.id if current_user else None
+    )
+
+
+@router.get(
+    "/extrair-lote/{job_id}",
+    summary="Progresso da extração em lote",
+    description="Contadores e resultado por fatura de um job de extração",
+    dependencies=[Depends(require_perfil("superadmin", "gestor"))]
+)
+async def progresso_extracao_lote(
+    job_id: int,
+    current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
+):
+    """
+    Retorna o andamento de um job criado em POST /faturas/extrair-lote.
+
+    status: "processando" enquanto houver faturas pendentes, depois "concluido".
+    """
+    return await asyncio.to_thread(fila_extracao.progresso, job_id)
 
 
 @router.get(
@@ -95,6 +95,8 @@ class FaturaResponse(BaseModel):
     # PDF
     pdf_path: Optional[str] = None
     pdf_base64: Optional[str] = None
+    pdf_sha256: Optional[str] = None  # Hash do PDF no blob store
+    pdf_tamanho: Optional[int] = None
     pdf_baixado_em: Optional[datetime] = None
 
     # Sincronização
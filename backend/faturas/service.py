@@ -8,8 +8,14 @@ import logging
 from datetime import datetime, timezone, date
 import re
 import json
+import base64
+import binascii
+import asyncio
 
 from backend.core.database import db_admin
+from backend.faturas.blob_store import FILTRO_COM_PDF, PDF_MIME, BlobNaoEncontrado, blob_store
+from backend.faturas.cache_extracao import cache_extracao
+from backend.faturas.provedores import limites_provedores
 
 
 def parse_date(date_str: str) -> Optional[str]:
@@ -85,14 +91,14 @@ class FaturasService:
         Returns:
             Tupla (lista de faturas, total)
         """
-        # Seleciona apenas campos necessários, excluindo pdf_base64 e qr_code_pix_image (pesados)
+        # Seleciona apenas campos necessários, excluindo dados_api e qr_code_pix_image (pesados)
         query = self.db.faturas().select(
             "id, uc_id, numero_fatura, mes_referencia, ano_referencia, valor_fatura, valor_liquido, "
             "consumo, leitura_atual, leitura_anterior, media_consumo, quantidade_dias, "
             "valor_iluminacao_publica, valor_icms, bandeira_tarifaria, data_leitura, data_vencimento, "
             "data_pagamento, indicador_situacao, indicador_pagamento, situacao_pagamento, "
             "servico_distribuicao, compra_energia, servico_transmissao, encargos_setoriais, "
-            "impostos_encargos, qr_code_pix, codigo_barras, pdf_path, pdf_baixado_em, "
+            "impostos_encargos, qr_code_pix, codigo_barras, pdf_path, pdf_sha256, pdf_tamanho, pdf_baixado_em, "
             "sincronizado_em, criado_em, atualizado_em, "
             "unidades_consumidoras!faturas_uc_id_fkey(id, cod_empresa, cdc, digito_verificador, nome_titular, cidade, uf, usuario_id)",
             count="exact"
@@ -196,6 +202,8 @@ class FaturasService:
             codigo_barras=f.get("codigo_barras"),
             pdf_path=f.get("pdf_path"),
             pdf_base64=f.get("pdf_base64"),
+            pdf_sha256=f.get("pdf_sha256"),
+            pdf_tamanho=f.get("pdf_tamanho"),
             pdf_baixado_em=f.get("pdf_baixado_em"),
             sincronizado_em=f.get("sincronizado_em"),
             criado_em=f.get("criado_em"),
@@ -234,26 +242,174 @@ class FaturasService:
             fatura_id: ID da fatura
 
         Returns:
-            Dict com pdf_base64
+            Dict com pdf_base64 (lido do blob store)
 
         Raises:
             NotFoundError: Se fatura não encontrada
         """
         result = self.db.faturas().select(
-            "id, pdf_base64, mes_referencia, ano_referencia"
+            "id, pdf_sha256, mes_referencia, ano_referencia"
         ).eq("id", fatura_id).single().execute()
 
         if not result.data:
             raise NotFoundError("Fatura")
 
+        pdf_base64 = None
+        sha256 = result.data.get("pdf_sha256")
+        if not sha256:
+            colunas = await asyncio.to_thread(self._mover_pdf_legado, fatura_id)
+            sha256 = colunas["pdf_sha256"] if colunas else None
+        if sha256:
+            try:
+                pdf_base64 = base64.b64encode(await asyncio.to_thread(blob_store.ler, sha256)).decode("utf-8")
+            except BlobNaoEncontrado:
+                logger.error(f"PDF {sha256} da fatura {fatura_id} não está no blob store")
+
         return {
             "id": result.data["id"],
-            "pdf_base64": result.data.get("pdf_base64"),
+            "pdf_base64": pdf_base64,
+            "pdf_sha256": sha256,
             "mes_referencia": result.data["mes_referencia"],
             "ano_referencia": result.data["ano_referencia"],
-            "disponivel": result.data.get("pdf_base64") is not None
+            "disponivel": pdf_base64 is not None
+        }
+
+    async def buscar_pdf_arquivo(self, fatura_id: int) -> dict:
+        """
+        Busca os metadados do PDF da fatura para download em streaming.
+
+        Args:
+            fatura_id: ID da fatura
+
+        Returns:
+            Dict com sha256, tamanho, mime e nome do arquivo
+
+        Raises:
+            NotFoundError: Se fatura não encontrada ou sem PDF
+        """
+        result = self.db.faturas().select(
+            "id, pdf_sha256, pdf_tamanho, pdf_mime, mes_referencia, ano_referencia"
+        ).eq("id", fatura_id).single().execute()
+
+        if not result.data:
+            raise NotFoundError("Fatura")
+
+        fatura = result.data
+        if not fatura.get("pdf_sha256"):
+            colunas = await asyncio.to_thread(self._mover_pdf_legado, fatura_id)
+            if not colunas:
+                raise NotFoundError("PDF da fatura")
+            fatura = {**fatura, **colunas}
+
+        return {
+            "sha256": fatura["pdf_sha256"],
+            "tamanho": fatura["pdf_tamanho"],
+            "mime": fatura.get("pdf_mime") or PDF_MIME,
+            "nome_arquivo": f"fatura_{fatura['mes_referencia']:02d}_{fatura['ano_referencia']}.pdf"
         }
 
+    def _mover_pdf_legado(self, fatura_id: int) -> Optional[dict]:
+        """
+        Move para o blob store o pdf_base64 de uma fatura ainda não migrada.
+
+        Com o blob store compartilhado a linha ganha o hash e perde o base64
+        (a mesma troca do migrar_pdfs); sem ele, a linha fica como está e o
+        blob serve só a este processo.
+
+        Args:
+            fatura_id: ID da fatura
+
+        Returns:
+            Colunas pdf_sha256, pdf_tamanho e pdf_mime, ou None sem PDF legado
+        """
+        result = self.db.faturas().select("pdf_base64").eq("id", fatura_id).execute()
+        pdf_base64 = result.data[0].get("pdf_base64") if result.data else None
+        if not pdf_base64:
+            return None
+
+        try:
+            pdf_bytes = base64.b64decode(pdf_base64, validate=True)
+        except (binascii.Error, ValueError):
+            logger.warning(f"⚠️ Fatura {fatura_id}: pdf_base64 inválido")
+            return None
+
+        colunas = blob_store.guardar_pdf(pdf_bytes)
+        if blob_store.compartilhado and blob_store.conferir(colunas["pdf_sha256"]):
+            self.db.faturas().update({**colunas, "pdf_base64": None}).eq("id", fatura_id).execute()
+            logger.info(f"📦 PDF da fatura {fatura_id} movido para o blob store na leitura")
+        return colunas
+
+    async def listar_pdfs_exportacao(
+        self,
+        usina_id: Optional[int] = None,
+        uc_id: Optional[int] = None,
+        mes_referencia: Optional[int] = None,
+        ano_referencia: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Lista as faturas com PDF para exportação em ZIP (só metadados).
+
+        Args:
+            usina_id: UC geradora e beneficiárias da usina
+            uc_id: Uma UC
+            mes_referencia: Mês de referência
+            ano_referencia: Ano de referência
+
+        Returns:
+            Registros com id, uc_id, referência, pdf_sha256, pdf_tamanho e UC
+
+        Raises:
+            ValidationError: Sem nenhum filtro
+            NotFoundError: Usina não encontrada
+        """
+        if not (usina_id or uc_id or ano_referencia):
+            raise ValidationError("Informe usina_id, uc_id ou ano_referencia")
+
+        uc_ids = None
+        if usina_id:
+            usina = self.db.usinas().select("id, uc_geradora_id").eq("id", usina_id).execute()
+            if not usina.data:
+                raise NotFoundError("Usina")
+            beneficiarias = self.db.beneficiarios().select("uc_id").eq("usina_id", usina_id).execute()
+            uc_ids = {usina.data[0]["uc_geradora_id"]} | {b["uc_id"] for b in beneficiarias.data or []}
+            if uc_id:
+                uc_ids &= {uc_id}
+            if not uc_ids:
+                return []
+        elif uc_id:
+            uc_ids = {uc_id}
+
+        faturas = []
+        por_pagina = 1000
+        while True:
+            query = self.db.faturas().select(
+                "id, uc_id, mes_referencia, ano_referencia, pdf_sha256, pdf_tamanho, "
+                "unidades_consumidoras!faturas_uc_id_fkey(cod_empresa, cdc, digito_verificador)"
+            ).or_(FILTRO_COM_PDF)
+
+            if uc_ids is not None:
+                query = query.in_("uc_id", list(uc_ids))
+            if mes_referencia:
+                query = query.eq("mes_referencia", mes_referencia)
+            if ano_referencia:
+                query = query.eq("ano_referencia", ano_referencia)
+
+            result = query.order("uc_id").order("ano_referencia").order("mes_referencia").order("id").range(
+                len(faturas), len(faturas) + por_pagina - 1
+            ).execute()
+            faturas.extend(result.data or [])
+            if len(result.data or []) < por_pagina:
+                break
+
+        # Faturas ainda com pdf_base64 entram no ZIP depois de movidas
+        for fatura in faturas:
+            if not fatura.get("pdf_sha256"):
+                colunas = await asyncio.to_thread(self._mover_pdf_legado, fatura["id"])
+                if colunas:
+                    fatura.update(colunas)
+
+        return [f for f in faturas if f.get("pdf_sha256")]
+
     async def buscar_pix(self, fatura_id: int) -> dict:
         """
         Busca dados PIX da fatura.
@@ -668,7 +824,7 @@ class FaturasService:
             logger.info(f"Usando parser IA ({provider}) para fatura {fatura_id}")
 
             parser = FaturaAIParser(provider=provider)
-            dados = parser.parse(texto)
+            dados = await limites_provedores.executar(provider, parser.parse, texto)
 
             logger.info(f"Extração via IA concluída para fatura {fatura_id}")
             return dados
@@ -711,12 +867,13 @@ class FaturasService:
             "energia_compensada_total_kwh": None
         }
 
-    async def processar_extracao_fatura(self, fatura_id: int) -> dict:
+    async def processar_extracao_fatura(self, fatura_id: int, ignorar_cache: bool = False) -> dict:
         """
         Processa extração de dados estruturados de uma fatura.
 
         Args:
             fatura_id: ID da fatura
+            ignorar_cache: True extrai de novo e sobrescreve a entrada do cache
 
         Returns:
             Dados extraídos estruturados
@@ -729,15 +886,29 @@ class FaturasService:
         from backend.faturas.python_parser import FaturaPythonParser
 
         # 1. Buscar fatura com PDF
-        result = self.db.table("faturas").select("id, pdf_base64, extracao_status").eq("id", fatura_id).single().execute()
+        result = self.db.table("faturas").select("id, pdf_sha256, extracao_status").eq("id", fatura_id).single().execute()
 
         if not result.data:
             raise NotFoundError(f"Fatura {fatura_id} não encontrada")
 
         fatura = result.data
 
-        if not fatura.get("pdf_base64"):
-            raise ValidationError("Fatura não possui PDF armazenado")
+        if not fatura.get("pdf_sha256"):
+            colunas = await asyncio.to_thread(self._mover_pdf_legado, fatura_id)
+            if not colunas:
+                raise ValidationError("Fatura não possui PDF armazenado")
+            fatura["pdf_sha256"] = colunas["pdf_sha256"]
+
+        # Mesmo PDF já extraído com as versões atuais: dispensa LLMWhisperer e OpenAI
+        em_cache = None
+        if not ignorar_cache:
+            em_cache = await asyncio.to_thread(cache_extracao.obter, fatura["pdf_sha256"])
+
+        if not em_cache:
+            try:
+                pdf_bytes = await asyncio.to_thread(blob_store.ler, fatura["pdf_sha256"])
+            except BlobNaoEncontrado:
+                raise ValidationError("PDF da fatura não encontrado no armazenamento")
 
         # 2. Atualizar status → PROCESSANDO
         self.db.table("faturas").update({
@@ -745,16 +916,21 @@ class FaturasService:
         }).eq("id", fatura_id).execute()
 
         try:
-            # 3. Extrair texto do PDF usando LLMWhisperer
-            logger.info(f"Extraindo texto do PDF da fatura {fatura_id} com LLMWhisperer")
-            from backend.faturas.llm_extractor import criar_extrator_llm
-
-            llm_extractor, openai_parser = criar_extrator_llm()
-            texto = llm_extractor.extract_from_pdf(fatura["pdf_base64"])
-
-            # 4. Parsear texto para estrutura de dados usando OpenAI
-            logger.info(f"Parseando texto da fatura {fatura_id} com OpenAI GPT-4o-mini")
-            dados_dict = openai_parser.parse_fatura(texto)
+            if em_cache:
+                logger.info(f"Extração da fatura {fatura_id} reaproveitada do cache (PDF {fatura['pdf_sha256'][:12]})")
+                texto = em_cache["texto"]
+                dados_dict = em_cache["dados"]
+            else:
+                # 3. Extrair texto do PDF usando LLMWhisperer
+                logger.info(f"Extraindo texto do PDF da fatura {fatura_id} com LLMWhisperer")
+                from backend.faturas.llm_extractor import criar_extrator_llm
+
+                llm_extractor, openai_parser = criar_extrator_llm()
+                texto = await limites_provedores.executar("llmwhisperer", llm_extractor.extract_from_bytes, pdf_bytes)
+
+                # 4. Parsear texto para estrutura de dados usando OpenAI
+                logger.info(f"Parseando texto da fatura {fatura_id} com OpenAI GPT-4o-mini")
+                dados_dict = await limites_provedores.executar("openai", openai_parser.parse_fatura, texto)
 
             # 5. Validar dados extraídos
             logger.info(f"Validando dados extraídos da fatura {fatura_id}")
@@ -787,11 +963,19 @@ class FaturasService:
                     logger.warning(f"  [{aviso['severidade']}] {aviso['categoria']}.{aviso['campo']}: {aviso['mensagem']}")
 
             # 6. Verificar se dados críticos foram extraídos, senão usar IA
-            dados_criticos_ok = self._verificar_dados_criticos(dados_dict)
+            # (resultado em cache já passou por esta verificação)
+            dados_criticos_ok = bool(em_cache) or self._verificar_dados_criticos(dados_dict)
+            usou_ia = False
 
             if not dados_criticos_ok:
                 logger.warning(f"Parser regex não extraiu dados críticos, tentando IA para fatura {fatura_id}")
                 dados_dict = await self._extrair_com_ia(texto, fatura_id)
+                dados_criticos_ok = self._verificar_dados_criticos(dados_dict)
+                usou_ia = True
+
+            # Resultado do parser IA depende do provedor/modelo, fora da chave do cache
+            if not em_cache and dados_criticos_ok and not usou_ia:
+                await asyncio.to_thread(cache_extracao.guardar, fatura["pdf_sha256"], texto, dados_dict)
 
             # 7. Salvar no banco
             self.db.table("faturas").update({
@@ -818,28 +1002,27 @@ class FaturasService:
 
             raise ValidationError(f"Erro ao extrair dados da fatura: {error_msg}")
 
-    async def processar_lote_faturas(
+    def faturas_para_extracao(
         self,
         filtros: Optional[dict] = None,
         limite: int = 10,
         forcar_reprocessamento: bool = False
-    ) -> dict:
+    ) -> List[dict]:
         """
-        Processa extração de múltiplas faturas em lote.
+        Seleciona as faturas com PDF a extrair (mais recentes primeiro).
 
         Args:
             filtros: Filtros para selecionar faturas (uc_id, mes, ano, etc)
-            limite: Número máximo de faturas a processar
-            forcar_reprocessamento: Se True, reprocessa mesmo faturas já extraídas
+            limite: Número máximo de faturas
+            forcar_reprocessamento: Se True, inclui faturas já extraídas
 
         Returns:
-            Resultado do processamento em lote
+            Faturas com id, numero_fatura, uc_id, referência e extracao_status
         """
-        # 1. Buscar faturas pendentes de extração
         query = self.db.table("faturas").select("id, numero_fatura, uc_id, mes_referencia, ano_referencia, extracao_status")
 
         # Filtrar faturas com PDF
-        query = query.not_.is_("pdf_base64", "null")
+        query = query.or_(FILTRO_COM_PDF)
 
         # Se não forçar reprocessamento, filtrar apenas PENDENTE/ERRO
         if not forcar_reprocessamento:
@@ -858,65 +1041,7 @@ class FaturasService:
         query = query.limit(limite).order("ano_referencia", desc=True).order("mes_referencia", desc=True)
 
         result = query.execute()
-        faturas_pendentes = result.data or []
-
-        if not faturas_pendentes:
-            # Verificar se há faturas no período (com qualquer status)
-            check_query = self.db.table("faturas").select("id, extracao_status").not_.is_("pdf_base64", "null")
-            if filtros:
-                if filtros.get("mes_referencia"):
-                    check_query = check_query.eq("mes_referencia", filtros["mes_referencia"])
-                if filtros.get("ano_referencia"):
-                    check_query = check_query.eq("ano_referencia", filtros["ano_referencia"])
-
-            check_result = check_query.limit(5).execute()
-            total_periodo = len(check_result.data or [])
-
-            logger.warning(f"Nenhuma fatura pendente encontrada. Total no período: {total_periodo}")
-
-            return {
-                "total": 0,
-                "processadas": 0,
-                "sucesso": 0,
-                "erro": 0,
-                "total_periodo": total_periodo,
-                "mensagem": f"Nenhuma fatura pendente. Encontradas {total_periodo} faturas no período (já processadas ou sem necessidade).",
-                "resultados": []
-            }
-
-        # 2. Processar cada fatura
-        resultados = []
-        sucesso_count = 0
-        erro_count = 0
-
-        for fatura in faturas_pendentes:
-            try:
-                dados = await self.processar_extracao_fatura(fatura["id"])
-                sucesso_count += 1
-                resultados.append({
-                    "fatura_id": fatura["id"],
-                    "numero_fatura": fatura.get("numero_fatura"),
-                    "referencia": f"{fatura['mes_referencia']:02d}/{fatura['ano_referencia']}",
-                    "status": "sucesso",
-                    "dados": dados
-                })
-            except Exception as e:
-                erro_count += 1
-                resultados.append({
-                    "fatura_id": fatura["id"],
-                    "numero_fatura": fatura.get("numero_fatura"),
-                    "referencia": f"{fatura['mes_referencia']:02d}/{fatura['ano_referencia']}",
-                    "status": "erro",
-                    "erro": str(e)
-                })
-
-        return {
-            "total": len(faturas_pendentes),
-            "processadas": len(resultados),
-            "sucesso": sucesso_count,
-            "erro": erro_count,
-            "resultados": resultados
-        }
+        return result.data or []
 
     async def obter_dados_extraidos(self, fatura_id: int) -> Optional[dict]:
         """
@@ -965,8 +1090,8 @@ class FaturasService:
             "extracao_error": None
         }).eq("id", fatura_id).execute()
 
-        # Processar novamente
-        return await self.processar_extracao_fatura(fatura_id)
+        # Processar novamente, sem reaproveitar o cache
+        return await self.processar_extracao_fatura(fatura_id, ignorar_cache=True)
 
 
 # Instância global do serviço
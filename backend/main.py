@@ -11,6 +11,7 @@ import logging
 
 from backend.config import settings
 from backend.core.exceptions import PlataformaException
+from backend.energisa.limitador import LimiteEnergisaExcedido
 
 # Configuração de logging
 logging.basicConfig(
@@ -31,17 +32,29 @@ async def lifespan(app: FastAPI):
     logger.info(f"Ambiente: {settings.ENVIRONMENT}")
     logger.info(f"Supabase URL: {settings.SUPABASE_URL}")
 
-    # Inicia o scheduler de sincronização (a cada 10 minutos)
+    # Inicia o scheduler de sincronização (só executa no processo que
+    # segurar o lease; com SYNC_SCHEDULER_NA_API=false roda no worker dedicado)
     from backend.sync.scheduler import sync_scheduler
-    sync_scheduler.start()
-    logger.info("🔄 Sync Scheduler iniciado (intervalo: 10 minutos)")
+    if settings.SYNC_SCHEDULER_NA_API:
+        sync_scheduler.start()
+        logger.info("🔄 Sync Scheduler iniciado (agenda por UC, eleição por lease)")
+    else:
+        logger.info("⏸️ Sync Scheduler desativado na API (worker dedicado)")
+
+    # Sobe os navegadores do login Energisa em background
+    from backend.energisa.navegadores import navegador_pool
+    navegador_pool.aquecer_em_background()
+    from backend.energisa.login_sessoes import registro_logins
+    registro_logins.iniciar_limpeza()
 
     yield
 
     # Shutdown
     logger.info("Finalizando aplicação...")
-    sync_scheduler.stop()
-    logger.info("🛑 Sync Scheduler parado")
+    if settings.SYNC_SCHEDULER_NA_API:
+        await sync_scheduler.encerrar()
+        logger.info("🛑 Sync Scheduler parado")
+    navegador_pool.encerrar()
 
 
 # Criação da aplicação FastAPI
@@ -109,6 +122,20 @@ async def plataforma_exception_handler(request: Request, exc: PlataformaExceptio
     )
 
 
+@app.exception_handler(LimiteEnergisaExcedido)
+async def limite_energisa_exception_handler(request: Request, exc: LimiteEnergisaExcedido):
+    """Handler para recusa do limitador local de requisições à Energisa"""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={
+            "error": True,
+            "message": str(exc),
+            "status_code": 429
+        },
+        headers={"Retry-After": "30"}
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handler para erros de validação do Pydantic"""
@@ -0,0 +1,281 @@
+"""
+Sync Agenda - Fila persistente de sincronização por UC
+O próximo horário de cada UC segue o calendário de leitura/vencimento da fatura
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.core.database import SupabaseClient
+
+logger = logging.getLogger(__name__)
+
+
+# Prioridades da fila (menor = mais urgente)
+PRIORIDADE_MANUAL = 0
+PRIORIDADE_LEITURA = 1
+PRIORIDADE_VENCIMENTO = 2
+PRIORIDADE_ROTINA = 3
+
+# Ciclo de leitura usado quando a fatura não traz a próxima leitura
+CICLO_LEITURA_DIAS = 30
+
+# Janela em torno da leitura prevista: a fatura nova costuma aparecer
+# alguns dias depois da leitura
+JANELA_ANTES_LEITURA = timedelta(days=1)
+JANELA_DEPOIS_LEITURA = timedelta(days=10)
+
+# Leitura atrasada há mais que isso (UC inativa, cancelada): volta à rotina diária
+LIMITE_LEITURA_ATRASADA = timedelta(days=30)
+
+# Janela em torno do vencimento (mudança de situação de pagamento)
+JANELA_ANTES_VENCIMENTO = timedelta(days=1)
+JANELA_DEPOIS_VENCIMENTO = timedelta(days=3)
+
+# Linhas por página nas leituras (o PostgREST corta em 1000 por requisição)
+LINHAS_POR_PAGINA = 1000
+
+# Intervalos de consulta
+INTERVALO_JANELA_LEITURA = timedelta(hours=2)
+INTERVALO_LEITURA_ATRASADA = timedelta(hours=6)
+INTERVALO_VENCIMENTO = timedelta(hours=6)
+INTERVALO_SEM_HISTORICO = timedelta(hours=6)
+INTERVALO_ROTINA = timedelta(hours=24)
+INTERVALO_ADIADA = timedelta(minutes=30)  # CPF pulado por motivo passageiro
+
+
+def _parse_data(valor) -> Optional[date]:
+    """Converte 'YYYY-MM-DD...' (ou date) em date"""
+    if not valor:
+        return None
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor)[:10])
+    except ValueError:
+        return None
+
+
+def _inicio_do_dia(dia: date) -> datetime:
+    """Meia-noite UTC do dia"""
+    return datetime(dia.year, dia.month, dia.day, tzinfo=timezone.utc)
+
+
+def calcular_proximo_sync(
+    fatura_recente: Optional[dict],
+    agora: Optional[datetime] = None
+) -> Tuple[datetime, int, str]:
+    """
+    Calcula quando a UC deve ser sincronizada de novo.
+
+    Usa a fatura mais recente da UC:
+    - proxima_leitura (extraída do PDF) ou data_leitura + 30 dias define a
+      janela de leitura, consultada a cada 2h
+    - passada a janela sem fatura nova, a leitura está atrasada: a cada 6h,
+      por até 30 dias depois da leitura prevista; depois disso, rotina
+    - data_vencimento sem pagamento define a janela de vencimento: a cada 6h
+    - fora das janelas: uma vez por dia, sem passar do início da próxima janela
+
+    Args:
+        fatura_recente: Dict com data_leitura, data_vencimento, data_pagamento
+            e proxima_leitura (ou None se a UC não tem faturas)
+        agora: Momento de referência (padrão: agora em UTC)
+
+    Returns:
+        Tupla (próximo horário, prioridade, motivo)
+    """
+    agora = agora or datetime.now(timezone.utc)
+
+    if not fatura_recente:
+        return agora + INTERVALO_SEM_HISTORICO, PRIORIDADE_ROTINA, "sem_historico"
+
+    proxima_leitura = _parse_data(fatura_recente.get("proxima_leitura"))
+    if not proxima_leitura:
+        data_leitura = _parse_data(fatura_recente.get("data_leitura"))
+        if data_leitura:
+            proxima_leitura = data_leitura + timedelta(days=CICLO_LEITURA_DIAS)
+
+    candidatos = [(agora + INTERVALO_ROTINA, PRIORIDADE_ROTINA, "rotina")]
+
+    if proxima_leitura:
+        inicio = _inicio_do_dia(proxima_leitura) - JANELA_ANTES_LEITURA
+        fim = _inicio_do_dia(proxima_leitura) + JANELA_DEPOIS_LEITURA
+        if inicio <= agora <= fim:
+            return agora + INTERVALO_JANELA_LEITURA, PRIORIDADE_LEITURA, "janela_leitura"
+        if fim < agora <= _inicio_do_dia(proxima_leitura) + LIMITE_LEITURA_ATRASADA:
+            return agora + INTERVALO_LEITURA_ATRASADA, PRIORIDADE_LEITURA, "leitura_atrasada"
+        if agora < inicio:
+            candidatos.append((inicio, PRIORIDADE_LEITURA, "janela_leitura"))
+
+    vencimento = _parse_data(fatura_recente.get("data_vencimento"))
+    if vencimento and not fatura_recente.get("data_pagamento"):
+        inicio = _inicio_do_dia(vencimento) - JANELA_ANTES_VENCIMENTO
+        fim = _inicio_do_dia(vencimento) + JANELA_DEPOIS_VENCIMENTO
+        if inicio <= agora <= fim:
+            return agora + INTERVALO_VENCIMENTO, PRIORIDADE_VENCIMENTO, "vencimento"
+        if agora < inicio:
+            candidatos.append((inicio, PRIORIDADE_VENCIMENTO, "vencimento"))
+
+    return min(candidatos, key=lambda c: c[0])
+
+
+class SyncAgenda:
+    """Agenda persistente (tabela sync_agenda) com o próximo sync de cada UC"""
+
+    def __init__(self):
+        self.db = SupabaseClient(admin=True)
+
+    @staticmethod
+    def _ler_todas(consulta: Callable) -> List[dict]:
+        """
+        Lê todas as linhas de uma consulta, página por página.
+
+        Args:
+            consulta: Função que monta a consulta (já ordenada por uma chave única)
+
+        Returns:
+            Todas as linhas
+        """
+        linhas: List[dict] = []
+        while True:
+            result = consulta().range(len(linhas), len(linhas) + LINHAS_POR_PAGINA - 1).execute()
+            linhas.extend(result.data or [])
+            if len(result.data or []) < LINHAS_POR_PAGINA:
+                return linhas
+
+    def semear(self) -> int:
+        """
+        Cria entradas vencidas para UCs que ainda não estão na agenda.
+
+        Returns:
+            Quantidade de UCs adicionadas
+        """
+        ucs = self._ler_todas(lambda: self.db.table("unidades_consumidoras").select("id").order("id"))
+        agendadas = self._ler_todas(lambda: self.db.table("sync_agenda").select("uc_id").order("uc_id"))
+
+        existentes = {row["uc_id"] for row in agendadas}
+        novas = [{"uc_id": uc["id"]} for uc in ucs if uc["id"] not in existentes]
+
+        if novas:
+            self.db.upsert_em_lote("sync_agenda", novas, on_conflict="uc_id")
+            logger.info(f"   🗓️ {len(novas)} UCs novas adicionadas à agenda")
+
+        return len(novas)
+
+    def buscar_devidas(self, limite: int = 50) -> List[int]:
+        """
+        Retorna as UCs cujo horário já chegou, mais urgentes primeiro.
+
+        Args:
+            limite: Máximo de UCs retornadas
+
+        Returns:
+            Lista de IDs de UC
+        """
+        agora = datetime.now(timezone.utc).isoformat()
+        result = self.db.table("sync_agenda").select("uc_id").lte(
+            "proximo_sync_em", agora
+        ).order("prioridade").order("proximo_sync_em").limit(limite).execute()
+
+        return [row["uc_id"] for row in result.data or []]
+
+    def priorizar(self, uc_id: int):
+        """Coloca a UC no topo da fila (sincronização manual)"""
+        self.db.table("sync_agenda").upsert({
+            "uc_id": uc_id,
+            "proximo_sync_em": datetime.now(timezone.utc).isoformat(),
+            "prioridade": PRIORIDADE_MANUAL,
+            "motivo": "manual",
+            "atualizado_em": datetime.now(timezone.utc).isoformat()
+        }, on_conflict="uc_id").execute()
+
+    def _faturas_recentes(self, uc_ids: List[int]) -> Dict[int, dict]:
+        """Busca a fatura mais recente de cada UC em uma única consulta"""
+        ano_minimo = datetime.now(timezone.utc).year - 1
+        faturas = self._ler_todas(lambda: self.db.table("faturas").select(
+            "id, uc_id, mes_referencia, ano_referencia, data_leitura, data_vencimento, "
+            "data_pagamento, proxima_leitura:dados_extraidos->>proxima_leitura_data"
+        ).in_("uc_id", uc_ids).gte("ano_referencia", ano_minimo).order(
+            "ano_referencia", desc=True
+        ).order("mes_referencia", desc=True).order("id"))
+
+        recentes: Dict[int, dict] = {}
+        for row in faturas:
+            recentes.setdefault(row["uc_id"], row)
+        return recentes
+
+    def reagendar(self, uc_ids: List[int]) -> Dict[int, str]:
+        """
+        Recalcula o próximo sync das UCs após uma sincronização.
+
+        Args:
+            uc_ids: UCs que acabaram de ser sincronizadas
+
+        Returns:
+            Dict uc_id -> motivo do novo horário
+        """
+        if not uc_ids:
+            return {}
+
+        agora = datetime.now(timezone.utc)
+        recentes = self._faturas_recentes(uc_ids)
+
+        registros = []
+        motivos = {}
+        for uc_id in uc_ids:
+            proximo, prioridade, motivo = calcular_proximo_sync(recentes.get(uc_id), agora)
+            motivos[uc_id] = motivo
+            registros.append({
+                "uc_id": uc_id,
+                "proximo_sync_em": proximo.isoformat(),
+                "prioridade": prioridade,
+                "motivo": motivo,
+                "ultimo_sync_em": agora.isoformat(),
+                "atualizado_em": agora.isoformat()
+            })
+
+        self.db.upsert_em_lote("sync_agenda", registros, on_conflict="uc_id")
+        return motivos
+
+    def adiar(self, uc_ids: List[int], motivo: str = "adiada"):
+        """
+        Tenta as UCs de novo em INTERVALO_ADIADA (CPF pulado neste ciclo
+        por motivo passageiro: renovação adiada, limite de requisições).
+
+        Args:
+            uc_ids: UCs do CPF pulado
+            motivo: Motivo gravado na agenda
+        """
+        if not uc_ids:
+            return
+
+        agora = datetime.now(timezone.utc)
+        self.db.upsert_em_lote("sync_agenda", [
+            {
+                "uc_id": uc_id,
+                "proximo_sync_em": (agora + INTERVALO_ADIADA).isoformat(),
+                "motivo": motivo,
+                "atualizado_em": agora.isoformat()
+            }
+            for uc_id in uc_ids
+        ], on_conflict="uc_id")
+
+    def resumo(self) -> dict:
+        """Retorna tamanho da fila vencida e o próximo horário agendado"""
+        agora = datetime.now(timezone.utc).isoformat()
+        devidas = self.db.table("sync_agenda").select("uc_id", count="exact").lte(
+            "proximo_sync_em", agora
+        ).limit(1).execute()
+        proxima = self.db.table("sync_agenda").select("uc_id, proximo_sync_em, motivo").gt(
+            "proximo_sync_em", agora
+        ).order("proximo_sync_em").limit(1).execute()
+
+        return {
+            "ucs_devidas": devidas.count or 0,
+            "proxima": proxima.data[0] if proxima.data else None
+        }
+
+
+# Instância global da agenda
+sync_agenda = SyncAgenda()
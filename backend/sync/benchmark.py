@@ -0,0 +1,432 @@
+"""
+Sync Benchmark - Mede a vazão de SyncService.sincronizar_todas_ucs sem rede
+Energisa via ReplayAdapter (responses/*.json) e banco em memória com contagem de escritas
+
+Uso:
+    python -m backend.sync.benchmark --cpfs 20 --ucs-por-cpf 3 --latencia-ms 40 120
+    python -m backend.sync.benchmark --cpfs 50 --taxa-erro 0.02 --rodadas 3 --json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from backend.core.database import SupabaseClient
+from backend.energisa.replay import ReplayAdapter, cdc_sintetico, cpf_sintetico, usar_replay
+
+logger = logging.getLogger(__name__)
+
+
+# ========================
+# Banco em memória
+# ========================
+
+class _Resultado:
+    def __init__(self, data: list, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class _Consulta:
+    """Subconjunto do query builder do postgrest usado pela sincronização"""
+
+    def __init__(self, banco: "BancoMemoria", tabela: str):
+        self.banco = banco
+        self.tabela = tabela
+        self.operacao = "select"
+        self.dados = None
+        self.filtros = []
+        self.ordem = []
+        self.limite = None
+        self.inicio = 0
+        self.contar = False
+        self.unico = False
+        self.on_conflict: List[str] = []
+        self.ignorar_duplicados = False
+        self._negar = False
+
+    # Operações
+    def select(self, *colunas, count=None, **kwargs):
+        self.operacao = "select"
+        self.contar = count is not None
+        return self
+
+    def insert(self, dados, **kwargs):
+        self.operacao, self.dados = "insert", dados if isinstance(dados, list) else [dados]
+        return self
+
+    def upsert(self, dados, on_conflict: str = "", ignore_duplicates: bool = False, **kwargs):
+        self.operacao, self.dados = "upsert", dados if isinstance(dados, list) else [dados]
+        self.on_conflict = [c.strip() for c in on_conflict.split(",") if c.strip()]
+        self.ignorar_duplicados = ignore_duplicates
+        return self
+
+    def update(self, dados, **kwargs):
+        self.operacao, self.dados = "update", dados
+        return self
+
+    def delete(self, **kwargs):
+        self.operacao = "delete"
+        return self
+
+    # Filtros
+    def _filtro(self, funcao):
+        negar, self._negar = self._negar, False
+        self.filtros.append((lambda r: not funcao(r)) if negar else funcao)
+        return self
+
+    @property
+    def not_(self):
+        self._negar = True
+        return self
+
+    def eq(self, c, v): return self._filtro(lambda r: r.get(c) == v)
+    def neq(self, c, v): return self._filtro(lambda r: r.get(c) != v)
+    def in_(self, c, v): return self._filtro(lambda r: r.get(c) in set(v))
+    def is_(self, c, v): return self._filtro(lambda r: r.get(c) is None if v in (None, "null") else r.get(c) == v)
+    def lt(self, c, v): return self._filtro(lambda r: r.get(c) is not None and str(r.get(c)) < str(v))
+    def lte(self, c, v): return self._filtro(lambda r: r.get(c) is not None and str(r.get(c)) <= str(v))
+    def gt(self, c, v): return self._filtro(lambda r: r.get(c) is not None and str(r.get(c)) > str(v))
+    def gte(self, c, v): return self._filtro(lambda r: r.get(c) is not None and r.get(c) >= v)
+
+    def order(self, coluna, desc: bool = False, **kwargs):
+        self.ordem.append((coluna, desc))
+        return self
+
+    def limit(self, n):
+        self.limite = n
+        return self
+
+    def range(self, inicio, fim):
+        self.inicio, self.limite = inicio, fim - inicio + 1
+        return self
+
+    def single(self):
+        self.unico = True
+        return self
+
+    def execute(self) -> _Resultado:
+        return self.banco._executar(self)
+
+
+class BancoMemoria:
+    """
+    Banco em memória com a interface usada por SupabaseClient.
+
+    Conta leituras e escritas (requisições) por tabela para o benchmark.
+    """
+
+    def __init__(self):
+        self.tabelas: Dict[str, List[dict]] = {}
+        self.leituras: Counter = Counter()
+        self.escritas: Counter = Counter()
+        self._ids: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def table(self, nome: str) -> _Consulta:
+        return _Consulta(self, nome)
+
+    def rpc(self, fn: str, params: Optional[dict] = None):
+        banco = self
+
+        class _Rpc:
+            def execute(self):
+                banco.escritas[f"rpc:{fn}"] += 1
+                return _Resultado(True)
+        return _Rpc()
+
+    upsert_em_lote = SupabaseClient.upsert_em_lote
+
+    def _novo_id(self, tabela: str) -> int:
+        self._ids[tabela] += 1
+        return self._ids[tabela]
+
+    def _executar(self, q: _Consulta) -> _Resultado:
+        with self._lock:
+            linhas = self.tabelas.setdefault(q.tabela, [])
+            selecionadas = [r for r in linhas if all(f(r) for f in q.filtros)]
+
+            if q.operacao == "select":
+                self.leituras[q.tabela] += 1
+                for coluna, desc in reversed(q.ordem):
+                    selecionadas.sort(key=lambda r: (r.get(coluna) is None, r.get(coluna)), reverse=desc)
+                total = len(selecionadas)
+                selecionadas = selecionadas[q.inicio:]
+                if q.limite is not None:
+                    selecionadas = selecionadas[:q.limite]
+                dados = [dict(r) for r in selecionadas]
+                if q.unico:
+                    return _Resultado(dados[0] if dados else None)
+                return _Resultado(dados, total if q.contar else None)
+
+            self.escritas[q.tabela] += 1
+
+            if q.operacao == "update":
+                for r in selecionadas:
+                    r.update(q.dados)
+                return _Resultado([dict(r) for r in selecionadas])
+
+            if q.operacao == "delete":
+                self.tabelas[q.tabela] = [r for r in linhas if r not in selecionadas]
+                return _Resultado([dict(r) for r in selecionadas])
+
+            gravados = []
+            for registro in q.dados:
+                existente = None
+                if q.operacao == "upsert" and q.on_conflict:
+                    chave = tuple(registro.get(c) for c in q.on_conflict)
+                    existente = next(
+                        (r for r in linhas if tuple(r.get(c) for c in q.on_conflict) == chave), None
+                    )
+                if existente is not None:
+                    if not q.ignorar_duplicados:
+                        existente.update(registro)
+                        gravados.append(dict(existente))
+                    continue
+                novo = {"id": self._novo_id(q.tabela), **self._padroes(q.tabela), **registro}
+                linhas.append(novo)
+                gravados.append(dict(novo))
+            return _Resultado(gravados)
+
+    @staticmethod
+    def _padroes(tabela: str) -> dict:
+        """Defaults de coluna que a sincronização lê de volta"""
+        agora = datetime.now(timezone.utc).isoformat()
+        if tabela == "fila_pdf":
+            return {"status": "pendente", "tentativas": 0, "proxima_tentativa_em": agora, "criado_em": agora}
+        if tabela == "sync_agenda":
+            return {"proximo_sync_em": agora, "prioridade": 3}
+        return {}
+
+    def total_escritas(self) -> int:
+        return sum(self.escritas.values())
+
+    def total_leituras(self) -> int:
+        return sum(self.leituras.values())
+
+
+def popular(banco: BancoMemoria, cpfs: int, ucs_por_cpf: int):
+    """Cria UCs e sessões sintéticas (mesma numeração do ReplayAdapter)"""
+    agora = datetime.now(timezone.utc).isoformat()
+    for i in range(cpfs):
+        cpf = cpf_sintetico(i)
+        banco.tabelas.setdefault("sessoes_energisa", []).append({
+            "cpf": cpf,
+            "cookies": {"utk": "utk", "rtk": "rtk", "accessTokenEnergisa": "utk", "udk": "udk"},
+            "atualizado_em": agora
+        })
+        for j in range(ucs_por_cpf):
+            banco.tabelas.setdefault("unidades_consumidoras", []).append({
+                "id": banco._novo_id("unidades_consumidoras"),
+                "cdc": cdc_sintetico(i, j),
+                "digito_verificador": 0,
+                "cod_empresa": 6,
+                "usuarios": {"cpf": cpf}
+            })
+
+
+# ========================
+# Execução
+# ========================
+
+@contextlib.contextmanager
+def _banco_substituido(banco: BancoMemoria):
+    """Aponta os singletons da sincronização para o banco em memória (PDFs em diretório temporário)"""
+    import backend.energisa.session_manager as session_manager
+    import backend.sync.fila_pdf as fila_pdf_modulo
+    from backend.faturas.blob_store import BlobStoreLocal
+    from backend.sync.agenda import sync_agenda
+    from backend.sync.service import sync_service
+
+    alvos = [
+        (sync_service, "db"), (sync_agenda, "db"), (fila_pdf_modulo.fila_pdf, "db"),
+        (session_manager, "db_admin")
+    ]
+    anteriores = [getattr(obj, attr) for obj, attr in alvos]
+    blob_store_anterior = fila_pdf_modulo.blob_store
+    for obj, attr in alvos:
+        setattr(obj, attr, banco)
+    # Sessões em cache vieram do outro banco
+    session_manager.sessao_cache.limpar()
+    with tempfile.TemporaryDirectory(prefix="benchmark-pdfs-") as diretorio:
+        fila_pdf_modulo.blob_store = BlobStoreLocal(diretorio)
+        try:
+            yield
+        finally:
+            for (obj, attr), anterior in zip(alvos, anteriores):
+                setattr(obj, attr, anterior)
+            fila_pdf_modulo.blob_store = blob_store_anterior
+            session_manager.sessao_cache.limpar()
+
+
+async def executar_benchmark(
+    cpfs: int = 10,
+    ucs_por_cpf: int = 2,
+    rodadas: int = 2,
+    latencia_ms: tuple = (0, 0),
+    taxa_erro: float = 0.0,
+    status_erro: int = 500,
+    taxa_mudanca: float = 0.0,
+    baixar_pdfs: bool = False,
+    semente: Optional[int] = 42
+) -> dict:
+    """
+    Roda sincronizar_todas_ucs contra o replay e o banco em memória.
+
+    Args:
+        cpfs: CPFs sintéticos
+        ucs_por_cpf: UCs por CPF
+        rodadas: Execuções seguidas (a partir da 2ª vale a sincronização delta)
+        latencia_ms: (mínimo, máximo) de latência por requisição HTTP
+        taxa_erro: Fração das chamadas /api com erro injetado
+        status_erro: Status do erro injetado (429/403 exercitam o limitador)
+        taxa_mudanca: Fração dos payloads alterados a cada resposta
+        baixar_pdfs: Processa a fila de PDFs após cada rodada
+        semente: Semente do gerador aleatório
+
+    Returns:
+        Resultado por rodada (UCs/s, escritas por UC, requisições HTTP)
+    """
+    from backend.energisa.limitador import limitador_energisa
+    from backend.sync.fila_pdf import fila_pdf
+    from backend.sync.service import sync_service
+
+    banco = BancoMemoria()
+    popular(banco, cpfs, ucs_por_cpf)
+    adapter = ReplayAdapter(
+        latencia_ms=latencia_ms,
+        taxa_erro=taxa_erro,
+        status_erro=status_erro,
+        taxa_mudanca=taxa_mudanca,
+        ucs_por_cpf=ucs_por_cpf,
+        semente=semente
+    )
+
+    resultados = []
+    with usar_replay(adapter), _banco_substituido(banco):
+        for rodada in range(1, rodadas + 1):
+            escritas_antes = banco.escritas.copy()
+            leituras_antes = banco.total_leituras()
+            http_antes = adapter.requisicoes.copy()
+
+            inicio = time.perf_counter()
+            stats = await sync_service.sincronizar_todas_ucs()
+            duracao = time.perf_counter() - inicio
+
+            pdfs = 0
+            if baixar_pdfs:
+                while True:
+                    processados = await fila_pdf.processar_lote()
+                    if not processados:
+                        break
+                    pdfs += processados
+
+            escritas = banco.escritas - escritas_antes
+            ucs = stats["ucs_processadas"]
+            resultados.append({
+                "rodada": rodada,
+                "ucs_processadas": ucs,
+                "erros": stats["erros"],
+                "duracao_segundos": round(duracao, 3),
+                "ucs_por_segundo": round(ucs / duracao, 2) if duracao > 0 else None,
+                "escritas_db": sum(escritas.values()),
+                "escritas_por_uc": round(sum(escritas.values()) / ucs, 2) if ucs else None,
+                "escritas_por_tabela": dict(escritas),
+                "leituras_db": banco.total_leituras() - leituras_antes,
+                "requisicoes_http": dict(adapter.requisicoes - http_antes),
+                "pdfs_baixados": pdfs,
+                "delta": stats.get("delta"),
+                "latencias": stats.get("latencias"),
+            })
+
+    return {
+        "parametros": {
+            "cpfs": cpfs,
+            "ucs_por_cpf": ucs_por_cpf,
+            "rodadas": rodadas,
+            "latencia_ms": list(latencia_ms),
+            "taxa_erro": taxa_erro,
+            "taxa_mudanca": taxa_mudanca,
+            "concorrencia": sync_service.pool.get_status(),
+        },
+        "erros_injetados": dict(adapter.erros_injetados),
+        "limitador": limitador_energisa.get_status(),
+        "rodadas": resultados
+    }
+
+
+def _imprimir(resultado: dict):
+    p = resultado["parametros"]
+    print(
+        f"\n📊 Benchmark de sincronização: {p['cpfs']} CPFs x {p['ucs_por_cpf']} UCs, "
+        f"latência {p['latencia_ms'][0]}-{p['latencia_ms'][1]}ms, erro {p['taxa_erro']:.1%}, "
+        f"concorrência {p['concorrencia']['max_concorrencia']}"
+    )
+    print(f"{'rodada':>6} {'UCs':>6} {'erros':>6} {'tempo(s)':>9} {'UCs/s':>8} {'escritas':>9} {'escr/UC':>8} {'HTTP':>6}")
+    for r in resultado["rodadas"]:
+        print(
+            f"{r['rodada']:>6} {r['ucs_processadas']:>6} {r['erros']:>6} {r['duracao_segundos']:>9} "
+            f"{r['ucs_por_segundo'] or 0:>8} {r['escritas_db']:>9} {r['escritas_por_uc'] or 0:>8} "
+            f"{sum(r['requisicoes_http'].values()):>6}"
+        )
+    if resultado["erros_injetados"]:
+        print(f"Erros injetados: {resultado['erros_injetados']}")
+    limitador = resultado["limitador"]
+    if limitador["eventos"]:
+        print(f"Limitador: eventos {limitador['eventos']}, taxa global final {limitador['taxa_global']} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline da sincronização Energisa")
+    parser.add_argument("--cpfs", type=int, default=10)
+    parser.add_argument("--ucs-por-cpf", type=int, default=2)
+    parser.add_argument("--rodadas", type=int, default=2)
+    parser.add_argument("--latencia-ms", type=float, nargs=2, default=[0, 0], metavar=("MIN", "MAX"))
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--status-erro", type=int, default=500, help="Ex: 429 para exercitar o limitador")
+    parser.add_argument("--taxa-mudanca", type=float, default=0.0)
+    parser.add_argument("--pdfs", action="store_true", help="Processa a fila de PDFs após cada rodada")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Saída completa em JSON")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs do EnergisaService")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    async def _rodar():
+        return await executar_benchmark(
+            cpfs=args.cpfs,
+            ucs_por_cpf=args.ucs_por_cpf,
+            rodadas=args.rodadas,
+            latencia_ms=tuple(args.latencia_ms),
+            taxa_erro=args.taxa_erro,
+            status_erro=args.status_erro,
+            taxa_mudanca=args.taxa_mudanca,
+            baixar_pdfs=args.pdfs,
+            semente=args.semente
+        )
+
+    if args.verbose:
+        resultado = asyncio.run(_rodar())
+    else:
+        # EnergisaService imprime cada chamada; silencia durante a medição
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = asyncio.run(_rodar())
+
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False, default=str))
+    else:
+        _imprimir(resultado)
+
+
+if __name__ == "__main__":
+    main()
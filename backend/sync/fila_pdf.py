@@ -0,0 +1,421 @@
+"""
+Fila PDF - Download de PDFs de faturas em background
+A sincronização de metadados só enfileira; o worker baixa com retry e backoff
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from backend.config import settings
+from backend.core.database import SupabaseClient
+from backend.energisa.service import EnergisaService
+from backend.faturas.blob_store import blob_store
+
+logger = logging.getLogger(__name__)
+
+
+# Backoff exponencial: 1min, 2min, 4min... limitado a 6h
+BACKOFF_BASE_SEGUNDOS = 60
+BACKOFF_MAX_SEGUNDOS = 6 * 3600
+
+# Tempo que um item fica reservado por um worker antes de voltar à fila
+RESERVA_SEGUNDOS = 600
+
+# CPF sem sessão: tenta de novo depois, sem consumir tentativa
+ADIAMENTO_SEM_SESSAO_SEGUNDOS = 3600
+
+# Item encerrado (erro ou concluido) com a fatura ainda sem PDF: uma nova
+# tentativa por período, sem zerar as tentativas
+REENFILEIRAR_ENCERRADO_SEGUNDOS = 24 * 3600
+
+
+def calcular_backoff(tentativas: int) -> int:
+    """
+    Espera até a próxima tentativa.
+
+    Args:
+        tentativas: Tentativas já feitas (>= 1)
+
+    Returns:
+        Segundos de espera
+    """
+    return min(BACKOFF_BASE_SEGUNDOS * 2 ** max(0, tentativas - 1), BACKOFF_MAX_SEGUNDOS)
+
+
+class FilaPDF:
+    """
+    Fila persistente (tabela fila_pdf) de downloads de PDF.
+
+    - Deduplicação por (uc_id, mes, ano): enfileirar de novo não duplica o
+      item; um item encerrado (erro ou concluido) cuja fatura segue sem PDF
+      só volta para a fila um dia depois de encerrado, mantendo as tentativas
+    - Concorrência limitada por CPF em paralelo; cada download passa pelo
+      pool do SyncService para não disputar a sessão com a sincronização
+    - Só processa no processo que segura o lease do scheduler
+    """
+
+    def __init__(
+        self,
+        concorrencia: int = 2,
+        max_tentativas: int = 6,
+        intervalo_segundos: int = 30,
+        lote: int = 20
+    ):
+        """
+        Args:
+            concorrencia: CPFs baixando PDFs ao mesmo tempo
+            max_tentativas: Tentativas antes de marcar o item como erro
+            intervalo_segundos: Espera entre verificações da fila vazia
+            lote: Itens reservados por verificação
+        """
+        self.db = SupabaseClient(admin=True)
+        self.concorrencia = max(1, concorrencia)
+        self.max_tentativas = max(1, max_tentativas)
+        self.intervalo_segundos = intervalo_segundos
+        self.lote = lote
+        self._task: Optional[asyncio.Task] = None
+        self.baixados = 0
+        self.falhas = 0
+
+    # ========================
+    # Persistência
+    # ========================
+
+    def enfileirar(self, uc_id: int, cpf: str, faturas: List[dict]) -> int:
+        """
+        Enfileira o download dos PDFs de faturas que estão sem PDF.
+
+        - Referência nova: item pendente
+        - Item em erro ou concluido há mais de REENFILEIRAR_ENCERRADO_SEGUNDOS:
+          volta a pendente com o numero_fatura atual, mantendo as tentativas
+          (um item esgotado ganha uma tentativa por período)
+        - Item encerrado há menos tempo: não mexe
+        - Item pendente: só atualiza numero_fatura e CPF, se mudaram
+        - Item em processamento: não mexe
+
+        Args:
+            uc_id: ID da UC
+            cpf: CPF dono da sessão Energisa
+            faturas: Registros sem pdf_baixado_em, com mes_referencia,
+                ano_referencia e numero_fatura
+
+        Returns:
+            Quantidade de itens (re)colocados na fila
+        """
+        faturas = [f for f in faturas if f.get("numero_fatura")]
+        if not faturas:
+            return 0
+
+        atuais = self.db.table("fila_pdf").select(
+            "mes_referencia, ano_referencia, numero_fatura, cpf, status, tentativas, "
+            "proxima_tentativa_em, atualizado_em"
+        ).eq("uc_id", uc_id).in_(
+            "ano_referencia", sorted({f["ano_referencia"] for f in faturas})
+        ).execute().data or []
+        por_referencia = {(i["mes_referencia"], i["ano_referencia"]): i for i in atuais}
+
+        momento = datetime.now(timezone.utc)
+        agora = momento.isoformat()
+        encerrado_ate = momento - timedelta(seconds=REENFILEIRAR_ENCERRADO_SEGUNDOS)
+        registros = []
+        enfileirados = 0
+        for f in faturas:
+            item = por_referencia.get((f["mes_referencia"], f["ano_referencia"]))
+            registro = {
+                "uc_id": uc_id,
+                "mes_referencia": f["mes_referencia"],
+                "ano_referencia": f["ano_referencia"],
+                "numero_fatura": f["numero_fatura"],
+                "cpf": cpf,
+                "status": "pendente",
+                "tentativas": 0,
+                "proxima_tentativa_em": agora,
+                "ultimo_erro": None,
+                "concluido_em": None,
+                "atualizado_em": agora
+            }
+
+            if item is None:
+                enfileirados += 1
+            elif item["status"] in ("erro", "concluido"):
+                if not self._encerrado_antes(item, encerrado_ate):
+                    continue
+                registro["tentativas"] = item["tentativas"]
+                enfileirados += 1
+            elif item["status"] == "processando":
+                continue
+            elif str(item["numero_fatura"]) != str(f["numero_fatura"]) or item["cpf"] != cpf:
+                # Pendente com dados antigos: mantém tentativas e horário
+                registro.update({
+                    "tentativas": item["tentativas"],
+                    "proxima_tentativa_em": item["proxima_tentativa_em"]
+                })
+            else:
+                continue
+
+            registros.append(registro)
+
+        if registros:
+            self.db.table("fila_pdf").upsert(
+                registros,
+                on_conflict="uc_id,mes_referencia,ano_referencia"
+            ).execute()
+        return enfileirados
+
+    @staticmethod
+    def _encerrado_antes(item: dict, limite: datetime) -> bool:
+        """True se o item encerrado foi atualizado antes do limite (ou sem data)"""
+        atualizado = item.get("atualizado_em")
+        if not atualizado:
+            return True
+        return datetime.fromisoformat(atualizado.replace("Z", "+00:00")) < limite
+
+    def reservar(self, limite: int) -> List[dict]:
+        """
+        Reserva itens prontos para download.
+
+        A reserva é condicional (status ainda pendente), então dois workers
+        nunca pegam o mesmo item.
+
+        Args:
+            limite: Máximo de itens
+
+        Returns:
+            Itens reservados
+        """
+        agora = datetime.now(timezone.utc)
+
+        # Itens de um worker que morreu no meio do download voltam para a fila
+        self.db.table("fila_pdf").update({"status": "pendente"}).eq(
+            "status", "processando"
+        ).lt("reservado_ate", agora.isoformat()).execute()
+
+        candidatos = self.db.table("fila_pdf").select("*").eq(
+            "status", "pendente"
+        ).lte("proxima_tentativa_em", agora.isoformat()).order(
+            "proxima_tentativa_em"
+        ).limit(limite).execute()
+
+        reservados = []
+        for item in candidatos.data or []:
+            result = self.db.table("fila_pdf").update({
+                "status": "processando",
+                "reservado_ate": (agora + timedelta(seconds=RESERVA_SEGUNDOS)).isoformat(),
+                "atualizado_em": agora.isoformat()
+            }).eq("id", item["id"]).eq("status", "pendente").execute()
+            if result.data:
+                reservados.append(item)
+
+        return reservados
+
+    def concluir(self, item: dict, pdf_bytes: bytes):
+        """Grava o PDF no blob store, liga o hash à fatura e encerra o item"""
+        agora = datetime.now(timezone.utc).isoformat()
+
+        self.db.table("faturas").update({
+            **blob_store.guardar_pdf(pdf_bytes),
+            "pdf_baixado_em": agora
+        }).eq("uc_id", item["uc_id"]).eq(
+            "mes_referencia", item["mes_referencia"]
+        ).eq("ano_referencia", item["ano_referencia"]).execute()
+
+        self.db.table("fila_pdf").update({
+            "status": "concluido",
+            "tentativas": item["tentativas"] + 1,
+            "ultimo_erro": None,
+            "concluido_em": agora,
+            "atualizado_em": agora
+        }).eq("id", item["id"]).execute()
+
+    def falhar(self, item: dict, erro: str):
+        """Registra a falha e reagenda com backoff (ou encerra como erro)"""
+        agora = datetime.now(timezone.utc)
+        tentativas = item["tentativas"] + 1
+        esgotado = tentativas >= self.max_tentativas
+
+        self.db.table("fila_pdf").update({
+            "status": "erro" if esgotado else "pendente",
+            "tentativas": tentativas,
+            "ultimo_erro": erro[:500],
+            "proxima_tentativa_em": (agora + timedelta(seconds=calcular_backoff(tentativas))).isoformat(),
+            "atualizado_em": agora.isoformat()
+        }).eq("id", item["id"]).execute()
+
+    def adiar(self, item: dict, segundos: int, motivo: str):
+        """Devolve o item à fila sem consumir tentativa"""
+        agora = datetime.now(timezone.utc)
+        self.db.table("fila_pdf").update({
+            "status": "pendente",
+            "ultimo_erro": motivo,
+            "proxima_tentativa_em": (agora + timedelta(seconds=segundos)).isoformat(),
+            "atualizado_em": agora.isoformat()
+        }).eq("id", item["id"]).execute()
+
+    def resumo(self) -> dict:
+        """
+        Profundidade e idade da fila.
+
+        Returns:
+            Contagem por status, idade do item pendente mais antigo e
+            contadores deste processo
+        """
+        contagens = {}
+        for status in ("pendente", "processando", "erro"):
+            result = self.db.table("fila_pdf").select("id", count="exact").eq(
+                "status", status
+            ).limit(1).execute()
+            contagens[status] = result.count or 0
+
+        mais_antigo = self.db.table("fila_pdf").select("criado_em").eq(
+            "status", "pendente"
+        ).order("criado_em").limit(1).execute()
+
+        idade = None
+        if mais_antigo.data:
+            criado = datetime.fromisoformat(mais_antigo.data[0]["criado_em"].replace("Z", "+00:00"))
+            idade = round((datetime.now(timezone.utc) - criado).total_seconds())
+
+        return {
+            **contagens,
+            "idade_max_segundos": idade,
+            "baixados": self.baixados,
+            "falhas": self.falhas,
+            "concorrencia": self.concorrencia
+        }
+
+    # ========================
+    # Processamento
+    # ========================
+
+    def _dados_ucs(self, uc_ids: List[int]) -> Dict[int, dict]:
+        """Busca cdc/dígito/empresa das UCs em uma consulta"""
+        result = self.db.table("unidades_consumidoras").select(
+            "id, cdc, digito_verificador, cod_empresa"
+        ).in_("id", uc_ids).execute()
+
+        return {
+            uc["id"]: {
+                "cdc": uc["cdc"],
+                "digitoVerificadorCdc": uc["digito_verificador"],
+                "codigoEmpresaWeb": uc.get("cod_empresa") or 6
+            }
+            for uc in result.data or []
+        }
+
+    async def _baixar(self, svc: EnergisaService, uc_data: dict, item: dict):
+        """Baixa um PDF e atualiza a fila"""
+        mes = item["mes_referencia"]
+        ano = item["ano_referencia"]
+        try:
+            pdf_bytes = await asyncio.to_thread(svc.download_pdf, uc_data, {
+                "ano": ano,
+                "mes": mes,
+                "numeroFatura": item["numero_fatura"]
+            })
+            if not pdf_bytes:
+                raise Exception("PDF vazio")
+
+            await asyncio.to_thread(self.concluir, item, pdf_bytes)
+            self.baixados += 1
+            logger.debug(f"      📄 PDF baixado para fatura {mes:02d}/{ano} (UC {item['uc_id']})")
+
+        except Exception as e:
+            self.falhas += 1
+            logger.warning(f"      ⚠️ Erro ao baixar PDF {mes:02d}/{ano} (UC {item['uc_id']}): {e}")
+            await asyncio.to_thread(self.falhar, item, str(e))
+
+    async def _processar_cpf(self, cpf: str, itens: List[dict], ucs: Dict[int, dict]):
+        """Baixa os PDFs de um CPF reaproveitando a mesma sessão"""
+        from backend.sync.service import sync_service
+
+        svc = await asyncio.to_thread(EnergisaService, cpf)
+        if not svc.is_authenticated():
+            for item in itens:
+                await asyncio.to_thread(
+                    self.adiar, item, ADIAMENTO_SEM_SESSAO_SEGUNDOS, "Sessão da Energisa expirada"
+                )
+            return
+
+        for item in itens:
+            uc_data = ucs.get(item["uc_id"])
+            if not uc_data:
+                await asyncio.to_thread(self.falhar, item, "UC não encontrada")
+                continue
+            # Um download por vez no slot do CPF: a sincronização do mesmo
+            # CPF pode intercalar entre os PDFs
+            await sync_service.pool.executar(
+                cpf, lambda item=item, uc_data=uc_data: self._baixar(svc, uc_data, item)
+            )
+
+    async def processar_lote(self) -> int:
+        """
+        Reserva e baixa um lote de PDFs.
+
+        Returns:
+            Quantidade de itens processados
+        """
+        itens = await asyncio.to_thread(self.reservar, self.lote)
+        if not itens:
+            return 0
+
+        ucs = await asyncio.to_thread(self._dados_ucs, list({i["uc_id"] for i in itens}))
+
+        por_cpf: Dict[str, List[dict]] = {}
+        for item in itens:
+            por_cpf.setdefault(item["cpf"], []).append(item)
+
+        limite = asyncio.Semaphore(self.concorrencia)
+
+        async def _com_limite(cpf: str, itens_cpf: List[dict]):
+            async with limite:
+                await self._processar_cpf(cpf, itens_cpf, ucs)
+
+        resultados = await asyncio.gather(
+            *(_com_limite(cpf, itens_cpf) for cpf, itens_cpf in por_cpf.items()),
+            return_exceptions=True
+        )
+        for resultado in resultados:
+            if isinstance(resultado, Exception):
+                logger.error(f"❌ Erro ao processar fila de PDFs: {resultado}")
+
+        return len(itens)
+
+    async def _loop(self, lease):
+        """Loop do worker: processa enquanto houver itens prontos"""
+        logger.info(f"📥 Fila de PDFs iniciada (concorrência: {self.concorrencia})")
+
+        while True:
+            try:
+                if lease.is_lider:
+                    processados = await self.processar_lote()
+                    if processados >= self.lote:
+                        continue
+            except Exception as e:
+                logger.error(f"❌ Erro na fila de PDFs: {e}")
+
+            await asyncio.sleep(self.intervalo_segundos)
+
+    def start(self, lease):
+        """
+        Inicia o worker da fila.
+
+        Args:
+            lease: LeaderLease do scheduler (só o líder processa)
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(lease))
+
+    def stop(self):
+        """Para o worker da fila"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+# Instância global da fila
+fila_pdf = FilaPDF(
+    concorrencia=settings.PDF_FILA_CONCORRENCIA,
+    max_tentativas=settings.PDF_FILA_MAX_TENTATIVAS
+)
@@ -0,0 +1,69 @@
+"""
+Sync Métricas - Latência por endpoint da Energisa e por etapa de banco
+As amostras ficam no dict de stats da execução e viram p50/p95/max no final
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """
+    Percentil pelo método nearest-rank.
+
+    Args:
+        valores: Amostras
+        p: Percentil (0-100)
+
+    Returns:
+        Valor do percentil ou None se não houver amostras
+    """
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def resumir_latencias(amostras: Dict[str, List[float]]) -> Dict[str, dict]:
+    """
+    Converte amostras brutas (segundos) em resumo por etapa.
+
+    Returns:
+        Dict etapa -> {n, p50, p95, max, total} em segundos
+    """
+    resumo = {}
+    for etapa, valores in sorted(amostras.items()):
+        if not valores:
+            continue
+        resumo[etapa] = {
+            "n": len(valores),
+            "p50": round(percentil(valores, 50), 3),
+            "p95": round(percentil(valores, 95), 3),
+            "max": round(max(valores), 3),
+            "total": round(sum(valores), 3),
+        }
+    return resumo
+
+
+@contextmanager
+def medir(stats: Optional[dict], etapa: str):
+    """
+    Mede a duração do bloco e guarda a amostra em stats["_amostras"].
+
+    Sem stats (None) apenas executa o bloco.
+
+    Args:
+        stats: Estatísticas da execução
+        etapa: Nome da etapa (ex: "energisa.listar_faturas", "db.faturas_upsert")
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.setdefault("_amostras", {}).setdefault(etapa, []).append(
+                time.perf_counter() - inicio
+            )
@@ -0,0 +1,126 @@
+"""
+Sync Pool - Pool limitado de workers para sincronização concorrente
+CPFs diferentes sincronizam em paralelo; chamadas de um mesmo CPF ficam em ordem
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SyncWorkerPool:
+    """
+    Pool de workers assíncronos com limite global e por CPF.
+
+    - max_concorrencia: quantos jobs (CPFs) rodam ao mesmo tempo no processo
+    - max_por_cpf: quantos jobs do MESMO CPF podem rodar juntos. O padrão (1)
+      serializa tudo que usa a mesma sessão Energisa, já que os cookies de
+      contexto da UC (NumeroUc, Digito...) são compartilhados na sessão.
+      O ciclo do scheduler envia um único job por CPF; o limite vale quando
+      ele se sobrepõe a sync manual, renovação de sessão ou fila de PDFs
+    - Semáforos por CPF só existem enquanto há job rodando ou esperando
+    """
+
+    def __init__(self, max_concorrencia: int = 4, max_por_cpf: int = 1):
+        self.max_concorrencia = max(1, max_concorrencia)
+        self.max_por_cpf = max(1, max_por_cpf)
+        self._global = asyncio.Semaphore(self.max_concorrencia)
+        self._por_cpf: Dict[str, asyncio.Semaphore] = {}
+        self._usos_cpf: Dict[str, int] = {}
+        self._ativos = 0
+        self.pico_ativos = 0
+
+    def _semaforo_cpf(self, cpf: str) -> asyncio.Semaphore:
+        """Retorna (criando se necessário) o semáforo do CPF e conta mais um uso"""
+        sem = self._por_cpf.get(cpf)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_por_cpf)
+            self._por_cpf[cpf] = sem
+        self._usos_cpf[cpf] = self._usos_cpf.get(cpf, 0) + 1
+        return sem
+
+    def _liberar_cpf(self, cpf: str):
+        """Descarta o semáforo do CPF quando nenhum job o usa mais"""
+        usos = self._usos_cpf.get(cpf, 0) - 1
+        if usos > 0:
+            self._usos_cpf[cpf] = usos
+        else:
+            self._usos_cpf.pop(cpf, None)
+            self._por_cpf.pop(cpf, None)
+
+    @property
+    def ativos(self) -> int:
+        """Quantidade de jobs executando neste momento"""
+        return self._ativos
+
+    async def executar(
+        self,
+        cpf: str,
+        job: Callable[[], Awaitable[Any]],
+        prioritario: bool = False
+    ) -> Any:
+        """
+        Executa um job respeitando os limites do pool.
+
+        O semáforo do CPF é adquirido antes do global para que um job
+        aguardando a vez do seu CPF não ocupe uma vaga global.
+
+        Args:
+            cpf: CPF dono da sessão usada pelo job
+            job: Função que retorna a corrotina a executar
+            prioritario: Se True, não espera vaga global (pedidos manuais);
+                continua respeitando o limite do CPF
+
+        Returns:
+            Resultado do job
+        """
+        try:
+            async with self._semaforo_cpf(cpf):
+                if prioritario:
+                    return await self._rodar(job)
+                async with self._global:
+                    return await self._rodar(job)
+        finally:
+            self._liberar_cpf(cpf)
+
+    async def _rodar(self, job: Callable[[], Awaitable[Any]]) -> Any:
+        """Executa o job contabilizando a ocupação do pool"""
+        self._ativos += 1
+        self.pico_ativos = max(self.pico_ativos, self._ativos)
+        try:
+            return await job()
+        finally:
+            self._ativos -= 1
+
+    async def executar_todos(
+        self,
+        jobs: Dict[str, Callable[[], Awaitable[Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Executa um job por CPF e aguarda todos terminarem.
+
+        Args:
+            jobs: Dict CPF -> função que retorna a corrotina do job
+
+        Returns:
+            Dict CPF -> resultado do job (ou a exceção levantada)
+        """
+        self.pico_ativos = self._ativos
+        cpfs = list(jobs.keys())
+        resultados = await asyncio.gather(
+            *(self.executar(cpf, jobs[cpf]) for cpf in cpfs),
+            return_exceptions=True
+        )
+        return dict(zip(cpfs, resultados))
+
+    def get_status(self) -> dict:
+        """Retorna configuração e ocupação atual do pool"""
+        return {
+            "max_concorrencia": self.max_concorrencia,
+            "max_por_cpf": self.max_por_cpf,
+            "ativos": self._ativos,
+            "pico_ativos": self.pico_ativos,
+            "cpfs_com_jobs": len(self._por_cpf),
+        }
@@ -0,0 +1,268 @@
+"""
+Sync Renovação - Renova em background as sessões Energisa antes de expirarem
+Refresh por HTTP e, se falhar, pelo estado do navegador salvo no login (sem novo SMS)
+"""
+
+import asyncio
+import copy
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from backend.config import settings
+from backend.core.database import SupabaseClient
+from backend.energisa.limitador import LimiteEnergisaExcedido
+from backend.energisa.navegadores import PoolNavegadoresEsgotado
+from backend.energisa.service import EnergisaService
+from backend.energisa.session_manager import MAX_SESSION_AGE_HOURS, SessionManager
+
+logger = logging.getLogger(__name__)
+
+
+# Chaves do localStorage do portal que levam os tokens
+CHAVES_TOKENS = ("accessTokenEnergisa", "token", "rtk", "refreshToken", "udk")
+
+# Resultados de renovar()
+RENOVADA = "renovada"
+ADIADA = "adiada"    # não deu agora (pool ocupado, falha passageira): tentar depois
+FALHOU = "falhou"    # sem como renovar (sem storage state ou max_falhas esgotado)
+
+
+def atualizar_storage_state(storage_state: dict, cookies: dict) -> dict:
+    """
+    Copia do storage state com os tokens atuais da sessão.
+
+    Refreshes por HTTP depois do login só atualizam os cookies gravados;
+    o navegador precisa abrir com os tokens mais novos.
+
+    Args:
+        storage_state: Estado gravado no login
+        cookies: Cookies/tokens atuais da sessão
+
+    Returns:
+        Novo storage state (o original não é alterado)
+    """
+    estado = copy.deepcopy(storage_state)
+    for cookie in estado.get("cookies", []):
+        if isinstance(cookies.get(cookie.get("name")), str):
+            cookie["value"] = cookies[cookie["name"]]
+
+    for origem in estado.get("origins", []):
+        for item in origem.get("localStorage", []):
+            if item.get("name") in CHAVES_TOKENS and cookies.get(item["name"]):
+                item["value"] = cookies[item["name"]]
+    return estado
+
+
+class RenovadorSessoes:
+    """
+    Renovação das sessões com storage state antes de completarem
+    MAX_SESSION_AGE_HOURS.
+
+    - Tenta primeiro o refresh por HTTP; se falhar, reabre o portal com o
+      storage state em um navegador do pool
+    - Após max_falhas tentativas seguidas a sessão é deixada expirar
+    - Só processa no processo que segura o lease do scheduler
+    """
+
+    def __init__(
+        self,
+        antecedencia_horas: int = 2,
+        intervalo_segundos: int = 600,
+        lote: int = 10,
+        max_falhas: int = 3
+    ):
+        """
+        Args:
+            antecedencia_horas: Renova sessões a menos disso de expirar
+            intervalo_segundos: Espera entre verificações
+            lote: Sessões renovadas por verificação
+            max_falhas: Tentativas seguidas antes de desistir da sessão
+        """
+        self.db = SupabaseClient(admin=True)
+        self.antecedencia_horas = antecedencia_horas
+        self.intervalo_segundos = intervalo_segundos
+        self.lote = lote
+        self.max_falhas = max(1, max_falhas)
+        self._task: Optional[asyncio.Task] = None
+        self.renovadas_http = 0
+        self.renovadas_navegador = 0
+        self.falhas = 0
+
+    # ========================
+    # Persistência
+    # ========================
+
+    def candidatas(self, limite: int) -> List[str]:
+        """
+        CPFs com sessão perto de expirar (mais antigas primeiro).
+
+        Args:
+            limite: Máximo de sessões
+
+        Returns:
+            CPFs das sessões
+        """
+        idade_minima = timedelta(hours=MAX_SESSION_AGE_HOURS - self.antecedencia_horas)
+        atualizado_antes = (datetime.now(timezone.utc) - idade_minima).isoformat()
+
+        result = self.db.table("sessoes_energisa").select("cpf").lt(
+            "atualizado_em", atualizado_antes
+        ).lt("renovacao_falhas", self.max_falhas).not_.is_(
+            "storage_state", "null"
+        ).order("atualizado_em").limit(limite).execute()
+
+        return [row["cpf"] for row in result.data or []]
+
+    def _marcar_renovada(self, cpf: str):
+        try:
+            self.db.table("sessoes_energisa").update({
+                "renovado_em": datetime.now(timezone.utc).isoformat()
+            }).eq("cpf", cpf).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao marcar sessão renovada: {e}")
+
+    def _registrar_falha(self, cpf: str) -> int:
+        """Soma uma falha seguida à sessão e devolve o total (0 se não deu para gravar)"""
+        try:
+            result = self.db.table("sessoes_energisa").select("renovacao_falhas").eq("cpf", cpf).execute()
+            if result.data:
+                falhas = (result.data[0].get("renovacao_falhas") or 0) + 1
+                self.db.table("sessoes_energisa").update({
+                    "renovacao_falhas": falhas
+                }).eq("cpf", cpf).execute()
+                return falhas
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao registrar falha de renovação: {e}")
+        return 0
+
+    # ========================
+    # Renovação
+    # ========================
+
+    def renovar(self, cpf: str, tentar_http: bool = True) -> str:
+        """
+        Renova a sessão de um CPF sem pedir SMS.
+
+        Args:
+            cpf: CPF limpo
+            tentar_http: False = vai direto ao navegador (o refresh por HTTP
+                acabou de falhar em quem chamou)
+
+        Returns:
+            RENOVADA (sessão renovada e salva), ADIADA (pool ocupado ou
+            falha abaixo de max_falhas: a sessão deve ser mantida) ou FALHOU
+            (não há como renovar: a sessão pode ser descartada)
+        """
+        cookies, storage_state = SessionManager.load_storage_state(cpf)
+        if not cookies:
+            return FALHOU
+
+        svc = EnergisaService(cpf, usar_cache=False)
+        if not svc.cookies:
+            # Sessão já passou da idade máxima: load_session não devolve os cookies
+            svc.cookies = dict(cookies)
+            svc._apply_cookies(svc.cookies)
+
+        try:
+            renovada_http = tentar_http and svc._refresh_token()
+        except LimiteEnergisaExcedido:
+            logger.info(f"⏳ Renovação do CPF {cpf[:3]}*** adiada: limite de requisições")
+            return ADIADA
+
+        if renovada_http:
+            self.renovadas_http += 1
+            self._marcar_renovada(cpf)
+            logger.info(f"🔁 Sessão do CPF {cpf[:3]}*** renovada por HTTP")
+            return RENOVADA
+
+        if not storage_state:
+            self.falhas += 1
+            self._registrar_falha(cpf)
+            return FALHOU
+
+        try:
+            renovada = svc.renovar_com_navegador(atualizar_storage_state(storage_state, svc.cookies))
+        except (PoolNavegadoresEsgotado, LimiteEnergisaExcedido):
+            # Pool ocupado ou limite de requisições: tenta na próxima verificação, sem contar falha
+            logger.info(f"⏳ Renovação do CPF {cpf[:3]}*** adiada: navegadores ocupados ou limite de requisições")
+            return ADIADA
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao renovar sessão pelo navegador: {e}")
+            renovada = False
+
+        if renovada:
+            self.renovadas_navegador += 1
+            self._marcar_renovada(cpf)
+            logger.info(f"🔁 Sessão do CPF {cpf[:3]}*** renovada pelo navegador")
+            return RENOVADA
+
+        self.falhas += 1
+        falhas = self._registrar_falha(cpf)
+        if falhas >= self.max_falhas:
+            return FALHOU
+        logger.info(f"⏳ Renovação do CPF {cpf[:3]}*** falhou ({falhas}/{self.max_falhas}); sessão mantida")
+        return ADIADA
+
+    async def processar_lote(self) -> int:
+        """
+        Renova as sessões mais perto de expirar.
+
+        Returns:
+            Quantidade de sessões tentadas
+        """
+        from backend.sync.service import sync_service
+
+        cpfs = await asyncio.to_thread(self.candidatas, self.lote)
+        for cpf in cpfs:
+            # No slot do CPF: não disputa a sessão com a sincronização
+            await sync_service.pool.executar(cpf, lambda cpf=cpf: asyncio.to_thread(self.renovar, cpf))
+        return len(cpfs)
+
+    async def _loop(self, lease):
+        """Loop do renovador"""
+        logger.info(f"🔁 Renovador de sessões iniciado (antecedência: {self.antecedencia_horas}h)")
+
+        while True:
+            try:
+                # Sem repetir na hora com lote cheio: falhas voltam como candidatas
+                if lease.is_lider:
+                    await self.processar_lote()
+            except Exception as e:
+                logger.error(f"❌ Erro no renovador de sessões: {e}")
+
+            await asyncio.sleep(self.intervalo_segundos)
+
+    def start(self, lease):
+        """
+        Inicia o renovador.
+
+        Args:
+            lease: LeaderLease do scheduler (só o líder renova)
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(lease))
+
+    def stop(self):
+        """Para o renovador"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def get_status(self) -> dict:
+        """Contadores deste processo"""
+        return {
+            "antecedencia_horas": self.antecedencia_horas,
+            "renovadas_http": self.renovadas_http,
+            "renovadas_navegador": self.renovadas_navegador,
+            "falhas": self.falhas,
+        }
+
+
+# Instância global do renovador
+renovador_sessoes = RenovadorSessoes(
+    antecedencia_horas=settings.ENERGISA_RENOVACAO_ANTECEDENCIA_HORAS,
+    intervalo_segundos=settings.ENERGISA_RENOVACAO_INTERVALO_SEGUNDOS,
+    lote=settings.ENERGISA_RENOVACAO_LOTE,
+    max_falhas=settings.ENERGISA_RENOVACAO_MAX_FALHAS
+)
@@ -2,6 +2,8 @@
 Sync Router - Endpoints de sincronização
 """
 
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Annotated
 from pydantic import BaseModel
@@ -28,6 +30,20 @@ class SyncStatusResponse(BaseModel):
     last_stats: dict | None
 
 
+class SyncDiagnosticoResponse(SyncStatusResponse):
+    """Status do scheduler com o diagnóstico de cada componente"""
+    agenda: dict | None = None
+    fila_pdf: dict | None = None
+    fila_extracao: dict | None = None
+    http: dict | None = None
+    tokens: dict | None = None
+    cache: dict | None = None
+    navegadores: dict | None = None
+    logins: dict | None = None
+    renovacao: dict | None = None
+    lease: dict | None = None
+
+
 @router.get(
     "/status",
     response_model=SyncStatusResponse,
@@ -41,6 +57,24 @@ async def get_sync_status(
     return sync_scheduler.get_status()
 
 
+@router.get(
+    "/diagnostico",
+    response_model=SyncDiagnosticoResponse,
+    summary="Diagnóstico da Sincronização",
+    description="Agenda, filas, limitador, caches, navegadores, logins e lease",
+    dependencies=[Depends(require_perfil("superadmin"))]
+)
+async def get_sync_diagnostico(
+    current_user: Annotated[CurrentUser, Depends(get_current_active_user)],
+):
+    """
+    Retorna o diagnóstico da sincronização.
+
+    Requer perfil superadmin.
+    """
+    return await asyncio.to_thread(sync_scheduler.get_diagnostico)
+
+
 @router.post(
     "/executar",
     response_model=SyncResponse,
@@ -117,7 +151,8 @@ async def sincronizar_uc(
         message="UC sincronizada com sucesso",
         stats={
             "uc_atualizada": result.get("uc_atualizada"),
-            "faturas_sincronizadas": result.get("faturas_sincronizadas")
+            "faturas_sincronizadas": result.get("faturas_sincronizadas"),
+            "delta": result.get("delta")
         }
     )
 
@@ -1,52 +1,118 @@
 """
 Sync Scheduler - Agendador de sincronização automática
-Executa a sincronização a cada 10 minutos
+Consulta a sync_agenda e sincroniza só as UCs cujo horário já chegou
 """
 
 import asyncio
 import logging
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
+
+from backend.config import settings
+from backend.core.lease import LeaderLease
 
 logger = logging.getLogger(__name__)
 
 
 class SyncScheduler:
-    """Agendador de sincronização com a Energisa"""
+    """
+    Agendador de sincronização com a Energisa.
+
+    Em vez de sincronizar todas as UCs em intervalo fixo, a cada verificação
+    busca na sync_agenda as UCs vencidas (mais urgentes primeiro) e as
+    sincroniza. O SyncService reagenda cada UC conforme o calendário de
+    leitura/vencimento da sua última fatura.
+
+    Com vários processos (workers uvicorn, réplicas ou o worker dedicado),
+    só o que segura o lease "sync_scheduler" executa ciclos; os demais ficam
+    em espera e assumem quando o lease expira.
+    """
 
-    def __init__(self, interval_minutes: int = 120):
+    # Intervalo para incluir na agenda UCs cadastradas depois da migração
+    INTERVALO_SEMEAR_SEGUNDOS = 600
+
+    def __init__(self, interval_seconds: int = 60, lote_max: int = 50, lease_ttl_seconds: int = 90):
         """
         Args:
-            interval_minutes: Intervalo entre sincronizações em minutos
+            interval_seconds: Intervalo entre verificações da agenda em segundos
+            lote_max: Máximo de UCs sincronizadas por verificação
+            lease_ttl_seconds: Validade do lease de líder sem renovação
         """
-        self.interval_seconds = interval_minutes * 60
+        self.interval_seconds = interval_seconds
+        self.lote_max = lote_max
+        self.lease = LeaderLease("sync_scheduler", ttl_segundos=lease_ttl_seconds)
         self._task: Optional[asyncio.Task] = None
         self._running = False
+        self._acordar: Optional[asyncio.Event] = None
+        self._ultimo_semear = 0.0
         self._last_sync: Optional[datetime] = None
         self._last_stats: Optional[dict] = None
 
-    async def _sync_loop(self):
-        """Loop principal de sincronização"""
+    async def _executar_ciclo(self) -> Tuple[int, bool]:
+        """
+        Sincroniza o próximo lote de UCs vencidas da agenda.
+
+        Returns:
+            Quantidade de UCs retiradas da agenda e se elas foram reagendadas
+        """
+        from backend.sync.agenda import sync_agenda
         from backend.sync.service import sync_service
 
-        logger.info(f"🚀 Scheduler iniciado - Sincronização a cada {self.interval_seconds // 60} minutos")
+        if time.monotonic() - self._ultimo_semear >= self.INTERVALO_SEMEAR_SEGUNDOS:
+            await asyncio.to_thread(sync_agenda.semear)
+            self._ultimo_semear = time.monotonic()
 
-        while self._running:
-            try:
-                logger.info(f"⏰ Executando sincronização programada...")
-                self._last_sync = datetime.now()
+        uc_ids = await asyncio.to_thread(sync_agenda.buscar_devidas, self.lote_max)
+        if not uc_ids:
+            return 0, True
 
-                # Executa sincronização
-                stats = await sync_service.sincronizar_todas_ucs()
-                self._last_stats = stats
+        logger.info(f"⏰ {len(uc_ids)} UCs vencidas na agenda, sincronizando...")
+        self._last_sync = datetime.now()
+        stats = await sync_service.sincronizar_todas_ucs(uc_ids=uc_ids)
+        self._last_stats = stats
+        return len(uc_ids), stats.get("agenda_atualizada", False)
+
+    async def _sync_loop(self):
+        """Loop principal de sincronização"""
+        logger.info(f"🚀 Scheduler iniciado - Agenda verificada a cada {self.interval_seconds}s")
 
-                logger.info(f"✅ Sincronização concluída. Próxima em {self.interval_seconds // 60} minutos.")
+        while self._running:
+            try:
+                # Só o líder sincroniza; os demais esperam o lease expirar
+                lider = self.lease.is_lider or await asyncio.to_thread(self.lease.tentar_adquirir)
+                quantidade, reagendada = await self._executar_ciclo() if lider else (0, True)
+                if quantidade:
+                    logger.info("✅ Lote da agenda concluído.")
+                    # Lote cheio: ainda pode haver UCs vencidas, segue sem esperar.
+                    # Sem reagendar, o mesmo lote voltaria na hora: espera o intervalo
+                    if quantidade >= self.lote_max and reagendada:
+                        continue
+                    if not reagendada:
+                        logger.warning("⚠️ Agenda não foi atualizada; próximo lote só após o intervalo")
 
             except Exception as e:
                 logger.error(f"❌ Erro na sincronização programada: {e}")
 
-            # Aguarda o intervalo
-            await asyncio.sleep(self.interval_seconds)
+            # Aguarda o intervalo ou um pedido de prioridade
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+
+    def priorizar(self, uc_id: int):
+        """
+        Coloca uma UC no topo da agenda e acorda o loop.
+
+        Args:
+            uc_id: ID da UC
+        """
+        from backend.sync.agenda import sync_agenda
+
+        sync_agenda.priorizar(uc_id)
+        if self._acordar:
+            self._acordar.set()
 
     def start(self):
         """Inicia o scheduler"""
@@ -55,26 +121,123 @@ class SyncScheduler:
             return
 
         self._running = True
+        self._acordar = asyncio.Event()
+        self.lease.start()
         self._task = asyncio.create_task(self._sync_loop())
+
+        # Filas de PDFs e de extração e renovação de sessões rodam no mesmo processo e sob o mesmo lease
+        from backend.faturas.fila_extracao import fila_extracao
+        from backend.sync.fila_pdf import fila_pdf
+        from backend.sync.renovacao import renovador_sessoes
+        fila_pdf.start(self.lease)
+        fila_extracao.start(self.lease)
+        renovador_sessoes.start(self.lease)
         logger.info("✅ Sync Scheduler iniciado")
 
     def stop(self):
-        """Para o scheduler"""
+        """Para o scheduler (o lease deixa de ser renovado e expira)"""
         self._running = False
         if self._task:
             self._task.cancel()
             self._task = None
+        self.lease.parar_renovacao()
+
+        from backend.faturas.fila_extracao import fila_extracao
+        from backend.sync.fila_pdf import fila_pdf
+        from backend.sync.renovacao import renovador_sessoes
+        fila_pdf.stop()
+        fila_extracao.stop()
+        renovador_sessoes.stop()
         logger.info("🛑 Sync Scheduler parado")
 
+    async def encerrar(self):
+        """Para o scheduler e libera o lease para outro processo assumir já"""
+        self.stop()
+        await self.lease.stop()
+
     def get_status(self) -> dict:
         """Retorna status do scheduler"""
         return {
             "running": self._running,
-            "interval_minutes": self.interval_seconds // 60,
+            "interval_minutes": max(1, self.interval_seconds // 60),
             "last_sync": self._last_sync.isoformat() if self._last_sync else None,
             "last_stats": self._last_stats
         }
 
+    def get_diagnostico(self) -> dict:
+        """
+        Estado interno da sincronização (agenda, filas, HTTP, sessões, lease).
+
+        Faz consultas bloqueantes ao banco: chamar fora do event loop.
+
+        Returns:
+            Status do scheduler mais o diagnóstico de cada componente
+        """
+        from backend.sync.agenda import sync_agenda
+
+        try:
+            agenda = sync_agenda.resumo()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar agenda: {e}")
+            agenda = None
+
+        from backend.sync.fila_pdf import fila_pdf
+
+        try:
+            fila = fila_pdf.resumo()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar fila de PDFs: {e}")
+            fila = None
+
+        from backend.faturas.fila_extracao import fila_extracao
+
+        try:
+            extracao = fila_extracao.resumo()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar fila de extração: {e}")
+            extracao = None
+
+        from backend.energisa import transporte
+        from backend.energisa.build_id import build_id_cache
+        from backend.energisa.cache import resposta_cache
+        from backend.energisa.caminhos import seletor_caminhos
+        from backend.energisa.limitador import limitador_energisa
+        from backend.energisa.navegadores import navegador_pool
+        from backend.energisa.login_sessoes import registro_logins
+        from backend.energisa.session_manager import sessao_cache
+        from backend.sync.renovacao import renovador_sessoes
+        from backend.energisa.tokens import refresh_coordenador
+
+        lease = self.lease.get_status()
+        try:
+            lease["lider_atual"] = self.lease.lider_atual()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar lease: {e}")
+            lease["lider_atual"] = None
+
+        return {
+            **self.get_status(),
+            "agenda": agenda,
+            "fila_pdf": fila,
+            "fila_extracao": extracao,
+            "http": {
+                **transporte.get_status(),
+                "build_id": build_id_cache.get_status(),
+                "limitador": limitador_energisa.get_status(),
+                "caminhos": seletor_caminhos.get_status(),
+            },
+            "tokens": refresh_coordenador.get_status(),
+            "cache": {**resposta_cache.get_status(), "sessoes": sessao_cache.get_status()},
+            "navegadores": navegador_pool.get_status(),
+            "logins": registro_logins.get_status(),
+            "renovacao": renovador_sessoes.get_status(),
+            "lease": lease
+        }
+
 
 # Instância global do scheduler
-sync_scheduler = SyncScheduler(interval_minutes=10)
+sync_scheduler = SyncScheduler(
+    interval_seconds=settings.SYNC_AGENDA_INTERVALO_SEGUNDOS,
+    lote_max=settings.SYNC_AGENDA_LOTE,
+    lease_ttl_seconds=settings.SYNC_LEASE_TTL_SEGUNDOS
+)
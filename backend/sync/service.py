@@ -1,19 +1,28 @@
 """
 Sync Service - Serviço de sincronização automática com a Energisa
-Executa a cada 10 minutos para manter os dados atualizados
+Executado pelo scheduler conforme a agenda de cada UC (sync_agenda)
 """
 
 import asyncio
 import logging
-import base64
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional, Tuple
 from decimal import Decimal
 import re
+import time
+import json
+import hashlib
 
+from backend.config import settings
 from backend.core.database import SupabaseClient
+from backend.energisa.limitador import LimiteEnergisaExcedido
 from backend.energisa.service import EnergisaService
 from backend.energisa.session_manager import SessionManager
+from backend.sync.pool import SyncWorkerPool
+from backend.sync.agenda import sync_agenda
+from backend.sync.fila_pdf import fila_pdf
+from backend.sync.renovacao import FALHOU, RENOVADA, renovador_sessoes
+from backend.sync.metricas import medir, resumir_latencias
 
 logger = logging.getLogger(__name__)
 
@@ -58,17 +67,55 @@ def parse_date(date_str: str) -> Optional[str]:
         return None
 
 
+def payload_hash(payload) -> str:
+    """
+    Gera hash estável (SHA-256) de um payload da Energisa.
+
+    A serialização é normalizada (chaves ordenadas, sem espaços), então o
+    mesmo conteúdo gera sempre o mesmo hash, independente da ordem dos campos.
+
+    Args:
+        payload: Dict/lista retornado pela API
+
+    Returns:
+        Hash hexadecimal (64 caracteres)
+    """
+    normalizado = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(normalizado.encode("utf-8")).hexdigest()
+
+
+def _contar_delta(stats: Optional[dict], tipo: str, alterados: int = 0, inalterados: int = 0):
+    """Acumula contadores de registros alterados/inalterados em stats["delta"]"""
+    if stats is None:
+        return
+    delta = stats.setdefault("delta", {})
+    contadores = delta.setdefault(tipo, {"alterados": 0, "inalterados": 0})
+    contadores["alterados"] += alterados
+    contadores["inalterados"] += inalterados
+
+
 class SyncService:
     """Serviço de sincronização de dados com a Energisa"""
 
     def __init__(self):
         self.db = SupabaseClient(admin=True)  # Usa admin para bypass RLS
         self._running = False
+        self.pool = SyncWorkerPool(
+            max_concorrencia=settings.SYNC_MAX_CONCORRENCIA,
+            max_por_cpf=settings.SYNC_MAX_CONCORRENCIA_POR_CPF
+        )
 
-    async def sincronizar_todas_ucs(self) -> dict:
+    async def sincronizar_todas_ucs(self, uc_ids: Optional[List[int]] = None) -> dict:
         """
         Sincroniza todas as UCs que possuem sessão ativa na Energisa.
 
+        Ao final, as UCs processadas são reagendadas na sync_agenda.
+
+        Args:
+            uc_ids: Restringe a sincronização a estas UCs (usado pelo scheduler)
+
         Returns:
             dict com estatísticas da sincronização
         """
@@ -80,15 +127,30 @@ class SyncService:
             "faturas_sincronizadas": 0,
             "gd_sincronizados": 0,
             "erros": 0,
+            "cpfs_processados": 0,
+            "cpfs_ignorados": 0,
             "inicio": datetime.now(timezone.utc).isoformat(),
-            "fim": None
+            "fim": None,
+            "duracao_segundos": None,
+            "ucs_por_minuto": None,
+            "concorrencia": None,
+            "delta": {},
+            "pdfs_enfileirados": 0,
+            "cpfs": {},
+            "_adiadas": [],
+            "agenda_atualizada": False
         }
+        inicio = time.monotonic()
 
         try:
             # Busca todas as UCs com seus usuários
-            result = self.db.table("unidades_consumidoras").select(
+            query = self.db.table("unidades_consumidoras").select(
                 "*, usuarios!inner(cpf)"
-            ).execute()
+            )
+            if uc_ids is not None:
+                query = query.in_("id", uc_ids)
+            with medir(stats, "db.buscar_ucs"):
+                result = await asyncio.to_thread(query.execute)
 
             ucs = result.data or []
             logger.info(f"   📋 {len(ucs)} UCs encontradas para sincronizar")
@@ -103,77 +165,42 @@ class SyncService:
                         ucs_por_cpf[cpf_limpo] = []
                     ucs_por_cpf[cpf_limpo].append(uc)
 
-            # Processa cada CPF
-            for cpf, ucs_do_cpf in ucs_por_cpf.items():
-                try:
-                    # Verifica se existe sessão ativa para este CPF
-                    cookies = SessionManager.load_session(cpf)
-                    if not cookies:
-                        logger.debug(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: sem sessão ativa")
-                        continue
-
-                    svc = EnergisaService(cpf)
-                    if not svc.is_authenticated():
-                        logger.debug(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: sessão expirada")
-                        continue
-
-                    # Faz refresh token ANTES de começar a sincronizar
-                    logger.info(f"   🔄 Renovando token para CPF {cpf[:3]}***{cpf[-2:]}...")
-                    if not svc._refresh_token():
-                        logger.warning(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: falha no refresh - invalidando sessão")
-                        # Invalida a sessão para que o usuário saiba que precisa fazer login novamente
-                        SessionManager.delete_session(cpf)
-                        continue
-
-                    logger.info(f"   👤 Processando CPF {cpf[:3]}***{cpf[-2:]} ({len(ucs_do_cpf)} UCs)")
-
-                    for uc in ucs_do_cpf:
-                        try:
-                            stats["ucs_processadas"] += 1
-
-                            # Sincroniza dados da UC
-                            uc_atualizada = await self._sincronizar_uc(svc, uc)
-                            if uc_atualizada:
-                                stats["ucs_atualizadas"] += 1
+            # Sessões de todos os CPFs em uma consulta (os CPFs leem do cache depois)
+            with medir(stats, "db.sessoes"):
+                await asyncio.to_thread(SessionManager.load_sessions, list(ucs_por_cpf))
 
-                            # Sincroniza faturas da UC
-                            faturas_sync = await self._sincronizar_faturas(svc, uc)
-                            stats["faturas_sincronizadas"] += faturas_sync
-
-                            # Sincroniza dados de GD da UC
-                            gd_sync = await self._sincronizar_gd(svc, uc)
-                            stats["gd_sincronizados"] += gd_sync
-
-                        except Exception as e:
-                            error_msg = str(e).lower()
-                            # Se for erro de autenticação, tenta refresh e retry uma vez
-                            if "401" in error_msg or "unauthorized" in error_msg or "token" in error_msg:
-                                logger.warning(f"   🔄 Token expirado durante sync da UC {uc.get('cdc')}, tentando refresh...")
-                                if svc._refresh_token():
-                                    try:
-                                        # Retry após refresh
-                                        uc_atualizada = await self._sincronizar_uc(svc, uc)
-                                        if uc_atualizada:
-                                            stats["ucs_atualizadas"] += 1
-                                        faturas_sync = await self._sincronizar_faturas(svc, uc)
-                                        stats["faturas_sincronizadas"] += faturas_sync
-                                        gd_sync = await self._sincronizar_gd(svc, uc)
-                                        stats["gd_sincronizados"] += gd_sync
-                                        continue  # Sucesso no retry
-                                    except Exception as retry_err:
-                                        logger.warning(f"   ⚠️ Retry falhou para UC {uc.get('cdc')}: {retry_err}")
-
-                            logger.warning(f"   ⚠️ Erro ao sincronizar UC {uc.get('cdc')}: {e}")
-                            stats["erros"] += 1
+            # Processa os CPFs em paralelo (limitado pelo pool)
+            jobs = {
+                cpf: (lambda cpf=cpf, ucs_do_cpf=ucs_do_cpf: self._sincronizar_cpf_medido(cpf, ucs_do_cpf, stats))
+                for cpf, ucs_do_cpf in ucs_por_cpf.items()
+            }
+            resultados = await self.pool.executar_todos(jobs)
 
-                except Exception as e:
-                    logger.error(f"   ❌ Erro ao processar CPF {cpf[:3]}***: {e}")
+            for cpf, resultado in resultados.items():
+                if isinstance(resultado, Exception):
+                    logger.error(f"   ❌ Erro ao processar CPF {cpf[:3]}***: {resultado}")
                     stats["erros"] += 1
 
+            # Recalcula o próximo sync de cada UC pelo calendário de leitura.
+            # UCs pedidas pelo scheduler são sempre reagendadas (mesmo sem CPF),
+            # senão voltariam vencidas no próximo ciclo
+            agendadas = uc_ids if uc_ids is not None else [uc["id"] for uc in ucs]
+            with medir(stats, "db.agenda"):
+                await asyncio.to_thread(sync_agenda.reagendar, agendadas)
+                # CPFs pulados por motivo passageiro voltam logo, não no calendário
+                await asyncio.to_thread(sync_agenda.adiar, stats["_adiadas"])
+            stats["agenda_atualizada"] = True
+
         except Exception as e:
             logger.error(f"❌ Erro geral na sincronização: {e}")
             stats["erros"] += 1
 
+        duracao = time.monotonic() - inicio
+        stats["duracao_segundos"] = round(duracao, 2)
+        stats["ucs_por_minuto"] = round(stats["ucs_processadas"] / duracao * 60, 2) if duracao > 0 else None
+        stats["concorrencia"] = self.pool.get_status()
+        stats["latencias"] = resumir_latencias(stats.pop("_amostras", {}))
+        stats["ucs_adiadas"] = len(stats.pop("_adiadas", []))
         stats["fim"] = datetime.now(timezone.utc).isoformat()
 
         logger.info(
@@ -182,18 +209,207 @@ class SyncService:
             f"{stats['ucs_atualizadas']} atualizadas, "
             f"{stats['faturas_sincronizadas']} faturas, "
             f"{stats['gd_sincronizados']} registros GD, "
-            f"{stats['erros']} erros"
+            f"{stats['erros']} erros "
+            f"({stats['duracao_segundos']}s, {stats['ucs_por_minuto']} UCs/min)"
+        )
+
+        await asyncio.to_thread(
+            self._registrar_execucao, stats, "agenda" if uc_ids is not None else "completa"
         )
 
         return stats
 
-    async def _sincronizar_uc(self, svc: EnergisaService, uc: dict) -> bool:
+    def _registrar_execucao(self, stats: dict, origem: str):
+        """
+        Persiste a execução em sync_execucoes (histórico e tendências).
+
+        Args:
+            stats: Estatísticas finais da execução
+            origem: "agenda" (scheduler) ou "completa" (todas as UCs)
+        """
+        try:
+            self.db.table("sync_execucoes").insert({
+                "origem": origem,
+                "inicio": stats["inicio"],
+                "fim": stats["fim"],
+                "duracao_segundos": stats["duracao_segundos"],
+                "ucs_processadas": stats["ucs_processadas"],
+                "ucs_atualizadas": stats["ucs_atualizadas"],
+                "faturas_sincronizadas": stats["faturas_sincronizadas"],
+                "gd_sincronizados": stats["gd_sincronizados"],
+                "erros": stats["erros"],
+                "cpfs_processados": stats["cpfs_processados"],
+                "cpfs_ignorados": stats["cpfs_ignorados"],
+                "latencias": stats["latencias"],
+                "cpfs": stats["cpfs"],
+                "delta": stats["delta"],
+            }).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao registrar histórico da sincronização: {e}")
+
+    async def _sincronizar_cpf_medido(self, cpf: str, ucs_do_cpf: list, stats: dict) -> bool:
+        """Executa _sincronizar_cpf registrando a duração do CPF em stats["cpfs"]"""
+        inicio = time.monotonic()
+        processado = False
+        try:
+            processado = await self._sincronizar_cpf(cpf, ucs_do_cpf, stats)
+            return processado
+        finally:
+            stats["cpfs"][f"{cpf[:3]}***{cpf[-2:]}"] = {
+                "ucs": len(ucs_do_cpf),
+                "processado": processado,
+                "duracao_segundos": round(time.monotonic() - inicio, 2),
+            }
+
+    async def _renovar_ou_invalidar(self, cpf: str) -> Tuple[Optional[EnergisaService], str]:
+        """
+        Refresh por HTTP falhou: tenta renovar pelo estado do navegador salvo
+        no login antes de invalidar a sessão.
+
+        A sessão só é removida quando não há como renová-la (FALHOU); se a
+        renovação foi só adiada, ela fica para a próxima tentativa.
+
+        Args:
+            cpf: CPF limpo
+
+        Returns:
+            Tupla (EnergisaService com os tokens novos ou None, resultado da
+            renovação: RENOVADA, ADIADA ou FALHOU)
+        """
+        resultado = await asyncio.to_thread(renovador_sessoes.renovar, cpf, False)
+        if resultado == RENOVADA:
+            return await asyncio.to_thread(EnergisaService, cpf, usar_cache=False), resultado
+
+        if resultado == FALHOU:
+            await asyncio.to_thread(SessionManager.delete_session, cpf)
+        return None, resultado
+
+    @staticmethod
+    def _erro_renovacao(resultado: str) -> str:
+        """Mensagem ao usuário quando a sessão não pôde ser renovada"""
+        if resultado == FALHOU:
+            return "Sessão expirada. Faça login novamente na Energisa."
+        return "Não foi possível renovar a sessão da Energisa agora. Tente novamente em alguns minutos."
+
+    async def _sincronizar_cpf(self, cpf: str, ucs_do_cpf: list, stats: dict) -> bool:
+        """
+        Sincroniza todas as UCs de um CPF usando uma única sessão Energisa.
+
+        As UCs do CPF são processadas em sequência (a sessão guarda o contexto
+        da UC em cookies); o paralelismo acontece entre CPFs, via pool.
+
+        Args:
+            cpf: CPF limpo (apenas números)
+            ucs_do_cpf: UCs do banco pertencentes ao CPF
+            stats: Dict de estatísticas da execução (atualizado in-place)
+
+        Returns:
+            True se o CPF foi processado, False se foi ignorado
+        """
+        # Verifica se existe sessão ativa para este CPF
+        with medir(stats, "db.sessao"):
+            cookies = await asyncio.to_thread(SessionManager.load_session, cpf)
+        if not cookies:
+            logger.debug(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: sem sessão ativa")
+            stats["cpfs_ignorados"] += 1
+            return False
+
+        svc = await asyncio.to_thread(EnergisaService, cpf, usar_cache=False)
+        if not svc.is_authenticated():
+            logger.debug(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: sessão expirada")
+            stats["cpfs_ignorados"] += 1
+            return False
+
+        # Renova o token ANTES de começar a sincronizar (só se estiver perto de expirar)
+        logger.info(f"   🔄 Verificando token para CPF {cpf[:3]}***{cpf[-2:]}...")
+        try:
+            with medir(stats, "energisa.refresh_token"):
+                renovado = await asyncio.to_thread(svc.garantir_token)
+        except LimiteEnergisaExcedido:
+            # Limitador local recusou: a sessão está boa, só tenta mais tarde
+            logger.info(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: limite de requisições - fica para o próximo ciclo")
+            stats.setdefault("_adiadas", []).extend(uc["id"] for uc in ucs_do_cpf)
+            stats["cpfs_ignorados"] += 1
+            return False
+        if not renovado:
+            with medir(stats, "energisa.renovacao"):
+                svc, resultado = await self._renovar_ou_invalidar(cpf)
+            if svc is None:
+                if resultado == FALHOU:
+                    logger.warning(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: falha no refresh - sessão invalidada")
+                else:
+                    logger.info(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: renovação adiada - fica para o próximo ciclo")
+                    stats.setdefault("_adiadas", []).extend(uc["id"] for uc in ucs_do_cpf)
+                stats["cpfs_ignorados"] += 1
+                return False
+
+        logger.info(f"   👤 Processando CPF {cpf[:3]}***{cpf[-2:]} ({len(ucs_do_cpf)} UCs)")
+        stats["cpfs_processados"] += 1
+
+        for posicao, uc in enumerate(ucs_do_cpf):
+            limitado = False
+            try:
+                stats["ucs_processadas"] += 1
+
+                # Sincroniza dados da UC
+                uc_atualizada = await self._sincronizar_uc(svc, uc, stats)
+                if uc_atualizada:
+                    stats["ucs_atualizadas"] += 1
+
+                # Sincroniza faturas da UC
+                faturas_sync = await self._sincronizar_faturas(svc, uc, stats)
+                stats["faturas_sincronizadas"] += faturas_sync
+
+                # Sincroniza dados de GD da UC
+                gd_sync = await self._sincronizar_gd(svc, uc, stats)
+                stats["gd_sincronizados"] += gd_sync
+
+            except LimiteEnergisaExcedido:
+                limitado = True
+            except Exception as e:
+                error_msg = str(e).lower()
+                # Se for erro de autenticação, tenta refresh e retry uma vez
+                if "401" in error_msg or "unauthorized" in error_msg or "token" in error_msg:
+                    logger.warning(f"   🔄 Token expirado durante sync da UC {uc.get('cdc')}, tentando refresh...")
+                    try:
+                        if await asyncio.to_thread(svc._refresh_token):
+                            # Retry após refresh
+                            uc_atualizada = await self._sincronizar_uc(svc, uc, stats)
+                            if uc_atualizada:
+                                stats["ucs_atualizadas"] += 1
+                            faturas_sync = await self._sincronizar_faturas(svc, uc, stats)
+                            stats["faturas_sincronizadas"] += faturas_sync
+                            gd_sync = await self._sincronizar_gd(svc, uc, stats)
+                            stats["gd_sincronizados"] += gd_sync
+                            continue  # Sucesso no retry
+                    except LimiteEnergisaExcedido:
+                        limitado = True
+                    except Exception as retry_err:
+                        logger.warning(f"   ⚠️ Retry falhou para UC {uc.get('cdc')}: {retry_err}")
+
+                if not limitado:
+                    logger.warning(f"   ⚠️ Erro ao sincronizar UC {uc.get('cdc')}: {e}")
+                    stats["erros"] += 1
+
+            if limitado:
+                # Limitador local recusou: esta UC e as seguintes ficam para daqui a pouco
+                logger.info(f"   ⏭️ CPF {cpf[:3]}***{cpf[-2:]}: limite de requisições - {len(ucs_do_cpf) - posicao} UCs adiadas")
+                stats.setdefault("_adiadas", []).extend(u["id"] for u in ucs_do_cpf[posicao:])
+                break
+
+        return True
+
+    async def _sincronizar_uc(self, svc: EnergisaService, uc: dict, stats: Optional[dict] = None) -> bool:
         """
         Sincroniza informações de uma UC com a Energisa.
 
+        Se o payload da Energisa for idêntico ao da última sincronização
+        (mesmo dados_api_hash), só ultima_sincronizacao é atualizada.
+
         Args:
             svc: Serviço Energisa autenticado
             uc: Dados da UC do banco
+            stats: Estatísticas da execução (recebe contadores de delta)
 
         Returns:
             True se houve atualização
@@ -213,7 +429,8 @@ class SyncService:
                 "codigoEmpresaWeb": empresa
             }
 
-            info = await asyncio.to_thread(svc.get_uc_info, uc_data)
+            with medir(stats, "energisa.get_uc_info"):
+                info = await asyncio.to_thread(svc.get_uc_info, uc_data)
 
             if not info or info.get("errored"):
                 logger.warning(f"      ⚠️ Não foi possível obter info da UC {cdc}")
@@ -224,9 +441,21 @@ class SyncService:
             if not infos:
                 return False
 
+            novo_hash = payload_hash(infos)
+            if uc.get("dados_api_hash") == novo_hash:
+                # Nada mudou: grava apenas o marcador de verificação
+                with medir(stats, "db.uc_update"):
+                    await asyncio.to_thread(self.db.table("unidades_consumidoras").update({
+                        "ultima_sincronizacao": datetime.now(timezone.utc).isoformat()
+                    }).eq("id", uc_id).execute)
+                _contar_delta(stats, "ucs", inalterados=1)
+                logger.debug(f"      ⏸️ UC {cdc} sem alterações")
+                return False
+
             # Prepara dados para atualização
             update_data = {
-                "ultima_sincronizacao": datetime.now(timezone.utc).isoformat()
+                "ultima_sincronizacao": datetime.now(timezone.utc).isoformat(),
+                "dados_api_hash": novo_hash
             }
 
             # Mapeia campos da API para o banco
@@ -269,25 +498,34 @@ class SyncService:
             if "geracaoDistribuida" in infos:
                 update_data["is_geradora"] = infos["geracaoDistribuida"] is not None
 
-            # Atualiza no banco
-            self.db.table("unidades_consumidoras").update(
-                update_data
-            ).eq("id", uc_id).execute()
+            # Atualiza no banco (PostgREST síncrono: fora do event loop, como a Energisa)
+            with medir(stats, "db.uc_update"):
+                await asyncio.to_thread(self.db.table("unidades_consumidoras").update(
+                    update_data
+                ).eq("id", uc_id).execute)
+            _contar_delta(stats, "ucs", alterados=1)
 
             logger.debug(f"      ✅ UC {cdc} atualizada")
             return True
 
+        except LimiteEnergisaExcedido:
+            raise
         except Exception as e:
             logger.error(f"      ❌ Erro ao sincronizar UC {cdc}: {e}")
             return False
 
-    async def _sincronizar_faturas(self, svc: EnergisaService, uc: dict) -> int:
+    async def _sincronizar_faturas(self, svc: EnergisaService, uc: dict, stats: Optional[dict] = None) -> int:
         """
         Sincroniza faturas de uma UC com a Energisa.
 
+        Só são gravadas as faturas cujo payload mudou (dados_api_hash
+        diferente do armazenado). PDFs faltantes são enfileirados na
+        fila_pdf em vez de baixados aqui.
+
         Args:
             svc: Serviço Energisa autenticado
             uc: Dados da UC do banco
+            stats: Estatísticas da execução (recebe contadores de delta)
 
         Returns:
             Número de faturas sincronizadas
@@ -307,7 +545,8 @@ class SyncService:
             }
 
             # Executa em thread para não bloquear o event loop
-            faturas = await asyncio.to_thread(svc.listar_faturas, uc_data)
+            with medir(stats, "energisa.listar_faturas"):
+                faturas = await asyncio.to_thread(svc.listar_faturas, uc_data)
 
             if not faturas:
                 logger.debug(f"      ℹ️ Nenhuma fatura encontrada para UC {cdc}")
@@ -322,108 +561,75 @@ class SyncService:
 
             logger.debug(f"      📄 Processando {len(faturas_ordenadas)} faturas mais recentes (de {len(faturas)} total)")
 
-            faturas_salvas = 0
-
+            # Monta todos os registros da UC antes de gravar
+            registros = []
             for fatura_api in faturas_ordenadas:
                 try:
-                    # Prepara dados da fatura
-                    mes = fatura_api.get("mesReferencia")
-                    ano = fatura_api.get("anoReferencia")
-
-                    if not mes or not ano:
-                        continue
-
-                    fatura_data = {
-                        "uc_id": uc_id,
-                        "numero_fatura": fatura_api.get("numeroFatura"),
-                        "mes_referencia": mes,
-                        "ano_referencia": ano,
-                        "valor_fatura": fatura_api.get("valorFatura", 0),
-                        "valor_liquido": fatura_api.get("valorLiquido"),
-                        "consumo": fatura_api.get("consumo"),
-                        "leitura_atual": fatura_api.get("leituraAtual"),
-                        "leitura_anterior": fatura_api.get("leituraAnterior"),
-                        "media_consumo": fatura_api.get("mediaConsumo"),
-                        "quantidade_dias": fatura_api.get("quantidadeDiaConsumo"),
-                        "valor_iluminacao_publica": fatura_api.get("valorIluminacaoPublica"),
-                        "valor_icms": fatura_api.get("valorICMS"),
-                        "bandeira_tarifaria": fatura_api.get("bandeiraTarifaria"),
-                        "data_leitura": parse_date(fatura_api.get("dataLeitura")),
-                        "data_vencimento": parse_date(fatura_api.get("dataVencimento")),
-                        "data_pagamento": parse_date(fatura_api.get("dataPagamento")),
-                        "indicador_situacao": fatura_api.get("indicadorSituacao"),
-                        "indicador_pagamento": fatura_api.get("indicadorPagamento"),
-                        "situacao_pagamento": fatura_api.get("situacaoPagamento"),
-                        "qr_code_pix": fatura_api.get("qrCodePix"),
-                        "qr_code_pix_image": fatura_api.get("qrCodePixImage64"),
-                        "codigo_barras": fatura_api.get("codigoBarras"),
-                        "dados_api": fatura_api,
-                        "sincronizado_em": datetime.now(timezone.utc).isoformat()
-                    }
-
-                    # Remove valores None
-                    fatura_data = {k: v for k, v in fatura_data.items() if v is not None}
-
-                    # Verifica se já tem PDF baixado
-                    existing_fatura = self.db.table("faturas").select(
-                        "id, pdf_base64"
-                    ).eq("uc_id", uc_id).eq(
-                        "mes_referencia", mes
-                    ).eq("ano_referencia", ano).execute()
+                    registro = self._montar_registro_fatura(uc_id, fatura_api)
+                    if registro:
+                        registros.append(registro)
+                except Exception as e:
+                    logger.warning(f"      ⚠️ Erro ao preparar fatura: {e}")
 
-                    has_pdf = existing_fatura.data and existing_fatura.data[0].get("pdf_base64")
+            if not registros:
+                return 0
 
-                    # Upsert (insert ou update)
-                    self.db.table("faturas").upsert(
-                        fatura_data,
+            # Uma única consulta traz hash e presença de PDF de cada referência
+            with medir(stats, "db.faturas_estado"):
+                existentes = await asyncio.to_thread(self._estado_faturas, uc_id, registros)
+
+            alterados = [
+                r for r in registros
+                if existentes.get((r["mes_referencia"], r["ano_referencia"]), {}).get("dados_api_hash")
+                != r["dados_api_hash"]
+            ]
+
+            # Upsert em lote (insert ou update) apenas do que mudou
+            if alterados:
+                with medir(stats, "db.faturas_upsert"):
+                    await asyncio.to_thread(
+                        self.db.upsert_em_lote,
+                        "faturas",
+                        alterados,
                         on_conflict="uc_id,mes_referencia,ano_referencia"
-                    ).execute()
-
-                    faturas_salvas += 1
-
-                    # Baixa PDF se ainda não tem
-                    if not has_pdf and fatura_api.get("numeroFatura"):
-                        try:
-                            pdf_request_data = {
-                                "ano": ano,
-                                "mes": mes,
-                                "numeroFatura": fatura_api.get("numeroFatura")
-                            }
-                            pdf_bytes = await asyncio.to_thread(
-                                svc.download_pdf, uc_data, pdf_request_data
-                            )
-
-                            if pdf_bytes:
-                                pdf_base64_str = base64.b64encode(pdf_bytes).decode('utf-8')
-
-                                self.db.table("faturas").update({
-                                    "pdf_base64": pdf_base64_str,
-                                    "pdf_baixado_em": datetime.now(timezone.utc).isoformat()
-                                }).eq("uc_id", uc_id).eq(
-                                    "mes_referencia", mes
-                                ).eq("ano_referencia", ano).execute()
-
-                                logger.debug(f"      📄 PDF baixado para fatura {mes:02d}/{ano}")
-                        except Exception as pdf_err:
-                            logger.warning(f"      ⚠️ Erro ao baixar PDF {mes:02d}/{ano}: {pdf_err}")
-
-                except Exception as e:
-                    logger.warning(f"      ⚠️ Erro ao salvar fatura: {e}")
+                    )
+            _contar_delta(stats, "faturas", alterados=len(alterados), inalterados=len(registros) - len(alterados))
+            faturas_salvas = len(registros)
+
+            # PDFs faltantes vão para a fila de download (worker em background)
+            sem_pdf = [
+                r for r in registros
+                if not existentes.get((r["mes_referencia"], r["ano_referencia"]), {}).get("pdf_baixado_em")
+            ]
+            if sem_pdf:
+                try:
+                    with medir(stats, "db.fila_pdf"):
+                        enfileirados = await asyncio.to_thread(fila_pdf.enfileirar, uc_id, svc.cpf, sem_pdf)
+                    if stats is not None:
+                        stats["pdfs_enfileirados"] = stats.get("pdfs_enfileirados", 0) + enfileirados
+                except Exception as fila_err:
+                    logger.warning(f"      ⚠️ Erro ao enfileirar PDFs da UC {cdc}: {fila_err}")
 
             logger.debug(f"      ✅ {faturas_salvas} faturas sincronizadas para UC {cdc}")
             return faturas_salvas
 
+        except LimiteEnergisaExcedido:
+            raise
         except Exception as e:
             logger.error(f"      ❌ Erro ao sincronizar faturas da UC {cdc}: {e}")
             return 0
 
-    async def _sincronizar_gd(self, svc: EnergisaService, uc: dict) -> int:
+    async def _sincronizar_gd(self, svc: EnergisaService, uc: dict, stats: Optional[dict] = None) -> int:
         """
         Sincroniza histórico de Geração Distribuída de uma UC.
 
+        Só são gravados os meses cujo payload mudou (dados_api_hash
+        diferente do armazenado).
+
         Args:
             svc: Serviço Energisa autenticado
             uc: Dados da UC do banco
+            stats: Estatísticas da execução (recebe contadores de delta)
 
         Returns:
             Número de registros de GD sincronizados
@@ -443,7 +649,8 @@ class SyncService:
             }
 
             # Busca detalhes de GD (histórico de 13 meses) - em thread para não bloquear
-            gd_data = await asyncio.to_thread(svc.get_gd_details, uc_data)
+            with medir(stats, "energisa.get_gd_details"):
+                gd_data = await asyncio.to_thread(svc.get_gd_details, uc_data)
 
             if not gd_data:
                 logger.debug(f"      ℹ️ Nenhum dado de GD para UC {cdc}")
@@ -466,72 +673,186 @@ class SyncService:
                 logger.debug(f"      ℹ️ Histórico GD vazio para UC {cdc}")
                 return 0
 
-            registros_salvos = 0
-
+            # Monta todos os registros de GD da UC antes de gravar
+            registros = []
             for item in historico:
                 try:
-                    mes = item.get("mesReferencia") or item.get("mes")
-                    ano = item.get("anoReferencia") or item.get("ano")
-
-                    if not mes or not ano:
-                        continue
-
-                    gd_record = {
-                        "uc_id": uc_id,
-                        "mes_referencia": int(mes),
-                        "ano_referencia": int(ano),
-                        "saldo_anterior_conv": item.get("saldoAnteriorConv"),
-                        "injetado_conv": item.get("injetadoConv"),
-                        "total_recebido_rede": item.get("totalRecebidoRede"),
-                        "consumo_recebido_conv": item.get("consumoRecebidoConv"),
-                        "consumo_injetado_compensado": item.get("consumoInjetadoCompensadoConv"),
-                        "consumo_transferido_conv": item.get("consumoTransferidoConv"),
-                        "consumo_compensado_conv": item.get("consumoCompensadoConv"),
-                        "saldo_compensado_anterior": item.get("saldoCompensadoAnteriorConv"),
-                        "composicao_energia": item.get("composicaoEnergiaInjetadas"),
-                        "discriminacao_energia": item.get("discriminacaoEnergiaInjetadas"),
-                        "chave_primaria": item.get("chavePrimaria"),
-                        "dados_api": item,
-                        "sincronizado_em": datetime.now(timezone.utc).isoformat()
-                    }
-
-                    # Tenta capturar data de modificação
-                    data_mod = item.get("dataModificacaoRegistro")
-                    if data_mod:
-                        gd_record["data_modificacao_registro"] = data_mod
-
-                    # Remove valores None
-                    gd_record = {k: v for k, v in gd_record.items() if v is not None}
-
-                    # Upsert (insert ou update)
-                    self.db.table("historico_gd").upsert(
-                        gd_record,
-                        on_conflict="uc_id,mes_referencia,ano_referencia"
-                    ).execute()
-
-                    registros_salvos += 1
+                    registro = self._montar_registro_gd(uc_id, item)
+                    if registro:
+                        registros.append(registro)
+                except Exception as e:
+                    logger.warning(f"      ⚠️ Erro ao preparar registro GD: {e}")
 
+            registros_salvos = 0
+            alterados = []
+            if registros:
+                try:
+                    with medir(stats, "db.gd_hashes"):
+                        hashes = await asyncio.to_thread(self._hashes_gd, uc_id)
+                    alterados = [
+                        r for r in registros
+                        if hashes.get((r["mes_referencia"], r["ano_referencia"])) != r["dados_api_hash"]
+                    ]
+
+                    # Upsert em lote (insert ou update) apenas do que mudou
+                    if alterados:
+                        with medir(stats, "db.gd_upsert"):
+                            await asyncio.to_thread(
+                                self.db.upsert_em_lote,
+                                "historico_gd",
+                                alterados,
+                                on_conflict="uc_id,mes_referencia,ano_referencia"
+                            )
+                    _contar_delta(stats, "gd", alterados=len(alterados), inalterados=len(registros) - len(alterados))
+                    registros_salvos = len(registros)
                 except Exception as e:
-                    logger.warning(f"      ⚠️ Erro ao salvar registro GD: {e}")
+                    alterados = []
+                    logger.warning(f"      ⚠️ Erro ao salvar registros GD: {e}")
 
-            # Atualiza saldo acumulado na UC se disponível
-            if registros_salvos > 0 and historico:
+            # Atualiza saldo acumulado na UC se o histórico mudou
+            if alterados and historico:
                 ultimo = historico[-1] if isinstance(historico, list) else historico
                 saldo_atual = ultimo.get("saldoCompensadoAnteriorConv") or ultimo.get("saldoAnteriorConv") or 0
                 try:
-                    self.db.table("unidades_consumidoras").update({
-                        "saldo_acumulado": saldo_atual
-                    }).eq("id", uc_id).execute()
+                    with medir(stats, "db.uc_saldo"):
+                        await asyncio.to_thread(self.db.table("unidades_consumidoras").update({
+                            "saldo_acumulado": saldo_atual
+                        }).eq("id", uc_id).execute)
                 except Exception as e:
                     logger.warning(f"      ⚠️ Erro ao atualizar saldo UC: {e}")
 
             logger.debug(f"      ✅ {registros_salvos} registros GD sincronizados para UC {cdc}")
             return registros_salvos
 
+        except LimiteEnergisaExcedido:
+            raise
         except Exception as e:
             logger.error(f"      ❌ Erro ao sincronizar GD da UC {cdc}: {e}")
             return 0
 
+    def _montar_registro_fatura(self, uc_id: int, fatura_api: dict) -> Optional[dict]:
+        """
+        Converte uma fatura da API Energisa no registro da tabela faturas.
+
+        Returns:
+            Registro sem valores None, ou None se faltar mês/ano de referência
+        """
+        mes = fatura_api.get("mesReferencia")
+        ano = fatura_api.get("anoReferencia")
+
+        if not mes or not ano:
+            return None
+
+        fatura_data = {
+            "uc_id": uc_id,
+            "numero_fatura": fatura_api.get("numeroFatura"),
+            "mes_referencia": mes,
+            "ano_referencia": ano,
+            "valor_fatura": fatura_api.get("valorFatura", 0),
+            "valor_liquido": fatura_api.get("valorLiquido"),
+            "consumo": fatura_api.get("consumo"),
+            "leitura_atual": fatura_api.get("leituraAtual"),
+            "leitura_anterior": fatura_api.get("leituraAnterior"),
+            "media_consumo": fatura_api.get("mediaConsumo"),
+            "quantidade_dias": fatura_api.get("quantidadeDiaConsumo"),
+            "valor_iluminacao_publica": fatura_api.get("valorIluminacaoPublica"),
+            "valor_icms": fatura_api.get("valorICMS"),
+            "bandeira_tarifaria": fatura_api.get("bandeiraTarifaria"),
+            "data_leitura": parse_date(fatura_api.get("dataLeitura")),
+            "data_vencimento": parse_date(fatura_api.get("dataVencimento")),
+            "data_pagamento": parse_date(fatura_api.get("dataPagamento")),
+            "indicador_situacao": fatura_api.get("indicadorSituacao"),
+            "indicador_pagamento": fatura_api.get("indicadorPagamento"),
+            "situacao_pagamento": fatura_api.get("situacaoPagamento"),
+            "qr_code_pix": fatura_api.get("qrCodePix"),
+            "qr_code_pix_image": fatura_api.get("qrCodePixImage64"),
+            "codigo_barras": fatura_api.get("codigoBarras"),
+            "dados_api": fatura_api,
+            "dados_api_hash": payload_hash(fatura_api),
+            "sincronizado_em": datetime.now(timezone.utc).isoformat()
+        }
+
+        # Remove valores None
+        return {k: v for k, v in fatura_data.items() if v is not None}
+
+    def _montar_registro_gd(self, uc_id: int, item: dict) -> Optional[dict]:
+        """
+        Converte um item do histórico GD da API no registro da tabela historico_gd.
+
+        Returns:
+            Registro sem valores None, ou None se faltar mês/ano de referência
+        """
+        mes = item.get("mesReferencia") or item.get("mes")
+        ano = item.get("anoReferencia") or item.get("ano")
+
+        if not mes or not ano:
+            return None
+
+        gd_record = {
+            "uc_id": uc_id,
+            "mes_referencia": int(mes),
+            "ano_referencia": int(ano),
+            "saldo_anterior_conv": item.get("saldoAnteriorConv"),
+            "injetado_conv": item.get("injetadoConv"),
+            "total_recebido_rede": item.get("totalRecebidoRede"),
+            "consumo_recebido_conv": item.get("consumoRecebidoConv"),
+            "consumo_injetado_compensado": item.get("consumoInjetadoCompensadoConv"),
+            "consumo_transferido_conv": item.get("consumoTransferidoConv"),
+            "consumo_compensado_conv": item.get("consumoCompensadoConv"),
+            "saldo_compensado_anterior": item.get("saldoCompensadoAnteriorConv"),
+            "composicao_energia": item.get("composicaoEnergiaInjetadas"),
+            "discriminacao_energia": item.get("discriminacaoEnergiaInjetadas"),
+            "chave_primaria": item.get("chavePrimaria"),
+            "dados_api": item,
+            "dados_api_hash": payload_hash(item),
+            "sincronizado_em": datetime.now(timezone.utc).isoformat()
+        }
+
+        # Tenta capturar data de modificação
+        data_mod = item.get("dataModificacaoRegistro")
+        if data_mod:
+            gd_record["data_modificacao_registro"] = data_mod
+
+        # Remove valores None
+        return {k: v for k, v in gd_record.items() if v is not None}
+
+    def _estado_faturas(self, uc_id: int, registros: list) -> dict:
+        """
+        Busca, numa única consulta, o estado atual das faturas da UC.
+
+        Seleciona só colunas leves (sem dados_api), filtrando
+        pelos anos presentes nos registros. pdf_baixado_em indica se o PDF
+        já foi salvo (a fila grava junto com pdf_sha256).
+
+        Returns:
+            Dict (mes_referencia, ano_referencia) -> {dados_api_hash, pdf_baixado_em}
+        """
+        anos = sorted({r["ano_referencia"] for r in registros})
+        result = self.db.table("faturas").select(
+            "mes_referencia, ano_referencia, dados_api_hash, pdf_baixado_em"
+        ).eq("uc_id", uc_id).in_("ano_referencia", anos).execute()
+
+        return {
+            (f["mes_referencia"], f["ano_referencia"]): f
+            for f in result.data or []
+        }
+
+    def _hashes_gd(self, uc_id: int) -> dict:
+        """
+        Busca os hashes do histórico GD já armazenado para a UC.
+
+        Returns:
+            Dict (mes_referencia, ano_referencia) -> dados_api_hash
+        """
+        result = self.db.table("historico_gd").select(
+            "mes_referencia, ano_referencia, dados_api_hash"
+        ).eq("uc_id", uc_id).execute()
+
+        return {
+            (h["mes_referencia"], h["ano_referencia"]): h.get("dados_api_hash")
+            for h in result.data or []
+        }
+
     async def sincronizar_gd_usuario(self, usuario_id: str, cpf: str) -> dict:
         """
         Sincroniza apenas dados de GD de todas as UCs de um usuário.
@@ -554,9 +875,9 @@ class SyncService:
 
         try:
             # Busca UCs do usuário
-            result = self.db.table("unidades_consumidoras").select(
+            result = await asyncio.to_thread(self.db.table("unidades_consumidoras").select(
                 "id, cdc, digito_verificador, cod_empresa, apelido"
-            ).eq("usuario_id", usuario_id).execute()
+            ).eq("usuario_id", usuario_id).execute)
 
             ucs = result.data or []
 
@@ -566,7 +887,7 @@ class SyncService:
 
             # Cria serviço Energisa
             cpf_limpo = cpf.replace(".", "").replace("-", "").replace(" ", "")
-            svc = EnergisaService(cpf_limpo)
+            svc = EnergisaService(cpf_limpo, usar_cache=False)
 
             if not svc.is_authenticated():
                 logger.warning("   ⚠️ Sessão Energisa não ativa")
@@ -576,22 +897,23 @@ class SyncService:
                     **stats
                 }
 
-            # Faz refresh token ANTES de sincronizar
-            logger.info(f"   🔄 Renovando token...")
-            if not svc._refresh_token():
-                logger.warning("   ⚠️ Falha no refresh token - invalidando sessão")
-                SessionManager.delete_session(cpf_limpo)
-                return {
-                    "success": False,
-                    "error": "Sessão expirada. Faça login novamente na Energisa.",
-                    **stats
-                }
+            # Renova o token ANTES de sincronizar (só se estiver perto de expirar)
+            logger.info(f"   🔄 Verificando token...")
+            if not await asyncio.to_thread(svc.garantir_token):
+                svc, resultado = await self._renovar_ou_invalidar(cpf_limpo)
+                if svc is None:
+                    logger.warning(f"   ⚠️ Falha no refresh token - renovação {resultado}")
+                    return {
+                        "success": False,
+                        "error": self._erro_renovacao(resultado),
+                        **stats
+                    }
 
             # Sincroniza GD de cada UC
             for uc in ucs:
                 stats["ucs_processadas"] += 1
                 try:
-                    gd_sync = await self._sincronizar_gd(svc, uc)
+                    gd_sync = await self._sincronizar_gd(svc, uc, stats)
                     stats["gd_sincronizados"] += gd_sync
                 except Exception as e:
                     logger.warning(f"   ⚠️ Erro ao sincronizar GD da UC {uc.get('cdc')}: {e}")
@@ -604,9 +926,11 @@ class SyncService:
                 f"{stats['erros']} erros"
             )
 
+            stats["latencias"] = resumir_latencias(stats.pop("_amostras", {}))
             return stats
 
         except Exception as e:
+            stats.pop("_amostras", None)
             logger.error(f"❌ Erro na sincronização de GD: {e}")
             return {
                 "success": False,
@@ -629,40 +953,54 @@ class SyncService:
 
         try:
             # Busca a UC
-            result = self.db.table("unidades_consumidoras").select("*").eq(
+            result = await asyncio.to_thread(self.db.table("unidades_consumidoras").select("*").eq(
                 "id", uc_id
-            ).single().execute()
+            ).single().execute)
 
             if not result.data:
                 return {"success": False, "error": "UC não encontrada"}
 
             uc = result.data
-
-            # Cria serviço Energisa
             cpf_limpo = cpf.replace(".", "").replace("-", "")
-            svc = EnergisaService(cpf_limpo)
 
-            if not svc.is_authenticated():
-                return {"success": False, "error": "Sessão da Energisa expirada"}
+            async def _executar() -> dict:
+                # Cria serviço Energisa
+                svc = await asyncio.to_thread(EnergisaService, cpf_limpo, usar_cache=False)
 
-            # Faz refresh token ANTES de sincronizar
-            logger.info(f"   🔄 Renovando token...")
-            if not svc._refresh_token():
-                logger.warning("   ⚠️ Falha no refresh token - invalidando sessão")
-                SessionManager.delete_session(cpf_limpo)
-                return {"success": False, "error": "Sessão expirada. Faça login novamente na Energisa."}
+                if not svc.is_authenticated():
+                    return {"success": False, "error": "Sessão da Energisa expirada"}
 
-            # Sincroniza
-            uc_atualizada = await self._sincronizar_uc(svc, uc)
-            faturas_sync = await self._sincronizar_faturas(svc, uc)
-            gd_sync = await self._sincronizar_gd(svc, uc)
+                # Renova o token ANTES de sincronizar (só se estiver perto de expirar)
+                logger.info(f"   🔄 Verificando token...")
+                if not await asyncio.to_thread(svc.garantir_token):
+                    svc, resultado = await self._renovar_ou_invalidar(cpf_limpo)
+                    if svc is None:
+                        logger.warning(f"   ⚠️ Falha no refresh token - renovação {resultado}")
+                        return {"success": False, "error": self._erro_renovacao(resultado)}
 
-            return {
-                "success": True,
-                "uc_atualizada": uc_atualizada,
-                "faturas_sincronizadas": faturas_sync,
-                "gd_sincronizados": gd_sync
-            }
+                # Sincroniza
+                contadores = {}
+                uc_atualizada = await self._sincronizar_uc(svc, uc, contadores)
+                faturas_sync = await self._sincronizar_faturas(svc, uc, contadores)
+                gd_sync = await self._sincronizar_gd(svc, uc, contadores)
+
+                return {
+                    "success": True,
+                    "uc_atualizada": uc_atualizada,
+                    "faturas_sincronizadas": faturas_sync,
+                    "gd_sincronizados": gd_sync,
+                    "delta": contadores.get("delta", {}),
+                    "latencias": resumir_latencias(contadores.get("_amostras", {}))
+                }
+
+            # Passa pelo pool para não disputar a sessão do CPF com o scheduler,
+            # mas fura a fila global: pedido manual não espera o lote agendado
+            resultado = await self.pool.executar(cpf_limpo, _executar, prioritario=True)
+
+            if resultado.get("success"):
+                await asyncio.to_thread(sync_agenda.reagendar, [uc_id])
+
+            return resultado
 
         except Exception as e:
             logger.error(f"❌ Erro ao sincronizar UC {uc_id}: {e}")
@@ -0,0 +1,44 @@
+"""
+Sync Worker - Processo dedicado ao scheduler de sincronização
+Separa a sincronização dos processos da API (uvicorn com vários workers)
+
+Uso:
+    python -m backend.sync.worker
+
+Pode rodar em mais de uma réplica: só a que segurar o lease sincroniza.
+"""
+
+import asyncio
+import logging
+import signal
+
+from backend.config import settings
+
+logging.basicConfig(
+    level=logging.DEBUG if settings.DEBUG else logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    """Inicia o scheduler e aguarda SIGINT/SIGTERM para encerrar"""
+    from backend.sync.scheduler import sync_scheduler
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, parar.set)
+
+    logger.info(f"🚀 Sync Worker iniciado ({sync_scheduler.lease.dono})")
+    sync_scheduler.start()
+
+    await parar.wait()
+
+    logger.info("Finalizando Sync Worker...")
+    await sync_scheduler.encerrar()
+    logger.info("🛑 Sync Worker parado")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
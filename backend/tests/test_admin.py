@@ -107,3 +107,20 @@ class TestAdminHealthDetailed:
         """Acesso sem token deve retornar 401"""
         response = client.get("/api/admin/health-detailed")
         assert response.status_code == 401
+
+
+class TestAdminSincronizacao:
+    """Testes do histórico de sincronização"""
+
+    def test_execucoes_sem_token(self, client):
+        """Acesso sem token deve retornar 401"""
+        response = client.get("/api/admin/sync/execucoes")
+        assert response.status_code == 401
+
+    def test_execucoes_autenticado(self, client, auth_headers):
+        """Deve retornar histórico e tendências (se superadmin)"""
+        if not auth_headers:
+            pytest.skip("Sem autenticação")
+
+        response = client.get("/api/admin/sync/execucoes?limite=10", headers=auth_headers)
+        assert response.status_code in [200, 403]
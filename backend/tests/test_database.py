@@ -0,0 +1,78 @@
+"""
+Testes do cliente de banco (upsert em lote)
+Usa um cliente falso no lugar do Supabase
+"""
+
+from backend.core.database import SupabaseClient
+
+
+class _TabelaFalsa:
+    """Registra os upserts enviados em vez de chamar o PostgREST"""
+
+    def __init__(self, envios: list):
+        self.envios = envios
+
+    def upsert(self, registros, on_conflict=None):
+        self.envios.append((list(registros), on_conflict))
+        return self
+
+    def execute(self):
+        return None
+
+
+def _cliente_falso():
+    """SupabaseClient sem conexão, com table() devolvendo a tabela falsa"""
+    cliente = SupabaseClient.__new__(SupabaseClient)
+    cliente.envios = []
+    cliente.table = lambda name: _TabelaFalsa(cliente.envios)
+    return cliente
+
+
+class TestUpsertEmLote:
+    """Testes de SupabaseClient.upsert_em_lote"""
+
+    def test_agrupa_por_colunas(self):
+        """Registros com colunas diferentes vão em requisições separadas"""
+        cliente = _cliente_falso()
+        registros = [
+            {"uc_id": 1, "mes_referencia": 1, "ano_referencia": 2025, "valor": 10},
+            {"uc_id": 1, "mes_referencia": 2, "ano_referencia": 2025, "valor": 20},
+            {"uc_id": 1, "mes_referencia": 3, "ano_referencia": 2025},
+        ]
+
+        requisicoes = cliente.upsert_em_lote("faturas", registros, on_conflict="uc_id,mes_referencia,ano_referencia")
+
+        assert requisicoes == 2
+        assert [len(lote) for lote, _ in cliente.envios] == [2, 1]
+        assert all(on_conflict == "uc_id,mes_referencia,ano_referencia" for _, on_conflict in cliente.envios)
+
+    def test_divide_em_lotes(self):
+        """Mais registros que tamanho_lote: várias requisições"""
+        cliente = _cliente_falso()
+        registros = [{"id": i, "valor": i} for i in range(7)]
+
+        requisicoes = cliente.upsert_em_lote("tabela", registros, on_conflict="id", tamanho_lote=3)
+
+        assert requisicoes == 3
+        assert [len(lote) for lote, _ in cliente.envios] == [3, 3, 1]
+
+    def test_deduplica_pela_chave_de_conflito(self):
+        """Chave repetida fica só com o último registro (o Postgres recusaria o lote)"""
+        cliente = _cliente_falso()
+        registros = [
+            {"uc_id": 1, "mes_referencia": 1, "ano_referencia": 2025, "valor": 10},
+            {"uc_id": 1, "mes_referencia": 2, "ano_referencia": 2025, "valor": 20},
+            {"uc_id": 1, "mes_referencia": 1, "ano_referencia": 2025, "valor": 99},
+        ]
+
+        cliente.upsert_em_lote("faturas", registros, on_conflict="uc_id, mes_referencia, ano_referencia")
+
+        enviados = [r for lote, _ in cliente.envios for r in lote]
+        assert len(enviados) == 2
+        assert {(r["mes_referencia"], r["valor"]) for r in enviados} == {(1, 99), (2, 20)}
+
+    def test_lista_vazia(self):
+        """Sem registros, nenhuma requisição"""
+        cliente = _cliente_falso()
+        assert cliente.upsert_em_lote("faturas", [], on_conflict="id") == 0
+        assert cliente.envios == []
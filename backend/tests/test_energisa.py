@@ -0,0 +1,157 @@
+"""
+Testes do controle de taxa e da escolha de caminhos da Energisa
+Lógica pura: não fazem requisições
+"""
+
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from backend.energisa.caminhos import SeletorCaminhos
+from backend.energisa.limitador import BaldeTokens, LimitadorEnergisa, LimiteEnergisaExcedido
+
+
+def _resposta(status_code: int, cabecalhos: dict = None) -> requests.Response:
+    """Resposta do requests montada à mão"""
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.headers.update(cabecalhos or {})
+    resp.url = "https://servicos.energisa.com.br/api/clientes"
+    resp._content = b"{}"
+    return resp
+
+
+class TestBaldeTokens:
+    """Testes do token bucket"""
+
+    def test_rajada_sem_espera(self):
+        """Até a rajada, nenhuma espera"""
+        balde = BaldeTokens(taxa=2.0, rajada=3.0, taxa_minima=0.2)
+        agora = time.monotonic()
+        for _ in range(3):
+            assert balde.espera(agora) == 0
+            balde.consumir()
+        assert balde.espera(agora) == pytest.approx(0.5)
+
+    def test_reducao_multiplicativa_uma_por_janela(self):
+        """Vários bloqueios na mesma rajada reduzem a taxa uma vez só"""
+        balde = BaldeTokens(taxa=4.0, rajada=4.0, taxa_minima=0.5)
+        agora = time.monotonic()
+        assert balde.reduzir(agora, 0.5) is True
+        assert balde.reduzir(agora + 0.1, 0.5) is False
+        assert balde.taxa == 2.0
+        assert balde.reduzir(agora + 5, 0.5) is True
+        assert balde.taxa == 1.0
+
+    def test_taxa_minima(self):
+        """A taxa nunca cai abaixo do piso"""
+        balde = BaldeTokens(taxa=1.0, rajada=1.0, taxa_minima=0.4)
+        agora = time.monotonic()
+        for i in range(5):
+            balde.reduzir(agora + i * 10, 0.5)
+        assert balde.taxa == 0.4
+
+    def test_aumento_aditivo_ate_a_base(self):
+        """Respostas normais devolvem taxa até a configurada"""
+        balde = BaldeTokens(taxa=2.0, rajada=2.0, taxa_minima=0.2)
+        balde.reduzir(time.monotonic(), 0.5)
+        balde.aumentar(0.3)
+        assert balde.taxa == pytest.approx(1.3)
+        for _ in range(10):
+            balde.aumentar(0.3)
+        assert balde.taxa == 2.0
+
+    def test_retry_after_segura_o_balde(self):
+        """Retry-After: espera igual à pausa pedida"""
+        balde = BaldeTokens(taxa=2.0, rajada=4.0, taxa_minima=0.2)
+        agora = time.monotonic()
+        balde.reduzir(agora, 0.5, pausa_segundos=60)
+        assert balde.espera(agora) == pytest.approx(61, abs=0.1)
+
+    def test_retry_after_em_rajada_nao_acumula(self):
+        """N bloqueios com Retry-After: 60 seguram 60s, não N x 60s"""
+        balde = BaldeTokens(taxa=2.0, rajada=4.0, taxa_minima=0.2)
+        agora = time.monotonic()
+        for i in range(5):
+            balde.reduzir(agora + i * 0.01, 0.5, pausa_segundos=60)
+        assert balde.espera(agora + 0.05) == pytest.approx(61, abs=0.1)
+
+
+class TestLimitadorEnergisa:
+    """Testes do limitador (AIMD sobre os baldes global e por CPF)"""
+
+    def test_429_reduz_e_200_recupera(self):
+        """Bloqueio reduz as duas taxas; respostas normais recuperam aos poucos"""
+        limitador = LimitadorEnergisa(taxa_global=10, rajada_global=10, taxa_cpf=2, rajada_cpf=2,
+                                      fator_reducao=0.5, aumento_rps=1.0)
+        limitador.registrar("12345678900", _resposta(429))
+        assert limitador.get_status()["taxa_global"] == 5.0
+        assert limitador.get_status()["cpfs_limitados"] == 1
+        assert limitador.eventos["429"] == 1
+
+        limitador.registrar("12345678900", _resposta(200))
+        assert limitador.get_status()["taxa_global"] == 6.0
+
+    def test_retry_after_recusa_em_vez_de_esperar(self):
+        """Pausa maior que espera_max_segundos: LimiteEnergisaExcedido"""
+        limitador = LimitadorEnergisa(espera_max_segundos=5)
+        limitador.registrar(None, _resposta(429, {"Retry-After": "60"}))
+        with pytest.raises(LimiteEnergisaExcedido):
+            limitador.aguardar()
+        assert limitador.recusadas == 1
+
+    def test_aguardar_dentro_da_rajada(self):
+        """Dentro da rajada, aguardar não dorme"""
+        limitador = LimitadorEnergisa(rajada_global=5, rajada_cpf=5)
+        with patch("backend.energisa.limitador.time.sleep") as dormir:
+            for _ in range(5):
+                limitador.aguardar("12345678900")
+        dormir.assert_not_called()
+
+
+class TestSeletorCaminhos:
+    """Testes da ordem adaptativa dos caminhos"""
+
+    def test_ordem_padrao_sem_dados(self):
+        """Sem observações, mantém a ordem padrão"""
+        seletor = SeletorCaminhos(explorar_a_cada=0)
+        assert seletor.ordem("faturas", ["next", "legacy", "ssr"]) == ["next", "legacy", "ssr"]
+
+    def test_mais_rapido_primeiro(self):
+        """Saudáveis ordenados pelo custo (latência / taxa de sucesso)"""
+        seletor = SeletorCaminhos(explorar_a_cada=0)
+        for _ in range(3):
+            seletor.registrar("faturas", "next", True, 2.0)
+            seletor.registrar("faturas", "legacy", True, 0.5)
+        assert seletor.ordem("faturas", ["next", "legacy", "ssr"]) == ["legacy", "next", "ssr"]
+
+    def test_falhas_seguidas_degradam(self):
+        """Caminho com falhas seguidas vai para o fim, mesmo com bom histórico"""
+        seletor = SeletorCaminhos(explorar_a_cada=0)
+        for _ in range(5):
+            seletor.registrar("faturas", "next", True, 0.1)
+        seletor.registrar("faturas", "next", False, 0.1)
+        seletor.registrar("faturas", "next", False, 0.1)
+        assert seletor.ordem("faturas", ["next", "legacy"]) == ["legacy", "next"]
+        assert seletor.get_status()["faturas"]["caminhos"]["next"]["estado"] == "degradado"
+
+    def test_explora_fora_do_topo(self):
+        """A cada explorar_a_cada chamadas, outro caminho vai para a frente"""
+        seletor = SeletorCaminhos(explorar_a_cada=3)
+        for _ in range(3):
+            seletor.registrar("faturas", "legacy", True, 0.5)
+        ordens = [seletor.ordem("faturas", ["next", "legacy"]) for _ in range(3)]
+        assert ordens[0] == ordens[1] == ["legacy", "next"]
+        assert ordens[2] == ["next", "legacy"]
+
+    def test_degradado_volta_a_ser_desconhecido(self):
+        """Com o decaimento, um caminho que falhou volta a ser tentado antes dos degradados"""
+        seletor = SeletorCaminhos(meia_vida_segundos=1, explorar_a_cada=0)
+        seletor.registrar("faturas", "next", False, 0.1)
+        seletor.registrar("faturas", "next", False, 0.1)
+        assert seletor.ordem("faturas", ["next", "legacy"]) == ["legacy", "next"]
+
+        with patch("backend.energisa.caminhos.time.monotonic", return_value=time.monotonic() + 60):
+            assert seletor.get_status()["faturas"]["caminhos"]["next"]["estado"] == "desconhecido"
@@ -2,8 +2,15 @@
 Testes do módulo Faturas
 """
 
+import io
+import zipfile
+
 import pytest
 
+from backend.faturas.blob_store import BlobStoreLocal
+from backend.faturas.exportacao import gerar_zip_pdfs
+from backend.faturas.router import _intervalo_range
+
 
 class TestFaturasListar:
     """Testes de listagem de faturas"""
@@ -148,6 +155,64 @@ class TestFaturasBuscar:
         assert response.status_code == 404
 
 
+class TestFaturasPdfArquivo:
+    """Testes do download binário do PDF"""
+
+    def test_pdf_arquivo_sem_token(self, client):
+        """Download sem token deve retornar 401"""
+        response = client.get("/api/faturas/1/pdf/arquivo")
+        assert response.status_code == 401
+
+    def test_pdf_arquivo_inexistente(self, client, auth_headers):
+        """Fatura inexistente deve retornar 404"""
+        if not auth_headers:
+            pytest.skip("Sem autenticação")
+
+        response = client.get("/api/faturas/99999999/pdf/arquivo", headers=auth_headers)
+        assert response.status_code == 404
+
+
+class TestFaturasExportarPdfs:
+    """Testes da exportação de PDFs em ZIP"""
+
+    def test_exportar_sem_token(self, client):
+        """Exportar sem token deve retornar 401"""
+        response = client.get("/api/faturas/exportar/pdfs?usina_id=1")
+        assert response.status_code == 401
+
+    def test_exportar_sem_filtro(self, client, auth_headers):
+        """Exportar sem filtro deve ser recusado"""
+        if not auth_headers:
+            pytest.skip("Sem autenticação")
+
+        response = client.get("/api/faturas/exportar/pdfs", headers=auth_headers)
+        # 403 se o usuário de teste não for gestor
+        assert response.status_code in [403, 422]
+
+
+class TestFaturasExtracaoLote:
+    """Testes da fila de extração em lote"""
+
+    def test_extrair_lote_sem_token(self, client):
+        """Enfileirar sem token deve retornar 401"""
+        response = client.post("/api/faturas/extrair-lote")
+        assert response.status_code == 401
+
+    def test_progresso_sem_token(self, client):
+        """Progresso sem token deve retornar 401"""
+        response = client.get("/api/faturas/extrair-lote/1")
+        assert response.status_code == 401
+
+    def test_progresso_inexistente(self, client, auth_headers):
+        """Job inexistente deve retornar 404"""
+        if not auth_headers:
+            pytest.skip("Sem autenticação")
+
+        response = client.get("/api/faturas/extrair-lote/99999999", headers=auth_headers)
+        # 403 se o usuário de teste não for gestor
+        assert response.status_code in [403, 404]
+
+
 class TestFaturasManual:
     """Testes de criação de fatura manual"""
 
@@ -183,3 +248,71 @@ class TestFaturasManual:
             "data_vencimento": "2024-12-10"
         })
         assert response.status_code == 422
+
+
+class TestIntervaloRange:
+    """Testes do cabeçalho Range do download de PDF (sem banco)"""
+
+    def test_intervalo_fechado(self):
+        """bytes=0-99: os 100 primeiros bytes"""
+        assert _intervalo_range("bytes=0-99", 1000) == (0, 99)
+
+    def test_intervalo_aberto(self):
+        """bytes=500-: do byte 500 até o fim"""
+        assert _intervalo_range("bytes=500-", 1000) == (500, 999)
+
+    def test_sufixo(self):
+        """bytes=-100: os 100 últimos bytes"""
+        assert _intervalo_range("bytes=-100", 1000) == (900, 999)
+
+    def test_sufixo_maior_que_o_arquivo(self):
+        """Sufixo maior que o arquivo: o arquivo inteiro"""
+        assert _intervalo_range("bytes=-5000", 1000) == (0, 999)
+
+    def test_fim_alem_do_arquivo(self):
+        """Fim depois do último byte é cortado no tamanho"""
+        assert _intervalo_range("bytes=900-5000", 1000) == (900, 999)
+
+    @pytest.mark.parametrize("cabecalho", ["bytes=1000-", "bytes=2000-3000", "bytes=50-10", "bytes=-0"])
+    def test_fora_do_arquivo(self, cabecalho):
+        """Intervalo impossível vira 416 na rota (ValueError)"""
+        with pytest.raises(ValueError):
+            _intervalo_range(cabecalho, 1000)
+
+    @pytest.mark.parametrize("cabecalho", ["bytes=0-1,5-6", "items=0-10", "bytes=-", "bytes=abc"])
+    def test_ignorado(self, cabecalho):
+        """Vários intervalos ou cabeçalho malformado: serve o arquivo inteiro"""
+        assert _intervalo_range(cabecalho, 1000) is None
+
+
+class TestGerarZipPdfs:
+    """Testes da exportação em ZIP (blob store em diretório temporário)"""
+
+    def test_zip_valido_com_ausentes(self, tmp_path):
+        """PDFs presentes viram entradas; os ausentes vão para AUSENTES.txt"""
+        store = BlobStoreLocal(str(tmp_path))
+        pdf = b"%PDF-1.4 fatura" * 10000
+        sha256 = store.guardar(pdf)
+        faturas = [
+            {
+                "id": 1, "uc_id": 10, "mes_referencia": 1, "ano_referencia": 2025, "pdf_sha256": sha256,
+                "unidades_consumidoras": {"cod_empresa": 6, "cdc": 1234567, "digito_verificador": 8}
+            },
+            {"id": 2, "uc_id": 11, "mes_referencia": 2, "ano_referencia": 2025, "pdf_sha256": "0" * 64},
+        ]
+
+        conteudo = b"".join(gerar_zip_pdfs(faturas, store))
+
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo_zip:
+            assert arquivo_zip.testzip() is None
+            assert arquivo_zip.namelist() == ["6-1234567-8_2025-01.pdf", "AUSENTES.txt"]
+            assert arquivo_zip.read("6-1234567-8_2025-01.pdf") == pdf
+            assert "uc11_2025-02.pdf" in arquivo_zip.read("AUSENTES.txt").decode("utf-8")
+
+    def test_sem_ausentes(self, tmp_path):
+        """Sem PDFs faltando, não há AUSENTES.txt"""
+        store = BlobStoreLocal(str(tmp_path))
+        faturas = [{"id": 1, "uc_id": 10, "mes_referencia": 3, "ano_referencia": 2025, "pdf_sha256": store.guardar(b"%PDF")}]
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(gerar_zip_pdfs(faturas, store)))) as arquivo_zip:
+            assert arquivo_zip.namelist() == ["uc10_2025-03.pdf"]
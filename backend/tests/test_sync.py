@@ -0,0 +1,165 @@
+"""
+Testes da Sincronização (pool de workers, agenda de UCs e hash de payload)
+Lógica pura: não precisam do Supabase nem da Energisa
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from backend.sync.agenda import (
+    INTERVALO_JANELA_LEITURA,
+    INTERVALO_LEITURA_ATRASADA,
+    INTERVALO_ROTINA,
+    INTERVALO_SEM_HISTORICO,
+    INTERVALO_VENCIMENTO,
+    PRIORIDADE_LEITURA,
+    PRIORIDADE_ROTINA,
+    PRIORIDADE_VENCIMENTO,
+    calcular_proximo_sync,
+)
+from backend.sync.pool import SyncWorkerPool
+from backend.sync.service import payload_hash
+
+
+AGORA = datetime(2025, 6, 15, 12, 0, tzinfo=timezone.utc)
+
+
+def _dia(dias: int) -> str:
+    """Data (YYYY-MM-DD) a tantos dias de AGORA"""
+    return (AGORA + timedelta(days=dias)).date().isoformat()
+
+
+class TestSyncWorkerPool:
+    """Testes do pool de sincronização"""
+
+    @staticmethod
+    def _executar(pool: SyncWorkerPool, jobs: list) -> tuple:
+        """Roda (cpf, nome) em paralelo e devolve resultados e ordem de entrada/saída"""
+        eventos = []
+
+        def job(nome):
+            async def rodar():
+                eventos.append(("entra", nome))
+                await asyncio.sleep(0.01)
+                eventos.append(("sai", nome))
+                return nome
+            return rodar
+
+        async def principal():
+            return await asyncio.gather(*(pool.executar(cpf, job(nome)) for cpf, nome in jobs))
+
+        return asyncio.run(principal()), eventos
+
+    def test_mesmo_cpf_em_ordem(self):
+        """Jobs do mesmo CPF não se sobrepõem; CPFs diferentes rodam juntos"""
+        pool = SyncWorkerPool(max_concorrencia=4, max_por_cpf=1)
+        resultados, eventos = self._executar(pool, [("a", "a1"), ("a", "a2"), ("b", "b1")])
+
+        assert resultados == ["a1", "a2", "b1"]
+        assert eventos.index(("sai", "a1")) < eventos.index(("entra", "a2"))
+        assert eventos.index(("entra", "b1")) < eventos.index(("sai", "a1"))
+        assert pool.pico_ativos == 2
+
+    def test_limite_global(self):
+        """Nunca mais jobs ao mesmo tempo que max_concorrencia"""
+        pool = SyncWorkerPool(max_concorrencia=2)
+        self._executar(pool, [(str(i), i) for i in range(6)])
+        assert pool.pico_ativos == 2
+
+    def test_semaforos_de_cpf_liberados(self):
+        """Sem jobs rodando, o pool não guarda semáforo de nenhum CPF"""
+        pool = SyncWorkerPool()
+        self._executar(pool, [(str(i), i) for i in range(10)])
+
+        async def falhar():
+            raise ValueError("erro no job")
+
+        try:
+            asyncio.run(pool.executar("x", falhar))
+        except ValueError:
+            pass
+
+        assert pool.get_status()["cpfs_com_jobs"] == 0
+
+
+class TestCalcularProximoSync:
+    """Testes das janelas da agenda"""
+
+    def test_sem_historico(self):
+        """UC sem faturas é consultada a cada 6h"""
+        assert calcular_proximo_sync(None, AGORA) == (
+            AGORA + INTERVALO_SEM_HISTORICO, PRIORIDADE_ROTINA, "sem_historico"
+        )
+
+    def test_rotina(self):
+        """Fora das janelas: uma vez por dia"""
+        fatura = {"proxima_leitura": _dia(20), "data_vencimento": _dia(-20), "data_pagamento": _dia(-25)}
+        assert calcular_proximo_sync(fatura, AGORA) == (AGORA + INTERVALO_ROTINA, PRIORIDADE_ROTINA, "rotina")
+
+    def test_dentro_da_janela_de_leitura(self):
+        """Na janela da leitura prevista: a cada 2h"""
+        fatura = {"proxima_leitura": _dia(0)}
+        assert calcular_proximo_sync(fatura, AGORA) == (
+            AGORA + INTERVALO_JANELA_LEITURA, PRIORIDADE_LEITURA, "janela_leitura"
+        )
+
+    def test_janela_de_leitura_antecipa_a_rotina(self):
+        """Janela começando antes de 24h: o próximo sync é o início dela"""
+        fatura = {"proxima_leitura": _dia(2)}
+        proximo, prioridade, motivo = calcular_proximo_sync(fatura, AGORA)
+        assert proximo == datetime(2025, 6, 16, tzinfo=timezone.utc)
+        assert (prioridade, motivo) == (PRIORIDADE_LEITURA, "janela_leitura")
+
+    def test_leitura_estimada_pela_data_de_leitura(self):
+        """Sem proxima_leitura, usa data_leitura + 30 dias"""
+        fatura = {"data_leitura": _dia(-30)}
+        assert calcular_proximo_sync(fatura, AGORA)[2] == "janela_leitura"
+
+    def test_leitura_atrasada(self):
+        """Janela passou sem fatura nova: a cada 6h"""
+        fatura = {"proxima_leitura": _dia(-15)}
+        assert calcular_proximo_sync(fatura, AGORA) == (
+            AGORA + INTERVALO_LEITURA_ATRASADA, PRIORIDADE_LEITURA, "leitura_atrasada"
+        )
+
+    def test_leitura_atrasada_demais_volta_a_rotina(self):
+        """Leitura que nunca chega (UC inativa) não é consultada a cada 6h para sempre"""
+        fatura = {"proxima_leitura": _dia(-45)}
+        assert calcular_proximo_sync(fatura, AGORA) == (AGORA + INTERVALO_ROTINA, PRIORIDADE_ROTINA, "rotina")
+
+    def test_dentro_da_janela_de_vencimento(self):
+        """Vencimento sem pagamento: a cada 6h"""
+        fatura = {"proxima_leitura": _dia(20), "data_vencimento": _dia(1)}
+        assert calcular_proximo_sync(fatura, AGORA) == (
+            AGORA + INTERVALO_VENCIMENTO, PRIORIDADE_VENCIMENTO, "vencimento"
+        )
+
+    def test_vencimento_pago_nao_abre_janela(self):
+        """Fatura paga não entra na janela de vencimento"""
+        fatura = {"proxima_leitura": _dia(20), "data_vencimento": _dia(1), "data_pagamento": _dia(-1)}
+        assert calcular_proximo_sync(fatura, AGORA)[2] == "rotina"
+
+    def test_janela_de_vencimento_antecipa_a_rotina(self):
+        """Vencimento em breve: o próximo sync é o início da janela"""
+        fatura = {"proxima_leitura": _dia(20), "data_vencimento": _dia(2)}
+        proximo, prioridade, motivo = calcular_proximo_sync(fatura, AGORA)
+        assert proximo == datetime(2025, 6, 16, tzinfo=timezone.utc)
+        assert (prioridade, motivo) == (PRIORIDADE_VENCIMENTO, "vencimento")
+
+
+class TestPayloadHash:
+    """Testes do hash de payload da Energisa"""
+
+    def test_ordem_das_chaves_nao_importa(self):
+        """Mesmo conteúdo, chaves em outra ordem: mesmo hash"""
+        assert payload_hash({"a": 1, "b": {"c": 2, "d": 3}}) == payload_hash({"b": {"d": 3, "c": 2}, "a": 1})
+
+    def test_conteudo_diferente(self):
+        """Qualquer valor diferente muda o hash"""
+        assert payload_hash({"valor": 10.5}) != payload_hash({"valor": 10.51})
+
+    def test_formato(self):
+        """SHA-256 hexadecimal, estável entre chamadas"""
+        hash_ = payload_hash([{"mes": 1, "data": datetime(2025, 1, 1)}, "ç"])
+        assert len(hash_) == 64
+        assert hash_ == payload_hash([{"mes": 1, "data": datetime(2025, 1, 1)}, "ç"])
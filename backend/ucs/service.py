@@ -324,6 +324,13 @@ class UCsService:
         if not result.data:
             raise ValidationError("Erro ao vincular UC")
 
+        # UC nova vai para o topo da agenda de sincronização
+        try:
+            from backend.sync.scheduler import sync_scheduler
+            sync_scheduler.priorizar(result.data[0]["id"])
+        except Exception as e:
+            logger.warning(f"Não foi possível priorizar a UC {result.data[0]['id']} na agenda: {e}")
+
         return await self.buscar_por_id(result.data[0]["id"])
 
     async def _atribuir_perfil_por_titularidade(self, usuario_id: str, is_titular: bool) -> None:
@@ -36,11 +36,23 @@ export interface PaginatedResponse<T> {
 export interface FaturaPdfResponse {
     id: number;
     pdf_base64: string | null;
+    pdf_sha256?: string | null;
     mes_referencia: number;
     ano_referencia: number;
     disponivel: boolean;
 }
 
+export interface ExtracaoJob {
+    job_id: number;
+    status: 'processando' | 'concluido';
+    total: number;
+    processadas: number;
+    sucesso: number;
+    erro: number;
+    pendentes: number;
+    resultados: { fatura_id: number; status: string; tentativas: number; erro: string | null }[];
+}
+
 export interface FaturaPixResponse {
     id: number;
     qr_code_pix: string | null;
@@ -60,10 +72,14 @@ export const faturasApi = {
     buscar: (id: number) =>
         api.get<Fatura>(`/faturas/${id}`),
 
-    // Buscar PDF da fatura
+    // Buscar PDF da fatura (base64 em JSON)
     buscarPdf: (id: number) =>
         api.get<FaturaPdfResponse>(`/faturas/${id}/pdf`),
 
+    // Baixar PDF da fatura (binário)
+    baixarPdf: (id: number) =>
+        api.get<Blob>(`/faturas/${id}/pdf/arquivo`, { params: { download: true }, responseType: 'blob' }),
+
     // Buscar dados PIX da fatura
     buscarPix: (id: number) =>
         api.get<FaturaPixResponse>(`/faturas/${id}/pix`),
@@ -103,15 +119,9 @@ export const faturasApi = {
     extrair: (faturaId: number) =>
         api.post<{ success: boolean; fatura_id: number; dados: any }>(`/faturas/${faturaId}/extrair`),
 
-    // Extrair dados em lote
+    // Extrair dados em lote (enfileira e retorna o job)
     extrairLote: (ucId?: number, mesReferencia?: number, anoReferencia?: number, limite: number = 10, forcarReprocessamento: boolean = false) =>
-        api.post<{
-            total: number;
-            processadas: number;
-            sucesso: number;
-            erro: number;
-            detalhes: any[];
-        }>('/faturas/extrair-lote', null, {
+        api.post<ExtracaoJob>('/faturas/extrair-lote', null, {
             params: {
                 uc_id: ucId,
                 mes_referencia: mesReferencia,
@@ -121,6 +131,10 @@ export const faturasApi = {
             }
         }),
 
+    // Progresso da extração em lote
+    progressoExtracao: (jobId: number) =>
+        api.get<ExtracaoJob>(`/faturas/extrair-lote/${jobId}`),
+
     // Obter dados já extraídos
     dadosExtraidos: (faturaId: number) =>
         api.get<{ success: boolean; fatura_id: number; dados: any | null }>(`/faturas/${faturaId}/dados-extraidos`),
@@ -131,20 +145,20 @@ export const faturasApi = {
 };
 
 /**
- * Helper para download do PDF da fatura a partir do base64
+ * Helper para download do PDF da fatura (binário, sem base64)
  */
-export const downloadFaturaPdf = (fatura: Fatura): boolean => {
-    if (!fatura.pdf_base64) {
-        return false;
-    }
-
+export const downloadFaturaPdf = async (fatura: Fatura): Promise<boolean> => {
     try {
+        const response = await faturasApi.baixarPdf(fatura.id);
+        const url = URL.createObjectURL(response.data);
+
         const link = document.createElement('a');
-        link.href = `data:application/pdf;base64,${fatura.pdf_base64}`;
+        link.href = url;
         link.download = `fatura_${fatura.mes_referencia.toString().padStart(2, '0')}_${fatura.ano_referencia}.pdf`;
         document.body.appendChild(link);
         link.click();
         document.body.removeChild(link);
+        URL.revokeObjectURL(url);
         return true;
     } catch (error) {
         console.error('Erro ao baixar PDF:', error);
@@ -152,4 +166,64 @@ export const downloadFaturaPdf = (fatura: Fatura): boolean => {
     }
 };
 
+export interface AguardarExtracaoOpcoes {
+    intervaloMs?: number;
+    tempoMaximoMs?: number;                  // desiste depois disso (o job continua no servidor)
+    signal?: AbortSignal;                    // cancela a espera
+    onProgresso?: (job: ExtracaoJob) => void;
+}
+
+/**
+ * Espera interrompida por tempo esgotado ou cancelamento; traz o último progresso lido
+ */
+export class ExtracaoInterrompida extends Error {
+    motivo: 'tempo' | 'cancelada';
+    job: ExtracaoJob | null;
+
+    constructor(motivo: 'tempo' | 'cancelada', job: ExtracaoJob | null) {
+        super(motivo === 'tempo' ? 'Tempo de espera da extração esgotado' : 'Espera da extração cancelada');
+        this.name = 'ExtracaoInterrompida';
+        this.motivo = motivo;
+        this.job = job;
+    }
+}
+
+const esperar = (ms: number, signal?: AbortSignal) =>
+    new Promise<void>(resolve => {
+        const timer = setTimeout(finalizar, ms);
+        signal?.addEventListener('abort', finalizar, { once: true });
+        function finalizar() {
+            clearTimeout(timer);
+            signal?.removeEventListener('abort', finalizar);
+            resolve();
+        }
+    });
+
+/**
+ * Aguarda o fim de um job de extração em lote, com limite de tempo e cancelamento
+ */
+export const aguardarExtracao = async (
+    jobId: number,
+    { intervaloMs = 2000, tempoMaximoMs = 10 * 60 * 1000, signal, onProgresso }: AguardarExtracaoOpcoes = {}
+): Promise<ExtracaoJob> => {
+    const limite = Date.now() + tempoMaximoMs;
+    let ultimo: ExtracaoJob | null = null;
+
+    while (true) {
+        if (signal?.aborted) {
+            throw new ExtracaoInterrompida('cancelada', ultimo);
+        }
+        const response = await faturasApi.progressoExtracao(jobId);
+        ultimo = response.data;
+        onProgresso?.(ultimo);
+        if (ultimo.status === 'concluido') {
+            return ultimo;
+        }
+        if (Date.now() + intervaloMs > limite) {
+            throw new ExtracaoInterrompida('tempo', ultimo);
+        }
+        await esperar(intervaloMs, signal);
+    }
+};
+
 export default faturasApi;
@@ -2,8 +2,9 @@
  * Cobranças Automáticas - Geração automática baseada em extração de faturas
  */
 
-import { useState, useEffect } from 'react';
-import { faturasApi } from '../../api/faturas';
+import { useState, useEffect, useRef } from 'react';
+import { faturasApi, aguardarExtracao, ExtracaoInterrompida } from '../../api/faturas';
+import type { ExtracaoJob } from '../../api/faturas';
 import { cobrancasApi } from '../../api/cobrancas';
 import { usinasApi } from '../../api/usinas';
 import type { Usina } from '../../api/types';
@@ -42,6 +43,8 @@ export function CobrancasAutomaticas() {
     // Estados do processo
     const [etapa, setEtapa] = useState<'selecao' | 'extraindo' | 'gerando' | 'concluido'>('selecao');
     const [resultadoExtracao, setResultadoExtracao] = useState<any>(null);
+    const [progressoExtracao, setProgressoExtracao] = useState<ExtracaoJob | null>(null);
+    const cancelarExtracao = useRef<AbortController | null>(null);
     const [resultadoGeracao, setResultadoGeracao] = useState<any>(null);
     const [cobrancasGeradas, setCobrancasGeradas] = useState<Cobranca[]>([]);
 
@@ -58,6 +61,8 @@ export function CobrancasAutomaticas() {
 
     useEffect(() => {
         fetchUsinas();
+        // Saindo da tela, para de acompanhar a extração
+        return () => cancelarExtracao.current?.abort();
     }, []);
 
     const fetchUsinas = async () => {
@@ -77,13 +82,20 @@ export function CobrancasAutomaticas() {
 
         try {
             setLoading(true);
+            setProgressoExtracao(null);
             setEtapa('extraindo');
 
             // Passo 1: Extrair faturas em lote
+            const controle = new AbortController();
+            cancelarExtracao.current = controle;
             const extracaoResponse = await faturasApi.extrairLote(undefined, mes, ano, 50, forcarReprocessamento);
-            setResultadoExtracao(extracaoResponse.data);
+            const extracao = await aguardarExtracao(extracaoResponse.data.job_id, {
+                signal: controle.signal,
+                onProgresso: setProgressoExtracao
+            });
+            setResultadoExtracao(extracao);
 
-            if (extracaoResponse.data.sucesso === 0) {
+            if (extracao.sucesso === 0) {
                 alert('Nenhuma fatura foi extraída com sucesso');
                 setEtapa('selecao');
                 return;
@@ -103,10 +115,17 @@ export function CobrancasAutomaticas() {
 
             setEtapa('concluido');
         } catch (err: any) {
-            console.error('Erro:', err);
-            alert(err.response?.data?.detail || 'Erro ao processar');
+            if (err instanceof ExtracaoInterrompida) {
+                if (err.motivo === 'tempo') {
+                    alert('A extração está demorando mais que o esperado. Ela continua no servidor; tente gerar as cobranças mais tarde.');
+                }
+            } else {
+                console.error('Erro:', err);
+                alert(err.response?.data?.detail || 'Erro ao processar');
+            }
             setEtapa('selecao');
         } finally {
+            cancelarExtracao.current = null;
             setLoading(false);
         }
     };
@@ -491,6 +510,29 @@ export function CobrancasAutomaticas() {
                     <p className="text-slate-500 dark:text-slate-400">
                         Processando PDFs com Python (pdfplumber + tesseract OCR)
                     </p>
+                    {progressoExtracao && progressoExtracao.total > 0 && (
+                        <div className="max-w-sm mx-auto mt-6">
+                            <div className="w-full h-2 bg-slate-200 dark:bg-slate-700 rounded-full overflow-hidden">
+                                <div
+                                    className="h-full bg-blue-500 transition-all"
+                                    style={{ width: `${Math.round((progressoExtracao.processadas / progressoExtracao.total) * 100)}%` }}
+                                />
+                            </div>
+                            <p className="text-sm text-slate-600 dark:text-slate-300 mt-2">
+                                {progressoExtracao.processadas} de {progressoExtracao.total} faturas
+                                {' · '}{progressoExtracao.sucesso} com sucesso
+                                {progressoExtracao.erro > 0 && (
+                                    <span className="text-red-500">{' · '}{progressoExtracao.erro} com erro</span>
+                                )}
+                            </p>
+                        </div>
+                    )}
+                    <button
+                        onClick={() => cancelarExtracao.current?.abort()}
+                        className="mt-6 px-4 py-2 text-sm text-slate-600 dark:text-slate-300 border border-slate-300 dark:border-slate-600 rounded-lg hover:bg-slate-50 dark:hover:bg-slate-700"
+                    >
+                        Parar de acompanhar
+                    </button>
                 </div>
             )}
 
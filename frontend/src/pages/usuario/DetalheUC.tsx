@@ -530,7 +530,7 @@ export function DetalheUC() {
                                                 )}
                                             </td>
                                             <td className="px-4 py-3 text-right">
-                                                {fatura.pdf_base64 && (
+                                                {fatura.pdf_sha256 && (
                                                     <button
                                                         onClick={() => downloadFaturaPdf(fatura)}
                                                         className="p-2 text-blue-500 hover:bg-blue-50 dark:hover:bg-blue-900/30 rounded-lg transition"
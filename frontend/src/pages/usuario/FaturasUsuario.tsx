@@ -6,7 +6,7 @@ import { useState, useEffect } from 'react';
 import { useAuth } from '../../contexts/AuthContext';
 import { usePerfil } from '../../contexts/PerfilContext';
 import { ucsApi } from '../../api/ucs';
-import { faturasApi, FaturaPixResponse } from '../../api/faturas';
+import { faturasApi, downloadFaturaPdf, FaturaPixResponse } from '../../api/faturas';
 import type { UnidadeConsumidora, Fatura } from '../../api/types';
 import {
     FileText,
@@ -175,19 +175,9 @@ export function FaturasUsuario() {
     const handleDownloadPdf = async (fatura: Fatura) => {
         try {
             setDownloadingId(fatura.id);
-            const response = await faturasApi.buscarPdf(fatura.id);
-
-            if (!response.data.disponivel || !response.data.pdf_base64) {
+            if (!(await downloadFaturaPdf(fatura))) {
                 alert('PDF não disponível para esta fatura. Sincronize as faturas para baixar o PDF.');
-                return;
             }
-
-            const link = document.createElement('a');
-            link.href = `data:application/pdf;base64,${response.data.pdf_base64}`;
-            link.download = `fatura_${response.data.mes_referencia.toString().padStart(2, '0')}_${response.data.ano_referencia}.pdf`;
-            document.body.appendChild(link);
-            link.click();
-            document.body.removeChild(link);
         } catch (err: any) {
             console.error('Erro ao baixar PDF:', err);
             alert('Erro ao baixar PDF da fatura');
@@ -0,0 +1,23 @@
+-- ===================================================================
+-- Migração 014: Hash do payload da Energisa (sincronização delta)
+-- ===================================================================
+-- Guarda um SHA-256 do payload normalizado ao lado de cada registro
+-- sincronizado. O SyncService compara o hash novo com o armazenado e só
+-- regrava a linha quando o conteúdo mudou, evitando UPDATEs (WAL, bloat e
+-- atualização de índices) a cada ciclo de sincronização.
+--
+-- Em registros inalterados apenas unidades_consumidoras.ultima_sincronizacao
+-- é atualizado, servindo como marcador de "última verificação" da UC.
+
+ALTER TABLE unidades_consumidoras
+ADD COLUMN IF NOT EXISTS dados_api_hash VARCHAR(64);
+
+ALTER TABLE faturas
+ADD COLUMN IF NOT EXISTS dados_api_hash VARCHAR(64);
+
+ALTER TABLE historico_gd
+ADD COLUMN IF NOT EXISTS dados_api_hash VARCHAR(64);
+
+COMMENT ON COLUMN unidades_consumidoras.dados_api_hash IS 'SHA-256 do último payload de informações da UC recebido da Energisa';
+COMMENT ON COLUMN faturas.dados_api_hash IS 'SHA-256 de dados_api (JSON normalizado) usado para pular regravações sem mudança';
+COMMENT ON COLUMN historico_gd.dados_api_hash IS 'SHA-256 de dados_api (JSON normalizado) usado para pular regravações sem mudança';
@@ -0,0 +1,34 @@
+-- ===================================================================
+-- Migração 015: Agenda de sincronização por UC
+-- ===================================================================
+-- Substitui o intervalo fixo do SyncScheduler por uma fila persistente:
+-- cada UC guarda quando deve ser sincronizada de novo. O próximo horário é
+-- calculado a partir do calendário de leitura da própria UC (data_leitura,
+-- proxima_leitura_data extraída do PDF e data_vencimento da última fatura):
+-- perto da leitura/vencimento a UC é consultada com frequência, no resto do
+-- mês raramente.
+--
+-- prioridade: 0 = manual, 1 = janela de leitura, 2 = vencimento, 3 = rotina
+
+CREATE TABLE IF NOT EXISTS sync_agenda (
+    uc_id INTEGER PRIMARY KEY REFERENCES unidades_consumidoras(id) ON DELETE CASCADE,
+    proximo_sync_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    prioridade SMALLINT NOT NULL DEFAULT 3,
+    motivo VARCHAR(30),
+    ultimo_sync_em TIMESTAMPTZ,
+    atualizado_em TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Índice para a consulta da fila (UCs vencidas, por prioridade)
+CREATE INDEX IF NOT EXISTS idx_sync_agenda_fila ON sync_agenda(proximo_sync_em, prioridade);
+
+-- Comentários
+COMMENT ON TABLE sync_agenda IS 'Próxima sincronização agendada de cada UC com a Energisa';
+COMMENT ON COLUMN sync_agenda.proximo_sync_em IS 'Quando a UC volta a ficar elegível para sincronização';
+COMMENT ON COLUMN sync_agenda.prioridade IS '0 = manual, 1 = janela de leitura, 2 = vencimento, 3 = rotina';
+COMMENT ON COLUMN sync_agenda.motivo IS 'Regra do calendário que definiu o próximo horário';
+
+-- UCs já existentes entram vencidas para serem reagendadas no primeiro ciclo
+INSERT INTO sync_agenda (uc_id)
+SELECT id FROM unidades_consumidoras
+ON CONFLICT (uc_id) DO NOTHING;
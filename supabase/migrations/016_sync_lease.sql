@@ -0,0 +1,61 @@
+-- ===================================================================
+-- Migração 016: Lease para eleição de líder dos workers de background
+-- ===================================================================
+-- Com mais de um worker uvicorn (ou mais de um container) cada processo
+-- iniciava o próprio scheduler e todos sincronizavam as mesmas UCs ao mesmo
+-- tempo. Agora o processo precisa segurar o lease ("sync_scheduler") para
+-- rodar: ele renova o lease periodicamente e, se parar de renovar, outro
+-- processo assume quando o lease expira.
+--
+-- A aquisição é atômica (INSERT ... ON CONFLICT ... WHERE), então funciona
+-- em qualquer Postgres, inclusive local, sem depender de advisory locks
+-- presos a uma conexão (o PostgREST não mantém conexão por cliente).
+
+CREATE TABLE IF NOT EXISTS worker_leases (
+    nome VARCHAR(50) PRIMARY KEY,
+    dono VARCHAR(120) NOT NULL,
+    expira_em TIMESTAMPTZ NOT NULL,
+    adquirido_em TIMESTAMPTZ DEFAULT NOW(),
+    atualizado_em TIMESTAMPTZ DEFAULT NOW()
+);
+
+COMMENT ON TABLE worker_leases IS 'Leases de eleição de líder (um processo por tarefa de background)';
+COMMENT ON COLUMN worker_leases.dono IS 'Identificação do processo líder (host:pid:id)';
+COMMENT ON COLUMN worker_leases.expira_em IS 'Sem renovação até este instante, outro processo pode assumir';
+
+-- Adquire ou renova o lease. Retorna TRUE se p_dono é o líder após a chamada.
+CREATE OR REPLACE FUNCTION adquirir_lease(
+    p_nome VARCHAR,
+    p_dono VARCHAR,
+    p_ttl_segundos INTEGER
+)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_dono VARCHAR;
+BEGIN
+    INSERT INTO worker_leases (nome, dono, expira_em)
+    VALUES (p_nome, p_dono, NOW() + make_interval(secs => p_ttl_segundos))
+    ON CONFLICT (nome) DO UPDATE
+        SET dono = EXCLUDED.dono,
+            expira_em = EXCLUDED.expira_em,
+            adquirido_em = CASE
+                WHEN worker_leases.dono = EXCLUDED.dono THEN worker_leases.adquirido_em
+                ELSE NOW()
+            END,
+            atualizado_em = NOW()
+        WHERE worker_leases.dono = EXCLUDED.dono
+           OR worker_leases.expira_em < NOW()
+    RETURNING dono INTO v_dono;
+
+    RETURN v_dono IS NOT NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Libera o lease (apenas se p_dono ainda for o líder)
+CREATE OR REPLACE FUNCTION liberar_lease(p_nome VARCHAR, p_dono VARCHAR)
+RETURNS BOOLEAN AS $$
+BEGIN
+    DELETE FROM worker_leases WHERE nome = p_nome AND dono = p_dono;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
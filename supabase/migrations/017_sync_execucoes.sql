@@ -0,0 +1,35 @@
+-- ===================================================================
+-- Migração 017: Histórico de execuções da sincronização
+-- ===================================================================
+-- Cada execução do SyncService (lote da agenda ou sincronização completa)
+-- grava uma linha com contadores, latência p50/p95/max por endpoint da
+-- Energisa (energisa.*) e por etapa de banco (db.*) e a duração de cada CPF.
+-- Base do endpoint /api/admin/sync/execucoes (tendências entre execuções).
+
+CREATE TABLE IF NOT EXISTS sync_execucoes (
+    id SERIAL PRIMARY KEY,
+    origem VARCHAR(20) NOT NULL,               -- agenda, completa
+    inicio TIMESTAMPTZ NOT NULL,
+    fim TIMESTAMPTZ,
+    duracao_segundos NUMERIC(10, 2),
+
+    ucs_processadas INTEGER DEFAULT 0,
+    ucs_atualizadas INTEGER DEFAULT 0,
+    faturas_sincronizadas INTEGER DEFAULT 0,
+    gd_sincronizados INTEGER DEFAULT 0,
+    erros INTEGER DEFAULT 0,
+    cpfs_processados INTEGER DEFAULT 0,
+    cpfs_ignorados INTEGER DEFAULT 0,
+
+    latencias JSONB,                           -- etapa -> {n, p50, p95, max, total}
+    cpfs JSONB,                                -- cpf mascarado -> {ucs, processado, duracao_segundos}
+    delta JSONB,                               -- registros alterados/inalterados por tipo
+
+    criado_em TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_execucoes_inicio ON sync_execucoes(inicio DESC);
+
+COMMENT ON TABLE sync_execucoes IS 'Histórico de execuções da sincronização com a Energisa';
+COMMENT ON COLUMN sync_execucoes.latencias IS 'Latência em segundos por endpoint Energisa (energisa.*) e etapa de banco (db.*)';
+COMMENT ON COLUMN sync_execucoes.cpfs IS 'Duração da sincronização de cada CPF (mascarado)';
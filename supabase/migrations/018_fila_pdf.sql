@@ -0,0 +1,37 @@
+-- ===================================================================
+-- Migração 018: Fila persistente de download de PDFs das faturas
+-- ===================================================================
+-- O download do PDF saiu do loop de metadados do SyncService: a
+-- sincronização só enfileira as faturas sem PDF e um worker em background
+-- baixa com concorrência limitada, retry com backoff exponencial e
+-- deduplicação por (uc_id, mes_referencia, ano_referencia).
+--
+-- status: pendente -> processando -> concluido | erro (tentativas esgotadas)
+
+CREATE TABLE IF NOT EXISTS fila_pdf (
+    id SERIAL PRIMARY KEY,
+    uc_id INTEGER NOT NULL REFERENCES unidades_consumidoras(id) ON DELETE CASCADE,
+    mes_referencia INTEGER NOT NULL,
+    ano_referencia INTEGER NOT NULL,
+    numero_fatura BIGINT NOT NULL,
+    cpf VARCHAR(14) NOT NULL,                  -- sessão Energisa usada no download
+
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    reservado_ate TIMESTAMPTZ,                 -- lease do worker que está baixando
+    ultimo_erro TEXT,
+
+    criado_em TIMESTAMPTZ DEFAULT NOW(),
+    concluido_em TIMESTAMPTZ,
+    atualizado_em TIMESTAMPTZ DEFAULT NOW(),
+
+    CONSTRAINT fila_pdf_referencia_unica UNIQUE (uc_id, mes_referencia, ano_referencia)
+);
+
+-- Índice para a consulta de itens prontos
+CREATE INDEX IF NOT EXISTS idx_fila_pdf_prontos ON fila_pdf(status, proxima_tentativa_em);
+
+COMMENT ON TABLE fila_pdf IS 'Fila de download de PDFs de faturas da Energisa';
+COMMENT ON COLUMN fila_pdf.status IS 'pendente, processando, concluido, erro';
+COMMENT ON COLUMN fila_pdf.reservado_ate IS 'Item em processamento volta a pendente se o worker não concluir até aqui';
@@ -0,0 +1,27 @@
+-- ===================================================================
+-- Migração 019: Registro compartilhado das sessões de login Energisa
+-- ===================================================================
+-- O navegador de cada login por SMS vive no processo que o iniciou; esta
+-- tabela guarda só os metadados (CPF, fase, dono, expiração) para que
+-- qualquer worker da API saiba se a sessão existe, se já foi autenticada
+-- e qual processo segura o navegador.
+--
+-- fase: telefones -> sms_enviado -> autenticada
+
+CREATE TABLE IF NOT EXISTS login_sessoes (
+    id VARCHAR(120) PRIMARY KEY,               -- transaction_id / session_id devolvido ao cliente
+    cpf VARCHAR(14) NOT NULL,
+    ip VARCHAR(64),
+    fase VARCHAR(20) NOT NULL DEFAULT 'telefones',
+    autenticada BOOLEAN NOT NULL DEFAULT FALSE,
+    dono VARCHAR(200) NOT NULL,                -- hostname:pid do processo com o navegador
+    criado_em TIMESTAMPTZ DEFAULT NOW(),
+    expira_em TIMESTAMPTZ NOT NULL
+);
+
+-- Índice para a limpeza das sessões expiradas
+CREATE INDEX IF NOT EXISTS idx_login_sessoes_expira ON login_sessoes(expira_em);
+
+COMMENT ON TABLE login_sessoes IS 'Metadados das sessões de login por SMS na Energisa (navegador fica no processo dono)';
+COMMENT ON COLUMN login_sessoes.fase IS 'telefones, sms_enviado, autenticada';
+COMMENT ON COLUMN login_sessoes.dono IS 'Processo que segura o navegador; passos com navegador precisam cair nele';
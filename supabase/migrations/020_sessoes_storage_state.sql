@@ -0,0 +1,19 @@
+-- ===================================================================
+-- Migração 020: Estado do navegador nas sessões Energisa (renovação silenciosa)
+-- ===================================================================
+-- Junto com os tokens, o login por SMS passa a guardar o storage state do
+-- Playwright (cookies + localStorage). Antes da sessão completar 24h, o
+-- renovador em background tenta o refresh por HTTP e, se falhar, reabre o
+-- portal com esse estado em um navegador do pool para obter tokens novos,
+-- sem pedir outro SMS ao usuário.
+
+ALTER TABLE sessoes_energisa ADD COLUMN IF NOT EXISTS storage_state JSONB;
+ALTER TABLE sessoes_energisa ADD COLUMN IF NOT EXISTS renovacao_falhas INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE sessoes_energisa ADD COLUMN IF NOT EXISTS renovado_em TIMESTAMPTZ;
+
+-- Índice para a busca das sessões perto de expirar
+CREATE INDEX IF NOT EXISTS idx_sessoes_energisa_atualizado ON sessoes_energisa(atualizado_em);
+
+COMMENT ON COLUMN sessoes_energisa.storage_state IS 'Storage state do Playwright (cookies + localStorage) capturado no login';
+COMMENT ON COLUMN sessoes_energisa.renovacao_falhas IS 'Tentativas seguidas de renovação sem sucesso (zera a cada sessão salva)';
+COMMENT ON COLUMN sessoes_energisa.renovado_em IS 'Última renovação feita pelo renovador em background';
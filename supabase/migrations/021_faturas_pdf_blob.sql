@@ -0,0 +1,53 @@
+-- ===================================================================
+-- Migração 021: PDFs das faturas em blob store endereçado por SHA-256
+-- ===================================================================
+-- O PDF sai de faturas.pdf_base64 (texto ~33% maior que o arquivo, lido do
+-- TOAST em todo select("*") e em todo filtro "pdf_base64 IS NOT NULL") e vai
+-- para o blob store (diretório local ou bucket do Supabase Storage), com o
+-- SHA-256 do conteúdo como chave. A fatura guarda só hash, tamanho e mime;
+-- PDFs idênticos ocupam um único blob.
+--
+-- As linhas existentes são movidas em lotes pelo script
+--     python -m backend.faturas.migrar_pdfs
+-- que grava cada PDF no blob store e zera pdf_base64 (pode ser interrompido
+-- e rodado de novo). A coluna pdf_base64 fica até o script terminar e, até
+-- lá, continua valendo como "fatura com PDF": a API lê e move a linha para o
+-- blob store na primeira leitura.
+
+ALTER TABLE faturas ADD COLUMN IF NOT EXISTS pdf_sha256 CHAR(64);
+ALTER TABLE faturas ADD COLUMN IF NOT EXISTS pdf_tamanho INTEGER;
+ALTER TABLE faturas ADD COLUMN IF NOT EXISTS pdf_mime VARCHAR(100);
+
+-- Faturas com PDF (extração em lote, painel admin) e faturas de um mesmo blob
+CREATE INDEX IF NOT EXISTS idx_faturas_pdf_sha256 ON faturas(pdf_sha256) WHERE pdf_sha256 IS NOT NULL;
+
+-- Linhas ainda não movidas, na ordem em que o script percorre
+CREATE INDEX IF NOT EXISTS idx_faturas_pdf_base64_pendente ON faturas(id) WHERE pdf_base64 IS NOT NULL;
+
+-- View de extração: PDF no blob store ou ainda em pdf_base64
+CREATE OR REPLACE VIEW faturas_pendentes_extracao AS
+SELECT
+    f.id,
+    f.uc_id,
+    f.numero_fatura,
+    f.mes_referencia,
+    f.ano_referencia,
+    f.extracao_status,
+    CASE
+        WHEN f.pdf_sha256 IS NOT NULL OR f.pdf_base64 IS NOT NULL THEN true
+        ELSE false
+    END as tem_pdf
+FROM faturas f
+WHERE f.extracao_status = 'PENDENTE'
+  AND (f.pdf_sha256 IS NOT NULL OR f.pdf_base64 IS NOT NULL)
+ORDER BY f.ano_referencia DESC, f.mes_referencia DESC;
+
+-- Bucket privado para o backend "supabase" (PDF_BLOB_BACKEND)
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('faturas-pdf', 'faturas-pdf', false)
+ON CONFLICT (id) DO NOTHING;
+
+COMMENT ON COLUMN faturas.pdf_sha256 IS 'SHA-256 do PDF; chave do blob no armazenamento de PDFs';
+COMMENT ON COLUMN faturas.pdf_tamanho IS 'Tamanho do PDF em bytes';
+COMMENT ON COLUMN faturas.pdf_mime IS 'Tipo do arquivo (application/pdf)';
+COMMENT ON COLUMN faturas.pdf_base64 IS 'Obsoleto: movido para o blob store por backend.faturas.migrar_pdfs';
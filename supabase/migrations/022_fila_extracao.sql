@@ -0,0 +1,51 @@
+-- ===================================================================
+-- Migração 022: Fila persistente de extração de dados das faturas
+-- ===================================================================
+-- POST /faturas/extrair-lote deixa de processar as faturas dentro da
+-- requisição: cria um job com os itens na fila e devolve o id na hora.
+-- Um pool de workers em background (no processo líder do scheduler)
+-- extrai com concorrência limitada por provedor (LLMWhisperer, OpenAI,
+-- Anthropic), retry com backoff e lease por item.
+--
+-- status do item: pendente -> processando -> concluido | erro (tentativas esgotadas)
+
+CREATE TABLE IF NOT EXISTS extracao_jobs (
+    id SERIAL PRIMARY KEY,
+    filtros JSONB NOT NULL DEFAULT '{}'::jsonb,  -- uc_id, mes_referencia, ano_referencia
+    forcar_reprocessamento BOOLEAN NOT NULL DEFAULT false,
+    total INTEGER NOT NULL DEFAULT 0,
+    criado_por UUID REFERENCES usuarios(id) ON DELETE SET NULL,
+
+    criado_em TIMESTAMPTZ DEFAULT NOW(),
+    concluido_em TIMESTAMPTZ
+);
+
+CREATE TABLE IF NOT EXISTS fila_extracao (
+    id SERIAL PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES extracao_jobs(id) ON DELETE CASCADE,
+    fatura_id INTEGER NOT NULL REFERENCES faturas(id) ON DELETE CASCADE,
+
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    reservado_ate TIMESTAMPTZ,                 -- lease do worker que está extraindo
+    ultimo_erro TEXT,
+
+    criado_em TIMESTAMPTZ DEFAULT NOW(),
+    concluido_em TIMESTAMPTZ,
+    atualizado_em TIMESTAMPTZ DEFAULT NOW(),
+
+    CONSTRAINT fila_extracao_fatura_unica UNIQUE (job_id, fatura_id),
+    CONSTRAINT check_fila_extracao_status CHECK (status IN ('pendente', 'processando', 'concluido', 'erro'))
+);
+
+-- Índice para a consulta de itens prontos
+CREATE INDEX IF NOT EXISTS idx_fila_extracao_prontos ON fila_extracao(status, proxima_tentativa_em);
+
+-- Índice para o progresso de um job
+CREATE INDEX IF NOT EXISTS idx_fila_extracao_job ON fila_extracao(job_id);
+
+COMMENT ON TABLE extracao_jobs IS 'Pedidos de extração em lote (POST /faturas/extrair-lote)';
+COMMENT ON TABLE fila_extracao IS 'Faturas de cada job de extração, processadas pelos workers em background';
+COMMENT ON COLUMN fila_extracao.status IS 'pendente, processando, concluido, erro';
+COMMENT ON COLUMN fila_extracao.reservado_ate IS 'Item em processamento volta a pendente se o worker não concluir até aqui';
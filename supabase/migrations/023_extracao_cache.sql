@@ -0,0 +1,39 @@
+-- ===================================================================
+-- Migração 023: Cache dos resultados de extração das faturas
+-- ===================================================================
+-- A extração (LLMWhisperer + OpenAI) é determinística o bastante para
+-- o mesmo PDF: reprocessar uma fatura, ou extrair outra com o PDF
+-- idêntico, reaproveita o resultado em vez de pagar as duas APIs de novo.
+--
+-- Chave: SHA-256 do PDF + versão do extrator + versão dos prompts.
+-- Mudar o modo do LLMWhisperer ou editar um prompt gera chaves novas;
+-- as entradas antigas simplesmente deixam de ser lidas.
+
+CREATE TABLE IF NOT EXISTS extracao_cache (
+    pdf_sha256 CHAR(64) NOT NULL,
+    versao_extrator VARCHAR(100) NOT NULL,     -- ex: llmwhisperer:high_quality:line-printer:v1
+    versao_prompt VARCHAR(100) NOT NULL,       -- modelo + hash dos prompts
+
+    texto TEXT,                                -- texto do LLMWhisperer
+    dados JSONB NOT NULL,                      -- dados estruturados extraídos
+    custo_usd NUMERIC(10, 6) NOT NULL DEFAULT 0,  -- custo estimado de uma extração
+
+    hits INTEGER NOT NULL DEFAULT 0,
+    criado_em TIMESTAMPTZ DEFAULT NOW(),
+    ultimo_hit_em TIMESTAMPTZ,
+
+    PRIMARY KEY (pdf_sha256, versao_extrator, versao_prompt)
+);
+
+-- Totais para o /sync/diagnostico: entradas, acertos e dólares economizados
+CREATE OR REPLACE VIEW extracao_cache_resumo AS
+SELECT
+    COUNT(*) AS entradas,
+    COALESCE(SUM(hits), 0) AS hits,
+    COALESCE(SUM(hits * custo_usd), 0) AS economizado_usd
+FROM extracao_cache;
+
+COMMENT ON TABLE extracao_cache IS 'Resultado da extração por PDF (SHA-256) e versões do extrator e dos prompts';
+COMMENT ON COLUMN extracao_cache.custo_usd IS 'Estimativa de LLMWhisperer (por página) + OpenAI (por token) de uma extração';
+COMMENT ON COLUMN extracao_cache.hits IS 'Extrações evitadas por esta entrada';
+COMMENT ON VIEW extracao_cache_resumo IS 'Totais do cache de extração (entradas, acertos, economia)';
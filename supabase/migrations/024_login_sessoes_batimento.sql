@@ -0,0 +1,18 @@
+-- ===================================================================
+-- Migração 024: Batimento das sessões de login Energisa
+-- ===================================================================
+-- Se o processo dono de um login morre, a linha em login_sessoes ficava
+-- até expira_em e os outros workers respondiam 409 ("sessão aberta em
+-- outro processo") para um navegador que não existe mais.
+--
+-- Cada processo renova atualizado_em das suas sessões a cada minuto;
+-- sem batimento por 3 minutos o dono é considerado morto: a sessão deixa
+-- de bloquear os outros workers e, se o login não terminou, é apagada.
+
+ALTER TABLE login_sessoes ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+-- Índices para o batimento (por dono) e a limpeza das órfãs
+CREATE INDEX IF NOT EXISTS idx_login_sessoes_dono ON login_sessoes(dono);
+CREATE INDEX IF NOT EXISTS idx_login_sessoes_atualizado ON login_sessoes(atualizado_em);
+
+COMMENT ON COLUMN login_sessoes.atualizado_em IS 'Último batimento do processo dono; parado há 3 min = dono morto';